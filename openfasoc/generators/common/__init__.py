@@ -5,6 +5,9 @@ This module exports functions used in OpenFASOC generators. The following submod
 - `common.verilog_generation`
 	1. `generate_verilog(parameters: dict, src_dir: str, out_dir: str) -> None`: Used to generate synthesizable Verilog files (for OpenROAD flow) from source Mako-based Verilog templates.
 	2. `COMMON_PLATFORMS_PREFIX_MAP` (dict): This is a dictionary of common platforms (currently sky130) and their cell naming prefixes.
+- `common.simulation_raw`
+	1. `read_raw_file(raw_file: str) -> list[RawPlot]`: Reads a ngspice or Xyce raw file (binary or ASCII) into memory-mapped `RawPlot` objects, one per plot.
+	2. `read_raw(raw_file: str, vectors: list = None, plot: int = 0) -> dict`: Returns the requested vectors of one plot of a raw file.
 
 See individual function documentation for more information on a particular function.
 """
\ No newline at end of file
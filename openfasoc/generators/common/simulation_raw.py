@@ -0,0 +1,217 @@
+"""Reader for SPICE raw files written by ngspice and Xyce.
+
+Both simulators write the Berkeley SPICE3 raw format: a plain text header followed by the data in either binary (`Binary:`) or text (`Values:`) form. A file can contain more than one plot (e.g. an `op` followed by a `tran`).
+
+Binary data is memory-mapped, so opening a file does not read the data and the arrays returned for a vector are views into the mapped file (no copy is made). Only the pages holding the requested vectors are ever read from disk. Text data has to be parsed, but only the requested vectors are converted to numbers.
+"""
+
+import re
+import numpy as np
+
+_HEADER_KEYS = {
+	"title": "title",
+	"date": "date",
+	"plotname": "plotname",
+	"flags": "flags",
+	"no. variables": "num_variables",
+	"no. points": "num_points",
+	"command": "command",
+	"option": "option",
+	"dimensions": "dimensions",
+}
+
+class RawPlot:
+	"""A single plot (one analysis) from a SPICE raw file.
+
+	Vectors are accessed by name, e.g. `plot["v(out)"]` or `plot.get("V(OUT)")`. Name lookup falls back to a case-insensitive match because ngspice writes lower case names and Xyce writes upper case names.
+
+	Attributes:
+	- `title`, `date`, `plotname`, `flags` (str): Header fields of the plot.
+	- `variables` (list[tuple[str, str]]): `(name, type)` of every vector in file order. The first vector is the scale (e.g. time or frequency).
+	- `num_points` (int): Number of points in the plot.
+	- `is_complex` (bool): True for complex plots (e.g. AC analysis).
+	"""
+	def __init__(self, header: dict, variables: list, num_points: int, data=None, text_tokens=None):
+		self.title = header.get("title", "")
+		self.date = header.get("date", "")
+		self.plotname = header.get("plotname", "")
+		self.flags = header.get("flags", "")
+		self.variables = variables
+		self.num_points = num_points
+		self.is_complex = "complex" in self.flags.lower()
+		self._data = data
+		self._text_tokens = text_tokens
+		self._text_cache = {}
+		self._index = {name: i for i, (name, _) in enumerate(variables)}
+		self._lower_index = {name.lower(): i for i, (name, _) in enumerate(variables)}
+
+	@property
+	def names(self) -> list:
+		"""Names of all vectors in file order."""
+		return [name for name, _ in self.variables]
+
+	@property
+	def scale(self) -> np.ndarray:
+		"""The scale vector (first vector, e.g. time or frequency)."""
+		return self._vector(0)
+
+	def index(self, name: str) -> int:
+		"""Returns the column of a vector. Raises `KeyError` if the vector does not exist."""
+		if name in self._index:
+			return self._index[name]
+		if name.lower() in self._lower_index:
+			return self._lower_index[name.lower()]
+		raise KeyError(f"vector '{name}' not found in plot '{self.plotname}', available vectors: {self.names}")
+
+	def get(self, name: str) -> np.ndarray:
+		"""Returns the data of a vector.
+
+		For binary files the returned array is a read-only view into the memory-mapped file. For complex plots the array has a complex dtype; the scale of a complex plot (frequency) is complex as well, use `.real` to get the frequency values.
+		"""
+		return self._vector(self.index(name))
+
+	def __getitem__(self, name: str) -> np.ndarray:
+		return self.get(name)
+
+	def __contains__(self, name: str) -> bool:
+		return name in self._index or name.lower() in self._lower_index
+
+	def _vector(self, column: int) -> np.ndarray:
+		if self._data is not None:
+			return self._data[:, column]
+		if column not in self._text_cache:
+			self._text_cache[column] = _decode_text_column(self._text_tokens, column, self.is_complex)
+		return self._text_cache[column]
+
+	def __repr__(self) -> str:
+		return f"RawPlot(plotname='{self.plotname}', num_points={self.num_points}, variables={self.names})"
+
+def _decode_text_column(tokens: np.ndarray, column: int, is_complex: bool) -> np.ndarray:
+	"""Converts one column of the `Values:` section to numbers.
+
+	`tokens` is a (num_points, num_variables + 1) array of strings, the first column is the point index.
+	"""
+	strings = tokens[:, column + 1]
+	if not is_complex:
+		return strings.astype(np.float64)
+	parts = np.char.partition(strings, ",")
+	return parts[:, 0].astype(np.float64) + 1j * parts[:, 2].astype(np.float64)
+
+def _read_header(raw: bytes):
+	"""Parses a plot header at the start of `raw`.
+
+	Returns `(header, variables, data_format, data_offset)` where `data_format` is `"binary"` or `"values"` and `data_offset` is the position of the first data byte.
+	"""
+	header = {}
+	variables = []
+	in_variables = False
+	position = 0
+	while position < len(raw):
+		end = raw.find(b"\n", position)
+		if end == -1:
+			raise ValueError("unexpected end of raw file while reading the header")
+		line = raw[position:end].decode("latin-1").rstrip("\r")
+		position = end + 1
+		key, _, value = line.partition(":")
+		key_lower = key.strip().lower()
+		if key_lower in ("binary", "values") and not line.startswith(("\t", " ")):
+			return header, variables, key_lower, position
+		if key_lower == "variables":
+			in_variables = True
+			continue
+		if in_variables and line.startswith(("\t", " ")):
+			fields = line.split()
+			if len(fields) >= 3:
+				variables.append((fields[1], fields[2]))
+			continue
+		in_variables = False
+		if key_lower in _HEADER_KEYS:
+			header[_HEADER_KEYS[key_lower]] = value.strip()
+	raise ValueError("raw file header does not end with 'Binary:' or 'Values:'")
+
+def read_raw_file(raw_file: str) -> list:
+	"""Reads a ngspice or Xyce raw file (binary or ASCII) and returns a list of `RawPlot` objects, one per plot.
+
+	Binary data is memory-mapped and not read until a vector is accessed. If the number of points in the header is wrong (e.g. the simulation was interrupted) the number of complete points is computed from the file size.
+
+	Arguments:
+	- `raw_file` (str): Path to the raw file.
+	"""
+	mapped = np.memmap(raw_file, dtype=np.uint8, mode="r")
+	plots = []
+	offset = 0
+	file_size = len(mapped)
+	while offset < file_size:
+		# headers are small, only decode a window of the file to find them
+		header, variables, data_format, data_offset = _read_header(_read_window(mapped, offset))
+		data_offset += offset
+		num_variables = int(header.get("num_variables", len(variables)))
+		if num_variables != len(variables):
+			raise ValueError(f"raw file declares {num_variables} variables but lists {len(variables)}")
+		is_complex = "complex" in header.get("flags", "").lower()
+		declared_points = int(header.get("num_points", "0") or 0)
+		if data_format == "binary":
+			dtype = np.dtype("<c16") if is_complex else np.dtype("<f8")
+			row_size = dtype.itemsize * num_variables
+			available_points = (file_size - data_offset) // row_size
+			num_points = declared_points if 0 < declared_points <= available_points else available_points
+			data = np.ndarray(
+				shape=(num_points, num_variables),
+				dtype=dtype,
+				buffer=mapped,
+				offset=data_offset,
+			)
+			plots.append(RawPlot(header, variables, num_points, data=data))
+			offset = data_offset + num_points * row_size
+			if declared_points > available_points:
+				# truncated file, the remaining bytes are an incomplete point
+				offset = file_size
+		else:
+			text, offset = _read_values_section(mapped, data_offset)
+			tokens = np.array(text.split(), dtype=str)
+			row_size = num_variables + 1
+			num_points = len(tokens) // row_size
+			if 0 < declared_points < num_points:
+				num_points = declared_points
+			tokens = tokens[: num_points * row_size].reshape(num_points, row_size)
+			plots.append(RawPlot(header, variables, num_points, text_tokens=tokens))
+		# skip blank lines between plots
+		while offset < file_size and mapped[offset] in (ord("\n"), ord("\r"), ord(" "), ord("\t")):
+			offset += 1
+	return plots
+
+def _read_window(mapped: np.memmap, offset: int, size: int = 1 << 16) -> bytes:
+	"""Returns enough bytes from `offset` to contain a full plot header."""
+	while True:
+		window = mapped[offset : offset + size].tobytes()
+		if re.search(rb"^(Binary|Values):", window, re.MULTILINE) or offset + size >= len(mapped):
+			return window
+		size *= 4
+
+def _read_values_section(mapped: np.memmap, offset: int):
+	"""Returns `(text, end_offset)` of an ASCII `Values:` section, which ends at the next plot (`Title:`) or the end of the file."""
+	match = re.search(rb"^Title:", mapped[offset:].tobytes(), re.MULTILINE)
+	end = offset + match.start() if match else len(mapped)
+	return mapped[offset:end].tobytes().decode("latin-1"), end
+
+def read_raw(raw_file: str, vectors: list = None, plot: int = 0) -> dict:
+	"""Returns the requested vectors of one plot of a raw file as a dictionary `{name: array}`.
+
+	Arguments:
+	- `raw_file` (str): Path to the raw file.
+	- `vectors` (list[str]): Names of the vectors to return (case-insensitive). All vectors are returned if this is `None`.
+	- `plot` (int or str): Index or plotname of the plot to read when the file has several plots. (default: first plot)
+
+	Example:
+		`data = read_raw("tran.raw", ["time", "v(vreg)"])` returns `{"time": array, "v(vreg)": array}`.
+	"""
+	plots = read_raw_file(raw_file)
+	if isinstance(plot, str):
+		matching = [p for p in plots if p.plotname.lower() == plot.lower()]
+		if not matching:
+			raise KeyError(f"plot '{plot}' not found, available plots: {[p.plotname for p in plots]}")
+		selected = matching[0]
+	else:
+		selected = plots[plot]
+	vectors = selected.names if vectors is None else vectors
+	return {name: selected.get(name) for name in vectors}
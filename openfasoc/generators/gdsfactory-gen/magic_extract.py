@@ -0,0 +1,151 @@
+"""single session magic extraction driver (replaces extract.bash)
+reads, flattens, and extracts a layout in one magic process instead of starting magic once per step.
+usage: python magic_extract.py <gds file> <top cell> [--mode pex|lvs|both] [--pex-options merge|lvs_all_caps] [--timeout seconds]
+"""
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+from pathlib import Path
+from typing import Optional, Union
+
+# PDK_ROOT used when the environment does not define one (same as the old extract.bash)
+DEFAULT_PDK_ROOT = "/usr/bin/miniconda3/share/pdk/"
+
+EXTRACTION_MODES = ("pex", "lvs", "both")
+
+# ext2spice options of the pex netlist (magic extracts parasitic caps only, no resistances)
+# merge: the netlist extract.bash left behind (its last pass), the default so sweep results stay comparable
+# lvs_all_caps: lvs device naming and every parasitic cap however small (cthresh 0), gives a different netlist
+PEX_OPTION_SETS = {
+	"merge": ["ext2spice merge aggressive"],
+	"lvs_all_caps": ["ext2spice lvs", "ext2spice merge aggressive", "ext2spice cthresh 0", "ext2spice rthresh 0"],
+}
+
+# ext2spice options are sticky inside a magic session, so every pass starts from the defaults
+__LVS_OPTIONS = ["ext2spice lvs"]
+
+
+class MagicExtractionError(RuntimeError):
+	"""raised when magic fails, times out, or does not write the expected netlist"""
+	def __init__(self, message: str, log_path: Optional[Path] = None):
+		log_tail = ""
+		if log_path is not None and Path(log_path).is_file():
+			log_tail = "\n".join(Path(log_path).read_text(errors="replace").splitlines()[-20:])
+			log_tail = "\nlast lines of " + str(log_path) + ":\n" + log_tail
+		super().__init__(message + log_tail)
+		self.log_path = log_path
+
+
+class MagicExtractionTimeout(MagicExtractionError):
+	"""raised when magic does not finish within the timeout"""
+
+
+def netlist_names(topcell: str, mode: str = "pex") -> dict[str,str]:
+	"""returns {pass: netlist file name} written for a mode
+	pex -> <topcell>_pex.spice, lvs -> <topcell>_lvs.spice"""
+	if mode not in EXTRACTION_MODES:
+		raise ValueError("mode must be one of " + str(EXTRACTION_MODES))
+	names = {"lvs": topcell + "_lvs.spice", "pex": topcell + "_pex.spice"}
+	return {pass_: name for pass_, name in names.items() if mode in (pass_, "both")}
+
+
+def magic_extraction_script(gds_file: Union[str,Path], topcell: str, mode: str = "pex", pex_options: str = "merge") -> str:
+	"""returns the magic tcl script which reads, flattens, and extracts topcell
+	the flattened copy replaces the original cell so netlists keep the top cell name"""
+	if pex_options not in PEX_OPTION_SETS:
+		raise ValueError("pex_options must be one of " + str(tuple(PEX_OPTION_SETS)))
+	pass_options = {"lvs": __LVS_OPTIONS, "pex": PEX_OPTION_SETS[pex_options]}
+	lines = [
+		"gds read " + str(gds_file),
+		"load " + topcell,
+		"flatten " + topcell + "_flat",
+		"load " + topcell + "_flat",
+		"cellname delete " + topcell,
+		"cellname rename " + topcell + "_flat " + topcell,
+		"load " + topcell,
+		"extract all",
+	]
+	for pass_, netlist in netlist_names(topcell, mode).items():
+		lines.append("ext2spice default")
+		lines += pass_options[pass_]
+		lines.append("ext2spice -o " + netlist)
+	lines.append("quit -noprompt")
+	return "\n".join(lines) + "\n"
+
+
+def run_magic_extraction(
+	gds_file: Union[str,Path],
+	topcell: str,
+	mode: str = "pex",
+	pex_options: str = "merge",
+	work_dir: Optional[Union[str,Path]] = None,
+	rcfile: Union[str,Path] = "./sky130A/sky130A.magicrc",
+	timeout: Optional[float] = 1800,
+	magic: Optional[str] = None,
+	keep_ext_files: bool = False,
+) -> dict[str,Path]:
+	"""extracts topcell from gds_file with a single magic session
+	args:
+	gds_file = layout to extract
+	topcell = name of the top cell in gds_file
+	mode = "pex" (netlist with parasitic caps, <topcell>_pex.spice), "lvs" (<topcell>_lvs.spice), or "both"
+	pex_options = ext2spice options of the pex netlist, see PEX_OPTION_SETS
+	work_dir = directory where magic runs and netlists are written (default: directory of gds_file)
+	rcfile = magicrc to use, relative paths are relative to work_dir
+	timeout = seconds before magic is killed, None means no limit
+	magic = magic executable, defaults to $MAGIC or "magic" (tests can point this at a stub)
+	keep_ext_files = keep the .ext files magic writes during extraction
+	returns {"lvs"/"pex": netlist path, "log": log path}
+	****NOTE: stdout and stderr of magic are written to <topcell>_extract.log in work_dir
+	"""
+	gds_file = Path(gds_file).resolve()
+	work_dir = Path(work_dir).resolve() if work_dir is not None else gds_file.parent
+	magic = magic if magic is not None else os.environ.get("MAGIC", "magic")
+	script = magic_extraction_script(gds_file, topcell, mode, pex_options)
+	netlists = {pass_: work_dir / name for pass_, name in netlist_names(topcell, mode).items()}
+	log_path = work_dir / (topcell + "_extract.log")
+	env = dict(os.environ)
+	env.setdefault("PDK_ROOT", DEFAULT_PDK_ROOT)
+	for netlist in netlists.values():
+		netlist.unlink(missing_ok=True)
+	with open(log_path, "w") as log:
+		try:
+			proc = subprocess.run(
+				[magic, "-rcfile", str(rcfile), "-noconsole", "-dnull"],
+				input=script,
+				stdout=log,
+				stderr=subprocess.STDOUT,
+				cwd=work_dir,
+				env=env,
+				timeout=timeout,
+				text=True,
+			)
+		except subprocess.TimeoutExpired:
+			raise MagicExtractionTimeout("magic extraction of " + topcell + " timed out after " + str(timeout) + "s", log_path)
+		except FileNotFoundError:
+			raise MagicExtractionError("magic executable not found: " + str(magic))
+	if not keep_ext_files:
+		for ext_file in work_dir.glob("*.ext"):
+			ext_file.unlink()
+	if proc.returncode != 0:
+		raise MagicExtractionError("magic exited with code " + str(proc.returncode) + " while extracting " + topcell, log_path)
+	missing = [str(netlist) for netlist in netlists.values() if not netlist.is_file()]
+	if missing:
+		raise MagicExtractionError("magic did not write " + ", ".join(missing), log_path)
+	return {**netlists, "log": log_path}
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="extract a layout with a single magic session")
+	parser.add_argument("gds_file", help="gds file to read")
+	parser.add_argument("topcell", help="name of the top cell in the gds file")
+	parser.add_argument("--mode", choices=EXTRACTION_MODES, default="pex", help="pex: netlist with parasitic caps, lvs: lvs netlist, both (default: pex)")
+	parser.add_argument("--pex-options", choices=list(PEX_OPTION_SETS), default="merge", help="ext2spice options of the pex netlist, merge: same netlist as extract.bash, lvs_all_caps: lvs naming and all caps (default: merge)")
+	parser.add_argument("--rcfile", default="./sky130A/sky130A.magicrc", help="magicrc file (default: ./sky130A/sky130A.magicrc)")
+	parser.add_argument("--timeout", type=float, default=1800, help="seconds before magic is killed (default: 1800)")
+	parser.add_argument("--work-dir", default=".", help="directory to run magic in and write netlists to (default: .)")
+	args = parser.parse_args()
+	outputs = run_magic_extraction(args.gds_file, args.topcell, args.mode, args.pex_options, args.work_dir, args.rcfile, args.timeout)
+	for pass_, path in outputs.items():
+		print(pass_ + ": " + str(path))
@@ -0,0 +1,247 @@
+"""declarative parameter space for generator sweeps
+a space is read from a yaml or json file (see opamp_param_space.yaml) which lists dimensions, the slots of the
+serialized parameter vector they fill, and constraints between them. points are produced by grid, sobol,
+latin hypercube, or random sampling and returned as (points, slots) arrays which can be passed to the sweep directly.
+dimension types:
+continuous = any float in [low, high]
+quantized = float in [low, high] rounded to multiples of step from low
+integer = any integer in [low, high]
+categorical = one of values
+every dimension may list grid values explicitly (grid: [...]), otherwise grid sampling uses levels evenly spaced
+values (default 3) for continuous/quantized dimensions and every value for integer/categorical dimensions.
+constraints are python expressions over the dimension names (e.g. "diffpair_width / diffpair_fingers >= 0.5"),
+only arithmetic, comparisons, and/or/not, and the functions in CONSTRAINT_FUNCTIONS are allowed.
+"""
+from __future__ import annotations
+import ast
+import itertools
+import json
+import math
+import warnings
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+DIMENSION_TYPES = ("continuous", "quantized", "integer", "categorical")
+SAMPLING_METHODS = ("grid", "sobol", "lhs", "random")
+
+CONSTRAINT_FUNCTIONS = {"abs": abs, "min": min, "max": max, "round": round, "floor": math.floor, "ceil": math.ceil, "sqrt": math.sqrt}
+
+__ALLOWED_NODES = (
+	ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+	ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+	ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+	ast.Name, ast.Load, ast.Constant, ast.Call, ast.IfExp,
+)
+
+
+def compile_constraint(expression: str, names: list[str]):
+	"""checks that expression only uses allowed syntax and known names and returns the compiled code"""
+	try:
+		tree = ast.parse(expression, mode="eval")
+	except SyntaxError as error:
+		raise ValueError("constraint " + repr(expression) + " is not a valid expression: " + str(error))
+	for node in ast.walk(tree):
+		if not isinstance(node, __ALLOWED_NODES):
+			raise ValueError("constraint " + repr(expression) + " uses " + type(node).__name__ + " which is not allowed")
+		if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in CONSTRAINT_FUNCTIONS):
+			raise ValueError("constraint " + repr(expression) + " calls a function which is not one of " + str(list(CONSTRAINT_FUNCTIONS)))
+		if isinstance(node, ast.Name) and node.id not in names and node.id not in CONSTRAINT_FUNCTIONS:
+			raise ValueError("constraint " + repr(expression) + " uses unknown name " + node.id)
+		if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, bool)):
+			raise ValueError("constraint " + repr(expression) + " may only contain numbers")
+	return compile(tree, "<constraint>", "eval")
+
+
+class ParameterSpace:
+	"""parameter space made of dimensions which fill slots of a parameter vector
+	args:
+	dimensions = list of dicts with keys name, slot (int or list of ints), type, and
+		low/high (continuous, integer), low/high/step (quantized), values (categorical), optional grid or levels
+	defaults = values of every slot (slots not covered by a dimension keep their default)
+	constraints = list of constraint expressions over dimension names
+	"""
+	def __init__(self, dimensions: list[dict], defaults: list[float], constraints: Optional[list[str]] = None):
+		self.defaults = np.asarray(defaults, dtype=np.float64)
+		self.dimensions = list()
+		seen_slots = set()
+		for dimension in dimensions:
+			dimension = dict(dimension)
+			name, kind = dimension.get("name"), dimension.get("type")
+			if not name or not name.isidentifier():
+				raise ValueError("every dimension needs a name which is a valid identifier, got " + repr(name))
+			if kind not in DIMENSION_TYPES:
+				raise ValueError("dimension " + name + " type must be one of " + str(DIMENSION_TYPES))
+			slots = dimension.get("slot")
+			slots = [slots] if isinstance(slots, int) else list(slots or [])
+			if not slots or any(slot < 0 or slot >= len(self.defaults) for slot in slots):
+				raise ValueError("dimension " + name + " slot must be between 0 and " + str(len(self.defaults)-1))
+			if seen_slots.intersection(slots):
+				raise ValueError("dimension " + name + " uses a slot which is already used by another dimension")
+			seen_slots.update(slots)
+			dimension["slot"] = slots
+			if kind == "categorical":
+				if not dimension.get("values"):
+					raise ValueError("categorical dimension " + name + " needs values")
+				dimension["values"] = [float(value) for value in dimension["values"]]
+			else:
+				if "low" not in dimension or "high" not in dimension or float(dimension["low"]) > float(dimension["high"]):
+					raise ValueError("dimension " + name + " needs low <= high")
+				dimension["low"], dimension["high"] = float(dimension["low"]), float(dimension["high"])
+				if kind == "quantized" and not float(dimension.get("step", 0)) > 0:
+					raise ValueError("quantized dimension " + name + " needs a step > 0")
+				if kind == "integer" and not (dimension["low"].is_integer() and dimension["high"].is_integer()):
+					raise ValueError("integer dimension " + name + " needs integer low and high")
+			self.dimensions.append(dimension)
+		if len({dimension["name"] for dimension in self.dimensions}) != len(self.dimensions):
+			raise ValueError("dimension names must be unique")
+		self.constraints = list(constraints or [])
+		self.__compiled_constraints = [compile_constraint(constraint, self.names) for constraint in self.constraints]
+
+	@classmethod
+	def from_dict(cls, spec: dict) -> "ParameterSpace":
+		for key in ("dimensions", "defaults"):
+			if key not in spec:
+				raise ValueError("parameter space spec needs " + key)
+		return cls(spec["dimensions"], spec["defaults"], spec.get("constraints"))
+
+	@classmethod
+	def from_file(cls, path: Union[str,Path]) -> "ParameterSpace":
+		"""reads a yaml (.yaml, .yml) or json spec"""
+		path = Path(path)
+		if path.suffix.lower() in (".yaml", ".yml"):
+			import yaml
+			spec = yaml.safe_load(path.read_text())
+		else:
+			spec = json.loads(path.read_text())
+		return cls.from_dict(spec)
+
+	@property
+	def names(self) -> list[str]:
+		return [dimension["name"] for dimension in self.dimensions]
+
+	def __from_unit(self, dimension: dict, u: np.array) -> np.array:
+		"""maps values in [0,1) to the dimension"""
+		kind = dimension["type"]
+		if kind == "categorical":
+			values = np.asarray(dimension["values"])
+			return values[np.minimum((u * len(values)).astype(int), len(values)-1)]
+		low, high = dimension["low"], dimension["high"]
+		if kind == "integer":
+			return np.minimum(low + np.floor(u * (high - low + 1)), high)
+		values = low + u * (high - low)
+		if kind == "quantized":
+			return self.snap(dimension, values)
+		return values
+
+	@staticmethod
+	def snap(dimension: dict, values: np.array) -> np.array:
+		"""rounds values of a quantized dimension to its steps inside [low, high]"""
+		low, high, step = dimension["low"], dimension["high"], float(dimension["step"])
+		snapped = low + np.round((np.asarray(values) - low) / step) * step
+		# stepping over high is not allowed, float noise should not create unique points
+		snapped = np.where(snapped > high + 1e-9, snapped - step, snapped)
+		return np.round(snapped, 9)
+
+	def grid_values(self, dimension: dict) -> list[float]:
+		if "grid" in dimension:
+			return [float(value) for value in dimension["grid"]]
+		kind = dimension["type"]
+		if kind == "categorical":
+			return list(dimension["values"])
+		if kind == "integer":
+			return [float(value) for value in range(int(dimension["low"]), int(dimension["high"])+1)]
+		values = np.linspace(dimension["low"], dimension["high"], int(dimension.get("levels", 3)))
+		return list(self.snap(dimension, values) if kind == "quantized" else values)
+
+	def satisfies(self, values: np.array) -> np.array:
+		"""returns a boolean mask of the rows of values (points, dimensions) which meet every constraint"""
+		values = np.atleast_2d(values)
+		mask = np.ones(len(values), dtype=bool)
+		if not self.__compiled_constraints:
+			return mask
+		for i, row in enumerate(values):
+			env = dict(zip(self.names, (float(value) for value in row)))
+			mask[i] = all(bool(eval(code, {"__builtins__": {}}, {**CONSTRAINT_FUNCTIONS, **env})) for code in self.__compiled_constraints)
+		return mask
+
+	def to_vectors(self, values: np.array) -> np.array:
+		"""converts (points, dimensions) values to (points, slots) parameter vectors"""
+		values = np.atleast_2d(values)
+		vectors = np.tile(self.defaults, (len(values), 1))
+		for col, dimension in enumerate(self.dimensions):
+			for slot in dimension["slot"]:
+				vectors[:,slot] = values[:,col]
+		return vectors
+
+	def grid(self) -> np.array:
+		"""returns every combination of the grid values which meets the constraints
+		the last dimension changes fastest, like nested for loops in dimension order"""
+		values = np.array(list(itertools.product(*[self.grid_values(dimension) for dimension in self.dimensions])), dtype=np.float64)
+		values = values.reshape(-1, len(self.dimensions))
+		return self.to_vectors(values[self.satisfies(values)])
+
+	def sample(self, num_points: int, method: str = "sobol", seed: Optional[int] = None, max_draws: int = 100) -> np.array:
+		"""returns num_points parameter vectors
+		args:
+		num_points = number of points (ignored by grid)
+		method = grid, sobol (scrambled), lhs (latin hypercube), or random
+		seed = random seed
+		max_draws = give up when num_points*max_draws candidates did not give enough points meeting the constraints
+		****NOTE: points breaking a constraint are rejected and more are drawn, so heavily constrained spaces lose some of
+		the stratification of sobol/lhs
+		"""
+		if method not in SAMPLING_METHODS:
+			raise ValueError("method must be one of " + str(SAMPLING_METHODS))
+		if method == "grid":
+			return self.grid()
+		num_dims = len(self.dimensions)
+		if method == "sobol":
+			from scipy.stats import qmc
+			sampler = qmc.Sobol(num_dims, scramble=True, seed=seed)
+			def draw(count):
+				# sobol prefers powers of 2 but any count is still low discrepancy
+				with warnings.catch_warnings():
+					warnings.simplefilter("ignore", UserWarning)
+					return sampler.random(count)
+		elif method == "lhs":
+			from scipy.stats import qmc
+			draw = lambda count : qmc.LatinHypercube(num_dims, seed=rng).random(count)
+		else:
+			draw = lambda count : rng.random((count, num_dims))
+		rng = np.random.default_rng(seed)
+		accepted = list()
+		num_accepted, drawn = 0, 0
+		while num_accepted < num_points:
+			if drawn >= num_points * max_draws:
+				raise RuntimeError("only " + str(num_accepted) + " of " + str(drawn) + " sampled points met the constraints " + str(self.constraints))
+			count = max(num_points - num_accepted, 1) if drawn == 0 else 2 * (num_points - num_accepted)
+			unit = draw(count)
+			drawn += count
+			values = np.column_stack([self.__from_unit(dimension, unit[:,col]) for col, dimension in enumerate(self.dimensions)])
+			values = values[self.satisfies(values)]
+			accepted.append(values)
+			num_accepted += len(values)
+		return self.to_vectors(np.concatenate(accepted)[:num_points])
+
+	def bounds(self) -> np.array:
+		"""returns a (slots, 3) array of (low, high, quantum) as used by the opamp optimizer
+		slots which no dimension covers are fixed to their default
+		****NOTE: constraints can not be expressed as bounds and are ignored
+		"""
+		bounds = np.column_stack([self.defaults, self.defaults, np.ones(len(self.defaults))])
+		for dimension in self.dimensions:
+			kind = dimension["type"]
+			if kind == "categorical":
+				values = np.sort(dimension["values"])
+				spacing = np.unique(np.round(np.diff(values), 9))
+				if len(spacing) > 1:
+					raise ValueError("categorical dimension " + dimension["name"] + " is not evenly spaced and can not be expressed as bounds")
+				low, high, quantum = values[0], values[-1], (spacing[0] if len(spacing) else 1)
+			else:
+				low, high = dimension["low"], dimension["high"]
+				quantum = {"continuous": 0, "quantized": float(dimension.get("step", 0)), "integer": 1}[kind]
+			for slot in dimension["slot"]:
+				bounds[slot] = (low, high, quantum)
+		return bounds
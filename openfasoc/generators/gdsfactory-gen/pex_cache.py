@@ -0,0 +1,115 @@
+"""content addressed cache for magic pex extraction results
+a layout is only extracted once for a given (gds bytes, top cell, extraction settings, magicrc) combination.
+the cache is a directory with one subdirectory per key, entries are written to a temporary name and
+then renamed into place so several Pool workers can share one cache directory safely.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pathlib import Path
+from shutil import copyfile
+from tempfile import mkdtemp
+from typing import Optional, Union
+
+
+def hash_file(path: Union[str,Path]) -> str:
+	"""returns the sha256 hex digest of a file, read in chunks so large gds files are not loaded at once"""
+	sha = hashlib.sha256()
+	with open(path, "rb") as file:
+		for chunk in iter(lambda: file.read(1 << 20), b""):
+			sha.update(chunk)
+	return sha.hexdigest()
+
+
+class PEXCache:
+	"""cache of extracted netlists keyed by layout content and extraction setup
+	args:
+	cache_dir = directory which holds the cache (created if it does not exist)
+	setup_files = files which change the extraction result (magicrc, tech setup, extraction script)
+	settings = dict of any other extraction settings (mode, pdk root, ...) which should be part of the key
+	****NOTE: hit/miss statistics are appended to cache_dir/stats.log so they are shared between processes
+	"""
+	def __init__(
+		self,
+		cache_dir: Union[str,Path] = "./pex_cache",
+		setup_files: Optional[list[Union[str,Path]]] = None,
+		settings: Optional[dict] = None,
+	):
+		self.cache_dir = Path(cache_dir).resolve()
+		self.cache_dir.mkdir(parents=True, exist_ok=True)
+		setup_files = setup_files if setup_files is not None else list()
+		# hash the setup once, it is part of every key
+		self.setup_hashes = {str(Path(f).name): hash_file(f) for f in setup_files if Path(f).is_file()}
+		self.settings = dict(settings) if settings is not None else dict()
+		self.hits = 0
+		self.misses = 0
+
+	def key(self, gds_path: Union[str,Path], topcell: str, netlist_name: str) -> str:
+		"""returns the cache key for extracting topcell from gds_path into netlist_name"""
+		key_data = {
+			"gds": hash_file(gds_path),
+			"topcell": topcell,
+			"netlist": netlist_name,
+			"setup": self.setup_hashes,
+			"settings": self.settings,
+		}
+		return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+
+	def __log(self, event: str, key: str) -> None:
+		# single small appends are atomic, so concurrent workers do not interleave lines
+		with open(self.cache_dir / "stats.log", "a") as log:
+			log.write(event + " " + key + "\n")
+
+	def fetch(self, key: str, netlist_name: str, destination_dir: Union[str,Path]) -> bool:
+		"""copies the cached netlist into destination_dir if it exists
+		returns True on a hit, False on a miss"""
+		cached_netlist = self.cache_dir / key / netlist_name
+		if cached_netlist.is_file():
+			copyfile(cached_netlist, Path(destination_dir) / netlist_name)
+			self.hits += 1
+			self.__log("hit", key)
+			return True
+		self.misses += 1
+		self.__log("miss", key)
+		return False
+
+	def store(self, key: str, netlist_path: Union[str,Path], metadata: Optional[dict] = None) -> bool:
+		"""stores an extracted netlist under key, empty or missing netlists (failed extractions) are not cached
+		returns True if the netlist was stored"""
+		netlist_path = Path(netlist_path)
+		if not netlist_path.is_file() or netlist_path.stat().st_size == 0:
+			return False
+		entry_dir = self.cache_dir / key
+		if entry_dir.is_dir():
+			return True
+		staging_dir = Path(mkdtemp(dir=self.cache_dir, prefix=".staging_"))
+		copyfile(netlist_path, staging_dir / netlist_path.name)
+		with open(staging_dir / "meta.json", "w") as meta:
+			json.dump({"setup": self.setup_hashes, "settings": self.settings, **(metadata or dict())}, meta, indent=2, default=str)
+		try:
+			os.rename(staging_dir, entry_dir)
+		except OSError:
+			# another worker stored the same key first
+			for leftover in staging_dir.iterdir():
+				leftover.unlink()
+			staging_dir.rmdir()
+		return True
+
+	def stats(self) -> dict:
+		"""returns hit/miss statistics of all processes which used this cache directory"""
+		counts = {"hit": 0, "miss": 0}
+		stats_log = self.cache_dir / "stats.log"
+		if stats_log.is_file():
+			with open(stats_log, "r") as log:
+				for line in log:
+					event = line.split(" ", 1)[0]
+					counts[event] = counts.get(event, 0) + 1
+		total = counts["hit"] + counts["miss"]
+		entries = sum(1 for entry in self.cache_dir.iterdir() if entry.is_dir() and not entry.name.startswith("."))
+		return {
+			"hits": counts["hit"],
+			"misses": counts["miss"],
+			"hit_rate": counts["hit"] / total if total else 0.0,
+			"entries": entries,
+		}
@@ -7,10 +7,13 @@ from .via_gen import via_stack, via_array
 from gdsfactory.components.rectangle import rectangle
 from .pdk.util.comp_utils import evaluate_bbox, align_comp_to_port, to_decimal, to_float, prec_ref_center
 from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_list, print_ports, assert_port_manhattan, assert_ports_perpindicular
+from .pdk.util.hierarchy import maybe_flatten
+from .pdk.util.memory_profile import profile_memory
 from decimal import Decimal
 
 
 @cell
+@profile_memory
 def L_route(
 	pdk: MappedPDK,
 	edge1: Port,
@@ -103,7 +106,7 @@ def L_route(
 		h_to_v_via_ref.movex(viaxofs).movey(viayofs)
 	# add ports and return
 	Lroute.add_ports(h_to_v_via_ref.get_ports_list())
-	return rename_ports_by_orientation(Lroute.flatten())
+	return rename_ports_by_orientation(maybe_flatten(Lroute))
 
 
 if __name__ == "__main__":
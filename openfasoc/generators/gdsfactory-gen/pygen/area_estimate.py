@@ -0,0 +1,455 @@
+"""analytic bounding box estimates of the pygen generators
+the estimates follow the placement arithmetic of nmos, pmos, diff_pair, mimcap_array, and opamp using only their
+parameters and the pdk grules, no geometry is built (an opamp estimate takes ~20 ms instead of a 40-100 s build).
+sweep samplers use them to drop configurations which exceed an area budget before any layout or simulation job runs.
+routes which stay inside the bounding box and grid snapping are ignored, checked against real sky130 builds
+(tests/gdsfactory_gen/test_area_estimate.py and compare_area_estimate in sky130_nist_tapeout.py) the width and height
+of every estimate are within ESTIMATE_TOLERANCE (relative) of evaluate_bbox of the built component.
+the largest errors seen were 0.5% (diff_pair height) and 0.02% (opamp, 30 random points of get_small_parameter_list),
+with and without the sky130 npc decorator. the opamp rounds the shift of its pmos section to 1 um, the estimate rounds
+a slightly smaller value (see ROUNDING_MARGIN) so the small height errors of the sections cannot move it by a step.
+all functions return (width, height) like evaluate_bbox, estimate_area returns width*height
+"""
+from math import floor
+from typing import Callable, Optional, Union
+from .pdk.mappedpdk import MappedPDK
+from .pdk.sky130_mapped.sky130_add_npc import sky130_add_npc
+
+# relative error bound of the estimated width and height, see module docstring
+ESTIMATE_TOLERANCE = 0.01
+# accuracy (um) of the terms of a rounded placement (the pmos section shift of opamp), see opamp_bbox_estimate
+ROUNDING_MARGIN = 0.02
+
+
+def __level(glayer: str) -> int:
+	return int(glayer[-1]) if "met" in glayer else 0
+
+
+def __layer_dim(pdk: MappedPDK, glayer: str, below: bool, above: bool) -> float:
+	"""square size of a routable layer in a via stack (see __get_layer_dim in via_gen.py)"""
+	is_lvl0 = any([hint in glayer for hint in ["poly","active"]])
+	layer_dim = 0
+	if below and not is_lvl0:
+		via_below = "mcon" if glayer=="met1" else "via"+str(int(glayer[-1])-1)
+		layer_dim = pdk.get_grule(via_below)["width"] + 2*pdk.get_grule(via_below,glayer)["min_enclosure"]
+	if above:
+		via_above = "mcon" if is_lvl0 else "via"+str(glayer[-1])
+		layer_dim = max(layer_dim, pdk.get_grule(via_above)["width"] + 2*pdk.get_grule(via_above,glayer)["min_enclosure"])
+	return max(layer_dim, pdk.get_grule(glayer)["min_width"])
+
+
+def __via_stack_dims(pdk: MappedPDK, glayer1: str, glayer2: str, assume_bottom_via: bool = False) -> dict[str,float]:
+	"""{glayer: square size} of every layer in via_stack(pdk, glayer1, glayer2), empty if both are on the same level"""
+	if __level(glayer1) > __level(glayer2):
+		glayer1, glayer2 = glayer2, glayer1
+	level1, level2 = __level(glayer1), __level(glayer2)
+	dims = dict()
+	if level1 == level2:
+		return dims
+	for level in range(level1, level2+1):
+		layer_name = glayer1 if level==0 else "met"+str(level)
+		dims[layer_name] = __layer_dim(pdk, layer_name, below=(level!=level1 or assume_bottom_via), above=(level!=level2))
+		if level != level2:
+			via_name = "mcon" if level==0 else "via"+str(level)
+			dims[via_name] = pdk.get_grule(via_name)["width"]
+	return dims
+
+
+def __via_stack_size(pdk: MappedPDK, glayer1: str, glayer2: str, assume_bottom_via: bool = False) -> float:
+	return max(__via_stack_dims(pdk, glayer1, glayer2, assume_bottom_via).values(), default=0)
+
+
+def __npc_overhang(pdk: MappedPDK, gate_route_topmet: str) -> float:
+	"""how far the npc which sky130_add_npc pads around licon on poly (0.1) reaches past the outer via of a gate via array"""
+	if pdk.default_decorator is not sky130_add_npc:
+		return 0
+	return max(0, (pdk.get_grule("mcon")["width"] + 2*0.1 - __via_stack_size(pdk, "poly", gate_route_topmet))/2)
+
+
+def __via_array_size(pdk: MappedPDK, glayer1: str, glayer2: str, size: tuple[Optional[float],Optional[float]], minus1: bool = False, num_vias: Optional[tuple[Optional[int],Optional[int]]] = None) -> list[float]:
+	"""(width, height) of via_array(pdk, glayer1, glayer2, size, minus1, num_vias)"""
+	if __level(glayer1) > __level(glayer2):
+		glayer1, glayer2 = glayer2, glayer1
+	level1, level2 = __level(glayer1), __level(glayer2)
+	dims = __via_stack_dims(pdk, glayer1, glayer2)
+	# via pitch and top enclosure (see __get_viastack_minseperation in via_gen.py)
+	spacings = [] if level1 else [pdk.get_grule("mcon")["min_separation"] + dims["mcon"]]
+	top_enclosure = 0
+	for level in range(max(level1, 1), level2):
+		met_glayer, via_glayer = "met"+str(level), "via"+str(level)
+		spacings += [pdk.get_grule(met_glayer)["min_separation"] + dims[met_glayer], pdk.get_grule(via_glayer)["min_separation"] + dims[via_glayer]]
+		if level == level2-1:
+			top_enclosure = pdk.get_grule(glayer2,via_glayer)["min_enclosure"]
+	spacing = pdk.snap_to_2xgrid(max(spacings),return_type="float")
+	top_enclosure = 2*pdk.snap_to_2xgrid(top_enclosure,return_type="float")
+	array_size = list()
+	for i in range(2):
+		if num_vias and num_vias[i]:
+			count = num_vias[i]
+		else:
+			count = floor((pdk.snap_to_2xgrid(size[i],return_type="float") - top_enclosure) / spacing) or 1
+			count = 1 if count < 1 else count
+			count = ((count - 1) or 1) if minus1 else count
+		array_size.append(max((count-1)*spacing + max(dims.values()), size[i] or 0))
+	return array_size
+
+
+def __tapring_size(pdk: MappedPDK, enclosed_rectangle: tuple[float,float], sdlayer: str = "p+s/d", horizontal_glayer: str = "met2", vertical_glayer: str = "met1") -> list[float]:
+	"""(width, height) of tapring(pdk, enclosed_rectangle, sdlayer, horizontal_glayer, vertical_glayer)"""
+	enclosed_rectangle = pdk.snap_to_2xgrid(enclosed_rectangle,return_type="float")
+	tap_width = max(pdk.get_grule("active_tap")["min_width"], 2*pdk.get_grule("active_tap","mcon")["min_enclosure"] + pdk.get_grule("mcon")["width"])
+	pp_enclosure = pdk.get_grule("active_tap",sdlayer)["min_enclosure"]
+	horizontal_arr = __via_array_size(pdk, "active_tap", horizontal_glayer, (enclosed_rectangle[0], __via_stack_size(pdk, "active_tap", horizontal_glayer)), minus1=True)
+	vertical_arr = __via_array_size(pdk, "active_tap", vertical_glayer, (__via_stack_size(pdk, "active_tap", vertical_glayer), enclosed_rectangle[1]), minus1=True)
+	# plus doped ring, via arrays centered on the tap ring (the corner L routes stay inside the arrays)
+	half_width = max(enclosed_rectangle[0]/2 + tap_width + pp_enclosure, (enclosed_rectangle[0] + tap_width + vertical_arr[0])/2, horizontal_arr[0]/2)
+	half_height = max(enclosed_rectangle[1]/2 + tap_width + pp_enclosure, (enclosed_rectangle[1] + tap_width + horizontal_arr[1])/2, vertical_arr[1]/2)
+	return [2*half_width, 2*half_height]
+
+
+def __multiplier_geometry(
+	pdk: MappedPDK,
+	sdlayer: str,
+	width: Optional[float] = 3,
+	length: Optional[float] = None,
+	fingers: int = 1,
+	routing: bool = True,
+	dummy: Union[bool, tuple[bool, bool]] = True,
+	sd_route_topmet: str = "met2",
+	gate_route_topmet: str = "met2",
+	rmult: Optional[int] = None,
+	sd_rmult: int = 1,
+	gate_rmult: int = 1,
+	interfinger_rmult: int = 1
+) -> dict:
+	"""bbox [xmin, ymin, xmax, ymax] and the positions of the routes of multiplier(...) which other estimates need
+	sd_x/gate_x = half width of the source/drain and gate routes, drain_top/gate_bottom = y of the routes edges"""
+	if rmult:
+		sd_rmult = rmult
+		gate_rmult = 1
+		interfinger_rmult = ((rmult-1) or 1)
+	min_length = pdk.get_grule("poly")["min_width"]
+	length = pdk.snap_to_2xgrid(min_length if (length or min_length) <= min_length else length)
+	min_width = max(min_length, pdk.get_grule("active_diff")["min_width"])
+	width = pdk.snap_to_2xgrid(min_width if (width or min_width) <= min_width else width)
+	poly_height = width + 2 * pdk.get_grule("poly", "active_diff")["overhang"]
+	# finger array, diffusion, and plus doped region (all centered)
+	sd_viaxdim = interfinger_rmult*__via_stack_size(pdk, "active_diff", "met1")
+	poly_spacing = max(sd_viaxdim, 2 * pdk.get_grule("poly", "mcon")["min_separation"] + pdk.get_grule("mcon")["width"])
+	poly_spacing += pdk.get_grule("met1")["min_separation"] if length < pdk.get_grule("met1")["min_separation"] else 0
+	sd_viaarr = __via_array_size(pdk, "active_diff", "met1", (sd_viaxdim, width), minus1=True)
+	pitch = poly_spacing + length
+	fingerarray_x = fingers*pitch + sd_viaarr[0]
+	diff_x = 2 * pdk.get_grule("mcon", "active_diff")["min_enclosure"] + fingerarray_x
+	sd_diff_ovhg = pdk.get_grule(sdlayer, "active_diff")["min_enclosure"]
+	geometry = {"plusdoped_x": (diff_x + sd_diff_ovhg)/2, "gate_x": length/2, "gate_height": poly_height, "sd_x": 0, "sdmet_height": 0}
+	xmax = max(fingerarray_x, diff_x + sd_diff_ovhg)/2
+	ymax = max(poly_height, sd_viaarr[1], width + sd_diff_ovhg)/2
+	ymin = -ymax
+	geometry["gate_bottom"], geometry["drain_top"] = ymin, ymax
+	if routing:
+		sdvia = __via_stack_size(pdk, "met1", sd_route_topmet)
+		sdmet_hieght = sd_rmult*sdvia
+		drain_center = width/2 + sdvia/2 + sdmet_hieght/2 + pdk.get_grule(sd_route_topmet)["min_separation"] + sdmet_hieght
+		gate = __via_array_size(pdk, "poly", gate_route_topmet, ((fingers-1)*pitch + length, None), num_vias=(None,gate_rmult))
+		geometry.update({"sd_x": (fingers*pitch + sdvia)/2, "sdmet_height": sdmet_hieght, "drain_center": drain_center, "gate_x": gate[0]/2, "gate_height": gate[1]})
+		geometry["gate_bottom"] = -poly_height/2 - pdk.util_max_metal_seperation() - gate[1] - __npc_overhang(pdk, gate_route_topmet)
+		geometry["drain_top"] = drain_center + sdmet_hieght/2
+		xmax = max(xmax, geometry["sd_x"], geometry["gate_x"])
+		# the vias under the drain route reach width/2 + sdvia + sep + 1.5*sdmet_hieght, below the drain route top
+		ymax = max(ymax, geometry["drain_top"])
+		ymin = min(ymin, geometry["gate_bottom"])
+	# dummies are placed one dummy pitch outside of the multiplier on each side
+	dummyl, dummyr = (dummy, dummy) if isinstance(dummy, bool) else dummy
+	xmin = -xmax
+	geometry["x0"] = xmax
+	if dummyl or dummyr:
+		dummy_space = pdk.get_grule(sdlayer, "active_diff")["min_enclosure"]
+		dummy_x = 2*dummy_space + pdk.get_grule(sdlayer)["min_separation"] + length
+		ymax = max(ymax, width/2 + dummy_space)
+		ymin = min(ymin, -width/2 - dummy_space)
+		xmin -= dummy_x if dummyl else 0
+		xmax += dummy_x if dummyr else 0
+	geometry["bbox"] = [xmin, ymin, xmax, ymax]
+	return geometry
+
+
+def __fet_geometry(
+	pdk: MappedPDK,
+	sdlayer: str,
+	width: float = 3,
+	fingers: int = 1,
+	multipliers: int = 1,
+	with_tie: bool = True,
+	with_dummy: Union[bool, tuple[bool, bool]] = True,
+	well_glayer: Optional[str] = None,
+	with_dnwell: bool = False,
+	with_substrate_tap: bool = True,
+	length: Optional[float] = None,
+	sd_route_topmet: str = "met2",
+	gate_route_topmet: str = "met2",
+	sd_route_left: bool = True,
+	rmult: Optional[int] = None,
+	sd_rmult: int = 1,
+	gate_rmult: int = 1,
+	interfinger_rmult: int = 1
+) -> tuple[list[float],dict]:
+	"""returns ((width, height) of nmos/pmos, multiplier geometry), nmos if sdlayer is n+s/d else pmos
+	well_glayer = well of the pmos (nwell or dnwell), the nmos uses pwell and with_dnwell"""
+	if rmult:
+		sd_rmult = rmult
+		gate_rmult = 1
+		interfinger_rmult = ((rmult-1) or 1)
+	mult = __multiplier_geometry(pdk, sdlayer, width=width, length=length, fingers=fingers, dummy=with_dummy, sd_route_topmet=sd_route_topmet, gate_route_topmet=gate_route_topmet, sd_rmult=sd_rmult, gate_rmult=gate_rmult, interfinger_rmult=interfinger_rmult)
+	xmin, ymin, xmax, ymax = mult["bbox"]
+	# multiplier rows, then the c routes between rows on the source/drain side and on the gate side
+	multiplier_separation = max([pdk.get_grule("met"+str(i))["min_separation"] for i in range(1,5)]) + ymax - ymin
+	ymin -= multiplier_separation/2 * (multipliers-1)
+	ymax += multiplier_separation/2 * (multipliers-1)
+	if multipliers > 1:
+		sd_via = __via_stack_size(pdk, sd_route_topmet, "met"+str(__level(sd_route_topmet)+1), assume_bottom_via=True)
+		gate_via = __via_stack_size(pdk, gate_route_topmet, "met"+str(__level(gate_route_topmet)+1), assume_bottom_via=True)
+		sd_reach = mult["sd_x"] + 0.6 + 3*pdk.get_grule("met4")["min_separation"] + sd_via
+		gate_reach = mult["gate_x"] + 0.6 + gate_via
+		xmin = min(xmin, -(sd_reach if sd_route_left else gate_reach))
+		xmax = max(xmax, gate_reach if sd_route_left else sd_reach)
+		# viaoffset pushes the gate via of the bottom row below the gate route if the via is larger than the route
+		gate_route_bottom = mult["gate_bottom"] + __npc_overhang(pdk, gate_route_topmet) - multiplier_separation/2 * (multipliers-1)
+		ymin = min(ymin, gate_route_bottom - max(0, gate_via - mult["gate_height"]))
+	size = [xmax - xmin, ymax - ymin]
+	# tie, well, and substrate tap are placed around the centered multiplier array
+	is_nmos = sdlayer == "n+s/d"
+	tie_sdlayer = "p+s/d" if is_nmos else "n+s/d"
+	if with_tie:
+		tap_separation = max(pdk.get_grule("met2")["min_separation"], pdk.get_grule("met1")["min_separation"], pdk.get_grule("active_diff", "active_tap")["min_separation"])
+		tap_separation += pdk.get_grule(tie_sdlayer, "active_tap")["min_enclosure"]
+		size = __tapring_size(pdk, [dim + 2*tap_separation for dim in size], tie_sdlayer)
+	if is_nmos:
+		size = [dim + 2*pdk.get_grule("pwell", "active_tap")["min_enclosure"] for dim in size]
+		if with_dnwell:
+			size = [dim + 2*pdk.get_grule("pwell", "dnwell")["min_enclosure"] for dim in size]
+	else:
+		size = [dim + 2*pdk.get_grule("active_tap", well_glayer or "nwell")["min_enclosure"] for dim in size]
+	if with_substrate_tap:
+		size = __tapring_size(pdk, [dim + 2*pdk.get_grule("dnwell", "active_tap")["min_separation"] for dim in size], "p+s/d")
+	return size, mult
+
+
+def __diff_pair_extents(pdk: MappedPDK, width: float = 3, fingers: int = 4, length: Optional[float] = None, n_or_p_fet: bool = True, plus_minus_seperation: float = 0, rmult: int = 1) -> list[float]:
+	"""[xmin, ymin, xmax, ymax] of diff_pair(...) before it is centered"""
+	sdlayer = "n+s/d" if n_or_p_fet else "p+s/d"
+	fet_size, mult = __fet_geometry(pdk, sdlayer, width=width, fingers=fingers, length=length, with_tie=False, with_dummy=False, with_substrate_tap=False, rmult=rmult)
+	fet_x, fet_y = fet_size[0]/2, fet_size[1]/2
+	# the multiplier is centered in y inside the fet
+	mult_shift = -(mult["bbox"][1] + mult["bbox"][3])/2
+	min_spacing_x = pdk.get_grule(sdlayer)["min_separation"] - 2*(fet_x - mult["plusdoped_x"])
+	viam2m3 = __via_stack_size(pdk, "met2", "met3")
+	metal_min_dim = max(pdk.get_grule("met2")["min_width"],pdk.get_grule("met3")["min_width"])
+	metal_space = max(pdk.get_grule("met2")["min_separation"],pdk.get_grule("met3")["min_separation"],metal_min_dim)
+	gate_route_os = viam2m3 - mult["gate_height"] + metal_space
+	# the gate_S port of the multiplier sits one npc overhang above the gate route
+	gate_port_y = mult["gate_bottom"] + 2*__npc_overhang(pdk, "met2") + mult_shift
+	min_spacing_y = metal_space + 2*gate_route_os - 2*abs(-fet_y - gate_port_y)
+	fet_edge_x = 2*fet_x + min_spacing_x/2
+	fet_offset_y = fet_y + min_spacing_y/2 + 0.5
+	# source routes, then drain routes, then two gate routes on each side, each one via further out
+	croute_via = __via_stack_size(pdk, "met2", "met3", assume_bottom_via=True)
+	met2_sep = pdk.get_grule("met2")["min_separation"]
+	half_width = fet_edge_x + croute_via + metal_space + croute_via + 2*(met2_sep + croute_via)
+	# gate bars above the top fets, the bar end vias are pushed up by the via offset of c_route
+	gate_height = mult["gate_height"]
+	bar_top = lambda bar_bottom : bar_bottom + gate_height/2 + max(gate_height/2, croute_via/2 + abs(gate_height - croute_via)/2)
+	ymax = bar_top(fet_offset_y + fet_y + met2_sep)
+	ymax = bar_top(ymax + max(met2_sep, plus_minus_seperation))
+	# drain vias and drain routes below the mirrored bottom fets
+	drain_port_y = -fet_offset_y - (mult["drain_top"] + mult_shift)
+	drain_width = mult["sdmet_height"]
+	floating_port_y = drain_port_y - viam2m3 - 1.5*drain_width - 3*metal_space
+	ymin = min(-fet_offset_y - fet_y, drain_port_y - 2*viam2m3 - drain_width - 3*metal_space, floating_port_y - drain_width/2, floating_port_y - croute_via/2 - abs(drain_width - croute_via)/2)
+	return [-half_width, ymin, half_width, ymax]
+
+
+def __mimcap_size(pdk: MappedPDK, size: tuple[float,float] = (5.0, 5.0)) -> list[float]:
+	size = pdk.snap_to_2xgrid(size,return_type="float")
+	capmettop = pdk.layer_to_glayer(pdk.get_grule("capmet")["capmettop"])
+	capmetbottom = pdk.layer_to_glayer(pdk.get_grule("capmet")["capmetbottom"])
+	top_met = __via_array_size(pdk, capmetbottom, capmettop, size, minus1=True)
+	bottom_met_enclosure = pdk.get_grule(capmetbottom,"capmet")["min_enclosure"]
+	return [max(size[i], top_met[i]) + 2*bottom_met_enclosure for i in range(2)]
+
+
+def __pmos_section_extents(pdk: MappedPDK, pamp_hparams: tuple[float, float, int, int], rmult: int) -> list[float]:
+	"""[xmin, ymin, xmax, ymax] of the pmos_comps section of opamp (shared gate pairs, center four units, output pmos, tap ring)"""
+	max_metal_sep = pdk.util_max_metal_seperation()
+	pmult = lambda fingers, dummy : __multiplier_geometry(pdk, "p+s/d", width=6, length=1, fingers=fingers, dummy=dummy, rmult=rmult)
+	six_l, six_r = pmult(6, (True, False)), pmult(6, (False, True))
+	four, four_l, four_r = pmult(4, False), pmult(4, (True, False)), pmult(4, (False, True))
+	# shared gate pairs (flush left and right of the AB spacing) above and below the center four units
+	pcomp_AB_spacing = max(2*max_metal_sep + 6*pdk.get_grule("met4")["min_width"],pdk.get_grule("p+s/d")["min_separation"])
+	offset_l = -six_l["bbox"][2] - pcomp_AB_spacing/2
+	offset_r = -six_r["bbox"][0] + pcomp_AB_spacing/2
+	single_dim = four["bbox"][2] + 0.1
+	ytranslation_pcenter = 2*four_r["bbox"][3] + 5*max_metal_sep
+	xmin = min(offset_l + six_l["bbox"][0], -3*single_dim + four_l["bbox"][0])
+	xmax = max(offset_r + six_r["bbox"][2], 3*single_dim + four_r["bbox"][2])
+	ymin = -ytranslation_pcenter + six_l["bbox"][1]
+	ymax = ytranslation_pcenter + six_l["bbox"][3]
+	# via from the shorted sources to met4
+	source_via = __via_stack_dims(pdk, "met2", "met4")
+	ymax = max(ymax, four["drain_center"] + source_via["met2"]/2 + max(source_via.values())/2)
+	# c routes on both sides, every extension is computed from the x extents at that point
+	croute_via = __via_stack_size(pdk, "met2", "met3", assume_bottom_via=True)
+	gate_extension = xmax - min(offset_r + six_r["gate_x"], 3*single_dim + four_r["gate_x"]) - pdk.get_grule("active_diff")["min_width"]
+	xmin = min(xmin, offset_l - six_l["gate_x"] - gate_extension - croute_via)
+	xmax = max(xmax, offset_r + six_r["gate_x"] + gate_extension + croute_via)
+	drain_extension = xmax - max(offset_r + six_r["sd_x"], 3*single_dim + four_r["sd_x"]) + max_metal_sep
+	xmin = min(xmin, min(offset_l - six_l["sd_x"], -3*single_dim - four_l["sd_x"]) - drain_extension - croute_via)
+	xmax = xmax + max_metal_sep + croute_via
+	# via from the B drains down to the diffpair (aligned to the gate_S port, one npc overhang above the gate route), then the B drain routes
+	gate_port_y = six_l["gate_bottom"] + 2*__npc_overhang(pdk, "met2")
+	ymin = min(ymin, -ytranslation_pcenter + gate_port_y - max_metal_sep - __via_stack_size(pdk, "met2", "met5"))
+	bdrain_extension = xmax - (offset_r + six_r["sd_x"]) + max_metal_sep
+	xmin = min(xmin, offset_l - six_l["sd_x"] - bdrain_extension - max_metal_sep - croute_via)
+	xmax = xmax + 2*max_metal_sep + croute_via
+	# output pmos on both sides
+	halfp_size = __fet_geometry(pdk, "p+s/d", width=pamp_hparams[0], length=pamp_hparams[1], fingers=pamp_hparams[2], multipliers=pamp_hparams[3], with_tie=True, well_glayer="nwell", with_substrate_tap=False, rmult=rmult)[0]
+	x_dim_center = max(abs(xmax), abs(xmin))
+	xmin, xmax = min(xmin, -x_dim_center - halfp_size[0] - 1), max(xmax, x_dim_center + halfp_size[0] + 1)
+	ymin, ymax = min(ymin, -halfp_size[1]/2), max(ymax, halfp_size[1]/2)
+	# nwell padding, then a tap ring centered on the origin around everything
+	nwell_enclosure = pdk.get_grule("nwell", "active_tap")["min_enclosure"]
+	xmin, ymin, xmax, ymax = xmin - nwell_enclosure, ymin - nwell_enclosure, xmax + nwell_enclosure, ymax + nwell_enclosure
+	tap = __tapring_size(pdk, [xmax - xmin + 1, ymax - ymin + 1], "p+s/d")
+	return [min(xmin, -tap[0]/2), min(ymin, -tap[1]/2), max(xmax, tap[0]/2), max(ymax, tap[1]/2)]
+
+
+def nmos_bbox_estimate(
+	pdk: MappedPDK,
+	width: float = 3,
+	fingers: Optional[int] = 1,
+	multipliers: Optional[int] = 1,
+	with_tie: bool = True,
+	with_dummy: Union[bool, tuple[bool, bool]] = True,
+	with_dnwell: bool = True,
+	with_substrate_tap: bool = True,
+	length: Optional[float] = None,
+	sd_route_topmet: str = "met2",
+	gate_route_topmet: str = "met2",
+	sd_route_left: bool = True,
+	rmult: Optional[int] = None,
+	sd_rmult: int=1,
+	gate_rmult: int=1,
+	interfinger_rmult: int=1
+) -> tuple[float,float]:
+	"""estimated (width, height) of nmos(...), takes the same args as nmos"""
+	size = __fet_geometry(pdk, "n+s/d", width, fingers, multipliers, with_tie, with_dummy, None, with_dnwell, with_substrate_tap, length, sd_route_topmet, gate_route_topmet, sd_route_left, rmult, sd_rmult, gate_rmult, interfinger_rmult)[0]
+	return tuple(size)
+
+
+def pmos_bbox_estimate(
+	pdk: MappedPDK,
+	width: float = 3,
+	fingers: Optional[int] = 1,
+	multipliers: Optional[int] = 1,
+	with_tie: Optional[bool] = True,
+	dnwell: Optional[bool] = False,
+	with_dummy: Optional[Union[bool, tuple[bool, bool]]] = True,
+	with_substrate_tap: Optional[bool] = True,
+	length: Optional[float] = None,
+	sd_route_topmet: Optional[str] = "met2",
+	gate_route_topmet: Optional[str] = "met2",
+	sd_route_left: Optional[bool] = True,
+	rmult: Optional[int] = None,
+	sd_rmult: int=1,
+	gate_rmult: int=1,
+	interfinger_rmult: int=1
+) -> tuple[float,float]:
+	"""estimated (width, height) of pmos(...), takes the same args as pmos"""
+	well_glayer = "dnwell" if dnwell else "nwell"
+	size = __fet_geometry(pdk, "p+s/d", width, fingers, multipliers, with_tie, with_dummy, well_glayer, False, with_substrate_tap, length, sd_route_topmet, gate_route_topmet, sd_route_left, rmult, sd_rmult, gate_rmult, interfinger_rmult)[0]
+	return tuple(size)
+
+
+def diff_pair_bbox_estimate(pdk: MappedPDK, width: float = 3, fingers: int = 4, length: Optional[float] = None, n_or_p_fet: bool = True, plus_minus_seperation: float = 0, rmult: int = 1) -> tuple[float,float]:
+	"""estimated (width, height) of diff_pair(...), takes the same args as diff_pair"""
+	extents = __diff_pair_extents(pdk, width, fingers, length, n_or_p_fet, plus_minus_seperation, rmult)
+	return (extents[2] - extents[0], extents[3] - extents[1])
+
+
+def mimcap_array_bbox_estimate(pdk: MappedPDK, rows: int, columns: int, size: tuple[float,float] = (5.0,5.0), rmult: Optional[int] = 1) -> tuple[float,float]:
+	"""estimated (width, height) of mimcap_array(...), takes the same args as mimcap_array"""
+	mimcap_size = __mimcap_size(pdk, size)
+	mimcap_space = pdk.get_grule("capmet")["min_separation"]
+	return (columns*mimcap_size[0] + (columns-1)*mimcap_space, rows*mimcap_size[1] + (rows-1)*mimcap_space)
+
+
+def opamp_bbox_estimate(
+	pdk: MappedPDK,
+	diffpair_params: tuple[float, float, int] = (6, 1, 4),
+	diffpair_bias: tuple[float, float, int] = (6, 2, 4),
+	houtput_bias: tuple[float, float, int, int] = (6, 2, 8, 3),
+	pamp_hparams: tuple[float, float, int, int] = (7, 1, 10, 3),
+	mim_cap_size=(12, 12),
+	mim_cap_rows=3,
+	rmult: int = 2
+) -> tuple[float,float]:
+	"""estimated (width, height) of opamp(...), takes the same args as opamp"""
+	max_metal_sep = pdk.util_max_metal_seperation()
+	via34 = __via_stack_size(pdk, "met3", "met4", assume_bottom_via=True)
+	# nmos section: diffpair above the tail current source in the center, current mirror halves on both sides
+	diffpair = __diff_pair_extents(pdk, width=diffpair_params[0], length=diffpair_params[1], fingers=diffpair_params[2], rmult=rmult)
+	tail_size = __fet_geometry(pdk, "n+s/d", width=diffpair_bias[0], length=diffpair_bias[1], fingers=diffpair_bias[2], with_tie=False, with_substrate_tap=False, gate_route_topmet="met3", sd_route_topmet="met3", rmult=rmult)[0]
+	center_size = [max(diffpair[2] - diffpair[0], tail_size[0]), diffpair[3] - diffpair[1] + max_metal_sep + tail_size[1]]
+	halfn_size = __fet_geometry(pdk, "n+s/d", width=houtput_bias[0], length=houtput_bias[1], fingers=houtput_bias[2], multipliers=houtput_bias[3], with_tie=True, with_dummy=(False, True), with_substrate_tap=False, rmult=rmult)[0]
+	xmax = center_size[0]/2 + max_metal_sep + halfn_size[0]
+	ymax = max(center_size[1], halfn_size[1])/2
+	xmin, ymin = -xmax, -ymax
+	# gnd pin below, current mirror gate and drain routes above
+	ymin -= max_metal_sep + 3
+	ymax += 2*(1 + via34)
+	# pmos section above
+	pmos_section = __pmos_section_extents(pdk, pamp_hparams, rmult)
+	# opamp rounds this shift to a whole um, terms which are a few nm off can flip the rounding near .5, so round down
+	# there: the sweep prunes on the estimate and a 1 um too small estimate is safer than a 1 um too large one
+	pmos_shift = round(ymax + pmos_section[3] + 8 - ROUNDING_MARGIN)
+	pmos_ymin = pmos_shift + pmos_section[1]
+	xmin, xmax = min(xmin, pmos_section[0]), max(xmax, pmos_section[2])
+	ymax = pmos_shift + pmos_section[3]
+	# output pmos source route, vdd pin, and the drain route above the vdd pin
+	ymax += via34 + 1.5 + pdk.get_grule("met5")["min_separation"] + via34
+	# output routes on both sides (cwidth=2)
+	via45 = __via_stack_size(pdk, "met4", "met5", assume_bottom_via=True)
+	output_route_reach = 2 + via45/2 + max(via45, 2)/2
+	xmin, xmax = xmin - output_route_reach, xmax + output_route_reach
+	# vbias1 below, vbias2 and then the plus pin left, the output pin right
+	ymin -= max_metal_sep + 3
+	xmin -= 4.5 + 2.5
+	xmax += 2.5
+	# mim caps right of everything, bottom aligned to the pmos section
+	mim_cap_size = pdk.snap_to_2xgrid(mim_cap_size, return_type="float")
+	mimcap_size = __mimcap_size(pdk, mim_cap_size)
+	mimcap_arr = mimcap_array_bbox_estimate(pdk, mim_cap_rows, 2, mim_cap_size)
+	mimcap_xmin = xmax + max(max_metal_sep, pdk.get_grule("capmet")["min_separation"]) + (mim_cap_size[0] - mimcap_size[0])/2
+	mimcap_ymin = pmos_ymin + (mim_cap_size[1] - mimcap_size[1])/2
+	xmax = max(xmax, mimcap_xmin + mimcap_arr[0])
+	ymax = max(ymax, mimcap_ymin + mimcap_arr[1]) + max_metal_sep + via34
+	return (xmax - xmin, ymax - ymin)
+
+
+BBOX_ESTIMATES = {
+	"nmos": nmos_bbox_estimate,
+	"pmos": pmos_bbox_estimate,
+	"diff_pair": diff_pair_bbox_estimate,
+	"mimcap_array": mimcap_array_bbox_estimate,
+	"opamp": opamp_bbox_estimate,
+}
+
+
+def estimate_area(pdk: MappedPDK, generator: Union[str,Callable], *args, **kwargs) -> float:
+	"""estimated bounding box area (um^2) of generator(pdk, *args, **kwargs)
+	generator = one of BBOX_ESTIMATES (name or the generator function itself)"""
+	name = generator if isinstance(generator, str) else generator.__name__
+	if name not in BBOX_ESTIMATES:
+		raise ValueError("no area estimate for " + str(name) + ", estimates exist for " + str(list(BBOX_ESTIMATES)))
+	width, height = BBOX_ESTIMATES[name](pdk, *args, **kwargs)
+	return width * height
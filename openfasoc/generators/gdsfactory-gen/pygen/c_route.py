@@ -9,6 +9,8 @@ from gdsfactory.routing.route_quad import route_quad
 from gdsfactory.components.rectangle import rectangle
 from .pdk.util.comp_utils import evaluate_bbox
 from .pdk.util.port_utils import add_ports_perimeter, rename_ports_by_orientation, rename_ports_by_list, print_ports, set_port_width, set_port_orientation, get_orientation
+from .pdk.util.hierarchy import maybe_flatten
+from .pdk.util.memory_profile import profile_memory
 from pydantic import validate_arguments
 
 
@@ -16,9 +18,10 @@ from pydantic import validate_arguments
 def __fill_empty_viastack__macro(pdk: MappedPDK, glayer: str, size: tuple[float,float]) -> Component:
 	"""returns a rectangle with ports that pretend to be viastack ports"""
 	comp = rectangle(size=size,layer=pdk.get_glayer(glayer),centered=True)
-	return rename_ports_by_orientation(rename_ports_by_list(comp,replace_list=[("e","top_met_")])).flatten()
+	return maybe_flatten(rename_ports_by_orientation(rename_ports_by_list(comp,replace_list=[("e","top_met_")])))
 
 @cell
+@profile_memory
 def c_route(
 	pdk: MappedPDK, 
 	edge1: Port, 
@@ -193,7 +196,7 @@ def c_route(
 		#orta = "E" if orta=="W" else ("W" if orta=="E" else orta)
 		route_ports[i] = set_port_orientation(port_to_add, orta)
 	croute.add_ports(route_ports,prefix="con_")
-	return rename_ports_by_orientation(rename_ports_by_list(croute.flatten(), [("con_","con_")]))
+	return rename_ports_by_orientation(rename_ports_by_list(maybe_flatten(croute), [("con_","con_")]))
 
 if __name__ == "__main__":
 	from .pdk.util.standard_main import pdk
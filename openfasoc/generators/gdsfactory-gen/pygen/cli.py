@@ -0,0 +1,198 @@
+"""pdk agnostic command line interface of the pygen generators
+usage (from the gdsfactory-gen directory):
+python -m pygen list
+python -m pygen build <generator> --params params.json [--pdk sky130] [--output-dir build] [--drc]
+params.json is one object of generator keyword arguments or a list of them, every parameter set is built in this
+process one after another, so pdk setup and the primitive cache (see pdk/util/primitive_cache.py) are shared between
+builds. each build writes <generator>_<index>.gds and a <generator>_<index>.json manifest (params, ports, bbox, build
+time, and drc results with --drc) to the output directory. json lists are passed to the generators as tuples.
+unlike pdk/util/standard_main.py nothing is activated on import, the pdk is loaded when a command runs
+"""
+import argparse
+import inspect
+import json
+import time
+from pathlib import Path
+from typing import Callable, Optional, Union
+from gdsfactory.typings import Component
+from .pdk.mappedpdk import MappedPDK
+from .pdk.util.comp_utils import evaluate_bbox
+from .pdk.util.hierarchy import set_hierarchical_output
+from .pdk.util.primitive_cache import set_primitive_cache, primitive_cache_stats
+from .pdk.util.drc_cache import set_drc_cache, drc_cache_stats
+from .via_gen import via_stack, via_array, via_array_ring
+from .guardring import tapring
+from .fet import multiplier, nmos, pmos
+from .diff_pair import diff_pair
+from .mimcap import mimcap, mimcap_array
+from .opamp import opamp
+
+# generators which only take the pdk and json serializable arguments (routes take ports and are not listed)
+GENERATORS = {
+	"via_stack": via_stack,
+	"via_array": via_array,
+	"via_array_ring": via_array_ring,
+	"tapring": tapring,
+	"multiplier": multiplier,
+	"nmos": nmos,
+	"pmos": pmos,
+	"diff_pair": diff_pair,
+	"mimcap": mimcap,
+	"mimcap_array": mimcap_array,
+	"opamp": opamp,
+}
+
+PDKS = ("sky130", "gf180")
+
+
+def get_pdk(name: str = "sky130") -> MappedPDK:
+	"""imports one of PDKS, builds run inside pdk.scope() (see pdk/util/pdk_context.py)"""
+	if name == "sky130":
+		from .pdk.sky130_mapped import sky130_mapped_pdk as pdk
+	elif name == "gf180":
+		from .pdk.gf180_mapped import gf180_mapped_pdk as pdk
+	else:
+		raise ValueError("pdk must be one of " + str(PDKS) + ", not " + str(name))
+	return pdk
+
+
+def __tupleize(value):
+	"""json has no tuples, generators expect tuples (e.g. sizes), nested lists become nested tuples"""
+	if isinstance(value, list):
+		return tuple(__tupleize(element) for element in value)
+	if isinstance(value, dict):
+		return {key: __tupleize(element) for key, element in value.items()}
+	return value
+
+
+def read_param_sets(params_file: Union[str, Path]) -> list[dict]:
+	"""reads a json file holding one parameter set (object) or a list of them"""
+	param_sets = json.loads(Path(params_file).read_text())
+	if isinstance(param_sets, dict):
+		param_sets = [param_sets]
+	if not isinstance(param_sets, list) or not all(isinstance(param_set, dict) for param_set in param_sets):
+		raise ValueError(str(params_file) + " must hold a json object of generator arguments or a list of them")
+	return param_sets
+
+
+def component_manifest(comp: Component) -> dict:
+	"""json serializable summary of a built component: bbox, size, and every port"""
+	ports = list()
+	for port in comp.ports.values():
+		ports.append({
+			"name": port.name,
+			"center": [float(value) for value in port.center],
+			"width": float(port.width),
+			"orientation": float(port.orientation) if port.orientation is not None else None,
+			"layer": list(port.layer) if port.layer is not None else None,
+			"port_type": port.port_type,
+		})
+	return {"name": comp.name, "bbox": comp.bbox.tolist(), "size": list(evaluate_bbox(comp)), "ports": ports}
+
+
+def build_one(
+	pdk: MappedPDK,
+	generator: Union[str, Callable],
+	params: dict,
+	output_dir: Union[str, Path],
+	stem: str,
+	drc: bool = False,
+) -> dict:
+	"""builds generator(pdk, **params), writes <stem>.gds and the <stem>.json manifest to output_dir, returns the manifest
+	a failing build is recorded in the manifest under "error" (a failing drc run under "drc" "error") instead of raising"""
+	generator_name = generator if isinstance(generator, str) else generator.__name__
+	if generator_name not in GENERATORS:
+		raise ValueError("unknown generator " + str(generator_name) + ", choose one of " + str(list(GENERATORS)))
+	output_dir = Path(output_dir)
+	output_dir.mkdir(parents=True, exist_ok=True)
+	manifest = {"generator": generator_name, "pdk": pdk.name, "params": params}
+	start_time = time.perf_counter()
+	try:
+		comp = GENERATORS[generator_name](pdk, **__tupleize(params))
+		manifest["build_seconds"] = time.perf_counter() - start_time
+		manifest["gds"] = str(Path(comp.write_gds(gdspath=output_dir / (stem + ".gds"))).resolve())
+		manifest.update(component_manifest(comp))
+	except Exception as error:
+		manifest.setdefault("build_seconds", time.perf_counter() - start_time)
+		manifest["error"] = type(error).__name__ + ": " + str(error)
+	if drc and "error" not in manifest:
+		try:
+			manifest["drc"] = pdk.drc_results(comp, output_dir)
+		except Exception as error:
+			manifest["drc"] = {"error": type(error).__name__ + ": " + str(error)}
+	(output_dir / (stem + ".json")).write_text(json.dumps(manifest, indent=1))
+	return manifest
+
+
+def build(
+	generator: str,
+	param_sets: list[dict],
+	pdk_name: str = "sky130",
+	output_dir: Union[str, Path] = "build",
+	drc: bool = False,
+	drc_cache_dir: Optional[Union[str, Path]] = None,
+	primitive_cache: bool = True,
+	hierarchical: bool = False,
+) -> list[dict]:
+	"""builds every parameter set of generator in this process (see module docstring), returns the manifests"""
+	if generator not in GENERATORS:
+		raise ValueError("unknown generator " + str(generator) + ", choose one of " + str(list(GENERATORS)))
+	pdk = get_pdk(pdk_name)
+	set_primitive_cache(primitive_cache)
+	if hierarchical:
+		set_hierarchical_output(True)
+	if drc_cache_dir is not None:
+		set_drc_cache(drc_cache_dir)
+	manifests = list()
+	with pdk.scope():
+		for index, params in enumerate(param_sets):
+			manifest = build_one(pdk, generator, params, output_dir, generator + "_" + str(index), drc)
+			status = manifest["error"] if "error" in manifest else "ok"
+			print(generator + "_" + str(index) + ": " + format(manifest["build_seconds"], ".2f") + "s " + status)
+			manifests.append(manifest)
+	return manifests
+
+
+def __list_generators() -> None:
+	for name, generator in GENERATORS.items():
+		parameters = list(inspect.signature(generator).parameters.values())[1:]
+		print(name + "(" + ", ".join(str(parameter) for parameter in parameters) + ")")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+	parser = argparse.ArgumentParser(prog="pygen", description="pdk agnostic pygen generator command line interface")
+	subparsers = parser.add_subparsers(title="mode", required=True, dest="mode")
+	subparsers.add_parser("list", help="list the generators and their parameters")
+	build_parser = subparsers.add_parser("build", help="build a generator for every parameter set of a json file")
+	build_parser.add_argument("generator", choices=list(GENERATORS), help="generator to build")
+	build_parser.add_argument("--params", required=True, help="json file with one object of generator arguments or a list of them")
+	build_parser.add_argument("--pdk", "-p", choices=PDKS, default="sky130", help="pdk to build with (default: sky130)")
+	build_parser.add_argument("--output-dir", "-o", default="build", help="directory for the gds files and manifests (default: ./build)")
+	build_parser.add_argument("--drc", action="store_true", help="run klayout drc on every build and add the results to the manifest")
+	build_parser.add_argument("--drc-cache", default=None, help="directory of the drc result cache (see pdk/util/drc_cache.py)")
+	build_parser.add_argument("--no-primitive-cache", action="store_true", help="do not reuse primitives (via stacks and arrays, tap rings) between builds")
+	build_parser.add_argument("--hierarchical", action="store_true", help="keep hierarchy in the written gds (see pdk/util/hierarchy.py), also enabled by PYGEN_HIERARCHICAL=1")
+	args = parser.parse_args(argv)
+
+	if args.mode == "list":
+		__list_generators()
+		return 0
+	manifests = build(
+		args.generator,
+		read_param_sets(args.params),
+		pdk_name=args.pdk,
+		output_dir=args.output_dir,
+		drc=args.drc,
+		drc_cache_dir=args.drc_cache,
+		primitive_cache=not args.no_primitive_cache,
+		hierarchical=args.hierarchical,
+	)
+	failed = sum("error" in manifest for manifest in manifests)
+	print(str(len(manifests) - failed) + "/" + str(len(manifests)) + " built, primitive cache " + str(primitive_cache_stats()))
+	if args.drc and args.drc_cache:
+		print("drc cache " + str(drc_cache_stats()))
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
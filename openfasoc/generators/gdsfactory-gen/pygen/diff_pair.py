@@ -15,9 +15,11 @@ from .pdk.util.comp_utils import movex, movey, evaluate_bbox, align_comp_to_port
 from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_list, add_ports_perimeter, print_ports, get_orientation, set_port_orientation
 from .via_gen import via_stack
 from .pdk.util.snap_to_grid import component_snap_to_grid
+from .pdk.util.memory_profile import profile_memory
 
 
 @cell
+@profile_memory
 def diff_pair(
 	pdk: MappedPDK,
 	width: Optional[float] = 3,
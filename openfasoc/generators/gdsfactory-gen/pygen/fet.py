@@ -8,9 +8,12 @@ from .via_gen import via_array, via_stack
 from .guardring import tapring
 from pydantic import validate_arguments
 from .pdk.util.comp_utils import evaluate_bbox, to_float, to_decimal, prec_array, prec_center, prec_ref_center, movey, align_comp_to_port
-from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_list, add_ports_perimeter, print_ports
+from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_list, add_ports_perimeter, print_ports, PortNamespace
 from .c_route import c_route
 from .pdk.util.snap_to_grid import component_snap_to_grid
+from .pdk.util.hierarchy import maybe_flatten
+from .pdk.util.memory_profile import profile_memory
+from .pdk.util.primitive_cache import cache_primitive
 from decimal import Decimal
 from .straight_route import straight_route
 
@@ -58,7 +61,9 @@ def __gen_fingers_macro(pdk: MappedPDK, rmult: int, fingers: int, length: float,
     return component_snap_to_grid(rename_ports_by_orientation(multiplier))
 
 
+@cache_primitive(large=True)
 @cell
+@profile_memory
 def multiplier(
     pdk: MappedPDK,
     sdlayer: str,
@@ -234,13 +239,13 @@ def __mult_array_macro(
         to_decimal(_max_metal_seperation_ps)
         + evaluate_bbox(multiplier_comp, True)[1]
     )
+    # row ports are only copied when the array is done (only the routed ports are looked up before)
+    multiplier_arr_ports = PortNamespace(multiplier_arr)
     for rownum in range(multipliers):
         row_displacment = rownum * multiplier_separation - (multiplier_separation/2 * (multipliers-1))
         row_ref = multiplier_arr << multiplier_comp
         row_ref.movey(to_float(row_displacment))
-        multiplier_arr.add_ports(
-            row_ref.get_ports_list(), prefix="multiplier_" + str(rownum) + "_"
-        )
+        multiplier_arr_ports.add_ref_ports(row_ref, prefix="multiplier_" + str(rownum) + "_")
     # TODO: fix extension (both extension are broken. IDK src extension and drain extension IDK metal layer)
     src_extension = to_decimal(0.6)
     drain_extension = src_extension + 3*to_decimal(pdk.get_grule("met4")["min_separation"])
@@ -252,22 +257,23 @@ def __mult_array_macro(
             nextmult = "multiplier_" + str(rownum+1) + "_"
             # route sources left
             srcpfx = thismult + "source_"
-            this_src = multiplier_arr.ports[srcpfx+sd_side]
-            next_src = multiplier_arr.ports[nextmult + "source_"+sd_side]
+            this_src = multiplier_arr_ports[srcpfx+sd_side]
+            next_src = multiplier_arr_ports[nextmult + "source_"+sd_side]
             src_ref = multiplier_arr << c_route(pdk, this_src, next_src, viaoffset=(True,False), extension=to_float(src_extension))
-            multiplier_arr.add_ports(src_ref.get_ports_list(), prefix=srcpfx)
+            multiplier_arr_ports.add_ref_ports(src_ref, prefix=srcpfx)
             # route drains left
             drainpfx = thismult + "drain_"
-            this_drain = multiplier_arr.ports[drainpfx+sd_side]
-            next_drain = multiplier_arr.ports[nextmult + "drain_"+sd_side]
+            this_drain = multiplier_arr_ports[drainpfx+sd_side]
+            next_drain = multiplier_arr_ports[nextmult + "drain_"+sd_side]
             drain_ref = multiplier_arr << c_route(pdk, this_drain, next_drain, viaoffset=(True,False), extension=to_float(drain_extension))
-            multiplier_arr.add_ports(drain_ref.get_ports_list(), prefix=drainpfx)
+            multiplier_arr_ports.add_ref_ports(drain_ref, prefix=drainpfx)
             # route gates right
             gatepfx = thismult + "gate_"
-            this_gate = multiplier_arr.ports[gatepfx+gate_side]
-            next_gate = multiplier_arr.ports[nextmult + "gate_"+gate_side]
+            this_gate = multiplier_arr_ports[gatepfx+gate_side]
+            next_gate = multiplier_arr_ports[nextmult + "gate_"+gate_side]
             gate_ref = multiplier_arr << c_route(pdk, this_gate, next_gate, viaoffset=(True,False), extension=to_float(src_extension))
-            multiplier_arr.add_ports(gate_ref.get_ports_list(), prefix=gatepfx)
+            multiplier_arr_ports.add_ref_ports(gate_ref, prefix=gatepfx)
+    multiplier_arr_ports.materialize()
     multiplier_arr = component_snap_to_grid(rename_ports_by_orientation(multiplier_arr))
     # recenter
     final_arr = Component()
@@ -278,7 +284,9 @@ def __mult_array_macro(
     return component_snap_to_grid(rename_ports_by_orientation(final_arr))
 
 
+@cache_primitive(large=True)
 @cell
+@profile_memory
 def nmos(
     pdk,
     width: float = 3,
@@ -394,10 +402,12 @@ def nmos(
         )
         tapring_ref = nfet << ringtoadd
         nfet.add_ports(tapring_ref.get_ports_list(),prefix="guardring_")
-    return rename_ports_by_orientation(nfet).flatten()
+    return maybe_flatten(rename_ports_by_orientation(nfet))
 
 
+@cache_primitive(large=True)
 @cell
+@profile_memory
 def pmos(
     pdk,
     width: float = 3,
@@ -506,7 +516,7 @@ def pmos(
             horizontal_glayer="met2",
             vertical_glayer="met1",
         )
-    return rename_ports_by_orientation(pfet).flatten()
+    return maybe_flatten(rename_ports_by_orientation(pfet))
 
 
 if __name__ == "__main__":
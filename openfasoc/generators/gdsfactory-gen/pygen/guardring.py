@@ -3,15 +3,19 @@ from gdsfactory.cell import cell
 from gdsfactory.component import Component
 from gdsfactory.components.rectangle import rectangle
 from gdsfactory.components.rectangular_ring import rectangular_ring
-from .via_gen import via_array, via_stack
+from .via_gen import via_array_ring
 from typing import Optional
 from .pdk.util.comp_utils import to_decimal, to_float, evaluate_bbox
-from .pdk.util.port_utils import print_ports
+from .pdk.util.port_utils import print_ports, PortNamespace
 from .pdk.util.snap_to_grid import component_snap_to_grid
+from .pdk.util.memory_profile import profile_memory
+from .pdk.util.primitive_cache import cache_primitive
 from .L_route import L_route
 
 
+@cache_primitive
 @cell
+@profile_memory
 def tapring(
     pdk: MappedPDK,
     enclosed_rectangle=(2.0, 4.0),
@@ -69,41 +73,24 @@ def tapring(
         centered=True,
         layer=pdk.get_glayer(sdlayer),
     )
-    # create via arrs
-    via_width_horizontal = evaluate_bbox(via_stack(pdk, "active_tap", horizontal_glayer))[0]
-    arr_size_horizontal = enclosed_rectangle[0]
-    horizontal_arr = via_array(
+    # create via arrs, the arrays of all four sides are built in one pass
+    via_ring = ptapring << via_array_ring(
         pdk,
+        enclosed_rectangle,
+        tap_width,
         "active_tap",
         horizontal_glayer,
-        (arr_size_horizontal, via_width_horizontal),
-        minus1=True,
-    )
-    via_width_vertical = evaluate_bbox(via_stack(pdk, "active_tap", vertical_glayer))[1]
-    arr_size_vertical = enclosed_rectangle[1]
-    vertical_arr = via_array(
-        pdk,
-        "active_tap",
         vertical_glayer,
-        (via_width_vertical, arr_size_vertical),
-        minus1=True,
     )
-    # add via arrs
-    refs_prefixes = list()
-    metal_ref_n = ptapring << horizontal_arr
-    metal_ref_e = ptapring << vertical_arr
-    metal_ref_s = ptapring << horizontal_arr
-    metal_ref_w = ptapring << vertical_arr
-    metal_ref_n.movey(round(0.5 * (enclosed_rectangle[1] + tap_width),4))
-    metal_ref_e.movex(round(0.5 * (enclosed_rectangle[0] + tap_width),4))
-    metal_ref_s.movey(round(-0.5 * (enclosed_rectangle[1] + tap_width),4))
-    metal_ref_w.movex(round(-0.5 * (enclosed_rectangle[0] + tap_width),4))
-    refs_prefixes += [(metal_ref_n,"N_"), (metal_ref_e,"E_"), (metal_ref_s,"S_"), (metal_ref_w,"W_")]
+    ptapring_ports = PortNamespace(ptapring)
+    ptapring_ports.add_ref_ports(via_ring)
+    ptapring_ports.materialize()
     # connect vertices
-    tlvia = ptapring << L_route(pdk, metal_ref_n.ports["top_met_W"], metal_ref_w.ports["top_met_N"])
-    trvia = ptapring << L_route(pdk, metal_ref_n.ports["top_met_E"], metal_ref_e.ports["top_met_N"])
-    blvia = ptapring << L_route(pdk, metal_ref_s.ports["top_met_W"], metal_ref_w.ports["top_met_S"])
-    brvia = ptapring << L_route(pdk, metal_ref_s.ports["top_met_E"], metal_ref_e.ports["top_met_S"])
+    refs_prefixes = list()
+    tlvia = ptapring << L_route(pdk, ptapring.ports["N_top_met_W"], ptapring.ports["W_top_met_N"])
+    trvia = ptapring << L_route(pdk, ptapring.ports["N_top_met_E"], ptapring.ports["E_top_met_N"])
+    blvia = ptapring << L_route(pdk, ptapring.ports["S_top_met_W"], ptapring.ports["W_top_met_S"])
+    brvia = ptapring << L_route(pdk, ptapring.ports["S_top_met_E"], ptapring.ports["E_top_met_S"])
     refs_prefixes += [(tlvia,"tl_"),(trvia,"tr_"),(blvia,"bl_"),(brvia,"br_")]
     # add ports, flatten and return
     for ref_, prefix in refs_prefixes:
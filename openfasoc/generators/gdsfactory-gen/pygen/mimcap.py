@@ -6,6 +6,8 @@ from typing import Optional
 from .via_gen import via_array
 from .pdk.util.comp_utils import prec_array, to_decimal, to_float
 from .pdk.util.port_utils import rename_ports_by_orientation, add_ports_perimeter, print_ports
+from .pdk.util.hierarchy import maybe_flatten
+from .pdk.util.memory_profile import profile_memory
 from pydantic import validate_arguments
 from .straight_route import straight_route
 from decimal import ROUND_UP, Decimal
@@ -24,6 +26,7 @@ def __get_mimcap_layerconstruction_info(pdk: MappedPDK) -> tuple[str,str]:
 
 
 @cell
+@profile_memory
 def mimcap(
     pdk: MappedPDK, size: tuple[float,float]=(5.0, 5.0)
 ) -> Component:
@@ -50,10 +53,11 @@ def mimcap(
     # flatten and create ports
     mim_cap = add_ports_perimeter(mim_cap, layer=pdk.get_glayer(capmetbottom), prefix="bottom_met_")
     mim_cap.add_ports(top_met_ref.get_ports_list())
-    return rename_ports_by_orientation(mim_cap).flatten()
+    return maybe_flatten(rename_ports_by_orientation(mim_cap))
 
 
 @cell
+@profile_memory
 def mimcap_array(pdk: MappedPDK, rows: int, columns: int, size: tuple[float,float] = (5.0,5.0), rmult: Optional[int]=1) -> Component:
 	"""create mimcap array
 	args:
@@ -94,7 +98,7 @@ def mimcap_array(pdk: MappedPDK, rows: int, columns: int, size: tuple[float,floa
 					port_pairs.append((bl_north_port,top_south_port,layer))
 	for port_pair in port_pairs:
 		mimcap_arr << straight_route(pdk,port_pair[0],port_pair[1],width=rmult*pdk.get_grule(port_pair[2])["min_width"])
-	return mimcap_arr.flatten()
+	return maybe_flatten(mimcap_arr)
 
 
 if __name__ == "__main__":
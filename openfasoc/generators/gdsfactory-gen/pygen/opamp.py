@@ -12,10 +12,11 @@ from .c_route import c_route
 from .via_gen import via_stack, via_array
 from gdsfactory.routing.route_quad import route_quad
 from .pdk.util.comp_utils import evaluate_bbox, prec_ref_center, movex, movey, to_decimal, to_float, move, align_comp_to_port
-from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_list, add_ports_perimeter, print_ports, set_port_orientation
+from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_list, add_ports_perimeter, print_ports, set_port_orientation, PortNamespace
 from sys import exit
 from .straight_route import straight_route
 from .pdk.util.snap_to_grid import component_snap_to_grid
+from .pdk.util.memory_profile import profile_memory
 from pydantic import validate_arguments
 
 
@@ -39,6 +40,7 @@ def __add_mimcap_arr(pdk: MappedPDK, opamp_top: Component, mim_cap_size, mim_cap
 
 
 @cell
+@profile_memory
 def opamp(
     pdk: MappedPDK,
     diffpair_params: Optional[tuple[float, float, int]] = (6, 1, 4),
@@ -151,7 +153,7 @@ def opamp(
     _prefR = (shared_gate_comps << pcompR).movex(-1 * pcompR.xmin + pcomp_AB_spacing/2)
     shared_gate_comps.add_ports(_prefL.get_ports_list(),prefix="L_")
     shared_gate_comps.add_ports(_prefR.get_ports_list(),prefix="R_")
-    shared_gate_comps << route_quad(_prefL.ports["gate_W"], _prefR.ports["gate_E"], layer=pdk.get_glayer("met2"))
+    shared_gate_comps << route_quad(shared_gate_comps.ports["L_gate_W"], shared_gate_comps.ports["R_gate_E"], layer=pdk.get_glayer("met2"))
     # center
     relative_dim_comp = multiplier(
         pdk, "p+s/d", width=6, length=1, fingers=4, dummy=False, rmult=rmult
@@ -180,10 +182,11 @@ def opamp(
         else:
             pcenterfourunits = relative_dim_comp
         pref_ = (pmos_comps << pcenterfourunits).movex(to_float(i * single_dim + extra_t))
-        LRplusdopedPorts += [pref_.ports["plusdoped_W"] , pref_.ports["plusdoped_E"]]
-        LRgatePorts += [pref_.ports["gate_W"],pref_.ports["gate_E"]]
-        LRdrainsPorts += [pref_.ports["source_W"],pref_.ports["source_E"]]
-        LRsourcesPorts += [pref_.ports["drain_W"],pref_.ports["drain_E"]]
+        pref_ports = PortNamespace(pref_)
+        LRplusdopedPorts += [pref_ports["plusdoped_W"] , pref_ports["plusdoped_E"]]
+        LRgatePorts += [pref_ports["gate_W"],pref_ports["gate_E"]]
+        LRdrainsPorts += [pref_ports["source_W"],pref_ports["source_E"]]
+        LRsourcesPorts += [pref_ports["drain_W"],pref_ports["drain_E"]]
     # connect p+s/d layer of the transistors
     pmos_comps << route_quad(LRplusdopedPorts[0],LRplusdopedPorts[-1],layer=pdk.get_glayer("p+s/d"))
     # connect drain of the left 2 and right 2, short sources of all 4
@@ -200,38 +203,40 @@ def opamp(
     pbottom_AB = (pmos_comps << shared_gate_comps).movey(-1 * ytranslation_pcenter)
     pmos_comps.add_ports(ptop_AB.get_ports_list(),prefix="ptopAB_")
     pmos_comps.add_ports(pbottom_AB.get_ports_list(),prefix="pbottomAB_")
+    # ref.ports transforms every port of the reference on each lookup, the namespaces transform only the looked up port
+    ptop_AB_ports, pbottom_AB_ports = PortNamespace(ptop_AB), PortNamespace(pbottom_AB)
     # short all gates of pmos_comps
-    pcenter_gate_route_extension = pmos_comps.xmax - min(ptop_AB.ports["R_gate_E"].center[0], LRgatePorts[-1].center[0]) - pdk.get_grule("active_diff")["min_width"]
-    pcenter_l_croute = pmos_comps << c_route(pdk, ptop_AB.ports["L_gate_W"], pbottom_AB.ports["L_gate_W"],extension=pcenter_gate_route_extension)
-    pcenter_r_croute = pmos_comps << c_route(pdk, ptop_AB.ports["R_gate_E"], pbottom_AB.ports["R_gate_E"],extension=pcenter_gate_route_extension)
+    pcenter_gate_route_extension = pmos_comps.xmax - min(ptop_AB_ports["R_gate_E"].center[0], LRgatePorts[-1].center[0]) - pdk.get_grule("active_diff")["min_width"]
+    pcenter_l_croute = pmos_comps << c_route(pdk, ptop_AB_ports["L_gate_W"], pbottom_AB_ports["L_gate_W"],extension=pcenter_gate_route_extension)
+    pcenter_r_croute = pmos_comps << c_route(pdk, ptop_AB_ports["R_gate_E"], pbottom_AB_ports["R_gate_E"],extension=pcenter_gate_route_extension)
     pmos_comps << straight_route(pdk, LRgatePorts[0], pcenter_l_croute.ports["con_N"])
     pmos_comps << straight_route(pdk, LRgatePorts[-1], pcenter_r_croute.ports["con_N"])
     # connect drain of A to the shorted gates
-    pmos_comps << L_route(pdk,ptop_AB.ports["L_source_W"],pcenter_l_croute.ports["con_N"])
-    pmos_comps << straight_route(pdk,pbottom_AB.ports["R_source_E"],pcenter_r_croute.ports["con_N"])
+    pmos_comps << L_route(pdk,ptop_AB_ports["L_source_W"],pcenter_l_croute.ports["con_N"])
+    pmos_comps << straight_route(pdk,pbottom_AB_ports["R_source_E"],pcenter_r_croute.ports["con_N"])
     # connect source of A to the drain of 2L
-    pcomps_route_A_drain_extension = pmos_comps.xmax-max(ptop_AB.ports["R_drain_E"].center[0], LRdrainsPorts[-1].center[0])+_max_metal_seperation_ps
-    pcomps_route_A_drain = pmos_comps << c_route(pdk, ptop_AB.ports["L_drain_W"], LRdrainsPorts[0], extension=pcomps_route_A_drain_extension)
-    row_rectangle_routing = rectangle(layer=ptop_AB.ports["L_drain_W"].layer,size=(pbottom_AB.ports["R_source_N"].width,pbottom_AB.ports["R_source_W"].width)).copy()
-    Aextra_top_connection = align_comp_to_port(row_rectangle_routing, pbottom_AB.ports["R_source_N"], ('c','t')).movey(row_rectangle_routing.ymax + _max_metal_seperation_ps)
+    pcomps_route_A_drain_extension = pmos_comps.xmax-max(ptop_AB_ports["R_drain_E"].center[0], LRdrainsPorts[-1].center[0])+_max_metal_seperation_ps
+    pcomps_route_A_drain = pmos_comps << c_route(pdk, ptop_AB_ports["L_drain_W"], LRdrainsPorts[0], extension=pcomps_route_A_drain_extension)
+    row_rectangle_routing = rectangle(layer=ptop_AB_ports["L_drain_W"].layer,size=(pbottom_AB_ports["R_source_N"].width,pbottom_AB_ports["R_source_W"].width)).copy()
+    Aextra_top_connection = align_comp_to_port(row_rectangle_routing, pbottom_AB_ports["R_source_N"], ('c','t')).movey(row_rectangle_routing.ymax + _max_metal_seperation_ps)
     pmos_comps.add(Aextra_top_connection)
-    pmos_comps << straight_route(pdk,Aextra_top_connection.ports["e4"],pbottom_AB.ports["R_drain_N"])
+    pmos_comps << straight_route(pdk,Aextra_top_connection.ports["e4"],pbottom_AB_ports["R_drain_N"])
     pmos_comps << L_route(pdk,pcomps_route_A_drain.ports["con_S"], Aextra_top_connection.ports["e1"],viaoffset=(False,True))
     # connect source of B to drain of 2R
-    pcomps_route_B_source_extension = pmos_comps.xmax-max(LRsourcesPorts[-1].center[0],ptop_AB.ports["R_source_E"].center[0])+_max_metal_seperation_ps
-    mimcap_connection_ref = pmos_comps << c_route(pdk, ptop_AB.ports["R_source_E"], LRdrainsPorts[-1],extension=pcomps_route_B_source_extension,viaoffset=(True,False))
-    bottom_pcompB_floating_port = set_port_orientation(movey(movex(pbottom_AB.ports["L_source_E"].copy(),5*_max_metal_seperation_ps), destination=Aextra_top_connection.ports["e1"].center[1]+Aextra_top_connection.ports["e1"].width+_max_metal_seperation_ps),"S")
-    pmos_bsource_2Rdrain_v = pmos_comps << L_route(pdk,pbottom_AB.ports["L_source_E"],bottom_pcompB_floating_port,vglayer="met3")
+    pcomps_route_B_source_extension = pmos_comps.xmax-max(LRsourcesPorts[-1].center[0],ptop_AB_ports["R_source_E"].center[0])+_max_metal_seperation_ps
+    mimcap_connection_ref = pmos_comps << c_route(pdk, ptop_AB_ports["R_source_E"], LRdrainsPorts[-1],extension=pcomps_route_B_source_extension,viaoffset=(True,False))
+    bottom_pcompB_floating_port = set_port_orientation(movey(movex(pbottom_AB_ports["L_source_E"].copy(),5*_max_metal_seperation_ps), destination=Aextra_top_connection.ports["e1"].center[1]+Aextra_top_connection.ports["e1"].width+_max_metal_seperation_ps),"S")
+    pmos_bsource_2Rdrain_v = pmos_comps << L_route(pdk,pbottom_AB_ports["L_source_E"],bottom_pcompB_floating_port,vglayer="met3")
     pmos_comps << c_route(pdk, LRdrainsPorts[-1], set_port_orientation(bottom_pcompB_floating_port,"E"),extension=pcomps_route_B_source_extension,viaoffset=(True,False))
     pmos_bsource_2Rdrain_v_center = via_stack(pdk,"met2","met3",fulltop=True)
     pmos_comps.add(align_comp_to_port(pmos_bsource_2Rdrain_v_center, bottom_pcompB_floating_port,('r','t')))
     # connect drain of B to each other directly over where the diffpair top left drain will be
     pmos_bdrain_diffpair_v = pmos_comps << via_stack(pdk, "met2","met5",fullbottom=True)
-    pmos_bdrain_diffpair_v = align_comp_to_port(pmos_bdrain_diffpair_v, movex(pbottom_AB.ports["L_gate_S"].copy(),destination=opamp_top.ports["centerNcomps_tl_multiplier_0_drain_N"].center[0]))
+    pmos_bdrain_diffpair_v = align_comp_to_port(pmos_bdrain_diffpair_v, movex(pbottom_AB_ports["L_gate_S"].copy(),destination=opamp_top.ports["centerNcomps_tl_multiplier_0_drain_N"].center[0]))
     pmos_bdrain_diffpair_v.movey(0-_max_metal_seperation_ps)
-    pcomps_route_B_drain_extension = pmos_comps.xmax-ptop_AB.ports["R_drain_E"].center[0]+_max_metal_seperation_ps
-    pmos_comps << c_route(pdk, ptop_AB.ports["R_drain_E"], pmos_bdrain_diffpair_v.ports["bottom_met_E"],extension=pcomps_route_B_drain_extension +_max_metal_seperation_ps)
-    pmos_comps << c_route(pdk, pbottom_AB.ports["L_drain_W"], pmos_bdrain_diffpair_v.ports["bottom_met_W"],extension=pcomps_route_B_drain_extension +_max_metal_seperation_ps)
+    pcomps_route_B_drain_extension = pmos_comps.xmax-ptop_AB_ports["R_drain_E"].center[0]+_max_metal_seperation_ps
+    pmos_comps << c_route(pdk, ptop_AB_ports["R_drain_E"], pmos_bdrain_diffpair_v.ports["bottom_met_E"],extension=pcomps_route_B_drain_extension +_max_metal_seperation_ps)
+    pmos_comps << c_route(pdk, pbottom_AB_ports["L_drain_W"], pmos_bdrain_diffpair_v.ports["bottom_met_W"],extension=pcomps_route_B_drain_extension +_max_metal_seperation_ps)
     pmos_comps.add_ports(pmos_bdrain_diffpair_v.get_ports_list(),prefix="minusvia_")
     # pcore to output
     x_dim_center = max(abs(pmos_comps.xmax),abs(pmos_comps.xmin))
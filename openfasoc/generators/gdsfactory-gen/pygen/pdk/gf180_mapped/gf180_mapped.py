@@ -3,9 +3,14 @@ usage: from gf180_mapped import gf180_mapped_pdk
 """
 
 from gf180.layers import LAYER  # , LAYER_VIEWS
-from .gf180_mapped.grules import grulesobj
-from .mappedpdk import MappedPDK
+from ..mappedpdk import MappedPDK
 from pathlib import Path
+from ..util.grules_binary import pdk_grules_binary
+
+# rules from grules.bin (decoded pair by pair, see grules_binary.py) when it was generated from grules.py
+grulesobj = pdk_grules_binary(Path(__file__).resolve().parent)
+if grulesobj is None:
+    from ..gf180_mapped.grules import grulesobj
 
 LAYER = LAYER.dict()
 #LAYER["fusetop"]=(75, 0)
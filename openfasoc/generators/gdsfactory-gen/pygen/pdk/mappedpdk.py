@@ -12,7 +12,9 @@ import tempfile
 import subprocess
 from decimal import Decimal
 from pydantic import validate_arguments
-import xml.etree.ElementTree as ET
+from .util.drc_cache import drc_cache_dir, layout_hash, lookup_drc, read_lyrdb, store_drc
+from .util.pdk_context import activate_pdk, pdk_scope
+from .util.grules_binary import GRulesBinary
 
 class MappedPDK(Pdk):
     """Inherits everything from the pdk class but also requires mapping to glayers
@@ -43,8 +45,8 @@ class MappedPDK(Pdk):
     )
 
     glayers: dict[StrictStr, Union[StrictStr, tuple[int,int]]]
-    # friendly way to implement a graph
-    grules: dict[StrictStr, dict[StrictStr, Optional[dict[StrictStr, Any]]]]
+    # friendly way to implement a graph (or the same graph read lazily from a binary artifact, see grules_binary.py)
+    grules: Union[GRulesBinary, dict[StrictStr, dict[StrictStr, Optional[dict[StrictStr, Any]]]]]
     klayout_lydrc_file: Optional[Path] = None
 
     @validator("glayers")
@@ -76,20 +78,32 @@ class MappedPDK(Pdk):
     ):
         """Returns true if the layout is DRC clean and false if not
         Also saves detailed results to output_dir_or_file location as lyrdb
-        layout can be passed as a file path or gdsfactory component"""
+        layout can be passed as a file path or gdsfactory component
+        see drc_results for the violations, results are cached when the drc cache is enabled"""
+        return self.drc_results(layout, output_dir_or_file)["error_count"] == 0
+
+    @validate_arguments
+    def drc_results(
+        self,
+        layout: Component | PathType,
+        output_dir_or_file: Optional[PathType] = None,
+    ) -> dict:
+        """Runs klayout DRC on layout (file path or gdsfactory component) and saves the lyrdb report to output_dir_or_file
+        returns {"error_count": int, "counts": {rule: violations}, "violations": [{"category", "cell", "values"}]}
+        when the drc cache is enabled (see pdk/util/drc_cache.py) a layout with the same geometry already checked
+        with the same drc deck is not checked again, the cached results and report are returned instead"""
         if not self.klayout_lydrc_file:
             raise NotImplementedError("no drc script for this pdk")
-        # find layout gds file path
-        tempdir = None
+        # find layout gds file name
         if isinstance(layout, Component):
-            tempdir = tempfile.TemporaryDirectory()
-            layout_path = Path(layout.write_gds(gdsdir=tempdir.name)).resolve()
+            layout_name = layout.name
         elif isinstance(layout, PathType):
             layout_path = Path(layout).resolve()
+            if not layout_path.is_file():
+                raise ValueError("layout must exist, the path given is not a file")
+            layout_name = layout_path.name.replace(layout_path.suffix, "")
         else:
             raise TypeError("layout should be a Component, Path, or string")
-        if not layout_path.is_file():
-            raise ValueError("layout must exist, the path given is not a file")
         # find report file path, if None then use current directory
         report_path = (
             Path(output_dir_or_file).resolve()
@@ -101,12 +115,23 @@ class MappedPDK(Pdk):
                 report_path
                 / str(
                     self.name
-                    + layout_path.name.replace(layout_path.suffix, "")
+                    + layout_name
                     + "_drcreport.lyrdb"
                 )
             )
         elif not report_path.is_file():
             raise ValueError("report_path must be file or dir")
+        # return cached results if this geometry was already checked with this deck
+        layout_key = None
+        if drc_cache_dir() is not None:
+            layout_key = layout_hash(layout)
+            cached_results = lookup_drc(layout_key, self.klayout_lydrc_file, report_path)
+            if cached_results is not None:
+                return cached_results
+        tempdir = None
+        if isinstance(layout, Component):
+            tempdir = tempfile.TemporaryDirectory()
+            layout_path = Path(layout.write_gds(gdsdir=tempdir.name)).resolve()
         # run klayout drc
         drc_args = [
             "klayout",
@@ -126,16 +151,21 @@ class MappedPDK(Pdk):
             tempdir.cleanup()
         # there is a drc parsing open-source at:
         # https://github.com/google/globalfoundries-pdk-libs-gf180mcu_fd_pr/blob/main/rules/klayout/drc
-        # eventually I can return more info on the drc run, but for now just void and view the lyrdb in klayout
-        
-        # Open DRC output XML file
-        drc_tree = ET.parse(report_path.resolve())
-        drc_root = drc_tree.getroot()
-        if drc_root.tag != "report-database":
-            raise TypeError("DRC report file is not a valid report-database")
-        # Check if DRC passed
-        drc_error_count = len(drc_root[7])
-        return (drc_error_count == 0)
+        # read_lyrdb parses the output XML file into the violations of each rule
+        drc_results = read_lyrdb(report_path)
+        if layout_key is not None:
+            store_drc(layout_key, self.klayout_lydrc_file, report_path, drc_results)
+        return drc_results
+
+    def activate(self) -> None:
+        """activates this pdk, inside a pdk_scope only the scoped pdk can be activated (see util/pdk_context.py)
+        unlike Pdk.activate switching pdks keeps the gdsfactory cell cache of each pdk"""
+        activate_pdk(self)
+
+    def scope(self):
+        """context manager which activates this pdk for the current thread, see util/pdk_context.py
+        usage: with pdk.scope(): comp = generator(pdk)"""
+        return pdk_scope(self)
 
     @validate_arguments
     def has_required_glayers(self, layers_required: list[str]):
@@ -4,10 +4,15 @@ usage: from sky130_mapped import sky130_mapped_pdk
 import sky130
 
 from ..mappedpdk import MappedPDK
-from ..sky130_mapped.grules import grulesobj
 from pathlib import Path
+from ..util.grules_binary import pdk_grules_binary
 from ..sky130_mapped.sky130_add_npc import sky130_add_npc
 
+# rules from grules.bin (decoded pair by pair, see grules_binary.py) when it was generated from grules.py
+grulesobj = pdk_grules_binary(Path(__file__).resolve().parent)
+if grulesobj is None:
+    from ..sky130_mapped.grules import grulesobj
+
 sky130.PDK.layers["capm3"] = (89, 44)
 
 # use mimcap over metal 3
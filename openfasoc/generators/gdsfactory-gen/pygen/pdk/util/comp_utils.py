@@ -7,6 +7,9 @@ from typing import Callable, Union, Optional,Iterable
 from decimal import Decimal
 from gdsfactory.functions import transformed
 from gdsfactory.functions import move as __gf_move
+from .hierarchy import maybe_flatten
+from .port_utils import PortNamespace
+from .memory_profile import profile_memory
 
 
 @validate_arguments
@@ -198,6 +201,7 @@ def to_float(elements: Union[tuple,list,Decimal,float]):
 			elements[i] = snap_to_grid(float(element))
 	return elements
 
+@profile_memory
 @validate_arguments
 def prec_array(custom_comp: Component, rows: int, columns: int, spacing: tuple[Union[float,Decimal],Union[float,Decimal]], absolute_spacing: Optional[bool]=False) -> Component:
 	"""instead of using the component.add_array function, if you are having grid snapping issues try using this function
@@ -219,14 +223,17 @@ def prec_array(custom_comp: Component, rows: int, columns: int, spacing: tuple[U
 		precspacing = [precspacing[i] + evaluate_bbox(custom_comp,True)[i] for i in range(2)]
 	# create array
 	precarray = Component()
+	# element ports are copied once when the array is done instead of once per element as it is added
+	precarray_ports = PortNamespace(precarray)
 	for colnum in range(columns):
 		coldisp = colnum * precspacing[0]
 		for rownum in range(rows):
 			rowdisp = rownum * precspacing[1]
 			cref = precarray << custom_comp
 			cref.movex(to_float(coldisp)).movey(to_float(rowdisp))
-			precarray.add_ports(cref.get_ports_list(),prefix=f"row{rownum}_col{colnum}_")
-	return precarray.flatten()
+			precarray_ports.add_ref_ports(cref,prefix=f"row{rownum}_col{colnum}_")
+	precarray_ports.materialize()
+	return maybe_flatten(precarray)
 
 
 @validate_arguments
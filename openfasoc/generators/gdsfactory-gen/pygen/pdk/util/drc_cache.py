@@ -0,0 +1,148 @@
+"""opt in persistent cache of klayout drc results
+MappedPDK.drc starts a klayout batch process for every call, even when the same layout was already checked (primitives
+such as via_stack and tapring are checked again and again, sweeps are repeated). with the cache enabled, drc results
+are stored on disk keyed by the geometry of the layout (see geometry_fingerprint, names and ports do not matter) and the
+sha256 of the drc deck, so a layout is only checked again when its geometry or the deck changes.
+entries live in <cache dir>/<deck hash>/<layout hash>.json (violations and counts) next to a copy of the lyrdb report,
+they are written atomically so parallel sweep workers can share a cache dir.
+enable with PYGEN_DRC_CACHE=<cache dir> (inherited by Pool workers) or set_drc_cache
+"""
+import hashlib
+import json
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from gdsfactory.typings import Component
+from pathlib import Path
+from typing import Optional, Union
+from .hierarchy import geometry_fingerprint, gds_fingerprint
+
+__CACHE_DIR = os.environ.get("PYGEN_DRC_CACHE") or None
+__STATS = {"hits": 0, "misses": 0}
+# (deck path, mtime, size) -> sha256 of the deck, so the deck is not hashed for every drc call
+__DECK_HASHES = dict()
+
+
+def set_drc_cache(cache_dir: Optional[Union[str,Path]]) -> None:
+	"""enables the drc cache in this process with entries stored in cache_dir (created if missing), None disables it
+	also sets PYGEN_DRC_CACHE so Pool workers started later inherit it"""
+	global __CACHE_DIR
+	__CACHE_DIR = str(cache_dir) if cache_dir is not None else None
+	if __CACHE_DIR is None:
+		os.environ.pop("PYGEN_DRC_CACHE", None)
+	else:
+		os.environ["PYGEN_DRC_CACHE"] = __CACHE_DIR
+
+
+def drc_cache_dir() -> Optional[Path]:
+	"""the cache directory, None if the drc cache is disabled"""
+	return Path(__CACHE_DIR) if __CACHE_DIR else None
+
+
+def drc_cache_stats() -> dict:
+	"""returns {"hits": int, "misses": int, "entries": int}, hits and misses are counted in this process, entries on disk"""
+	cache_dir = drc_cache_dir()
+	entries = len(list(cache_dir.glob("*/*.json"))) if cache_dir and cache_dir.is_dir() else 0
+	return dict(__STATS, entries=entries)
+
+
+def reset_drc_cache_stats() -> None:
+	__STATS.update(hits=0, misses=0)
+
+
+def deck_hash(lydrc_file: Union[str,Path]) -> str:
+	"""sha256 of the drc deck file, recomputed when the file is modified"""
+	lydrc_file = Path(lydrc_file).resolve()
+	stat = lydrc_file.stat()
+	key = (str(lydrc_file), stat.st_mtime_ns, stat.st_size)
+	if key not in __DECK_HASHES:
+		__DECK_HASHES[key] = hashlib.sha256(lydrc_file.read_bytes()).hexdigest()
+	return __DECK_HASHES[key]
+
+
+def layout_hash(layout: Union[Component, str, Path]) -> str:
+	"""canonical hash of the layout geometry, a component and the gds it was written to hash the same"""
+	if isinstance(layout, Component):
+		return geometry_fingerprint(layout, include_ports=False)
+	return gds_fingerprint(layout)
+
+
+def read_lyrdb(report_path: Union[str,Path]) -> dict:
+	"""parses a klayout lyrdb report
+	returns {"error_count": int, "counts": {rule category: number of violations}, "violations": [{"category", "cell", "values"}]}"""
+	drc_root = ET.parse(Path(report_path).resolve()).getroot()
+	if drc_root.tag != "report-database":
+		raise TypeError("DRC report file is not a valid report-database")
+	violations, counts = list(), dict()
+	items = drc_root.find("items")
+	for item in (items if items is not None else list()):
+		category = (item.findtext("category") or "").strip("'")
+		values = [value.text for value in item.iter("value")]
+		violations.append({"category": category, "cell": (item.findtext("cell") or "").strip("'"), "values": values})
+		counts[category] = counts.get(category, 0) + 1
+	return {"error_count": len(violations), "counts": counts, "violations": violations}
+
+
+def __entry_path(layout_key: str, lydrc_file: Union[str,Path]) -> Path:
+	return drc_cache_dir() / deck_hash(lydrc_file) / (layout_key + ".json")
+
+
+def lookup_drc(layout_key: str, lydrc_file: Union[str,Path], report_path: Optional[Union[str,Path]] = None) -> Optional[dict]:
+	"""returns the cached read_lyrdb result of layout_key checked with lydrc_file, None if not cached (or the cache is disabled)
+	when report_path is given the cached lyrdb report is copied there"""
+	if drc_cache_dir() is None:
+		return None
+	entry = __entry_path(layout_key, lydrc_file)
+	try:
+		result = json.loads(entry.read_text())["result"]
+		if report_path is not None:
+			shutil.copyfile(entry.with_suffix(".lyrdb"), report_path)
+	except (OSError, ValueError, KeyError):
+		__STATS["misses"] += 1
+		return None
+	__STATS["hits"] += 1
+	return result
+
+
+def store_drc(layout_key: str, lydrc_file: Union[str,Path], report_path: Union[str,Path], result: dict) -> None:
+	"""stores result (see read_lyrdb) and a copy of the lyrdb report of layout_key checked with lydrc_file, no op if the cache is disabled"""
+	if drc_cache_dir() is None:
+		return
+	entry = __entry_path(layout_key, lydrc_file)
+	entry.parent.mkdir(parents=True, exist_ok=True)
+	# report first, an entry is only visible (json present) once both files are complete
+	temp_report = entry.with_name(entry.stem + ".lyrdb." + str(os.getpid()))
+	shutil.copyfile(report_path, temp_report)
+	os.replace(temp_report, entry.with_suffix(".lyrdb"))
+	temp_entry = entry.with_name(entry.stem + ".json." + str(os.getpid()))
+	temp_entry.write_text(json.dumps({"deck": str(Path(lydrc_file).resolve()), "result": result}))
+	os.replace(temp_entry, entry)
+
+
+def clear_drc_cache(lydrc_file: Optional[Union[str,Path]] = None, stale_only: bool = True) -> int:
+	"""removes cache entries and returns how many were removed
+	args:
+	lydrc_file = None removes every entry, else only entries checked with this deck file
+	stale_only = with lydrc_file, only remove entries checked with an older version of the deck (they can never be hit again)
+	"""
+	cache_dir = drc_cache_dir()
+	if cache_dir is None or not cache_dir.is_dir():
+		return 0
+	deck_path = str(Path(lydrc_file).resolve()) if lydrc_file is not None else None
+	current_hash = deck_hash(lydrc_file) if lydrc_file is not None else None
+	removed = 0
+	for entry in list(cache_dir.glob("*/*.json")):
+		if deck_path is not None:
+			try:
+				entry_deck = json.loads(entry.read_text()).get("deck")
+			except (OSError, ValueError):
+				entry_deck = None
+			if entry_deck != deck_path or (stale_only and entry.parent.name == current_hash):
+				continue
+		entry.unlink(missing_ok=True)
+		entry.with_suffix(".lyrdb").unlink(missing_ok=True)
+		removed += 1
+	for deck_dir in cache_dir.iterdir():
+		if deck_dir.is_dir() and not any(deck_dir.iterdir()):
+			deck_dir.rmdir()
+	return removed
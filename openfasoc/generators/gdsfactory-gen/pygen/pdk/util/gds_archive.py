@@ -0,0 +1,218 @@
+"""compressed, deduplicated single file store of gds layouts (see GDSArchive)
+a sweep writes one gds per point, tens of thousands of small files with many identical layouts. the archive keeps them
+in one sqlite file, zlib compressed and stored once per sha256, and reads any member without touching the others.
+usage: python gds_archive.py pack <gds dir> <archive> | list <archive> | extract <archive> <destination> [indices]
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Iterator, Optional, Union
+
+# compression level for members, layouts are small so the best level costs little time
+COMPRESSION_LEVEL = 9
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+	sha TEXT PRIMARY KEY,
+	data BLOB NOT NULL,
+	size INTEGER NOT NULL,
+	compressed_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+	idx INTEGER PRIMARY KEY,
+	sha TEXT NOT NULL REFERENCES blobs (sha),
+	name TEXT,
+	added REAL
+);
+CREATE INDEX IF NOT EXISTS members_sha ON members (sha);
+"""
+
+
+class GDSArchive:
+	"""single file container of many gds layouts (e.g. every point of a training sweep)
+	members are zlib compressed and addressed by an integer index (the sweep index) and by the sha256 of the gds bytes.
+	identical layouts are stored once. reads are random access, reading one member does not touch the others.
+	args:
+	path = archive file, created if it does not exist
+	****NOTE: the archive is a sqlite database so worker processes can add members concurrently
+	"""
+	def __init__(self, path: Union[str,Path], timeout: float = 60):
+		self.path = Path(path).resolve()
+		self.timeout = timeout
+		if not self.path.is_file():
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			connection = sqlite3.connect(self.path, timeout=timeout)
+			try:
+				connection.execute("PRAGMA journal_mode=WAL")
+				connection.executescript(ARCHIVE_SCHEMA)
+			finally:
+				connection.close()
+
+	def __connect(self) -> sqlite3.Connection:
+		connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+		connection.execute("PRAGMA busy_timeout=" + str(int(self.timeout * 1000)))
+		return connection
+
+	def add(self, index: int, gds: Union[bytes,str,Path], name: Optional[str] = None) -> str:
+		"""adds a layout under index (replacing an existing member with that index)
+		args:
+		index = integer address of the layout
+		gds = gds bytes or path of a gds file
+		name = optional name stored with the member (e.g. the original file name)
+		returns the sha256 of the layout
+		"""
+		data = gds if isinstance(gds, bytes) else Path(gds).read_bytes()
+		sha = hashlib.sha256(data).hexdigest()
+		connection = self.__connect()
+		try:
+			connection.execute("BEGIN IMMEDIATE")
+			if connection.execute("SELECT 1 FROM blobs WHERE sha = ?", (sha,)).fetchone() is None:
+				compressed = zlib.compress(data, COMPRESSION_LEVEL)
+				connection.execute("INSERT INTO blobs (sha, data, size, compressed_size) VALUES (?, ?, ?, ?)", (sha, compressed, len(data), len(compressed)))
+			connection.execute("INSERT OR REPLACE INTO members (idx, sha, name, added) VALUES (?, ?, ?, ?)", (int(index), sha, name, time.time()))
+			connection.execute("COMMIT")
+		except BaseException:
+			if connection.in_transaction:
+				connection.execute("ROLLBACK")
+			raise
+		finally:
+			connection.close()
+		return sha
+
+	def sha(self, index: int) -> str:
+		"""returns the content hash of the layout at index"""
+		connection = self.__connect()
+		try:
+			row = connection.execute("SELECT sha FROM members WHERE idx = ?", (int(index),)).fetchone()
+		finally:
+			connection.close()
+		if row is None:
+			raise KeyError("no layout with index " + str(index) + " in " + str(self.path))
+		return row[0]
+
+	def read_bytes(self, index: Optional[int] = None, sha: Optional[str] = None) -> bytes:
+		"""returns the gds bytes of a member addressed by index or by content hash"""
+		if (index is None) == (sha is None):
+			raise ValueError("specify exactly one of index or sha")
+		sha = self.sha(index) if sha is None else sha
+		connection = self.__connect()
+		try:
+			row = connection.execute("SELECT data FROM blobs WHERE sha = ?", (sha,)).fetchone()
+		finally:
+			connection.close()
+		if row is None:
+			raise KeyError("no layout with sha " + sha + " in " + str(self.path))
+		return zlib.decompress(row[0])
+
+	def extract(self, index: int, destination: Union[str,Path]) -> Path:
+		"""writes the layout at index to destination (a file or a directory, which gets <index>.gds)"""
+		destination = Path(destination)
+		if destination.is_dir():
+			destination = destination / (str(index) + ".gds")
+		destination.write_bytes(self.read_bytes(index))
+		return destination
+
+	def import_component(self, index: int, name: Optional[str] = None):
+		"""returns the layout at index as a gdsfactory Component"""
+		from gdsfactory.read.import_gds import import_gds
+		with TemporaryDirectory() as tmpdirname:
+			comp = import_gds(self.extract(index, tmpdirname))
+		if name is not None:
+			comp.name = name
+		return comp
+
+	def indices(self) -> list[int]:
+		connection = self.__connect()
+		try:
+			return [row[0] for row in connection.execute("SELECT idx FROM members ORDER BY idx")]
+		finally:
+			connection.close()
+
+	def __contains__(self, index: int) -> bool:
+		connection = self.__connect()
+		try:
+			return connection.execute("SELECT 1 FROM members WHERE idx = ?", (int(index),)).fetchone() is not None
+		finally:
+			connection.close()
+
+	def __len__(self) -> int:
+		connection = self.__connect()
+		try:
+			return connection.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+		finally:
+			connection.close()
+
+	def __iter__(self) -> Iterator[tuple[int,bytes]]:
+		"""yields (index, gds bytes) in index order"""
+		for index in self.indices():
+			yield index, self.read_bytes(index)
+
+	def stats(self) -> dict:
+		"""returns member count, unique layouts, and raw vs stored size"""
+		connection = self.__connect()
+		try:
+			members = connection.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+			raw_size = connection.execute("SELECT COALESCE(SUM(blobs.size), 0) FROM members JOIN blobs ON members.sha = blobs.sha").fetchone()[0]
+			unique, stored_size = connection.execute("SELECT COUNT(*), COALESCE(SUM(compressed_size), 0) FROM blobs").fetchone()
+		finally:
+			connection.close()
+		return {
+			"members": members,
+			"unique_layouts": unique,
+			"raw_bytes": raw_size,
+			"stored_bytes": stored_size,
+			"file_bytes": os.path.getsize(self.path),
+		}
+
+
+def pack_gds_directory(directory: Union[str,Path], archive: Union[str,Path]) -> GDSArchive:
+	"""adds every <index>.gds file of directory (e.g. save_gds_by_index) to an archive"""
+	archive = archive if isinstance(archive, GDSArchive) else GDSArchive(archive)
+	for gds_file in sorted(Path(directory).glob("*.gds")):
+		if not re.fullmatch(r"\d+", gds_file.stem):
+			continue
+		archive.add(int(gds_file.stem), gds_file, gds_file.name)
+	return archive
+
+
+def is_gds_archive(path: Union[str,Path]) -> bool:
+	"""True if path is an archive file (sqlite header), False for directories and gds files"""
+	path = Path(path)
+	if not path.is_file():
+		return False
+	with open(path, "rb") as file:
+		return file.read(16) == b"SQLite format 3\x00"
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="pack, list, and extract gds archives")
+	subparsers = parser.add_subparsers(dest="action", required=True)
+	pack_parser = subparsers.add_parser("pack", help="add every <index>.gds of a directory to an archive")
+	pack_parser.add_argument("directory")
+	pack_parser.add_argument("archive")
+	list_parser = subparsers.add_parser("list", help="list members and sizes")
+	list_parser.add_argument("archive")
+	extract_parser = subparsers.add_parser("extract", help="write members to gds files")
+	extract_parser.add_argument("archive")
+	extract_parser.add_argument("destination", help="output directory")
+	extract_parser.add_argument("indices", nargs="*", type=int, help="members to extract (default: all)")
+	args = parser.parse_args()
+	if args.action == "pack":
+		print(pack_gds_directory(args.directory, args.archive).stats())
+	elif args.action == "list":
+		archive = GDSArchive(args.archive)
+		for index in archive.indices():
+			print(str(index) + " " + archive.sha(index))
+		print(archive.stats())
+	else:
+		archive = GDSArchive(args.archive)
+		Path(args.destination).mkdir(parents=True, exist_ok=True)
+		for index in (args.indices or archive.indices()):
+			print(archive.extract(index, args.destination))
@@ -0,0 +1,266 @@
+"""compact binary form of a pdk rule deck (the grulesobj dictionary written by print_rules.py) and a memory mapped loader
+grules.py is python source that is parsed and executed on import, a pdk with many glayers (the deck grows with the
+square of the number of glayers) can load the same rules from a binary artifact written by print_rules.py --binary.
+the mapped pdks (sky130_mapped, gf180_mapped) use grules.bin instead of grules.py when it is next to grules.py and was
+generated from it (python -m pygen.pdk.util.grules_binary <pdk package>), pairs are then decoded on first use.
+layout (little endian):
+header = magic, format version, number of glayers, number of strings, sha256 of the source the rules were generated from
+strings = glayer names then rule names, each as u16 length + utf8
+pairs = (u32 record offset, u16 rule count) for every (glayer1, glayer2), count NO_RULES where the pair is None
+records = (u16 rule name, u8 kind, value) per rule, value is a f64, an int tuple (u8 length + i32s), or a string (u16)
+trailer = sha256 of everything above it
+****NOTE: artifacts with a different GRULES_BINARY_VERSION are rejected, regenerate them with print_rules.py --binary
+"""
+import argparse
+import hashlib
+import importlib
+import mmap
+import struct
+import warnings
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+GRULES_BINARY_VERSION = 1
+__MAGIC = b"PGRL"
+__HEADER = struct.Struct("<4sHHH32s")
+__PAIR = struct.Struct("<IH")
+__NO_RULES = 0xFFFF
+__FLOAT, __INT_TUPLE, __STRING = 0, 1, 2
+
+
+def source_hash(source: Union[str, Path, bytes]) -> bytes:
+	"""sha256 digest of a rule source (file path or contents), stored in the artifact so stale artifacts are detected"""
+	if not isinstance(source, bytes):
+		source = Path(source).read_bytes()
+	return hashlib.sha256(source).digest()
+
+
+def __pack_string(string: str) -> bytes:
+	encoded = string.encode()
+	return struct.pack("<H", len(encoded)) + encoded
+
+
+def dumps_grules(grulesobj: dict, source: Optional[Union[str, Path, bytes]] = None) -> bytes:
+	"""returns the binary artifact of grulesobj (dict[glayer, dict[glayer, Optional[dict[rule, value]]]])
+	source = the csv or python file the rules came from, its hash is stored in the header (see load_grules_binary)"""
+	glayers = list(grulesobj.keys())
+	strings = list(glayers)
+	string_index = {string: index for index, string in enumerate(strings)}
+	def index_of(string: str) -> int:
+		if string not in string_index:
+			string_index[string] = len(strings)
+			strings.append(string)
+		return string_index[string]
+	pairs, records = list(), bytearray()
+	for glayer1 in glayers:
+		for glayer2 in glayers:
+			rules = grulesobj[glayer1].get(glayer2)
+			if rules is None:
+				pairs.append(__PAIR.pack(0, __NO_RULES))
+				continue
+			if len(rules) >= __NO_RULES:
+				raise ValueError("too many rules between " + glayer1 + " and " + glayer2)
+			pairs.append(__PAIR.pack(len(records), len(rules)))
+			for rule, value in rules.items():
+				if isinstance(value, str):
+					records += struct.pack("<HBH", index_of(rule), __STRING, index_of(value))
+				elif isinstance(value, tuple):
+					records += struct.pack("<HBB" + str(len(value)) + "i", index_of(rule), __INT_TUPLE, len(value), *value)
+				elif isinstance(value, (int, float)):
+					records += struct.pack("<HBd", index_of(rule), __FLOAT, float(value))
+				else:
+					raise TypeError("grules values must be float, tuple of int, or str, not " + type(value).__name__)
+	digest = source_hash(source) if source is not None else bytes(32)
+	body = __HEADER.pack(__MAGIC, GRULES_BINARY_VERSION, len(glayers), len(strings), digest)
+	body += b"".join(__pack_string(string) for string in strings) + b"".join(pairs) + bytes(records)
+	return body + hashlib.sha256(body).digest()
+
+
+def write_grules_binary(grulesobj: dict, output: Union[str, Path], source: Optional[Union[str, Path, bytes]] = None) -> Path:
+	"""writes dumps_grules(grulesobj, source) to output, returns the output path"""
+	output = Path(output)
+	output.write_bytes(dumps_grules(grulesobj, source))
+	return output
+
+
+def __map_artifact(artifact: Path, source: Optional[Union[str, Path, bytes]]) -> tuple[mmap.mmap, list[str], list[str], int, int]:
+	"""memory maps and checks an artifact, returns (data, glayers, strings, offset of the pairs, offset of the records)
+	only the header and the strings are decoded, the pairs and records are read when a pair is accessed"""
+	with open(artifact, "rb") as artifact_file:
+		data = mmap.mmap(artifact_file.fileno(), 0, access=mmap.ACCESS_READ)
+	if len(data) < __HEADER.size + 32:
+		raise ValueError(str(artifact) + " is not a grules artifact")
+	magic, version, num_glayers, num_strings, digest = __HEADER.unpack_from(data, 0)
+	if magic != __MAGIC:
+		raise ValueError(str(artifact) + " is not a grules artifact")
+	if version != GRULES_BINARY_VERSION:
+		raise ValueError(str(artifact) + " has format version " + str(version) + ", expected " + str(GRULES_BINARY_VERSION) + ", regenerate it with print_rules.py --binary")
+	if hashlib.sha256(data[:-32]).digest() != data[-32:]:
+		raise ValueError(str(artifact) + " is corrupt (checksum mismatch)")
+	if source is not None and digest != source_hash(source):
+		raise ValueError(str(artifact) + " is out of date, the rule source changed since it was generated")
+	offset = __HEADER.size
+	strings = list()
+	for _ in range(num_strings):
+		(length,) = struct.unpack_from("<H", data, offset)
+		strings.append(bytes(data[offset + 2 : offset + 2 + length]).decode())
+		offset += 2 + length
+	return data, strings[:num_glayers], strings, offset, offset + num_glayers * num_glayers * __PAIR.size
+
+
+def __decode_rules(artifact: Path, data: mmap.mmap, strings: list[str], position: int, count: int) -> dict:
+	"""decodes the count rule records starting at position"""
+	rules = dict()
+	for _ in range(count):
+		rule, kind = struct.unpack_from("<HB", data, position)
+		position += 3
+		if kind == __FLOAT:
+			(value,) = struct.unpack_from("<d", data, position)
+			position += 8
+		elif kind == __INT_TUPLE:
+			(length,) = struct.unpack_from("<B", data, position)
+			value = struct.unpack_from("<" + str(length) + "i", data, position + 1)
+			position += 1 + 4 * length
+		elif kind == __STRING:
+			(value,) = struct.unpack_from("<H", data, position)
+			value = strings[value]
+			position += 2
+		else:
+			raise ValueError(str(artifact) + " is corrupt (unknown rule kind " + str(kind) + ")")
+		rules[strings[rule]] = value
+	return rules
+
+
+class GRulesBinary(Mapping):
+	"""read only grulesobj (glayer -> glayer -> rules or None) backed by a memory mapped artifact
+	the rules of a glayer pair are decoded the first time the pair is read and kept, so a pdk built from it only decodes
+	the pairs its generators ask for. gdsfactory serializes the pdk (and its rules) into the cell settings with to_dict,
+	which decodes every pair once, the result is the same as for the grulesobj dictionary
+	****NOTE: use load_grules_binary to create one
+	"""
+	def __init__(self, path: Path, glayers: list[str], decode_pair: Callable[[int], Optional[dict]]):
+		self.path = path
+		self.glayers = tuple(glayers)
+		self.__index = {glayer: index for index, glayer in enumerate(self.glayers)}
+		self.__decode_pair = decode_pair
+		# pair number -> decoded rules (or None)
+		self.__decoded = dict()
+		self.__rows = {glayer: GRulesBinaryRow(self, index) for index, glayer in enumerate(self.glayers)}
+
+	def rules(self, row: int, column: int) -> Optional[dict]:
+		"""rules between the glayers with index row and column (see glayers)"""
+		pair = row * len(self.glayers) + column
+		if pair not in self.__decoded:
+			self.__decoded[pair] = self.__decode_pair(pair)
+		return self.__decoded[pair]
+
+	def glayer_index(self, glayer: str) -> int:
+		return self.__index[glayer]
+
+	def decoded_pairs(self) -> int:
+		"""number of glayer pairs decoded so far"""
+		return len(self.__decoded)
+
+	def __getitem__(self, glayer: str) -> "GRulesBinaryRow":
+		return self.__rows[glayer]
+
+	def __iter__(self):
+		return iter(self.glayers)
+
+	def __len__(self) -> int:
+		return len(self.glayers)
+
+	def to_dict(self) -> dict:
+		"""the grulesobj dictionary (decodes every pair)"""
+		return {glayer1: {glayer2: (dict(rules) if rules is not None else None) for glayer2, rules in row.items()} for glayer1, row in self.items()}
+
+	# immutable and backed by a file: copies (pydantic copies models) share it, pickles reopen the artifact
+	def __copy__(self) -> "GRulesBinary":
+		return self
+
+	def __deepcopy__(self, memo: dict) -> "GRulesBinary":
+		return self
+
+	def __reduce__(self):
+		return (load_grules_binary, (self.path,))
+
+	@classmethod
+	def __get_validators__(cls):
+		# lets a pydantic model (MappedPDK.grules) keep the mapping instead of converting it to a dict
+		yield cls.validate
+
+	@classmethod
+	def validate(cls, value):
+		if not isinstance(value, cls):
+			raise TypeError("expected a GRulesBinary")
+		return value
+
+
+class GRulesBinaryRow(Mapping):
+	"""rules of one glayer with every other glayer, see GRulesBinary"""
+	def __init__(self, grules: GRulesBinary, row: int):
+		self.grules = grules
+		self.row = row
+
+	def __getitem__(self, glayer: str) -> Optional[dict]:
+		return self.grules.rules(self.row, self.grules.glayer_index(glayer))
+
+	def __iter__(self):
+		return iter(self.grules.glayers)
+
+	def __len__(self) -> int:
+		return len(self.grules.glayers)
+
+
+def load_grules_binary(artifact: Union[str, Path], source: Optional[Union[str, Path, bytes]] = None) -> GRulesBinary:
+	"""memory maps a binary artifact and returns the grulesobj it was written from as a lazily decoded GRulesBinary
+	args:
+	artifact = path of the artifact written by write_grules_binary
+	source = optional csv or python file the artifact must have been generated from, raises ValueError if it changed since
+	raises ValueError if the artifact is corrupt or has a different format version
+	"""
+	artifact = Path(artifact).resolve()
+	data, glayers, strings, pairs_start, records_start = __map_artifact(artifact, source)
+	def decode_pair(pair: int) -> Optional[dict]:
+		record_offset, count = __PAIR.unpack_from(data, pairs_start + pair * __PAIR.size)
+		return None if count == __NO_RULES else __decode_rules(artifact, data, strings, records_start + record_offset, count)
+	return GRulesBinary(artifact, glayers, decode_pair)
+
+
+def pdk_grules_binary(pdk_dir: Union[str, Path]) -> Optional[GRulesBinary]:
+	"""rules of a mapped pdk from pdk_dir/grules.bin if it was generated from pdk_dir/grules.py (see __main__ below)
+	returns None if there is no artifact, warns and returns None if it is out of date or unreadable (the pdk then
+	imports grules.py as before)"""
+	pdk_dir = Path(pdk_dir)
+	artifact = pdk_dir / "grules.bin"
+	if not artifact.is_file():
+		return None
+	try:
+		return load_grules_binary(artifact, source=pdk_dir / "grules.py")
+	except ValueError as error:
+		warnings.warn(str(error) + ", using grules.py")
+		return None
+
+
+def grules_differences(expected: Mapping, actual: Mapping) -> list[str]:
+	"""returns "glayer1 glayer2" for every pair whose rules differ between two grulesobj dictionaries (empty if they match)"""
+	differences = list()
+	for glayer1 in sorted(set(expected) | set(actual)):
+		expected_row, actual_row = expected.get(glayer1, dict()), actual.get(glayer1, dict())
+		for glayer2 in sorted(set(expected_row) | set(actual_row)):
+			if expected_row.get(glayer2) != actual_row.get(glayer2):
+				differences.append(glayer1 + " " + glayer2)
+	return differences
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(prog="python -m pygen.pdk.util.grules_binary", description="write grules.bin next to the grules.py of a mapped pdk, the pdk then loads its rules from it")
+	parser.add_argument("pdk", help="mapped pdk package in pygen.pdk, e.g. sky130_mapped or gf180_mapped")
+	args = parser.parse_args()
+	grules_module = importlib.import_module("pygen.pdk." + args.pdk + ".grules")
+	artifact = write_grules_binary(grules_module.grulesobj, Path(grules_module.__file__).parent / "grules.bin", source=grules_module.__file__)
+	differences = grules_differences(grules_module.grulesobj, load_grules_binary(artifact, source=grules_module.__file__))
+	if differences:
+		raise RuntimeError(str(artifact) + " does not match grules.py for " + ", ".join(differences))
+	print("wrote " + str(artifact))
@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+from gdsfactory.typings import Component
+from pathlib import Path
+from typing import Iterator, Optional, Union
+import datetime
+import gdstk
+import hashlib
+import numpy as np
+import os
+import weakref
+from .memory_profile import profile_memory
+
+# flat output is the default, set PYGEN_HIERARCHICAL=1 (or call set_hierarchical_output) to keep hierarchy
+__HIERARCHICAL = os.environ.get("PYGEN_HIERARCHICAL", "0").lower() in ("1", "true", "yes")
+
+# written into deduplicated gds files instead of the current time (gdsfactory write_gds does the same), so identical
+# layouts give identical bytes and byte hashes (e.g. the pex cache key) stay valid across runs
+GDS_TIMESTAMP = datetime.datetime(2019, 10, 25)
+
+# cell name -> the one cell which owns it (see uniquify_cell_names)
+__CELL_NAMES = weakref.WeakValueDictionary()
+
+
+def set_hierarchical_output(enabled: bool = True) -> None:
+	"""globally switches generators between flat output (default) and hierarchical output
+	in hierarchical mode generators keep unique subcells (vias, fingers, array elements) as gds cells placed by references
+	instead of flattening every level, so gds size and write time grow with the number of unique cells instead of devices
+	****NOTE: components are cached by gdsfactory, call gdsfactory.cell.clear_cache() after switching the mode
+	"""
+	global __HIERARCHICAL
+	__HIERARCHICAL = bool(enabled)
+
+
+def hierarchical_output_enabled() -> bool:
+	return __HIERARCHICAL
+
+
+@contextmanager
+def hierarchical_output(enabled: bool = True) -> Iterator[None]:
+	"""context manager version of set_hierarchical_output, restores the previous mode on exit"""
+	previous = hierarchical_output_enabled()
+	set_hierarchical_output(enabled)
+	try:
+		yield
+	finally:
+		set_hierarchical_output(previous)
+
+
+@profile_memory
+def maybe_flatten(comp: Component) -> Component:
+	"""returns comp.flatten() in flat mode and comp unchanged in hierarchical mode
+	use this instead of flatten in generators, call comp.flatten() directly only where a tool requires flat geometry"""
+	if __HIERARCHICAL:
+		return uniquify_cell_names(comp)
+	return comp.flatten()
+
+
+def uniquify_cell_names(comp: Component) -> Component:
+	"""renames comp and its subcells where a name is already used by a different cell, returns comp
+	generators create cells with fixed names (e.g. Component("finger")) and copy then edit cached components, so
+	different cells share a name. flattening hides this, but gdstk looks up subcells by name when computing bounding boxes
+	and writing gds, so in hierarchical mode every name has to belong to exactly one cell.
+	maybe_flatten calls this in hierarchical mode, call it before writing a component which was not passed through maybe_flatten
+	"""
+	for subcell in [comp] + sorted(comp.get_dependencies(recursive=True), key=lambda subcell : subcell.name):
+		owner = __CELL_NAMES.get(subcell.name)
+		if owner is subcell:
+			continue
+		if owner is not None:
+			suffix = 1
+			while subcell.name + "_" + str(suffix) in __CELL_NAMES:
+				suffix += 1
+			subcell.name = subcell.name + "_" + str(suffix)
+		__CELL_NAMES[subcell.name] = subcell
+	return comp
+
+
+def __polygon_key(points: np.array, grid: float) -> bytes:
+	"""integer vertices of a polygon, counterclockwise and starting at the smallest vertex"""
+	vertices = np.round(np.asarray(points) / grid).astype(np.int64)
+	signed_area = np.sum(vertices[:,0] * np.roll(vertices[:,1], -1) - np.roll(vertices[:,0], -1) * vertices[:,1])
+	if signed_area < 0:
+		vertices = vertices[::-1]
+	start = np.lexsort((vertices[:,1], vertices[:,0]))[0]
+	return np.roll(vertices, -start, axis=0).tobytes()
+
+
+def cell_fingerprint(cell: gdstk.Cell, child_fingerprints: dict[str,str], ports: Optional[list] = None, grid: float = 1e-3) -> str:
+	"""canonical hash of the geometry of a gdstk cell
+	args:
+	cell = the cell, its polygons, paths, labels, and references are hashed
+	child_fingerprints = {cell name: fingerprint} of every referenced cell, so references hash by content instead of by name
+	ports = optional gdsfactory ports (name, center, width, orientation, layer are hashed)
+	grid = coordinates are rounded to multiples of grid (default 1nm)
+	cells with the same fingerprint are identical up to the order of their elements
+	"""
+	items = list()
+	polygons = list(cell.polygons)
+	for path in list(cell.paths):
+		polygons += path.to_polygons()
+	for polygon in polygons:
+		items.append(b"p" + repr((polygon.layer, polygon.datatype)).encode() + __polygon_key(polygon.points, grid))
+	for label in cell.labels:
+		origin = tuple(int(round(value / grid)) for value in label.origin)
+		items.append(b"l" + repr((label.text, label.layer, label.texttype, origin, round(label.rotation, 6), label.magnification, label.x_reflection)).encode())
+	for reference in cell.references:
+		child = reference.cell if isinstance(reference.cell, str) else reference.cell.name
+		origin = tuple(int(round(value / grid)) for value in reference.origin)
+		offsets = b""
+		if reference.repetition.size:
+			offsets = np.round(reference.repetition.get_offsets() / grid).astype(np.int64).tobytes()
+		items.append(b"r" + repr((child_fingerprints[child], origin, round(reference.rotation, 6), reference.magnification, reference.x_reflection)).encode() + offsets)
+	for port in (ports or list()):
+		center = tuple(int(round(value / grid)) for value in port.center)
+		items.append(b"o" + repr((port.name, center, int(round(port.width / grid)), round(float(port.orientation or 0), 6), tuple(port.layer))).encode())
+	sha = hashlib.sha256()
+	for item in sorted(items):
+		sha.update(hashlib.sha256(item).digest())
+	return sha.hexdigest()
+
+
+def __cells_bottom_up(top_cells: list[gdstk.Cell]) -> list[gdstk.Cell]:
+	"""every cell below top_cells (and top_cells) ordered so a cell comes after all cells it references"""
+	ordered, visited = list(), set()
+	for top in top_cells:
+		stack = [(top, False)]
+		while stack:
+			cell, expanded = stack.pop()
+			if expanded:
+				ordered.append(cell)
+				continue
+			if cell.name in visited:
+				continue
+			visited.add(cell.name)
+			stack.append((cell, True))
+			for child in cell.dependencies(False):
+				if child.name not in visited:
+					stack.append((child, False))
+	return ordered
+
+
+def geometry_fingerprint(comp: Component, include_ports: bool = True) -> str:
+	"""canonical hash of a component (polygons per layer of the whole hierarchy plus the ports of comp)
+	two components with the same fingerprint produce the same layout, regardless of cell names or how they were parameterized"""
+	child_fingerprints = dict()
+	for cell in __cells_bottom_up([comp._cell])[:-1]:
+		child_fingerprints[cell.name] = cell_fingerprint(cell, child_fingerprints)
+	return cell_fingerprint(comp._cell, child_fingerprints, comp.get_ports_list() if include_ports else None)
+
+
+def gds_fingerprint(gds_file: Union[str,Path]) -> str:
+	"""geometry_fingerprint (without ports) of the top cell of a gds file, a hash of every top cell if there are several
+	a component and the gds it was written to have the same fingerprint"""
+	library = gdstk.read_gds(str(gds_file))
+	top_cells = library.top_level()
+	child_fingerprints = dict()
+	for cell in __cells_bottom_up(top_cells):
+		child_fingerprints[cell.name] = cell_fingerprint(cell, child_fingerprints)
+	if len(top_cells) == 1:
+		return child_fingerprints[top_cells[0].name]
+	return hashlib.sha256("".join(sorted(child_fingerprints[cell.name] for cell in top_cells)).encode()).hexdigest()
+
+
+def dedupe_library(library: gdstk.Library) -> dict[str,int]:
+	"""merges geometrically identical cells of a gdstk library in place
+	references to a duplicate are pointed at the first cell with the same fingerprint and the duplicate is removed,
+	top cells are never removed
+	returns {"cells_before", "cells_after", "merged"}
+	"""
+	top_cells = library.top_level()
+	top_names = {cell.name for cell in top_cells}
+	cells_before = len(library.cells)
+	fingerprints, canonical, duplicates = dict(), dict(), dict()
+	for cell in __cells_bottom_up(top_cells):
+		fingerprint = cell_fingerprint(cell, fingerprints)
+		fingerprints[cell.name] = fingerprint
+		if fingerprint in canonical and cell.name not in top_names:
+			duplicates[cell.name] = canonical[fingerprint]
+		else:
+			canonical.setdefault(fingerprint, cell)
+	for cell in library.cells:
+		if cell.name in duplicates:
+			continue
+		for reference in cell.references:
+			child = reference.cell if isinstance(reference.cell, str) else reference.cell.name
+			if child in duplicates:
+				reference.cell = duplicates[child]
+	for cell in list(library.cells):
+		if cell.name in duplicates:
+			library.remove(cell)
+	return {"cells_before": cells_before, "cells_after": len(library.cells), "merged": len(duplicates)}
+
+
+def dedupe_gds(gds_file: Union[str,Path], output_file: Optional[Union[str,Path]] = None) -> dict[str,int]:
+	"""merges geometrically identical cells of a gds file (see dedupe_library), writes output_file (default: in place)
+	returns the dedupe_library counts plus bytes_before and bytes_after"""
+	gds_file = Path(gds_file)
+	output_file = Path(output_file) if output_file is not None else gds_file
+	bytes_before = gds_file.stat().st_size
+	library = gdstk.read_gds(str(gds_file))
+	counts = dedupe_library(library)
+	library.write_gds(str(output_file), timestamp=GDS_TIMESTAMP)
+	return {**counts, "bytes_before": bytes_before, "bytes_after": output_file.stat().st_size}
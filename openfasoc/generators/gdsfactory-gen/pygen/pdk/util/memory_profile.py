@@ -0,0 +1,215 @@
+"""opt in memory profiling and a memory budget for pygen builds
+generators decorated with profile_memory record, for every call, the python allocations (tracemalloc) and the process
+rss, attributed to the generator and to the chain of generators which called it. the same decorator enforces a memory
+budget: when the rss has grown by more than the budget since the outermost generator call (the build) started, the build
+raises MemoryError naming the generator chain, instead of growing until the kernel kills the (pool worker) process.
+the budget is measured from the start of every build because python rarely gives freed memory back to the os, an
+absolute limit would fail every later build of a worker once one build went over it.
+enable with environment variables (inherited by Pool workers) or set_memory_profile:
+PYGEN_MEMORY_PROFILE = rss (cheap, rss only) or trace (also tracemalloc, slows builds down ~2-3x)
+PYGEN_MEMORY_BUDGET_MB = rss growth limit of a build in MB
+PYGEN_MEMORY_REPORT_DIR = directory for memory_<pid>.json reports (see write_memory_report)
+usage: python memory_profile.py <report dir or files> [--top 20] merges and prints reports
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+MEMORY_PROFILE_MODES = ("off", "rss", "trace")
+
+__MODE = os.environ.get("PYGEN_MEMORY_PROFILE", "off").lower() or "off"
+__BUDGET_BYTES = float(os.environ["PYGEN_MEMORY_BUDGET_MB"]) * 2**20 if os.environ.get("PYGEN_MEMORY_BUDGET_MB") else None
+__REPORT_DIR = os.environ.get("PYGEN_MEMORY_REPORT_DIR") or None
+
+# generator name -> accumulated stats (see __new_stats)
+__STATS = dict()
+# [name, highest traced memory seen, rss at the start of the build] of the generator calls currently running
+__CALL_STACK = list()
+
+
+def __new_stats() -> dict:
+	return {"calls": 0, "seconds": 0.0, "traced_net_bytes": 0, "traced_peak_bytes": 0, "rss_growth_bytes": 0, "rss_max_bytes": 0, "callers": dict()}
+
+
+def current_rss() -> int:
+	"""resident set size of this process in bytes (peak rss where /proc is not available)"""
+	try:
+		with open("/proc/self/statm", "rb") as statm:
+			return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError, IndexError):
+		return peak_rss()
+
+
+def peak_rss() -> int:
+	"""highest resident set size of this process so far in bytes"""
+	maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def set_memory_profile(mode: Optional[str] = "rss", budget_mb: Optional[float] = None, report_dir: Optional[Union[str,Path]] = None) -> None:
+	"""configures profiling in this process, also sets the environment variables so Pool workers started later inherit it
+	args:
+	mode = off, rss, or trace (see module docstring)
+	budget_mb = rss growth budget of a build in MB, None disables the budget
+	report_dir = where write_memory_report writes memory_<pid>.json by default
+	"""
+	global __MODE, __BUDGET_BYTES, __REPORT_DIR
+	mode = (mode or "off").lower()
+	if mode not in MEMORY_PROFILE_MODES:
+		raise ValueError("memory profile mode must be one of " + str(MEMORY_PROFILE_MODES))
+	if budget_mb is not None and budget_mb <= 0:
+		raise ValueError("memory budget must be positive")
+	__MODE = mode
+	__BUDGET_BYTES = budget_mb * 2**20 if budget_mb is not None else None
+	__REPORT_DIR = str(report_dir) if report_dir is not None else None
+	os.environ["PYGEN_MEMORY_PROFILE"] = mode
+	for key, value in [("PYGEN_MEMORY_BUDGET_MB", budget_mb), ("PYGEN_MEMORY_REPORT_DIR", __REPORT_DIR)]:
+		if value is None:
+			os.environ.pop(key, None)
+		else:
+			os.environ[key] = str(value)
+
+
+def memory_profile_mode() -> str:
+	return __MODE
+
+
+def __check_budget(name: str, rss: int, build_rss: int) -> None:
+	if __BUDGET_BYTES is not None and rss - build_rss > __BUDGET_BYTES:
+		chain = " > ".join([frame[0] for frame in __CALL_STACK] + [name])
+		traced = " (python allocations " + str(round(tracemalloc.get_traced_memory()[0] / 2**20)) + " MB)" if tracemalloc.is_tracing() else ""
+		raise MemoryError("pygen memory budget of " + str(round(__BUDGET_BYTES / 2**20)) + " MB exceeded in " + chain + ": rss grew by " + str(round((rss - build_rss) / 2**20)) + " MB to " + str(round(rss / 2**20)) + " MB" + traced)
+
+
+def __record_call(frame: list, start_time: float, rss_start: int, traced_start: Optional[int]) -> int:
+	"""adds a finished call to the stats, returns the rss at the end of the call"""
+	rss_end = current_rss()
+	if __MODE == "off":
+		return rss_end
+	stats = __STATS.setdefault(frame[0], __new_stats())
+	stats["calls"] += 1
+	stats["seconds"] += time.perf_counter() - start_time
+	stats["rss_growth_bytes"] = max(stats["rss_growth_bytes"], rss_end - rss_start)
+	stats["rss_max_bytes"] = max(stats["rss_max_bytes"], rss_end)
+	caller = __CALL_STACK[-1][0] if __CALL_STACK else "<top>"
+	stats["callers"][caller] = stats["callers"].get(caller, 0) + 1
+	if traced_start is not None:
+		traced_end, traced_peak = tracemalloc.get_traced_memory()
+		frame[1] = max(frame[1], traced_peak)
+		stats["traced_net_bytes"] += traced_end - traced_start
+		stats["traced_peak_bytes"] = max(stats["traced_peak_bytes"], frame[1] - traced_start)
+		if __CALL_STACK:
+			__CALL_STACK[-1][1] = max(__CALL_STACK[-1][1], frame[1])
+	return rss_end
+
+
+def profile_memory(func: Callable) -> Callable:
+	"""decorator recording memory use of each call of func (see module docstring), costs one attribute check when off
+	put it below @cell so cached components are not counted"""
+	name = func.__name__
+
+	@functools.wraps(func)
+	def memory_profiled(*args, **kwargs):
+		if __MODE == "off" and __BUDGET_BYTES is None:
+			return func(*args, **kwargs)
+		if __MODE == "trace" and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		rss_start = current_rss()
+		build_rss = __CALL_STACK[0][2] if __CALL_STACK else rss_start
+		__check_budget(name, rss_start, build_rss)
+		traced_start = None
+		if tracemalloc.is_tracing():
+			traced_start, traced_peak = tracemalloc.get_traced_memory()
+			# the peak is reset for every call, so callers keep the highest peak of their callees
+			if __CALL_STACK:
+				__CALL_STACK[-1][1] = max(__CALL_STACK[-1][1], traced_peak)
+			tracemalloc.reset_peak()
+		frame = [name, traced_start or 0, build_rss]
+		__CALL_STACK.append(frame)
+		start_time = time.perf_counter()
+		try:
+			component = func(*args, **kwargs)
+		except BaseException:
+			# the exception of the generator is raised as is, not hidden behind a budget error
+			__CALL_STACK.pop()
+			__record_call(frame, start_time, rss_start, traced_start)
+			raise
+		__CALL_STACK.pop()
+		__check_budget(name, __record_call(frame, start_time, rss_start, traced_start), build_rss)
+		return component
+
+	return memory_profiled
+
+
+def memory_report() -> dict:
+	"""{"pid", "peak_rss_bytes", "mode", "generators": {name: stats}} of this process"""
+	return {"pid": os.getpid(), "mode": __MODE, "peak_rss_bytes": peak_rss(), "generators": json.loads(json.dumps(__STATS))}
+
+
+def reset_memory_profile() -> None:
+	__STATS.clear()
+
+
+def write_memory_report(path: Optional[Union[str,Path]] = None) -> Optional[Path]:
+	"""writes memory_report() as json to path (default: <report dir>/memory_<pid>.json), returns the path
+	returns None if profiling is off or no path or report dir is set"""
+	if __MODE == "off":
+		return None
+	if path is None:
+		if __REPORT_DIR is None:
+			return None
+		path = Path(__REPORT_DIR) / ("memory_" + str(os.getpid()) + ".json")
+	path = Path(path)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp_path = path.with_name(path.name + ".tmp")
+	tmp_path.write_text(json.dumps(memory_report(), indent=1))
+	tmp_path.replace(path)
+	return path
+
+
+def merge_memory_reports(paths: list[Union[str,Path]]) -> dict:
+	"""combines reports of several processes (e.g. pool workers), sums counts and keeps the maxima"""
+	merged = {"processes": 0, "peak_rss_bytes": 0, "generators": dict()}
+	for path in paths:
+		report = json.loads(Path(path).read_text())
+		merged["processes"] += 1
+		merged["peak_rss_bytes"] = max(merged["peak_rss_bytes"], report["peak_rss_bytes"])
+		for name, stats in report["generators"].items():
+			total = merged["generators"].setdefault(name, __new_stats())
+			for key in ["calls", "seconds", "traced_net_bytes"]:
+				total[key] += stats[key]
+			for key in ["traced_peak_bytes", "rss_growth_bytes", "rss_max_bytes"]:
+				total[key] = max(total[key], stats[key])
+			for caller, count in stats["callers"].items():
+				total["callers"][caller] = total["callers"].get(caller, 0) + count
+	return merged
+
+
+def format_memory_report(report: dict, top: int = 20) -> str:
+	"""table of the generators with the largest peaks (MB), report from memory_report or merge_memory_reports"""
+	generators = sorted(report["generators"].items(), key=lambda item : (item[1]["traced_peak_bytes"], item[1]["rss_growth_bytes"]), reverse=True)
+	lines = ["peak rss " + str(round(report["peak_rss_bytes"] / 2**20, 1)) + " MB" + (" over " + str(report["processes"]) + " processes" if "processes" in report else "")]
+	lines.append("generator".ljust(28) + "calls".rjust(8) + "seconds".rjust(10) + "traced peak".rjust(13) + "traced net".rjust(12) + "rss growth".rjust(12) + "rss max".rjust(10) + "  top caller")
+	for name, stats in generators[:top]:
+		caller = max(stats["callers"].items(), key=lambda item : item[1])[0] if stats["callers"] else ""
+		row = [stats["calls"], round(stats["seconds"], 2)] + [round(stats[key] / 2**20, 1) for key in ["traced_peak_bytes", "traced_net_bytes", "rss_growth_bytes", "rss_max_bytes"]]
+		lines.append(name[:27].ljust(28) + "".join(str(value).rjust(width) for value, width in zip(row, [8, 10, 13, 12, 12, 10])) + "  " + caller)
+	return "\n".join(lines)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="merge and print pygen memory reports")
+	parser.add_argument("reports", nargs="+", help="memory_<pid>.json files or directories containing them")
+	parser.add_argument("--top", type=int, default=20, help="number of generators to print (default: 20)")
+	args = parser.parse_args()
+	paths = list()
+	for report in args.reports:
+		paths += sorted(Path(report).glob("memory_*.json")) if Path(report).is_dir() else [Path(report)]
+	print(format_memory_report(merge_memory_reports(paths), args.top))
@@ -1,3 +1,7 @@
+"""writes many opamp layouts (a directory of gds files or a gds archive) side by side into one gds/oasis file
+usage (from the gdsfactory-gen directory, the module imports pygen so it cannot run as a plain script):
+python -m pygen.pdk.util.opamp_array_create <opamps dir or archive> [-o big_gds_here.gds] [--columns n] [--in-memory]
+"""
 from gdsfactory.read.import_gds import import_gds
 from gdsfactory.component import Component
 from pathlib import Path
@@ -5,7 +9,11 @@ import os
 import math
 from gdsfactory.pdk import Pdk
 from pathlib import Path
-from typing import Union
+from typing import Iterator, Optional, Union
+from tempfile import TemporaryDirectory
+import argparse
+import gdstk
+from pygen.pdk.util.gds_archive import GDSArchive, is_gds_archive
 
 def get_files_with_extension(directory, extension):
 	file_list = []
@@ -18,21 +26,31 @@ def get_files_with_extension(directory, extension):
 def write_opamp_matrix(opamps_dir: Union[str,Path]="./", xspace=400,yspace=300):
 	"""Use the write_opamp_matrix function to create a matrix of many different opamps
 	reads the different opamps from all gds files in opamps_dir
+	opamps_dir can also be a gds archive (see gds_archive.py), identical layouts in the archive are imported once
 	"""
 	pdk_nochache = Pdk(name="nocache")
 	pdk_nochache.cell_decorator_settings.cache=False
 	pdk_nochache.activate()
 
 	search_dir = Path(opamps_dir).resolve()
-	opamp_files_list = get_files_with_extension(str(search_dir),".gds")
 	opamp_comp_list = list()
 
-	for i,filev in enumerate(opamp_files_list):
-		if "big_gds_here" in str(filev):
-			continue
-		tempcomp = import_gds(filev)
-		tempcomp.name = "opamp"+str(i)
-		opamp_comp_list.append(tempcomp)
+	if is_gds_archive(search_dir):
+		archive = GDSArchive(search_dir)
+		comps_by_sha = dict()
+		for index in archive.indices():
+			sha = archive.sha(index)
+			if sha not in comps_by_sha:
+				comps_by_sha[sha] = archive.import_component(index, "opamp"+str(index))
+			opamp_comp_list.append(comps_by_sha[sha])
+	else:
+		opamp_files_list = get_files_with_extension(str(search_dir),".gds")
+		for i,filev in enumerate(opamp_files_list):
+			if "big_gds_here" in str(filev):
+				continue
+			tempcomp = import_gds(search_dir / filev)
+			tempcomp.name = "opamp"+str(i)
+			opamp_comp_list.append(tempcomp)
 
 	col_len = round(math.sqrt(len(opamp_comp_list)))
 	col_index = 0
@@ -50,5 +68,107 @@ def write_opamp_matrix(opamps_dir: Union[str,Path]="./", xspace=400,yspace=300):
 
 	big_comp.write_gds("big_gds_here.gds")
 
+
+def __matrix_gds_files(search_dir: Path, exclude: Optional[Path] = None) -> list[Path]:
+	exclude = Path(exclude).resolve() if exclude is not None else None
+	gds_files = [gds_file for gds_file in search_dir.glob("*.gds") if "big_gds_here" not in gds_file.name and gds_file.resolve() != exclude]
+	gds_files.sort(key=lambda gds_file : (0, int(gds_file.stem), "") if gds_file.stem.isdigit() else (1, 0, gds_file.name))
+	return gds_files
+
+
+def iter_matrix_sources(opamps: Union[str,Path], exclude: Optional[Union[str,Path]] = None) -> Iterator[tuple[str,Path]]:
+	"""yields (layout key, gds path) for every opamp of a directory or gds archive
+	layouts with the same key are identical, the gds path of a key is only valid until the next layout is yielded
+	directory files are ordered by index (<index>.gds), other names after them alphabetically, exclude (e.g. the
+	matrix being written into the same directory) is skipped. directories are listed when the first layout is taken"""
+	search_dir = Path(opamps).resolve()
+	if is_gds_archive(search_dir):
+		archive = GDSArchive(search_dir)
+		with TemporaryDirectory() as tmpdirname:
+			extracted = set()
+			for index in archive.indices():
+				sha = archive.sha(index)
+				gds_path = Path(tmpdirname) / (sha + ".gds")
+				# only the most recent layout is kept on disk, repeated layouts reuse the cells already written
+				if sha not in extracted:
+					for old_file in Path(tmpdirname).glob("*.gds"):
+						old_file.unlink()
+					gds_path.write_bytes(archive.read_bytes(sha=sha))
+					extracted.add(sha)
+				yield sha, gds_path
+		return
+	for gds_file in __matrix_gds_files(search_dir, exclude):
+		yield str(gds_file), gds_file
+
+
+def stream_opamp_matrix(
+	opamps: Union[str,Path] = "./",
+	output_file: Union[str,Path] = "big_gds_here.gds",
+	xspace: float = 400,
+	yspace: float = 300,
+	columns: Optional[int] = None,
+	top_name: str = "opamp_matrix",
+) -> Path:
+	"""writes a matrix of many opamps without holding them in memory (unlike write_opamp_matrix)
+	every source layout is read once, its cells are renamed with a unique prefix and written to the output stream right away,
+	and the top cell only holds references to the renamed top cells. identical layouts of an archive are written once and
+	referenced at every position
+	args:
+	opamps = directory of gds files or a gds archive (see gds_archive.py)
+	output_file = .gds (streamed) or .oas
+	xspace, yspace = pitch of the matrix
+	columns = number of columns (default: square matrix)
+	top_name = name of the top cell
+	****NOTE: gdstk can not stream oasis, .oas output is streamed to a temporary gds which is then converted in one piece
+	"""
+	output_file = Path(output_file).resolve()
+	search_dir = Path(opamps).resolve()
+	if is_gds_archive(search_dir):
+		num_layouts = len(GDSArchive(search_dir))
+		sources = iter_matrix_sources(search_dir)
+	else:
+		# listed before the writer creates output_file, which may be in the same directory
+		sources = list(iter_matrix_sources(search_dir, exclude=output_file))
+		num_layouts = len(sources)
+	if columns is None:
+		columns = max(round(math.sqrt(num_layouts)), 1)
+	oasis = output_file.suffix.lower() == ".oas"
+	with TemporaryDirectory() as tmpdirname:
+		gds_file = Path(tmpdirname) / "matrix.gds" if oasis else output_file
+		writer = gdstk.GdsWriter(str(gds_file), name="opamp_matrix", unit=1e-6, precision=1e-9)
+		top = gdstk.Cell(top_name)
+		written = dict()
+		for position, (key, gds_path) in enumerate(sources):
+			if key not in written:
+				library = gdstk.read_gds(str(gds_path), unit=1e-6)
+				top_cells = library.top_level()
+				if len(top_cells) != 1:
+					raise ValueError(str(gds_path) + " has " + str(len(top_cells)) + " top cells, expected 1")
+				prefix = "m" + str(len(written)) + "_"
+				for layout_cell in library.cells:
+					layout_cell.name = prefix + layout_cell.name
+				writer.write(*library.cells)
+				written[key] = top_cells[0].name
+				del library, top_cells
+			# references by name so the top cell never holds the layouts
+			top.add(gdstk.Reference(written[key], ((position % columns) * xspace, (position // columns) * yspace)))
+		writer.write(top)
+		writer.close()
+		if oasis:
+			gdstk.read_gds(str(gds_file)).write_oas(str(output_file))
+	return output_file
+
+
 if __name__=="__main__":
-	write_opamp_matrix()
+	parser = argparse.ArgumentParser(prog="python -m pygen.pdk.util.opamp_array_create", description="write a matrix of opamp layouts to one gds/oasis file")
+	parser.add_argument("opamps", nargs="?", default="./", help="directory of gds files or gds archive (default: ./)")
+	parser.add_argument("-o", "--output", default="big_gds_here.gds", help="output .gds or .oas file (default: big_gds_here.gds)")
+	parser.add_argument("--xspace", type=float, default=400, help="x pitch (default: 400)")
+	parser.add_argument("--yspace", type=float, default=300, help="y pitch (default: 300)")
+	parser.add_argument("--columns", type=int, default=None, help="number of columns (default: square matrix)")
+	parser.add_argument("--in-memory", action="store_true", help="import every layout into one component (write_opamp_matrix) instead of streaming")
+	args = parser.parse_args()
+	if args.in_memory:
+		write_opamp_matrix(args.opamps, args.xspace, args.yspace)
+	else:
+		print(stream_opamp_matrix(args.opamps, args.output, args.xspace, args.yspace, args.columns))
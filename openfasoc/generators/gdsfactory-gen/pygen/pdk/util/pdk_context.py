@@ -0,0 +1,136 @@
+"""scoped pdk activation for building several pdks in one process
+gdsfactory keeps one global active pdk: the @cell decorator takes the default decorator and cell settings from it
+(not from the pdk argument of the generator), and Pdk.activate drops the global cell cache on every switch. so a
+process which builds sky130 and gf180 variants flips the active pdk back and forth, throws away the cell cache each
+time, and a thread which activates one pdk while another thread builds the other one changes that build.
+pdk_scope(pdk) makes the pdk explicit: inside the with block pdk is the active pdk of this thread, pdk.activate() calls
+of the generators (routes, fets, ...) are free, and activating a different pdk is an error instead of a silent switch.
+every pdk with the gdsfactory cell cache enabled keeps its own cache, switching pdks swaps the caches instead of
+clearing them. sky130 and gf180 disable the cell cache and reuse primitives through the primitive cache instead, which
+is already keyed by pdk name (see primitive_cache.py).
+the gdsfactory state is still global, so a scope pins the active pdk while it is open: scopes of the same pdk (and
+threads started inside a scope) build at the same time, a scope of another pdk waits until the scopes of other threads
+end. to build different pdks in parallel use processes (each has its own gdsfactory state), e.g. a Pool with one
+pdk_scope per task.
+usage:
+with pdk_scope(sky130_mapped_pdk):
+	comp = opamp(sky130_mapped_pdk)
+"""
+import contextvars
+import importlib
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import gdsfactory.pdk
+from gdsfactory.pdk import Pdk
+
+# the module, gdsfactory.cell is shadowed by the cell decorator in the gdsfactory namespace
+__GF_CELL = importlib.import_module("gdsfactory.cell")
+
+# held only while the gdsfactory active pdk or cell cache is changed or scopes are opened or closed, never while building
+__CONDITION = threading.Condition(threading.RLock())
+# thread id -> number of open pdk_scopes of that thread, open scopes pin the gdsfactory active pdk
+__SCOPE_HOLDERS = Counter()
+# innermost pdk_scope pdk of this thread (None outside of any scope)
+__SCOPED_PDK = contextvars.ContextVar("pygen_scoped_pdk", default=None)
+# pdk name -> gdsfactory cell cache of that pdk (the cache of the active pdk is gdsfactory.cell.CACHE)
+__CELL_CACHES = dict()
+
+
+def __same_pdk(pdk1: Optional[Pdk], pdk2: Pdk) -> bool:
+	"""generators get copies of the pdk (pydantic validate_arguments copies models), so a copy of the active pdk counts
+	as the active pdk as long as the parts the @cell decorator reads from the active pdk are the same"""
+	if pdk1 is pdk2:
+		return True
+	return pdk1 is not None and pdk1.name == pdk2.name and pdk1.default_decorator is pdk2.default_decorator and pdk1.cell_decorator_settings == pdk2.cell_decorator_settings
+
+
+def __switch_active_pdk(pdk: Pdk) -> None:
+	"""makes pdk the gdsfactory active pdk, parking the cell cache of the previous pdk and restoring the one of pdk
+	must be called with __CONDITION held"""
+	previous = gdsfactory.pdk._ACTIVE_PDK
+	if __same_pdk(previous, pdk):
+		return
+	if previous is not None and previous.cell_decorator_settings.cache:
+		__CELL_CACHES[previous.name] = __GF_CELL.CACHE
+	# Pdk.activate does the gdsfactory setup (base pdk merge, layer validation, activation event) and clears the cache
+	Pdk.activate(pdk)
+	__GF_CELL.CACHE = __CELL_CACHES.pop(pdk.name, __GF_CELL.CACHE)
+
+
+def __drop_unread_cell_cache(pdk: Pdk) -> None:
+	"""with the cell cache disabled (the pygen pdks) gdsfactory still stores every component it builds but never reads
+	them back, drop them on activation like Pdk.activate did so a sweep does not keep every component alive"""
+	if not pdk.cell_decorator_settings.cache:
+		__GF_CELL.clear_cache()
+
+
+def scoped_pdk() -> Optional[Pdk]:
+	"""the pdk of the innermost pdk_scope of this thread, None outside of a scope"""
+	return __SCOPED_PDK.get()
+
+
+def __other_threads_hold_scopes() -> bool:
+	thread = threading.get_ident()
+	return any(count for holder, count in __SCOPE_HOLDERS.items() if holder != thread)
+
+
+def activate_pdk(pdk: Pdk) -> None:
+	"""what MappedPDK.activate does
+	inside a pdk_scope: nothing for the scoped pdk, RuntimeError for any other pdk (use a nested pdk_scope instead)
+	outside a scope: nothing if pdk is already the active pdk (e.g. in threads started inside a scope), otherwise makes
+	pdk the global active pdk like gdsfactory does but keeps the cell cache of each pdk, RuntimeError while another
+	thread has a scope open (it would switch the pdk under that thread)
+	unlike Pdk.activate a copy of the active pdk is not activated again (see __same_pdk)"""
+	current = __SCOPED_PDK.get()
+	if current is not None:
+		if not __same_pdk(current, pdk):
+			raise RuntimeError(f"cannot activate {pdk.name} inside the pdk_scope of {current.name}, use a nested pdk_scope")
+		__drop_unread_cell_cache(current)
+		return
+	if __same_pdk(gdsfactory.pdk._ACTIVE_PDK, pdk):
+		__drop_unread_cell_cache(pdk)
+		return
+	with __CONDITION:
+		if __other_threads_hold_scopes():
+			raise RuntimeError(f"cannot activate {pdk.name} while another thread has a pdk_scope of {gdsfactory.pdk._ACTIVE_PDK.name} open")
+		__switch_active_pdk(pdk)
+		__drop_unread_cell_cache(pdk)
+
+
+@contextmanager
+def pdk_scope(pdk: Pdk) -> Iterator[Pdk]:
+	"""activates pdk for this thread until the with block ends, then restores the previously active pdk
+	scopes nest (also with different pdks), a scope of another pdk than the scopes open in other threads waits until
+	those end, the lock is not held while the with block runs"""
+	thread = threading.get_ident()
+	with __CONDITION:
+		__CONDITION.wait_for(lambda: __same_pdk(gdsfactory.pdk._ACTIVE_PDK, pdk) or not __other_threads_hold_scopes())
+		previous = gdsfactory.pdk._ACTIVE_PDK
+		__switch_active_pdk(pdk)
+		__SCOPE_HOLDERS[thread] += 1
+	token = __SCOPED_PDK.set(pdk)
+	try:
+		yield pdk
+	finally:
+		__SCOPED_PDK.reset(token)
+		with __CONDITION:
+			__SCOPE_HOLDERS[thread] -= 1
+			outer_scope = __SCOPE_HOLDERS[thread] > 0
+			if not outer_scope:
+				del __SCOPE_HOLDERS[thread]
+			if outer_scope:
+				# the outer scope of this thread needs its pdk back, wait for other threads building with this one
+				__CONDITION.wait_for(lambda: __same_pdk(gdsfactory.pdk._ACTIVE_PDK, previous) or not __other_threads_hold_scopes())
+				__switch_active_pdk(previous)
+			elif previous is not None and not __other_threads_hold_scopes():
+				__switch_active_pdk(previous)
+			__CONDITION.notify_all()
+
+
+def clear_pdk_cell_caches() -> None:
+	"""drops the gdsfactory cell cache of every pdk, including the active one"""
+	with __CONDITION:
+		__CELL_CACHES.clear()
+		__GF_CELL.clear_cache()
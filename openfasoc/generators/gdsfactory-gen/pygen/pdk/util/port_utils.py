@@ -1,9 +1,13 @@
 from pydantic import validate_arguments
 from gdsfactory.typings import Component, ComponentReference
 from gdsfactory.components.rectangle import rectangle
-from gdsfactory.port import Port
+from gdsfactory.port import Port, sort_ports_clockwise
+from gdsfactory.component_layout import _rotate_points
 from typing import Callable, Union, Optional
 from decimal import Decimal
+from fnmatch import fnmatchcase
+import numpy as np
+from .memory_profile import profile_memory
 
 
 @validate_arguments
@@ -37,14 +41,13 @@ def rename_component_ports(custom_comp: Component, rename_function: Callable[[st
     return custom_comp
 
 
-@validate_arguments
-def rename_ports_by_orientation__call(old_name: str, pobj: Port) -> str:
-	"""internal implementation of port orientation rename"""
+def rename_ports_by_orientation__name(old_name: str, orientation: Optional[float]) -> str:
+	"""internal implementation of port orientation rename (not validated, called once per port)"""
 	if not "_" in old_name:
 		raise ValueError("portname must contain underscore \"_\" " + old_name)
 	# get new suffix (port orientation)
 	new_suffix = None
-	angle = pobj.orientation % 360 if pobj.orientation is not None else 0
+	angle = orientation % 360 if orientation is not None else 0
 	angle = round(angle)
 	if angle <= 45 or angle >= 315:
 		new_suffix = "E"
@@ -55,10 +58,13 @@ def rename_ports_by_orientation__call(old_name: str, pobj: Port) -> str:
 	else:
 		new_suffix = "S"
 	# construct new name
-	old_str_split = old_name.rsplit("_", 1)
-	old_str_split[1] = new_suffix
-	new_name = "_".join(old_str_split)
-	return new_name
+	return old_name.rsplit("_", 1)[0] + "_" + new_suffix
+
+
+@validate_arguments
+def rename_ports_by_orientation__call(old_name: str, pobj: Port) -> str:
+	"""internal implementation of port orientation rename"""
+	return rename_ports_by_orientation__name(old_name, pobj.orientation)
 
 @validate_arguments
 def rename_ports_by_orientation(custom_comp: Component) -> Component:
@@ -67,7 +73,7 @@ def rename_ports_by_orientation(custom_comp: Component) -> Component:
     direction is one of N,E,S,W
     returns the modified component
     """
-    return rename_component_ports(custom_comp, rename_ports_by_orientation__call)
+    return rename_component_ports(custom_comp, lambda old_name, pobj : rename_ports_by_orientation__name(old_name, pobj.orientation))
 
 
 class rename_ports_by_list__call: 
@@ -95,6 +101,7 @@ def rename_ports_by_list(custom_comp: Component, replace_list: list[tuple[str,st
     return rename_component_ports(custom_comp, rename_func)
 
 
+@profile_memory
 @validate_arguments
 def add_ports_perimeter(custom_comp: Component, layer: tuple[int, int], prefix: Optional[str] = "_") -> Component:
     """adds ports to the outside perimeter of a cell
@@ -226,6 +233,265 @@ def print_ports(custom_comp: Union[Component, ComponentReference], names_only: O
 
 
 
+class PortNamespace:
+	"""indexed view of the ports of a Component or ComponentReference
+	_ represents a level of hierarchy (like PortTree). the index maps every prefix ending in _ to the port names below it,
+	so prefix, glob, and ls lookups only touch matching ports instead of walking the whole ports dict
+	Component namespaces support bulk renames and lazily inherited ports (add_ref_ports)
+	ComponentReference namespaces transform only the ports which are looked up (ref.ports transforms every port on every access)
+	****NOTE: the index is built on the first lookup, if ports are added or renamed without the namespace call refresh()
+	methods are not pydantic validated because they run once per port
+	"""
+
+	@validate_arguments
+	def __init__(self, custom_comp: Union[Component, ComponentReference]):
+		self.owner = custom_comp
+		self.is_reference = isinstance(custom_comp, ComponentReference)
+		# lazily inherited ports: prefix -> (namespace of ref.parent, ref, origin, rotation, x_reflection) at the time of add_ref_ports
+		self.__pending = dict()
+		# every _ level of the pending prefixes
+		self.__pending_levels = set()
+		# transformed reference ports, cleared when the reference moves
+		self.__ref_ports = dict()
+		self.__ref_transform = None
+		self.__index = None
+		self.__children = None
+
+	def __source_ports(self) -> dict[str, Port]:
+		return self.owner.parent.ports if self.is_reference else self.owner.ports
+
+	def refresh(self) -> None:
+		"""drops the index and cached reference ports, call after changing ports without the namespace"""
+		self.__index = None
+		self.__children = None
+		self.__ref_ports.clear()
+
+	def __build_index(self) -> None:
+		index, children = {"": dict()}, {"": dict()}
+		for name in self.names():
+			start = 0
+			split = name.find("_")
+			while split >= 0:
+				children.setdefault(name[:start], dict())[name[start:split]] = None
+				index.setdefault(name[:split+1], dict())[name] = None
+				start = split + 1
+				split = name.find("_", start)
+			children.setdefault(name[:start], dict())[name[start:]] = None
+			index[""][name] = None
+		self.__index, self.__children = index, children
+
+	def __add_to_index(self, name: str) -> None:
+		if self.__index is None:
+			return
+		start = 0
+		split = name.find("_")
+		while split >= 0:
+			self.__children.setdefault(name[:start], dict())[name[start:split]] = None
+			self.__index.setdefault(name[:split+1], dict())[name] = None
+			start = split + 1
+			split = name.find("_", start)
+		self.__children.setdefault(name[:start], dict())[name[start:]] = None
+		self.__index[""][name] = None
+
+	def names(self) -> list[str]:
+		"""all port names, including lazily inherited ports which are not materialized yet"""
+		names = list(self.__source_ports().keys())
+		for prefix, (child, _, _, _, _) in self.__pending.items():
+			names += [prefix + name for name in child.names()]
+		return names
+
+	def __len__(self) -> int:
+		return len(self.__source_ports()) + sum(len(pending[0]) for pending in self.__pending.values())
+
+	def __iter__(self):
+		return iter(self.names())
+
+	def __contains__(self, name: str) -> bool:
+		if name in self.__source_ports():
+			return True
+		pending = self.__find_pending(name)
+		return pending is not None and name[len(pending):] in self.__pending[pending][0]
+
+	def __find_pending(self, name: str) -> Optional[str]:
+		"""returns the add_ref_ports prefix name falls under (checks each _ boundary of name)"""
+		if not self.__pending:
+			return None
+		if "" in self.__pending:
+			return ""
+		split = name.find("_")
+		while split >= 0:
+			if name[:split+1] in self.__pending:
+				return name[:split+1]
+			split = name.find("_", split + 1)
+		return None
+
+	def __getitem__(self, name: str) -> Port:
+		source_ports = self.__source_ports()
+		if not self.is_reference and name in source_ports:
+			return source_ports[name]
+		if self.is_reference and name in source_ports:
+			transform = (tuple(self.owner.origin), self.owner.rotation, self.owner.x_reflection)
+			if transform != self.__ref_transform:
+				self.__ref_ports.clear()
+				self.__ref_transform = transform
+			if name not in self.__ref_ports:
+				self.__ref_ports[name] = transform_ports([source_ports[name]], *transform, parent=self.owner)[0]
+			return self.__ref_ports[name]
+		pending = self.__find_pending(name)
+		if pending is not None:
+			child, ref, origin, rotation, x_reflection = self.__pending[pending]
+			return transform_ports([child[name[len(pending):]]], origin, rotation, x_reflection, parent=ref, prefix=pending)[0]
+		raise KeyError(name + " not in ports")
+
+	def prefix(self, prefix: str = "") -> list[Port]:
+		"""ports whose name starts with prefix, prefix is a path of _ separated levels (e.g. multiplier_0 or multiplier_0_)"""
+		if self.__index is None:
+			self.__build_index()
+		if prefix and not prefix.endswith("_"):
+			prefix += "_"
+		return [self[name] for name in self.__index.get(prefix, dict())]
+
+	def glob(self, pattern: str) -> list[Port]:
+		"""ports whose name matches a shell style pattern (*, ?, [seq]), e.g. multiplier_*_gate_E
+		only ports below the literal levels at the start of the pattern are compared"""
+		literal = pattern
+		for wildcard in "*?[":
+			literal = literal.split(wildcard, 1)[0]
+		if literal == pattern:
+			return [self[pattern]] if pattern in self else list()
+		if self.__index is None:
+			self.__build_index()
+		candidates = self.__index.get(literal[:literal.rfind("_")+1], dict())
+		return [self[name] for name in candidates if fnmatchcase(name, pattern)]
+
+	def ls(self, file_path: Optional[str] = None) -> list[str]:
+		"""lists the next level of names below a path (see PortTree.ls), raises KeyError if the path is not found"""
+		if self.__index is None:
+			self.__build_index()
+		file_path = file_path + "_" if file_path else ""
+		if file_path not in self.__children:
+			raise KeyError("Port path was not found")
+		return list(self.__children[file_path].keys())
+
+	def add_ref_ports(self, ref: ComponentReference, prefix: str = "") -> None:
+		"""same ports as owner.add_ports(ref.get_ports_list(), prefix=prefix) but nothing is copied until the ports are used
+		ports are placed where ref is now, moving ref afterwards does not move them (same as add_ports)
+		lookups through the namespace transform single ports, call materialize() before the component is used elsewhere
+		"""
+		if self.is_reference:
+			raise ValueError("ports can only be added to a Component namespace")
+		# lookups find the pending reference by the _ levels of a name, overlapping prefixes are added in order instead
+		if prefix in self.__pending_levels or self.__find_pending(prefix) is not None:
+			self.materialize()
+		self.__pending[prefix] = (PortNamespace(ref.parent), ref, np.array(ref.origin), ref.rotation, ref.x_reflection)
+		split = prefix.find("_")
+		while split >= 0:
+			self.__pending_levels.add(prefix[:split+1])
+			split = prefix.find("_", split + 1)
+		self.__pending_levels.add("")
+		if prefix and not prefix.endswith("_"):
+			self.materialize()
+		if self.__index is not None:
+			for name in self.__pending[prefix][0].names():
+				self.__add_to_index(prefix + name)
+
+	def materialize(self) -> Union[Component, ComponentReference]:
+		"""adds all lazily inherited ports to the component (in one transform per reference), returns the component
+		ports of each reference are added clockwise like add_ports(ref.get_ports_list())"""
+		pending, self.__pending = self.__pending, dict()
+		self.__pending_levels = set()
+		for prefix, (child, ref, origin, rotation, x_reflection) in pending.items():
+			ports = transform_ports(list(child.owner.ports.values()), origin, rotation, x_reflection, parent=ref, prefix=prefix)
+			# same order as ref.get_ports_list()
+			for port in sort_ports_clockwise({port.name: port for port in ports}).values():
+				if port.name in self.owner.ports:
+					raise ValueError("add_port() Port name " + port.name + " exists in " + self.owner.name)
+				self.owner.ports[port.name] = port
+		return self.owner
+
+	def rename_prefix(self, old_prefix: str, new_prefix: str) -> Union[Component, ComponentReference]:
+		"""renames every port starting with old_prefix to start with new_prefix instead (keeps the port order)"""
+		if self.is_reference:
+			raise ValueError("reference ports can not be renamed, rename the ports of the parent component")
+		self.materialize()
+		if self.__index is None:
+			self.__build_index()
+		old_prefix = old_prefix + "_" if old_prefix and not old_prefix.endswith("_") else old_prefix
+		new_prefix = new_prefix + "_" if new_prefix and not new_prefix.endswith("_") else new_prefix
+		to_rename = self.__index.get(old_prefix, dict())
+		return self.__rename(lambda name : new_prefix + name[len(old_prefix):] if name in to_rename else name)
+
+	def rename_by_orientation(self, prefix: str = "") -> Union[Component, ComponentReference]:
+		"""rename_ports_by_orientation for the ports below prefix (default: all ports)"""
+		if self.is_reference:
+			raise ValueError("reference ports can not be renamed, rename the ports of the parent component")
+		self.materialize()
+		if self.__index is None:
+			self.__build_index()
+		prefix = prefix + "_" if prefix and not prefix.endswith("_") else prefix
+		to_rename = self.__index.get(prefix, dict())
+		ports = self.owner.ports
+		return self.__rename(lambda name : rename_ports_by_orientation__name(name, ports[name].orientation) if name in to_rename else name)
+
+	def __rename(self, rename_function: Callable[[str], str]) -> Component:
+		"""same pop and insert order as rename_component_ports, so the result matches rename_ports_by_orientation"""
+		ports = self.owner.ports
+		for old_name, new_name in [(name, rename_function(name)) for name in ports]:
+			port = ports.pop(old_name)
+			port.name = new_name
+			ports[new_name] = port
+		self.__index = None
+		self.__children = None
+		return self.owner
+
+
+def transform_ports(
+	ports: list[Port],
+	origin: tuple[float,float],
+	rotation: Optional[float] = None,
+	x_reflection: bool = False,
+	parent: Optional[Union[Component, ComponentReference]] = None,
+	prefix: str = "",
+) -> list[Port]:
+	"""copies ports with the transformation of a reference applied (same result as ref.ports, in one numpy pass)
+	args:
+	ports = ports of the referenced component
+	origin, rotation, x_reflection = placement of the reference
+	parent = parent of the new ports (usually the reference)
+	prefix = prepended to the port names
+	"""
+	if len(ports) == 0:
+		return list()
+	centers = np.array([port.center for port in ports], dtype="float64")
+	if x_reflection:
+		centers[:, 1] = -centers[:, 1]
+	if rotation is not None:
+		centers = _rotate_points(centers, angle=rotation, center=[0, 0])
+	if origin is not None:
+		centers = centers + np.array(origin)
+	new_ports = list()
+	for port, center in zip(ports, centers):
+		orientation = port.orientation
+		if x_reflection and orientation is not None:
+			orientation = -orientation
+		if rotation is not None and orientation is not None:
+			orientation += rotation
+		new_port = Port(
+			name = prefix + port.name,
+			center = center,
+			orientation = np.mod(orientation, 360) if orientation else orientation,
+			parent = parent,
+			port_type = port.port_type,
+			cross_section = port.cross_section,
+			shear_angle = port.shear_angle,
+			layer = port.layer,
+			width = port.width,
+		)
+		new_port.info = port.info
+		new_ports.append(new_port)
+	return new_ports
+
+
 class PortTree:
 	"""PortTree helps a pygen programmer visualize the ports in a component
 	_ should represent a level of hiearchy (much like a directory). think of this like psuedo directories
@@ -235,32 +501,28 @@ class PortTree:
 
 	@validate_arguments
 	def __init__(self, custom_comp: Union[Component, ComponentReference]) -> dict:
-		"""creates the tree structure from the ports where _ represent subdirectories
+		"""uses the PortNamespace index (built on the first ls), the nested dict tree is only built if PortTree.tree is used"""
+		self.namespace = PortNamespace(custom_comp)
+
+	@property
+	def tree(self) -> dict:
+		"""nested dict where _ represent subdirectories
 		credit -> chatGPT
 		"""
-		file_list = custom_comp.ports.keys()
 		directory_tree = {}
-		for file_path in file_list:
+		for file_path in self.namespace.names():
 			path_components = file_path.split('_')
 			current_dir = directory_tree
 			for path_component in path_components:
 				if path_component not in current_dir:
 					current_dir[path_component] = {}
 				current_dir = current_dir[path_component]
-		self.tree = directory_tree
-	
+		return directory_tree
+
 	@validate_arguments
 	def ls(self, file_path: Optional[str] = None) -> list[str]:
 		"""tries to traverse the tree along the given path and prints all subdirectories in a psuedo directory
 		if the path given is not found in the tree, raises KeyError
 		path should not end with _ char
 		"""
-		if file_path is None or len(file_path)==0:
-			return list(self.tree.keys())
-		path_components = file_path.split('_')
-		current_dir = self.tree
-		for path_component in path_components:
-			if path_component not in current_dir:
-				raise KeyError("Port path was not found")
-			current_dir = current_dir[path_component]
-		return list(current_dir.keys())
\ No newline at end of file
+		return self.namespace.ls(file_path)
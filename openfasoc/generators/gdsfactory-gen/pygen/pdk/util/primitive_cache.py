@@ -0,0 +1,119 @@
+"""opt in memoization of the pygen primitives (via stacks, via arrays, tap rings, transistors)
+a sweep builds the same primitives over and over (an opamp calls via_stack ~360 times with a handful of different
+arguments, the pmos section multipliers only depend on rmult), but the pdks disable the gdsfactory cell cache because
+generators edit the components they get back. generators decorated with cache_primitive instead keep the first
+component built for each set of arguments and return a copy of it on every call, so callers can still edit the result.
+copying is 20-200x faster than building the primitive again.
+the cache is kept per process, warm_primitives fills it before a Pool is started so fork workers share the components
+copy on write instead of each building them again (see the --warm-pool option of sky130_nist_tapeout.py).
+enable with PYGEN_PRIMITIVE_CACHE=1 (inherited by Pool workers) or set_primitive_cache
+the cache is bounded: it keeps the max_entries (PYGEN_PRIMITIVE_CACHE_SIZE, default 256) most recently used components
+and by default only the small primitives (via stacks, via arrays, tap rings). transistors (multiplier, nmos, pmos,
+decorated with cache_primitive(large=True)) hold every finger and via of the device, they are cached only with
+PYGEN_PRIMITIVE_CACHE=all or set_primitive_cache(include_large=True).
+****NOTE: the key includes the pdk name, the pdk default decorator, and the hierarchical output mode, call
+clear_primitive_cache after changing anything else about the pdk (e.g. grules)
+"""
+import functools
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+from .hierarchy import hierarchical_output_enabled
+
+DEFAULT_MAX_ENTRIES = 256
+
+__ENABLED = os.environ.get("PYGEN_PRIMITIVE_CACHE", "0").lower() in ("1", "true", "yes", "all")
+__INCLUDE_LARGE = os.environ.get("PYGEN_PRIMITIVE_CACHE", "0").lower() == "all"
+__MAX_ENTRIES = int(os.environ.get("PYGEN_PRIMITIVE_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+
+# key (see __cache_key) -> component, never handed out, only copies of it are. least recently used first
+__CACHE = OrderedDict()
+__STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def set_primitive_cache(enabled: bool = True, include_large: bool = False, max_entries: Optional[int] = None) -> None:
+	"""enables or disables the primitive cache in this process, also sets PYGEN_PRIMITIVE_CACHE(_SIZE) so Pool workers started later inherit it
+	include_large also caches the primitives decorated with cache_primitive(large=True) (transistors)
+	max_entries = number of components kept, the least recently used one is dropped first (None keeps the current limit)
+	disabling does not drop cached components, see clear_primitive_cache"""
+	global __ENABLED, __INCLUDE_LARGE, __MAX_ENTRIES
+	if max_entries is not None and max_entries < 1:
+		raise ValueError("max_entries must be at least 1")
+	__ENABLED = bool(enabled)
+	__INCLUDE_LARGE = bool(enabled and include_large)
+	os.environ["PYGEN_PRIMITIVE_CACHE"] = ("all" if __INCLUDE_LARGE else "1") if enabled else "0"
+	if max_entries is not None:
+		__MAX_ENTRIES = int(max_entries)
+		os.environ["PYGEN_PRIMITIVE_CACHE_SIZE"] = str(__MAX_ENTRIES)
+		while len(__CACHE) > __MAX_ENTRIES:
+			__evict()
+
+
+def primitive_cache_enabled() -> bool:
+	return __ENABLED
+
+
+def clear_primitive_cache() -> None:
+	"""drops every cached component and resets the counters (call it after a MemoryError, like gdsfactory clear_cache)"""
+	__CACHE.clear()
+	__STATS.update(hits=0, misses=0, evictions=0)
+
+
+def primitive_cache_stats() -> dict:
+	"""returns {"hits": int, "misses": int, "evictions": int, "entries": int} of this process"""
+	return dict(__STATS, entries=len(__CACHE))
+
+
+def __evict() -> None:
+	__CACHE.popitem(last=False)
+	__STATS["evictions"] += 1
+
+
+def __key_part(value) -> str:
+	# a MappedPDK is keyed by what changes its output instead of its (long) repr
+	if hasattr(value, "get_grule") and hasattr(value, "default_decorator"):
+		return "pdk:" + str(value.name) + ":" + str(getattr(value.default_decorator, "__name__", value.default_decorator))
+	return repr(value)
+
+
+def __cache_key(name: str, args: tuple, kwargs: dict) -> tuple:
+	return (name, hierarchical_output_enabled(), tuple(__key_part(arg) for arg in args), tuple(sorted((key, __key_part(value)) for key, value in kwargs.items())))
+
+
+def cache_primitive(func: Optional[Callable] = None, large: bool = False) -> Callable:
+	"""decorator returning a copy of the component func built the first time it was called with the same arguments
+	costs one check when the cache is disabled. put it above @cell so the cached component has its cell name
+	use as @cache_primitive or @cache_primitive(large=True), large primitives are only cached with include_large"""
+	if func is None:
+		return functools.partial(cache_primitive, large=large)
+	name = func.__name__
+
+	@functools.wraps(func)
+	def cached_primitive(*args, **kwargs):
+		if not __ENABLED or (large and not __INCLUDE_LARGE):
+			return func(*args, **kwargs)
+		key = __cache_key(name, args, kwargs)
+		component = __CACHE.get(key)
+		if component is None:
+			__STATS["misses"] += 1
+			component = func(*args, **kwargs)
+			__CACHE[key] = component
+			while len(__CACHE) > __MAX_ENTRIES:
+				__evict()
+		else:
+			__STATS["hits"] += 1
+			__CACHE.move_to_end(key)
+		component_copy = component.copy()
+		component_copy.name = component.name
+		return component_copy
+	return cached_primitive
+
+
+def warm_primitives(primitives: Iterable[tuple[Callable, tuple, Optional[dict]]]) -> float:
+	"""builds (func, args, kwargs) for every entry of primitives so later calls are cache hits (only useful with the cache enabled)
+	returns the seconds spent building"""
+	start_time = time.perf_counter()
+	for func, args, kwargs in primitives:
+		func(*args, **(kwargs or dict()))
+	return time.perf_counter() - start_time
@@ -5,9 +5,12 @@ https://docs.google.com/spreadsheets/d/172P-CW_dGQU5icyUQAasLVq7Jlz51R5lB1rJ4Jyv
 directions
 1) go to the google sheets and download as .csv
 2) run this program with the csv input
+3) optionally write the binary rule artifact with --binary (see grules_binary.py)
 """
 
+import ast
 import csv
+import re
 from pathlib import Path
 
 
@@ -83,6 +86,22 @@ def create_ruledeck_python_dictionary_definition(csvtoread: Path):
     return output
 
 
+def ruledeck_grules(csvtoread: Path) -> dict:
+    """returns the grulesobj dictionary that the python written by create_ruledeck_python_dictionary_definition defines
+    pairs of glayers without rules in the csv are None"""
+    with open(csvtoread, newline="") as csvfile:
+        glayers = next(csv.reader(csvfile, delimiter=","))[1:]
+    grulesobj = dict()
+    for glayer in glayers:
+        grulesobj[glayer] = dict((x, None) for x in glayers)
+    rule_line = re.compile(r'^grulesobj\["(.+?)"\]\["(.+?)"\] = (.*)$')
+    for line in create_ruledeck_python_dictionary_definition(csvtoread).splitlines():
+        match = rule_line.match(line)
+        if match:
+            grulesobj.setdefault(match.group(1), dict())[match.group(2)] = ast.literal_eval(match.group(3))
+    return grulesobj
+
+
 if __name__ == "__main__":
     from argparse import ArgumentParser
 
@@ -96,6 +115,12 @@ if __name__ == "__main__":
         action="store_true",
         help="true/false write python file to current dir",
     )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="write the binary rule artifact grules.bin to current dir and validate it against the csv (copy it next to grules.py of the pdk together with the grules.py written by --code)",
+    )
     args = parser.parse_args()
     csvtoread = Path(args.file).resolve()
     output = create_ruledeck_python_dictionary_definition(csvtoread)
@@ -109,3 +134,14 @@ for glayer in MappedPDK.valid_glayers:
         output = append_front + output
         with open("grules.py", "w") as outputpy:
             outputpy.write(output)
+    if args.binary:
+        from grules_binary import write_grules_binary, load_grules_binary, grules_differences
+
+        grulesobj = ruledeck_grules(csvtoread)
+        # next to the grules.py written above the artifact is keyed on it, so a pdk directory can load it instead
+        source = Path("grules.py").resolve() if args.code else csvtoread
+        artifact = write_grules_binary(grulesobj, "grules.bin", source=source)
+        differences = grules_differences(grulesobj, load_grules_binary(artifact, source=source))
+        if differences:
+            raise RuntimeError("grules.bin does not match the csv for " + ", ".join(differences))
+        print("wrote " + str(artifact.resolve()))
@@ -7,16 +7,19 @@ from pathlib import Path
 from gdsfactory.read.import_gds import import_gds
 from decimal import Decimal, ROUND_UP
 from gdsfactory.snap import snap_to_grid
+from .hierarchy import maybe_flatten, hierarchical_output_enabled
+from .memory_profile import profile_memory
 
 
+@profile_memory
 @validate_arguments
 def component_snap_to_grid(comp: Component, nm: Optional[int]=None) -> Component:
 	"""snaps all polygons in component to grid and correctly updates ports
 	comp = the component to snap to grid
-	NOTE this function will flatten the component
+	NOTE this function will flatten the component (unless hierarchical output is enabled, see hierarchy.py)
 	nm the grid to snap to, defaults to active pdk grid size"""
 	# flatten the component
-	comp = comp.flatten()
+	comp = maybe_flatten(comp)
 	# figure out nm
 	if nm is None:
 		nm = int(get_grid_size() * 1000)
@@ -26,6 +29,9 @@ def component_snap_to_grid(comp: Component, nm: Optional[int]=None) -> Component
 		raise ValueError("nm must be an integer tolerance value greater than zero")
 	# iterate through ports and snap to grid
 	comp.snap_ports_to_grid(nm=nm)
+	# a hierarchical component is written on the database grid anyway, the round trip would only duplicate every subcell
+	if hierarchical_output_enabled():
+		return comp
 	save_ports = comp.get_ports_list()
 	save_name = comp.name
 	with TemporaryDirectory() as tmpdirname:
@@ -0,0 +1,236 @@
+"""geometry regression harness for the pygen generators
+builds a fixed corpus of generator calls (REGRESSION_CORPUS) for the sky130 and gf180 mapped pdks and compares the
+result against stored golden geometry, so performance work on via_stack, prec_array, multiplier, routes, etc. can be
+checked to keep the layout identical. every polygon is merged per layer (so a different fragmentation of the same
+shapes still matches) and hashed with cell_fingerprint, ports are compared by name, center, width, orientation, layer.
+on a mismatch the xor area of each differing layer is computed against the golden polygons.
+runs offline with gdstk only (no klayout). golden files per pdk: <golden dir>/<pdk>_geometry.json.gz (canonical geometry) and <pdk>_geometry.gds (merged polygons)
+usage (from the gdsfactory-gen directory):
+python -m pygen.regression [--pdk sky130 gf180] [--golden-dir dir] [--update] [--case name ...]
+****NOTE: only run --update after checking that a geometry change is intended
+"""
+import argparse
+import datetime
+import gzip
+import json
+from pathlib import Path
+from typing import Iterable, Optional, Union
+import gdstk
+from gdsfactory.typings import Component
+from .pdk.mappedpdk import MappedPDK
+from .pdk.util.comp_utils import prec_array
+from .pdk.util.hierarchy import cell_fingerprint, hierarchical_output
+from .pdk.util.primitive_cache import primitive_cache_enabled, set_primitive_cache
+from .via_gen import via_stack, via_array
+from .guardring import tapring
+from .fet import multiplier, nmos, pmos
+from .diff_pair import diff_pair
+from .mimcap import mimcap
+from .L_route import L_route
+from .c_route import c_route
+from .straight_route import straight_route
+
+# golden files checked in with the tests
+GOLDEN_DIR = Path(__file__).resolve().parents[4] / "tests" / "gdsfactory_gen" / "golden"
+# coordinates are compared on this grid (um)
+REGRESSION_GRID = 1e-3
+# xor area (um^2) of a layer below which a mismatch is reported as rounding instead of a geometry change
+XOR_AREA_TOLERANCE = 1e-6
+
+
+def __two_stacks(pdk: MappedPDK, offset: tuple[float,float]) -> tuple[Component, dict]:
+	"""top component with two met2 via stacks, the second one moved by offset (route fixtures)"""
+	top = Component()
+	stack1 = top << via_stack(pdk, "met1", "met2")
+	stack2 = top << via_stack(pdk, "met1", "met2")
+	stack2.move(offset)
+	return top, {"1": stack1, "2": stack2}
+
+
+def __c_route_case(pdk: MappedPDK) -> Component:
+	top, stacks = __two_stacks(pdk, (0, 5))
+	top << c_route(pdk, stacks["1"].ports["top_met_E"], stacks["2"].ports["top_met_E"])
+	return top
+
+
+def __L_route_case(pdk: MappedPDK) -> Component:
+	top, stacks = __two_stacks(pdk, (4, 3))
+	top << L_route(pdk, stacks["1"].ports["top_met_N"], stacks["2"].ports["top_met_W"])
+	return top
+
+
+def __straight_route_case(pdk: MappedPDK) -> Component:
+	top, stacks = __two_stacks(pdk, (5, 0))
+	top << straight_route(pdk, stacks["1"].ports["top_met_E"], stacks["2"].ports["top_met_W"])
+	return top
+
+
+# case name -> function(pdk) -> Component, keep calls small so the corpus builds in seconds
+REGRESSION_CORPUS = {
+	"via_stack_met1_met3": lambda pdk: via_stack(pdk, "met1", "met3"),
+	"via_stack_poly_met2_full": lambda pdk: via_stack(pdk, "poly", "met2", fullbottom=True, fulltop=True),
+	"via_array_active_met2": lambda pdk: via_array(pdk, "active_diff", "met2", size=(3, 2), lay_bottom=True),
+	"prec_array_via_stack": lambda pdk: prec_array(via_stack(pdk, "met1", "met2"), rows=2, columns=3, spacing=(0.5, 0.5), absolute_spacing=True),
+	"tapring": lambda pdk: tapring(pdk, (5.0, 3.0)),
+	"multiplier_n": lambda pdk: multiplier(pdk, "n+s/d", width=2, fingers=2),
+	"multiplier_p_rmult2": lambda pdk: multiplier(pdk, "p+s/d", width=3, length=1, fingers=3, rmult=2),
+	"nmos": lambda pdk: nmos(pdk, width=3, fingers=2, multipliers=2),
+	"pmos": lambda pdk: pmos(pdk, width=2, fingers=3, with_tie=True),
+	"diff_pair": lambda pdk: diff_pair(pdk, width=2, fingers=2),
+	"mimcap": lambda pdk: mimcap(pdk, (6.0, 4.0)),
+	"c_route": __c_route_case,
+	"L_route": __L_route_case,
+	"straight_route": __straight_route_case,
+}
+
+
+def get_regression_pdk(name: str) -> MappedPDK:
+	if name == "sky130":
+		from .pdk.sky130_mapped import sky130_mapped_pdk as pdk
+	elif name == "gf180":
+		from .pdk.gf180_mapped import gf180_mapped_pdk as pdk
+	else:
+		raise ValueError("regression pdk must be sky130 or gf180, not " + str(name))
+	return pdk
+
+
+def __layer_key(layer: tuple[int,int]) -> str:
+	return str(layer[0]) + "/" + str(layer[1])
+
+
+def merged_layers(comp: Component) -> dict[str, list[gdstk.Polygon]]:
+	"""the polygons of comp (whole hierarchy) merged per layer, keyed by "layer/datatype" """
+	merged = dict()
+	for layer, polygons in comp.get_polygons(by_spec=True, as_array=False).items():
+		layer = tuple(layer)
+		merged[__layer_key(layer)] = gdstk.boolean(polygons, [], "or", precision=REGRESSION_GRID / 10, layer=layer[0], datatype=layer[1])
+	return merged
+
+
+def __port_record(port) -> list:
+	center = [int(round(value / REGRESSION_GRID)) for value in port.center]
+	orientation = round(float(port.orientation), 6) if port.orientation is not None else None
+	return [port.name, center, int(round(port.width / REGRESSION_GRID)), orientation, list(port.layer) if port.layer is not None else None]
+
+
+def canonical_geometry(comp: Component) -> dict:
+	"""{"layers": {layer: {"hash", "area"}}, "ports": [[name, center (grid units), width (grid units), orientation, layer]]}
+	layers are merged before hashing, ports are sorted by name"""
+	layers = dict()
+	for layer, polygons in merged_layers(comp).items():
+		layer_cell = gdstk.Cell("layer")
+		layer_cell.add(*polygons)
+		layers[layer] = {"hash": cell_fingerprint(layer_cell, dict(), grid=REGRESSION_GRID), "area": round(sum(polygon.area() for polygon in polygons), 6)}
+	ports = sorted((__port_record(port) for port in comp.ports.values()), key=lambda record: record[0])
+	return {"layers": dict(sorted(layers.items())), "ports": ports}
+
+
+def build_corpus(pdk: MappedPDK, cases: Optional[Iterable[str]] = None) -> dict[str, Component]:
+	"""builds the REGRESSION_CORPUS cases (default all) in flat mode with the primitive cache disabled"""
+	cases = list(cases) if cases is not None else list(REGRESSION_CORPUS)
+	unknown = [case for case in cases if case not in REGRESSION_CORPUS]
+	if unknown:
+		raise ValueError("unknown regression cases " + str(unknown) + ", choose from " + str(list(REGRESSION_CORPUS)))
+	cache_was_enabled = primitive_cache_enabled()
+	set_primitive_cache(False)
+	try:
+		with hierarchical_output(False), pdk.scope():
+			return {case: REGRESSION_CORPUS[case](pdk) for case in cases}
+	finally:
+		set_primitive_cache(cache_was_enabled)
+
+
+def __golden_paths(pdk_name: str, golden_dir: Union[str,Path]) -> tuple[Path,Path]:
+	golden_dir = Path(golden_dir)
+	return golden_dir / (pdk_name + "_geometry.json.gz"), golden_dir / (pdk_name + "_geometry.gds")
+
+
+def write_golden(pdk_name: str, golden_dir: Union[str,Path] = GOLDEN_DIR, cases: Optional[Iterable[str]] = None) -> dict[str, dict]:
+	"""builds the corpus and stores its canonical geometry (gzipped json) and merged polygons (gds, one cell per case)
+	with cases only those entries are replaced, returns the stored {case: canonical_geometry}"""
+	json_path, gds_path = __golden_paths(pdk_name, golden_dir)
+	json_path.parent.mkdir(parents=True, exist_ok=True)
+	golden = json.loads(gzip.decompress(json_path.read_bytes())) if json_path.is_file() and cases is not None else dict()
+	golden_cells = {cell.name: cell for cell in gdstk.read_gds(str(gds_path)).cells} if gds_path.is_file() and cases is not None else dict()
+	for case, comp in build_corpus(get_regression_pdk(pdk_name), cases).items():
+		golden[case] = canonical_geometry(comp)
+		golden_cells[case] = gdstk.Cell(case)
+		for polygons in merged_layers(comp).values():
+			golden_cells[case].add(*polygons)
+	golden = dict(sorted(golden.items()))
+	# cells and json entries sorted by case name so rewriting a subset of cases gives the same files
+	library = gdstk.Library(unit=1e-6, precision=1e-9)
+	library.add(*[golden_cells[case] for case in sorted(golden_cells)])
+	json_path.write_bytes(gzip.compress(json.dumps(golden, separators=(",", ":")).encode(), mtime=0))
+	library.write_gds(str(gds_path), timestamp=datetime.datetime(2000, 1, 1))
+	return golden
+
+
+def compare_geometry(case: str, comp: Component, golden: dict, golden_cell: Optional[gdstk.Cell]) -> list[str]:
+	"""differences between comp and the golden canonical geometry of case (empty list if identical)
+	layers with a different hash are reported with their xor area against the golden polygons"""
+	differences = list()
+	current = canonical_geometry(comp)
+	golden_polygons = dict()
+	if golden_cell is not None:
+		for polygon in golden_cell.polygons:
+			golden_polygons.setdefault(__layer_key((polygon.layer, polygon.datatype)), list()).append(polygon)
+	current_polygons = None
+	for layer in sorted(set(current["layers"]) | set(golden["layers"])):
+		current_layer, golden_layer = current["layers"].get(layer), golden["layers"].get(layer)
+		if current_layer is not None and golden_layer is not None and current_layer["hash"] == golden_layer["hash"]:
+			continue
+		if current_polygons is None:
+			current_polygons = merged_layers(comp)
+		xor_area = sum(polygon.area() for polygon in gdstk.boolean(current_polygons.get(layer, list()), golden_polygons.get(layer, list()), "xor", precision=REGRESSION_GRID / 10))
+		if xor_area <= XOR_AREA_TOLERANCE and current_layer is not None and golden_layer is not None:
+			continue
+		differences.append(f"{case}: layer {layer} xor area {xor_area:.6f} um^2 (area {golden_layer['area'] if golden_layer else 0} -> {current_layer['area'] if current_layer else 0})")
+	current_ports = {record[0]: record for record in current["ports"]}
+	golden_ports = {record[0]: record for record in golden["ports"]}
+	missing = sorted(set(golden_ports) - set(current_ports))
+	added = sorted(set(current_ports) - set(golden_ports))
+	changed = sorted(name for name in set(current_ports) & set(golden_ports) if current_ports[name] != golden_ports[name])
+	for label, names in [("missing", missing), ("added", added), ("changed", changed)]:
+		if names:
+			differences.append(f"{case}: {len(names)} ports {label}, e.g. " + ", ".join(names[:5]))
+	return differences
+
+
+def check_golden(pdk_name: str, golden_dir: Union[str,Path] = GOLDEN_DIR, cases: Optional[Iterable[str]] = None) -> list[str]:
+	"""builds the corpus and compares it against the golden files, returns the differences (empty list if all match)"""
+	json_path, gds_path = __golden_paths(pdk_name, golden_dir)
+	if not json_path.is_file():
+		raise FileNotFoundError("no golden geometry for " + pdk_name + " in " + str(golden_dir) + ", create it with --update")
+	golden = json.loads(gzip.decompress(json_path.read_bytes()))
+	golden_cells = {cell.name: cell for cell in gdstk.read_gds(str(gds_path)).cells} if gds_path.is_file() else dict()
+	cases = list(cases) if cases is not None else list(REGRESSION_CORPUS)
+	differences = [case + ": no golden geometry" for case in cases if case not in golden]
+	for case, comp in build_corpus(get_regression_pdk(pdk_name), [case for case in cases if case in golden]).items():
+		differences += compare_geometry(case, comp, golden[case], golden_cells.get(case))
+	return differences
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+	parser = argparse.ArgumentParser(prog="pygen.regression", description="compare generator geometry against golden fingerprints")
+	parser.add_argument("--pdk", nargs="+", choices=["sky130", "gf180"], default=["sky130", "gf180"], help="pdks to check (default: both)")
+	parser.add_argument("--golden-dir", default=str(GOLDEN_DIR), help="directory of the golden files (default: tests/gdsfactory_gen/golden)")
+	parser.add_argument("--case", nargs="+", default=None, help="only these corpus cases (default: all)")
+	parser.add_argument("--update", action="store_true", help="rebuild and store the golden geometry instead of checking it")
+	args = parser.parse_args(argv)
+	failed = False
+	for pdk_name in args.pdk:
+		if args.update:
+			golden = write_golden(pdk_name, args.golden_dir, args.case)
+			print(pdk_name + ": stored " + str(len(golden)) + " cases")
+			continue
+		differences = check_golden(pdk_name, args.golden_dir, args.case)
+		print(pdk_name + ": " + ("ok" if not differences else str(len(differences)) + " differences"))
+		for difference in differences:
+			print("\t" + difference)
+		failed = failed or bool(differences)
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
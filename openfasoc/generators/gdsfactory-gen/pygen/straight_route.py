@@ -7,9 +7,12 @@ from .via_gen import via_stack, via_array
 from gdsfactory.components.rectangle import rectangle
 from .pdk.util.comp_utils import evaluate_bbox, align_comp_to_port
 from .pdk.util.port_utils import assert_port_manhattan, set_port_orientation
+from .pdk.util.hierarchy import maybe_flatten
+from .pdk.util.memory_profile import profile_memory
 
 
 @cell
+@profile_memory
 def straight_route(
 	pdk: MappedPDK,
 	edge1: Port,
@@ -78,7 +81,7 @@ def straight_route(
 	straightroute.add(align_comp_to_port(out_via,route_ref.ports[viaport_name],alignment=("c","c")))
 	if front_via is not None:
 		straightroute.add(align_comp_to_port(front_via,edge1,alignment=("c","c")))
-	return straightroute.flatten()
+	return maybe_flatten(straightroute)
 
 
 if __name__ == "__main__":
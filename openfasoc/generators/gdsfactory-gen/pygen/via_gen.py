@@ -1,15 +1,20 @@
 from gdsfactory.cell import cell
 from gdsfactory.component import Component
 from gdsfactory.components.rectangle import rectangle
+from gdsfactory.port import Port, sort_ports_clockwise
 from pydantic import validate_arguments
 from .pdk.mappedpdk import MappedPDK
 from math import floor
 from typing import Optional, Union
 from .pdk.util.comp_utils import evaluate_bbox, prec_array, to_float, move, prec_ref_center, to_decimal
-from .pdk.util.port_utils import rename_ports_by_orientation, print_ports
+from .pdk.util.port_utils import rename_ports_by_orientation, rename_ports_by_orientation__name, print_ports
 from .pdk.util.snap_to_grid import component_snap_to_grid
+from .pdk.util.hierarchy import maybe_flatten, hierarchical_output_enabled
+from .pdk.util.memory_profile import profile_memory
+from .pdk.util.primitive_cache import cache_primitive
 from decimal import Decimal
 from typing import Literal
+import numpy as np
 
 
 @validate_arguments
@@ -89,7 +94,9 @@ def __get_viastack_minseperation(pdk: MappedPDK, viastack: Component, ordered_la
     return via_spacing, 2*top_enclosure
 
 
+@cache_primitive
 @cell
+@profile_memory
 def via_stack(
     pdk: MappedPDK,
     glayer1: str,
@@ -174,10 +181,39 @@ def via_stack(
         # move SW corner to 0,0 if centered=False
         if not centered:
             viastack = move(viastack,(viastack.xmax,viastack.ymax))
-    return rename_ports_by_orientation(viastack.flatten())
+    return rename_ports_by_orientation(maybe_flatten(viastack))
 
 
+def __via_array_num_vias(
+    pdk: MappedPDK,
+    viadim: float,
+    via_abs_spacing: float,
+    top_enclosure: float,
+    size: Optional[tuple[Optional[float],Optional[float]]],
+    minus1: bool,
+    num_vias: Optional[tuple[Optional[int],Optional[int]]],
+    no_exception: bool,
+) -> list[int]:
+    """internal use: number of (columns, rows) of a via_array (see via_array for the args)"""
+    cnum_vias = 2*[None]
+    for i in range(2):
+        if (num_vias[i] if num_vias else False):
+            cnum_vias[i] = num_vias[i]
+        elif (size[i] if size else False):
+            dim = pdk.snap_to_2xgrid(size[i],return_type="float")
+            fltnum = floor((dim - top_enclosure) / (via_abs_spacing)) or 1
+            fltnum = 1 if fltnum < 1 else fltnum
+            cnum_vias[i] = ((fltnum - 1) or 1) if minus1 else fltnum
+            if to_decimal(viadim) > to_decimal(dim) and not no_exception:
+                raise ValueError(f"via_array,size:dim#{i}={dim} < {viadim}")
+        else:
+            raise ValueError("give at least 1: num_vias or size for each dim")
+    return cnum_vias
+
+
+@cache_primitive
 @cell
+@profile_memory
 def via_array(
     pdk: MappedPDK,
     glayer1: str,
@@ -226,19 +262,7 @@ def via_array(
     viadim = evaluate_bbox(viastack)[0]
     via_abs_spacing, top_enclosure = __get_viastack_minseperation(pdk, viastack, ordered_layer_info)
     # error check size and determine num_vias, cnum_vias[0]=x, cnum_vias[1]=y
-    cnum_vias = 2*[None]
-    for i in range(2):
-        if (num_vias[i] if num_vias else False):
-            cnum_vias[i] = num_vias[i]
-        elif (size[i] if size else False):
-            dim = pdk.snap_to_2xgrid(size[i],return_type="float")
-            fltnum = floor((dim - top_enclosure) / (via_abs_spacing)) or 1
-            fltnum = 1 if fltnum < 1 else fltnum
-            cnum_vias[i] = ((fltnum - 1) or 1) if minus1 else fltnum
-            if to_decimal(viadim) > to_decimal(dim) and not no_exception:
-                raise ValueError(f"via_array,size:dim#{i}={dim} < {viadim}")
-        else:
-            raise ValueError("give at least 1: num_vias or size for each dim")
+    cnum_vias = __via_array_num_vias(pdk, viadim, via_abs_spacing, top_enclosure, size, minus1, num_vias, no_exception)
     # create array
     viaarray_ref = prec_ref_center(prec_array(viastack, columns=cnum_vias[0], rows=cnum_vias[1], spacing=2*[via_abs_spacing],absolute_spacing=True))
     viaarray.add(viaarray_ref)
@@ -262,6 +286,111 @@ def via_array(
     return component_snap_to_grid(rename_ports_by_orientation(viaarray))
 
 
+@cell
+@profile_memory
+def via_array_ring(
+    pdk: MappedPDK,
+    enclosed_rectangle: tuple[float,float],
+    width: float,
+    glayer1: str = "active_tap",
+    horizontal_glayer: str = "met2",
+    vertical_glayer: str = "met1",
+) -> Component:
+    """the via arrays along the four sides of a rectangular ring (e.g. a tapring), centered at the origin
+    same geometry and ports as placing via_array(pdk, glayer1, horizontal_glayer, (enclosed_rectangle[0], via width), minus1=True)
+    at the north and south sides of the ring and the vertical_glayer array at the east and west sides,
+    but the via positions of every side are computed in one numpy pass and each side is added as one array reference
+    (hierarchical mode) or one batch of polygons per layer (flat mode) instead of one reference per via
+    args:
+    pdk: MappedPDK is the pdk to use
+    enclosed_rectangle: tuple is the (width, hieght) enclosed by the ring
+    width: width of the ring, the arrays are centered on the ring
+    glayer1: str is the glayer to start on (bottom of every array)
+    horizontal_glayer: str is the top glayer of the north and south arrays
+    vertical_glayer: str is the top glayer of the east and west arrays
+    ports:
+    N_..., E_..., S_..., W_... the via_array ports of each side (array_row#_col#_..., bottom_lay_..., top_met_...)
+    """
+    enclosed_rectangle = pdk.snap_to_2xgrid(enclosed_rectangle,return_type="float")
+    viaring = Component()
+    # distance from the ring center to the center of each side
+    side_offsets = [round(0.5 * (enclosed_rectangle[i] + width),4) for i in range(2)]
+    # prefix, top glayer, dim of the array along the ring, center of the array
+    sides = [
+        ("N_", horizontal_glayer, 0, (0, side_offsets[1])),
+        ("E_", vertical_glayer, 1, (side_offsets[0], 0)),
+        ("S_", horizontal_glayer, 0, (0, -side_offsets[1])),
+        ("W_", vertical_glayer, 1, (-side_offsets[0], 0)),
+    ]
+    arrays = dict()
+    for prefix, glayer2, along, center in sides:
+        if (glayer2, along) not in arrays:
+            ordered_layer_info = __error_check_order_layers(pdk, glayer1, glayer2)
+            bottom_glayer, top_glayer = ordered_layer_info[1]
+            viastack = via_stack(pdk, bottom_glayer, top_glayer)
+            viadim = evaluate_bbox(viastack)[0]
+            via_abs_spacing, top_enclosure = __get_viastack_minseperation(pdk, viastack, ordered_layer_info)
+            size = [viadim, viadim]
+            size[along] = enclosed_rectangle[along]
+            cnum_vias = __via_array_num_vias(pdk, viadim, via_abs_spacing, top_enclosure, size, True, None, False)
+            # via centers relative to the array center (prec_array followed by prec_ref_center)
+            via_xs = (np.arange(cnum_vias[0]) - (cnum_vias[0] - 1) / 2) * via_abs_spacing
+            via_ys = (np.arange(cnum_vias[1]) - (cnum_vias[1] - 1) / 2) * via_abs_spacing
+            # column major like prec_array (row index changes fastest)
+            via_centers = np.stack(np.meshgrid(via_xs, via_ys, indexing="ij"), axis=-1).reshape(-1, 2)
+            array_dims = [(cnum_vias[i] - 1) * via_abs_spacing + viadim for i in range(2)]
+            bottom_dim = evaluate_bbox(viastack.extract(layers=[pdk.get_glayer(bottom_glayer)]))[0]
+            arrays[(glayer2, along)] = {
+                "viastack": viastack,
+                "cnum_vias": cnum_vias,
+                "pitch": via_abs_spacing,
+                "via_centers": via_centers,
+                "via_names": [f"array_row{row}_col{col}_" for col in range(cnum_vias[0]) for row in range(cnum_vias[1])],
+                "bottom_size": [(cnum_vias[i] - 1) * via_abs_spacing + bottom_dim for i in range(2)],
+                "top_size": [max(size[i], array_dims[i]) for i in range(2)],
+                "glayers": (bottom_glayer, top_glayer),
+            }
+        array = arrays[(glayer2, along)]
+        viastack, offsets = array["viastack"], array["via_centers"] + np.array(center)
+        # vias
+        if hierarchical_output_enabled():
+            pitch = array["pitch"]
+            via_ref = viaring.add_array(viastack, columns=array["cnum_vias"][0], rows=array["cnum_vias"][1], spacing=(pitch, pitch))
+            via_ref.move(tuple(offsets[0]))
+        else:
+            for layer, polygons in viastack.get_polygons(by_spec=True).items():
+                for polygon in polygons:
+                    viaring.add_polygon(polygon[None, :, :] + offsets[:, None, :], layer=layer)
+        side_ports = dict()
+        via_ports = list(viastack.ports.values())
+        port_centers = np.array([port.center for port in via_ports])[None, :, :] + offsets[:, None, :]
+        for via_name, centers in zip(array["via_names"], port_centers):
+            for port, port_center in zip(via_ports, centers):
+                name = prefix + via_name + port.name
+                side_ports[name] = Port(
+                    name = name,
+                    center = port_center,
+                    orientation = port.orientation,
+                    parent = viaring,
+                    port_type = port.port_type,
+                    cross_section = port.cross_section,
+                    shear_angle = port.shear_angle,
+                    layer = port.layer,
+                    width = port.width,
+                )
+        # bottom layer and top met
+        for rect_prefix, rect_size, rect_glayer in [("bottom_lay_", array["bottom_size"], array["glayers"][0]), ("top_met_", array["top_size"], array["glayers"][1])]:
+            rect_ref = viaring << rectangle(size=rect_size, layer=pdk.get_glayer(rect_glayer), centered=True)
+            rect_ref.move(center)
+            for port in rect_ref.get_ports_list():
+                port = port.copy()
+                port.name = prefix + rename_ports_by_orientation__name(rect_prefix + port.name, port.orientation)
+                side_ports[port.name] = port
+        # same port order as adding the ports of a via_array reference
+        viaring.add_ports(sort_ports_clockwise(side_ports).values())
+    return maybe_flatten(viaring)
+
+
 if __name__ == "__main__":
     from .pdk.util.standard_main import pdk, parser
     from .pdk.util.custom_comp_utils import print_ports
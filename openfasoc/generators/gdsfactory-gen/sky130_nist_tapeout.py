@@ -4,7 +4,7 @@ sys.path.append('./pygen')
 
 from gdsfactory.read.import_gds import import_gds
 from gdsfactory.components import text_freetype, rectangle
-from pygen.pdk.util.comp_utils import prec_array, movey, align_comp_to_port
+from pygen.pdk.util.comp_utils import prec_array, movey, align_comp_to_port, evaluate_bbox
 from pygen.pdk.util.port_utils import add_ports_perimeter, print_ports
 from gdsfactory.component import Component
 from pygen.pdk.mappedpdk import MappedPDK
@@ -12,14 +12,23 @@ from pygen.opamp import opamp
 from pygen.L_route import L_route
 from pygen.straight_route import straight_route
 from pygen.via_gen import via_array
+from pygen.area_estimate import opamp_bbox_estimate, ESTIMATE_TOLERANCE
+from pygen.pdk.util.gds_archive import GDSArchive
+from pygen.pdk.util.memory_profile import set_memory_profile, write_memory_report, merge_memory_reports, format_memory_report
+from pygen.pdk.util.primitive_cache import set_primitive_cache, primitive_cache_stats, clear_primitive_cache
+from pygen.pdk.util.hierarchy import maybe_flatten, hierarchical_output, set_hierarchical_output, hierarchical_output_enabled, dedupe_gds
 from gdsfactory.cell import cell, clear_cache
 import numpy as np
-from subprocess import Popen
+from subprocess import Popen, STDOUT, TimeoutExpired
 from pathlib import Path
 from typing import Union, Optional
 from tempfile import TemporaryDirectory
-from shutil import copyfile, copytree
-from multiprocessing import Pool
+from shutil import copyfile, copytree, which
+from multiprocessing import Pool, get_context
+import hashlib
+import json
+import os
+import time
 import matplotlib.pyplot as plt
 from scipy.stats import norm
 from scipy.optimize import curve_fit
@@ -31,6 +40,12 @@ from sklearn.cluster import KMeans, AgglomerativeClustering
 from sklearn.metrics import silhouette_score
 import argparse
 from pygen.pdk.sky130_mapped import sky130_mapped_pdk as pdk
+from pex_cache import PEXCache
+from magic_extract import run_magic_extraction, netlist_names, MagicExtractionError
+from sweep_failures import FailureLog, SweepPointFailure, FAILURE_CLASSES, read_log_tail, traceback_tail, triage_report
+from sweep_queue import SweepQueue, run_worker
+from param_space import ParameterSpace, SAMPLING_METHODS
+from stats_incremental import IncrementalStatsModel, load_training_arrays, clean_training_rows
 
 
 # ====Build Opamp====
@@ -92,7 +107,7 @@ def sky130_opamp_add_pads(opamp_in: Component) -> Component:
 	opamp_wpads << straight_route(pdk, nanopad_array_ref.ports["row1_col1_nanopad_E"],pad_array_ref.ports["row1_col1_pad_S"],width=3)
 	#vddnanopad = opamp_wpads << nanopad
 	#opamp_wpads << nanopad
-	return opamp_wpads.flatten()
+	return maybe_flatten(opamp_wpads)
 
 
 def sky130_add_opamp_labels(opamp_in: Component) -> Component:
@@ -139,7 +154,7 @@ def sky130_add_opamp_labels(opamp_in: Component) -> Component:
 	for comp, prt in move_info:
 		compref = align_comp_to_port(comp, prt, alignment=('c','b'))
 		opamp_in.add(compref)
-	return opamp_in.flatten()
+	return maybe_flatten(opamp_in)
 
 def sky130_add_lvt_layer(opamp_in: Component) -> Component:
 	opamp_in.unlock()
@@ -304,21 +319,64 @@ def get_small_parameter_list(test_mode = False) -> np.array:
 						index = index + 1
 	return short_list
 
-
-
-def get_sim_results(acpath: Union[str,Path], dcpath: Union[str,Path], noisepath: Union[str,Path]):
+def get_parameter_list(
+	test_mode: bool = False,
+	space: Optional[Union[str,Path]] = None,
+	sampling: str = "grid",
+	num_points: int = 1000,
+	seed: Optional[int] = None,
+	max_area: Optional[float] = None,
+) -> np.array:
+	"""returns the parameters to sweep
+	args:
+	test_mode = use the test mode list of get_small_parameter_list (only without space)
+	space = yaml/json parameter space spec (see param_space.py and opamp_param_space.yaml), None uses get_small_parameter_list
+	sampling = grid, sobol, lhs, or random
+	num_points = number of points for sobol, lhs, and random sampling
+	seed = random seed of the sampler
+	max_area = area budget in um^2, points whose estimated bounding box is larger are dropped (see prune_by_estimated_area)
+	"""
+	if space is None:
+		params = get_small_parameter_list(test_mode)
+	else:
+		parameter_space = ParameterSpace.from_file(space)
+		if len(parameter_space.defaults) != len(opamp_parameters_serializer()):
+			raise ValueError("parameter space defaults must have one value per opamp parameter (" + str(len(opamp_parameters_serializer())) + ")")
+		params = parameter_space.sample(num_points, sampling, seed)
+	if max_area is not None:
+		params = prune_by_estimated_area(params, max_area)
+	return params
+
+def estimate_opamp_bbox(parameter_list: np.array) -> np.array:
+	"""returns the estimated (width, height) of the opamp bounding box for every row of parameter_list, shape (points, 2)
+	no layout is built, see pygen/area_estimate.py"""
+	parameter_list = np.atleast_2d(parameter_list)
+	return np.array([opamp_bbox_estimate(pdk, **opamp_parameters_de_serializer(parameters)) for parameters in parameter_list], dtype=np.float64).reshape(-1,2)
+
+def prune_by_estimated_area(parameter_list: np.array, max_area: float) -> np.array:
+	"""returns the rows of parameter_list whose estimated opamp bounding box area is at most max_area (um^2)
+	the estimate is shrunk by ESTIMATE_TOLERANCE first, so only points which are too large for certain are dropped"""
+	parameter_list = np.atleast_2d(parameter_list)
+	bboxes = estimate_opamp_bbox(parameter_list)
+	keep = np.prod(bboxes, axis=1) * (1 - ESTIMATE_TOLERANCE)**2 <= max_area
+	print("area budget " + str(max_area) + " um^2: kept " + str(int(keep.sum())) + " of " + str(len(parameter_list)) + " points")
+	return parameter_list[keep]
+
+
+def get_sim_results(acpath: Union[str,Path], dcpath: Union[str,Path], noisepath: Union[str,Path], line: int=0):
+	"""reads the results of one temperature (line of the wrdata files, in the order of {@@TEMPS})"""
 	acabspath = Path(acpath).resolve()
 	dcabspath = Path(dcpath).resolve()
 	noiseabspath = Path(noisepath).resolve()
-	with open(acabspath, "r") as ACReport:
-		RawAC = ACReport.readlines()[0]
-		ACColumns = [item for item in RawAC.split() if item]
-	with open(dcabspath, "r") as DCReport:
-		RawDC = DCReport.readlines()[0]
-		DCColumns = [item for item in RawDC.split() if item]
-	with open(noiseabspath, "r") as NoiseReport:
-		RawNoise = NoiseReport.readlines()[0]
-		NoiseColumns = [item for item in RawNoise.split() if item]
+	def read_columns(abspath: Path) -> Optional[list]:
+		if not abspath.is_file():
+			return None
+		with open(abspath, "r") as report:
+			lines = report.readlines()
+		return [item for item in lines[line].split() if item] if line < len(lines) else None
+	ACColumns = read_columns(acabspath)
+	DCColumns = read_columns(dcabspath)
+	NoiseColumns = read_columns(noiseabspath)
 	na = -987.654321
 	if ACColumns is None or len(ACColumns)<9:
 		return {"ugb":na,"biasVoltage1":na,"biasVoltage2":na,"phaseMargin":na,"dcGain":na,"power":na,"noise":na}
@@ -344,6 +402,22 @@ def get_sim_results(acpath: Union[str,Path], dcpath: Union[str,Path], noisepath:
 		return_dict[key] = val_flt
 	return return_dict
 
+def get_sim_results_multitemp(acpath: Union[str,Path], dcpath: Union[str,Path], noisepath: Union[str,Path], num_temps: int) -> list[dict]:
+	"""returns one get_sim_results dict per simulated temperature"""
+	return [get_sim_results(acpath, dcpath, noisepath, line=i) for i in range(num_temps)]
+
+def format_perf_eval_deck(deck: Union[str,Path], temperatures: list[float]) -> None:
+	"""fills in the temperature placeholders of opamp_perf_eval.sp in place
+	{@@TEMPS} is the list swept by the control block, {@@TEMP} (the .temp card) is set to the first temperature"""
+	if len(temperatures)==0:
+		raise ValueError("at least one temperature is required")
+	deck = Path(deck).resolve()
+	format_temp = lambda temp : format(float(temp),"g")
+	deck_text = deck.read_text()
+	deck_text = deck_text.replace("{@@TEMPS}", " ".join([format_temp(temp) for temp in temperatures]))
+	deck_text = deck_text.replace("{@@TEMP}", format_temp(temperatures[0]))
+	deck.write_text(deck_text)
+
 def standardize_netlist_subckt_def(netlist: Union[str,Path], sim_temperature: Optional[float] = float(27)):
 	netlist = Path(netlist).resolve()
 	if not netlist.is_file():
@@ -360,54 +434,180 @@ def standardize_netlist_subckt_def(netlist: Union[str,Path], sim_temperature: Op
 	with open(netlist, "w") as spice_net:
 		spice_net.writelines(subckt_lines)
 
-def __run_single_brtfrc(index, parameters_ele, output_dir: Optional[Union[str,Path]] = None):
-	# generate layout
+# extraction cache shared by all workers, None disables caching
+PEX_CACHE = None
+
+# temperatures simulated for every point (all in one ngspice run)
+SIM_TEMPS = [float(27)]
+
+# records failed sweep points and retries them, None raises failures as exceptions
+FAILURE_LOG = None
+
+# seconds before a ngspice run is killed, None means no limit
+SIM_TIMEOUT = None
+
+# archive which stores the layout of every point instead of save_gds_dir/<index>.gds, None writes files
+GDS_ARCHIVE = None
+
+# set in workers of a warm pool (see warm_worker_pool), workers report the build time of their first point to it
+WARM_POOL_QUEUE = None
+
+def enable_gds_archive(archive_path: Union[str,Path] = "./save_gds_by_index.gdsar") -> GDSArchive:
+	"""stores sweep layouts as compressed, deduplicated members of one archive file (see pygen/pdk/util/gds_archive.py)"""
+	global GDS_ARCHIVE
+	GDS_ARCHIVE = GDSArchive(archive_path)
+	return GDS_ARCHIVE
+
+def enable_failure_log(failure_dir: Union[str,Path] = "./sweep_failures", keep_per_class: int = 3, retry_policy: Optional[dict[str,int]] = None) -> FailureLog:
+	"""records failed sweep points in failure_dir and retries them according to retry_policy (see sweep_failures.py)"""
+	global FAILURE_LOG
+	FAILURE_LOG = FailureLog(failure_dir, keep_per_class, retry_policy)
+	return FAILURE_LOG
+
+def enable_pex_cache(cache_dir: Union[str,Path] = "./pex_cache") -> PEXCache:
+	"""enables reuse of extracted netlists for byte identical layouts
+	the key includes the extraction script and the magic setup files so editing them invalidates the cache"""
+	global PEX_CACHE
+	PEX_CACHE = PEXCache(cache_dir, setup_files=["magic_extract.py","sky130A/sky130A.magicrc","sky130A/sky130A_setup.tcl"], settings={"mode": "pex", "pex_options": "merge"})
+	return PEX_CACHE
+
+def __build_opamp_layout(index, parameters_ele, tmpdirname: Union[str,Path]) -> tuple[Path,float]:
+	"""builds the opamp, writes opamp.gds to tmpdirname, and saves a copy to save_gds_dir (or GDS_ARCHIVE)
+	returns (gds path, opamp area)"""
 	global pdk
 	global save_gds_dir
-	global SIM_TEMP
 	destination_gds_copy = save_gds_dir / (str(index)+".gds")
 	sky130pdk = pdk
 	params = opamp_parameters_de_serializer(parameters_ele)
+	start_time = time.time()
 	opamp_v = sky130_add_opamp_labels(opamp(sky130pdk, **params))
 	opamp_v.name = "opamp"
+	__report_first_point(time.time() - start_time)
 	area = float(opamp_v.area())
-	# use temp dir
-	with TemporaryDirectory() as tmpdirname:
-		tmp_gds_path = Path(opamp_v.write_gds(gdsdir=tmpdirname)).resolve()
-		if tmp_gds_path.is_file():
+	tmp_gds_path = Path(opamp_v.write_gds(gdsdir=tmpdirname)).resolve()
+	# no-op unless memory profiling is enabled, every worker keeps its memory_<pid>.json up to date
+	write_memory_report()
+	if tmp_gds_path.is_file():
+		# generators create many identical cells (vias, fingers) under different names, merge them before saving/extracting
+		if hierarchical_output_enabled():
+			dedupe_gds(tmp_gds_path)
+		if GDS_ARCHIVE:
+			GDS_ARCHIVE.add(index, tmp_gds_path, str(index)+".gds")
+		else:
 			destination_gds_copy.write_bytes(tmp_gds_path.read_bytes())
-		copyfile("extract.bash",str(tmpdirname)+"/extract.bash")
+	return tmp_gds_path, area
+
+def __extract_opamp(index, tmp_gds_path: Union[str,Path], tmpdirname: Union[str,Path]) -> None:
+	"""writes opamp_pex.spice to tmpdirname (extracted by magic or copied from the PEX cache)"""
+	copytree("sky130A",str(tmpdirname)+"/sky130A")
+	# extract layout (or reuse the netlist of an identical layout)
+	pex_netlist = netlist_names("opamp", "pex")["pex"]
+	pex_key = PEX_CACHE.key(tmp_gds_path, "opamp", pex_netlist) if PEX_CACHE else None
+	if not (PEX_CACHE and PEX_CACHE.fetch(pex_key, pex_netlist, tmpdirname)):
+		run_magic_extraction(tmp_gds_path, "opamp", mode="pex", work_dir=tmpdirname)
+		if PEX_CACHE:
+			PEX_CACHE.store(pex_key, str(tmpdirname)+"/"+pex_netlist, {"index": index})
+
+def __build_and_extract_opamp(index, parameters_ele, tmpdirname: Union[str,Path]) -> float:
+	"""builds the opamp, saves a copy of the gds to save_gds_dir, and writes opamp_pex.spice to tmpdirname
+	returns the opamp area"""
+	tmp_gds_path, area = __build_opamp_layout(index, parameters_ele, tmpdirname)
+	__extract_opamp(index, tmp_gds_path, tmpdirname)
+	return area
+
+def __failed_sweep_results() -> np.array:
+	"""results of a point which did not get to simulation, same shape as a simulated point"""
+	results = np.tile(opamp_results_serializer(), (len(SIM_TEMPS),1))
+	return results[0] if len(SIM_TEMPS)==1 else results
+
+def __run_single_brtfrc_attempt(index, parameters_ele, tmpdirname: Union[str,Path]) -> tuple[np.array,Optional[SweepPointFailure]]:
+	"""one try of a sweep point in tmpdirname
+	returns (results, failure) where failure describes a simulation which ran but did not give usable results
+	raises SweepPointFailure naming the stage if the layout, extraction, or simulation raised"""
+	global SIM_TEMPS
+	# generate layout
+	try:
+		tmp_gds_path, area = __build_opamp_layout(index, parameters_ele, tmpdirname)
+	except Exception as cause:
+		# drop the components cached by the failed build so the next points of this worker can reuse the memory
+		if isinstance(cause, MemoryError):
+			clear_cache()
+			clear_primitive_cache()
+		raise SweepPointFailure("layout", cause, traceback_tail()) from cause
+	# extract
+	try:
+		__extract_opamp(index, tmp_gds_path, tmpdirname)
+	except MagicExtractionError as cause:
+		raise SweepPointFailure("extraction", cause, read_log_tail(cause.log_path) if cause.log_path else "") from cause
+	except Exception as cause:
+		raise SweepPointFailure("extraction", cause, traceback_tail()) from cause
+	# run sim (all temperatures in one ngspice run), the ngspice output is kept in ngspice.log
+	sim_log_path = str(tmpdirname)+"/ngspice.log"
+	failure = None
+	try:
 		copyfile("opamp_perf_eval.sp",str(tmpdirname)+"/opamp_perf_eval.sp")
-		copytree("sky130A",str(tmpdirname)+"/sky130A")
-		# extract layout
-		Popen(["bash","extract.bash", tmp_gds_path, opamp_v.name],cwd=tmpdirname).wait()
-		print("Running simulation at temperature: " + str(SIM_TEMP) + "C")
-		spice_lines = list()
-		with open(str(tmpdirname)+"/opamp_perf_eval.sp", "r") as spice_file:
-			spice_lines = spice_file.readlines()
-			print("BEFORE REPL: " + spice_lines[5])
-			spice_lines[5] = spice_lines[5].replace('{@@TEMP}', str(int(SIM_TEMP)))
-			print("AFTER REPL: " + spice_lines[5])
-		with open(str(tmpdirname)+"/opamp_perf_eval.sp", "w") as spice_file:
-			spice_file.writelines(spice_lines)
-		standardize_netlist_subckt_def(str(tmpdirname)+"/opamp_pex.spice", SIM_TEMP)
-		# run sim and store result
-		Popen(["ngspice","-b","opamp_perf_eval.sp"],cwd=tmpdirname).wait()
-		result_dict = get_sim_results(str(tmpdirname)+"/result_ac.txt", str(tmpdirname)+"/result_power.txt", str(tmpdirname)+"/result_noise.txt")
+		print("Running simulation at temperature(s): " + str(SIM_TEMPS) + "C")
+		format_perf_eval_deck(str(tmpdirname)+"/opamp_perf_eval.sp", SIM_TEMPS)
+		standardize_netlist_subckt_def(str(tmpdirname)+"/opamp_pex.spice", SIM_TEMPS[0])
+		with open(sim_log_path, "w") as sim_log:
+			simulation = Popen(["ngspice","-b","opamp_perf_eval.sp"],cwd=tmpdirname,stdout=sim_log,stderr=STDOUT)
+			try:
+				returncode = simulation.wait(timeout=SIM_TIMEOUT)
+			except TimeoutExpired as cause:
+				simulation.kill()
+				simulation.wait()
+				failure = SweepPointFailure("simulation", cause, read_log_tail(sim_log_path))
+				returncode = None
+	except Exception as cause:
+		raise SweepPointFailure("simulation", cause, traceback_tail()) from cause
+	# store result
+	result_dicts = get_sim_results_multitemp(str(tmpdirname)+"/result_ac.txt", str(tmpdirname)+"/result_power.txt", str(tmpdirname)+"/result_noise.txt", len(SIM_TEMPS))
+	for result_dict in result_dicts:
 		result_dict["area"] = area
-		results = opamp_results_serializer(**result_dict)
-		if output_dir: 
-			output_dir = Path(output_dir).resolve()
-			if not output_dir.is_dir():
-				raise ValueError("Output directory must be a directory")
-			copytree(str(tmpdirname), str(output_dir)+"/test_output", dirs_exist_ok=True)
-		return results
-
-def brute_force_full_layout_and_PEXsim(sky130pdk: MappedPDK, parameter_list: np.array) -> np.array:
+	results = np.array([opamp_results_serializer(**result_dict) for result_dict in result_dicts])
+	if failure is None and returncode != 0:
+		failure = SweepPointFailure("simulation", None, read_log_tail(sim_log_path), "simulation_error", "ngspice exited with code " + str(returncode))
+	elif failure is None and np.any(opamp_results_failed(results)):
+		failed_temps = [SIM_TEMPS[i] for i in np.where(opamp_results_failed(results))[0]]
+		failure = SweepPointFailure("results", None, read_log_tail(sim_log_path), "measurement_failed", "no usable results at temperature(s) " + str(failed_temps))
+	# single temperature keeps the original (8,) shape, multiple temperatures return (num_temps, 8)
+	results = results[0] if len(SIM_TEMPS)==1 else results
+	return results, failure
+
+def __run_single_brtfrc(index, parameters_ele, output_dir: Optional[Union[str,Path]] = None):
+	"""builds, extracts, and simulates one sweep point
+	with a FAILURE_LOG failures are recorded and retried according to its retry policy and failed points return
+	-987.654321 results, without one exceptions are raised as before"""
+	attempt = 0
+	while True:
+		# use temp dir
+		with TemporaryDirectory() as tmpdirname:
+			try:
+				results, failure = __run_single_brtfrc_attempt(index, parameters_ele, tmpdirname)
+			except SweepPointFailure as raised:
+				if FAILURE_LOG is None:
+					raise raised.cause if raised.cause is not None else raised
+				results, failure = __failed_sweep_results(), raised
+			if failure is not None and FAILURE_LOG is not None:
+				will_retry = FAILURE_LOG.should_retry(failure, attempt)
+				FAILURE_LOG.record(failure, index, parameters_ele, attempt, will_retry, tmpdirname)
+				print("point " + str(index) + ": " + str(failure) + (" (retrying)" if will_retry else ""))
+				if will_retry:
+					attempt += 1
+					continue
+			if output_dir: 
+				output_dir = Path(output_dir).resolve()
+				if not output_dir.is_dir():
+					raise ValueError("Output directory must be a directory")
+				copytree(str(tmpdirname), str(output_dir)+"/test_output", dirs_exist_ok=True)
+			return results
+
+def brute_force_full_layout_and_PEXsim(sky130pdk: MappedPDK, parameter_list: np.array, warm_pool: bool = False) -> np.array:
 	"""runs the brute force testing of parameters by
 	1-constructing the opamp layout specfied by parameters
 	2-extracting the netlist for the opamp
 	3-running simulations on the opamp
+	warm_pool = build the primitives shared by all points once before forking the workers (see warm_worker_pool)
 	returns the ugb of the opamps
 	"""
 	if sky130pdk.name != "sky130":
@@ -422,18 +622,166 @@ def brute_force_full_layout_and_PEXsim(sky130pdk: MappedPDK, parameter_list: np.
 	global save_gds_dir
 	save_gds_dir = Path('./save_gds_by_index').resolve()
 	save_gds_dir.mkdir(parents=True)
-	with Pool(120) as cores:
+	cores, warm_report = warm_worker_pool(sky130pdk, 120, warm_points(parameter_list)) if warm_pool else (Pool(120), None)
+	with cores:
 		results = np.array(cores.starmap(__run_single_brtfrc, enumerate(parameter_list)),np.float64)
+	if warm_report:
+		print(warm_pool_report(warm_report))
 	# undo pdk modification
 	sky130pdk.default_decorator = add_npc_decorator
+	if PEX_CACHE:
+		print("PEX cache: " + str(PEX_CACHE.stats()))
+	if GDS_ARCHIVE:
+		print("GDS archive: " + str(GDS_ARCHIVE.stats()))
+	if FAILURE_LOG:
+		print(triage_report(FAILURE_LOG.failure_dir, top=5))
+	if os.environ.get("PYGEN_MEMORY_REPORT_DIR"):
+		print(format_memory_report(merge_memory_reports(sorted(Path(os.environ["PYGEN_MEMORY_REPORT_DIR"]).glob("memory_*.json"))), top=10))
 	return results
 
 
-def get_training_data(test_mode=True,):
-	params = get_small_parameter_list(test_mode)
-	results = brute_force_full_layout_and_PEXsim(pdk, params)
+def get_training_data(test_mode=True, space: Optional[Union[str,Path]] = None, sampling: str = "grid", num_points: int = 1000, seed: Optional[int] = None, max_area: Optional[float] = None, warm_pool: bool = False):
+	"""runs the sweep and saves training_params.npy and training_results.npy
+	the swept points come from get_small_parameter_list or from a parameter space file, see get_parameter_list
+	with several SIM_TEMPS the results have shape (points, temperatures, 8) and the temperatures are saved to training_temps.npy"""
+	params = get_parameter_list(test_mode, space, sampling, num_points, seed, max_area)
+	results = brute_force_full_layout_and_PEXsim(pdk, params, warm_pool)
 	np.save("training_params.npy",params)
 	np.save("training_results.npy",results)
+	if len(SIM_TEMPS) > 1:
+		np.save("training_temps.npy",np.array(SIM_TEMPS,dtype=np.float64))
+
+
+# ====Warm Worker Pool====
+# pool workers are forked from the main process, with warm_pool the main process first enables the primitive cache
+# (see pygen/pdk/util/primitive_cache.py), activates the pdk, and builds a few points, so every worker starts with the
+# primitives which all points share (pmos section multipliers, via stacks, ...) already built and shared copy on write
+
+
+__FIRST_POINT_REPORTED = False
+
+def __report_first_point(build_seconds: float) -> None:
+	global __FIRST_POINT_REPORTED
+	if WARM_POOL_QUEUE is not None and not __FIRST_POINT_REPORTED:
+		__FIRST_POINT_REPORTED = True
+		WARM_POOL_QUEUE.put((os.getpid(), "first_point", build_seconds))
+
+def __init_warm_worker(queue, fork_time: float) -> None:
+	global WARM_POOL_QUEUE
+	WARM_POOL_QUEUE = queue
+	queue.put((os.getpid(), "ready", time.time() - fork_time))
+
+def warm_points(parameter_list: np.array) -> np.array:
+	"""returns the first point of parameter_list for every rmult in it, the pmos section primitives only depend on rmult"""
+	parameter_list = np.atleast_2d(parameter_list)
+	first_rows = np.unique(parameter_list[:,17], return_index=True)[1]
+	return parameter_list[np.sort(first_rows)]
+
+def warm_worker_pool(sky130pdk: MappedPDK, processes: int, warm_params: np.array) -> tuple:
+	"""enables the primitive cache (transistors included), builds the opamps of warm_params in this process, then forks a Pool of processes workers
+	args:
+	sky130pdk = pdk used by the workers (activated before forking)
+	processes = number of workers
+	warm_params = serialized opamp parameters built before forking, the set of warmed primitives (see warm_points)
+	returns (pool, report), print warm_pool_report(report) after the pool is done
+	"""
+	# the pmos section multipliers are the primitives worth sharing, so transistors are cached as well
+	set_primitive_cache(True, include_large=True)
+	start_time = time.time()
+	sky130pdk.activate()
+	report = {"activate_seconds": time.time() - start_time, "warm_point_seconds": list()}
+	for parameters in np.atleast_2d(warm_params):
+		start_time = time.time()
+		sky130_add_opamp_labels(opamp(sky130pdk, **opamp_parameters_de_serializer(parameters)))
+		report["warm_point_seconds"].append(time.time() - start_time)
+	report["cached_primitives"] = primitive_cache_stats()["entries"]
+	fork_context = get_context("fork")
+	report["queue"] = fork_context.SimpleQueue()
+	pool = fork_context.Pool(processes, initializer=__init_warm_worker, initargs=(report["queue"], time.time()))
+	return pool, report
+
+def warm_pool_report(report: dict) -> str:
+	"""summarizes the startup time and the first point build time of the workers of a warm_worker_pool
+	the first point built in the main process is a cold build, the difference to the first point of the workers is the
+	latency saved per worker (the points differ, so this is an estimate)"""
+	ready, first_point = dict(), dict()
+	while not report["queue"].empty():
+		pid, event, seconds = report["queue"].get()
+		(ready if event == "ready" else first_point)[pid] = seconds
+	cold_seconds = report["warm_point_seconds"][0] if report["warm_point_seconds"] else None
+	lines = ["warm pool: activated the pdk in " + format(report["activate_seconds"],".3f") + " s, built " + str(len(report["warm_point_seconds"])) + " warm point(s) in " + format(sum(report["warm_point_seconds"]),".1f") + " s, " + str(report["cached_primitives"]) + " primitives cached"]
+	if ready:
+		lines.append(str(len(ready)) + " workers ready " + format(np.mean(list(ready.values())),".3f") + " s (max " + format(max(ready.values()),".3f") + " s) after forking, without import or pdk setup")
+	if first_point:
+		mean_first = float(np.mean(list(first_point.values())))
+		lines.append("first point per worker " + format(mean_first,".1f") + " s" + ("" if cold_seconds is None else " vs " + format(cold_seconds,".1f") + " s cold, " + format(cold_seconds - mean_first,".1f") + " s saved per worker"))
+	return "\n".join(lines)
+
+
+# ====Distributed Sweep====
+# the sweep can also be run from a sqlite work queue, any number of worker processes (on this machine or on
+# other machines which see the queue file) pull parameter indices until the sweep is done, see sweep_queue.py
+
+
+def init_sweep_queue(db_path: Union[str,Path] = "./sweep_queue.db", test_mode: bool = False, lease_seconds: float = 1800, max_attempts: int = 3, params: Optional[np.array] = None) -> SweepQueue:
+	"""creates a work queue holding params (default: the parameters of get_small_parameter_list)
+	SIM_TEMPS is stored in the queue so every worker simulates the same temperatures"""
+	params = get_small_parameter_list(test_mode) if params is None else params
+	queue = SweepQueue.create(db_path, params, lease_seconds, max_attempts, metadata={"sim_temps": np.array(SIM_TEMPS,dtype=np.float64)})
+	print("created sweep queue " + str(queue.db_path) + " with " + str(len(params)) + " jobs")
+	return queue
+
+def __sweep_worker_process(db_path: Union[str,Path]) -> int:
+	return run_worker(db_path, __run_single_brtfrc)
+
+def run_sweep_worker(db_path: Union[str,Path] = "./sweep_queue.db", processes: int = 1, warm_pool: bool = False) -> int:
+	"""builds, extracts, and simulates opamps from the queue until it is empty
+	args:
+	db_path = queue created by init_sweep_queue
+	processes = number of worker processes to start on this machine
+	warm_pool = build the default opamp (rmult 1 and 2) before forking the workers so they share its primitives (see warm_worker_pool)
+	returns the number of jobs completed by this machine
+	"""
+	global pdk
+	global save_gds_dir
+	global SIM_TEMPS
+	queue = SweepQueue(db_path)
+	SIM_TEMPS = [float(temp) for temp in np.atleast_1d(queue.get_metadata("sim_temps"))]
+	# same pdk setup as brute_force_full_layout_and_PEXsim
+	pdk.default_decorator = None
+	pdk.activate()
+	save_gds_dir = Path('./save_gds_by_index').resolve()
+	save_gds_dir.mkdir(parents=True, exist_ok=True)
+	warm_report = None
+	if processes > 1:
+		cores, warm_report = warm_worker_pool(pdk, processes, [opamp_parameters_serializer(rmult=rmult) for rmult in (1,2)]) if warm_pool else (Pool(processes), None)
+		with cores:
+			completed = sum(cores.map(__sweep_worker_process, processes*[str(queue.db_path)]))
+	else:
+		if warm_pool:
+			set_primitive_cache(True, include_large=True)
+		completed = __sweep_worker_process(queue.db_path)
+	if warm_report:
+		print(warm_pool_report(warm_report))
+	print("completed " + str(completed) + " jobs, queue: " + str(queue.progress()))
+	if PEX_CACHE:
+		print("PEX cache: " + str(PEX_CACHE.stats()))
+	if GDS_ARCHIVE:
+		print("GDS archive: " + str(GDS_ARCHIVE.stats()))
+	if FAILURE_LOG:
+		print(triage_report(FAILURE_LOG.failure_dir, top=5))
+	return completed
+
+def merge_sweep_queue(db_path: Union[str,Path] = "./sweep_queue.db", allow_partial: bool = False) -> None:
+	"""saves the queue results as training_params.npy and training_results.npy (same files as get_training_data)"""
+	queue = SweepQueue(db_path)
+	params, results = queue.merge("training_params.npy", "training_results.npy", allow_partial)
+	sim_temps = np.atleast_1d(queue.get_metadata("sim_temps"))
+	if len(sim_temps) > 1:
+		np.save("training_temps.npy",sim_temps)
+	for index, attempts, error in queue.failures():
+		print("job " + str(index) + " failed after " + str(attempts) + " attempt(s): " + error.strip().splitlines()[-1])
+	print("merged " + str(len(params)) + " points, queue: " + str(queue.progress()))
 
 
 #util function for pure simulation
@@ -449,6 +797,635 @@ def single_build_and_simulation(parameters: np.array, output_dir: Optional[Union
 	return __run_single_brtfrc(index, parameters, output_dir)
 
 
+# ====Hierarchical Output====
+# generators flatten every level by default. in hierarchical mode (see pygen/pdk/util/hierarchy.py) unique subcells are
+# kept as gds cells placed by references, magic still extracts a flat netlist because magic_extract flattens the top cell
+
+
+def layout_xor_area(gds_a: Union[str,Path], gds_b: Union[str,Path]) -> dict[tuple[int,int],float]:
+	"""returns {(layer, datatype): area} of the xor of the flattened top cells of two gds files, only nonzero layers"""
+	import gdstk
+	flat_polygons = list()
+	for gds in (gds_a, gds_b):
+		top = gdstk.read_gds(str(gds)).top_level()[0].copy("xor_flat", deep_copy=True)
+		top.flatten()
+		by_layer = dict()
+		for polygon in top.polygons:
+			by_layer.setdefault((polygon.layer, polygon.datatype), list()).append(polygon)
+		flat_polygons.append(by_layer)
+	xor_area = dict()
+	for layer in set(flat_polygons[0]) | set(flat_polygons[1]):
+		area = sum(polygon.area() for polygon in gdstk.boolean(flat_polygons[0].get(layer, []), flat_polygons[1].get(layer, []), "xor", precision=1e-4))
+		if area > 0:
+			xor_area[layer] = area
+	return xor_area
+
+
+def __time_extraction(gds_path: Path) -> float:
+	with TemporaryDirectory() as tmpdirname:
+		copytree("sky130A", str(tmpdirname)+"/sky130A")
+		start_time = time.time()
+		run_magic_extraction(gds_path, "opamp", mode="pex", work_dir=tmpdirname)
+		return time.time() - start_time
+
+
+def compare_hierarchy_output(parameter_list: Optional[np.array] = None, output_dir: Union[str,Path] = "./hierarchy_compare", extract: bool = True) -> dict:
+	"""builds opamps with flat output, hierarchical output, and hierarchical output with identical cells merged (dedupe_gds)
+	and compares gds size, cell count, build/write time, and (if magic is installed and extract=True) magic extraction time
+	args:
+	parameter_list = serialized opamp parameters, one row per opamp (default: opamp_parameters_serializer defaults)
+	output_dir = where the layouts of every point (<index>_flat.gds, ...) and comparison.json are saved
+	returns {mode: {stat: total over all points}, "merged_cells": cells merged by dedupe, "xor_area": total area which differs from flat}
+	****NOTE: intermediate grid snapping happens at different levels, so flat and hierarchical layouts can differ by single grid steps.
+	merging identical cells never changes the layout
+	"""
+	output_dir = Path(output_dir).resolve()
+	output_dir.mkdir(parents=True, exist_ok=True)
+	parameter_list = np.atleast_2d(opamp_parameters_serializer() if parameter_list is None else parameter_list)
+	extract = extract and which(os.environ.get("MAGIC", "magic")) is not None
+	modes = ("flat", "hierarchical", "deduplicated")
+	comparison = {mode: {"build_seconds": 0.0, "write_seconds": 0.0, "gds_bytes": 0, "cells": 0} for mode in modes}
+	comparison["merged_cells"] = 0
+	comparison["xor_area"] = 0.0
+	for index, parameters in enumerate(parameter_list):
+		gds_paths = {mode: output_dir / (str(index) + "_" + mode + ".gds") for mode in modes}
+		for mode in ("flat", "hierarchical"):
+			with hierarchical_output(mode == "hierarchical"):
+				clear_cache()
+				start_time = time.time()
+				opamp_v = sky130_add_opamp_labels(opamp(pdk, **opamp_parameters_de_serializer(parameters)))
+				opamp_v.name = "opamp"
+				build_seconds = time.time() - start_time
+				comparison[mode]["build_seconds"] += build_seconds
+				start_time = time.time()
+				opamp_v.write_gds(gds_paths[mode])
+				write_seconds = time.time() - start_time
+				comparison[mode]["write_seconds"] += write_seconds
+				comparison[mode]["cells"] += len(opamp_v.get_dependencies(recursive=True)) + 1
+		clear_cache()
+		# dedupe runs on the written hierarchical gds, so its write time includes the hierarchical write
+		start_time = time.time()
+		counts = dedupe_gds(gds_paths["hierarchical"], gds_paths["deduplicated"])
+		comparison["deduplicated"]["build_seconds"] += build_seconds
+		comparison["deduplicated"]["write_seconds"] += write_seconds + time.time() - start_time
+		comparison["deduplicated"]["cells"] += counts["cells_after"]
+		comparison["merged_cells"] += counts["merged"]
+		for mode in modes:
+			comparison[mode]["gds_bytes"] += gds_paths[mode].stat().st_size
+			if extract:
+				comparison[mode]["extract_seconds"] = comparison[mode].get("extract_seconds", 0.0) + __time_extraction(gds_paths[mode])
+		comparison["xor_area"] += sum(layout_xor_area(gds_paths["flat"], gds_paths["deduplicated"]).values())
+	with open(output_dir / "comparison.json", "w") as comparison_file:
+		json.dump(comparison, comparison_file, indent=2)
+	print(str(len(parameter_list)) + " opamps, totals:")
+	print("".ljust(16) + "".join(mode.rjust(14) for mode in modes))
+	for key in comparison["flat"]:
+		row = [comparison[mode][key] for mode in modes]
+		print(key.ljust(16) + "".join(str(round(value, 3)).rjust(14) for value in row) + ("  (" + " / ".join(str(round(value / row[0], 3)) + "x" for value in row[1:]) + ")" if row[0] else ""))
+	if not extract:
+		print("extraction not timed (magic not found or --no-extract)")
+	print("dedupe merged " + str(comparison["merged_cells"]) + " cells, layouts differ from flat by " + str(round(comparison["xor_area"], 4)) + " um^2")
+	return comparison
+
+
+def compare_area_estimate(parameter_list: Optional[np.array] = None) -> dict:
+	"""builds opamps and compares the bounding box of the layout with the analytic estimate of pygen/area_estimate.py
+	args:
+	parameter_list = serialized opamp parameters, one row per opamp (default: opamp_parameters_serializer defaults)
+	returns {"errors": (points, 2) relative width/height errors (estimate - built)/built, "max_error": largest abs error,
+	"build_seconds": total layout time, "estimate_seconds": total estimate time}
+	max_error should stay below ESTIMATE_TOLERANCE, otherwise the estimate no longer follows the generators
+	"""
+	parameter_list = np.atleast_2d(opamp_parameters_serializer() if parameter_list is None else parameter_list)
+	start_time = time.time()
+	estimates = estimate_opamp_bbox(parameter_list)
+	estimate_seconds = time.time() - start_time
+	built = np.empty_like(estimates)
+	start_time = time.time()
+	for index, parameters in enumerate(parameter_list):
+		built[index] = evaluate_bbox(opamp(pdk, **opamp_parameters_de_serializer(parameters)))
+		clear_cache()
+	build_seconds = time.time() - start_time
+	errors = (estimates - built) / built
+	for index in range(len(parameter_list)):
+		print(str(index) + ": built " + " x ".join(format(dim,".3f") for dim in built[index]) + ", estimate " + " x ".join(format(dim,".3f") for dim in estimates[index]) + ", error " + " ".join(format(error,"+.4f") for error in errors[index]))
+	max_error = float(np.max(np.abs(errors)))
+	print("max relative error " + format(max_error,".4f") + " (tolerance " + str(ESTIMATE_TOLERANCE) + "), estimate " + format(estimate_seconds,".3f") + " s vs build " + format(build_seconds,".1f") + " s")
+	return {"errors": errors, "max_error": max_error, "build_seconds": build_seconds, "estimate_seconds": estimate_seconds}
+
+
+# ====Corners and Monte Carlo====
+# every design point is extracted once, then each process corner is simulated in its own ngspice run
+# (all corners run at the same time) and every run loops over the mismatch samples with mc_source.
+# the bias voltages are held at the nominal optimum found by opamp_perf_eval.sp
+
+
+PROCESS_CORNERS = ("tt","ff","ss","fs","sf")
+# columns of the variation samples, names match opamp_results_de_serializer
+VARIATION_RESULT_NAMES = ("ugb","dcGain","phaseMargin","power","noise")
+
+def format_variation_deck(
+	deck: Union[str,Path],
+	corner: str,
+	num_samples: int,
+	bias1: float,
+	bias2: float,
+	temperature: float = float(27),
+	mismatch: bool = True,
+	seed: int = 1,
+) -> None:
+	"""fills in the placeholders of opamp_variation_eval.sp in place
+	args:
+	corner = one of PROCESS_CORNERS
+	num_samples = number of mismatch samples simulated in the run
+	bias1, bias2 = fixed bias voltages
+	mismatch = use the <corner>_mm library section so every sample draws new device mismatch
+	seed = sample i uses seed+i, so runs are reproducible
+	"""
+	if corner not in PROCESS_CORNERS:
+		raise ValueError("corner must be one of " + str(PROCESS_CORNERS))
+	if num_samples < 1:
+		raise ValueError("at least one sample is required")
+	deck = Path(deck).resolve()
+	replacements = {
+		"{@@CORNER_LIB}": corner + ("_mm" if mismatch else ""),
+		"{@@CORNER}": corner,
+		"{@@SAMPLES}": str(int(num_samples)),
+		"{@@SEED}": str(int(seed)),
+		"{@@B1}": format(float(bias1),"g"),
+		"{@@B2}": format(float(bias2),"g"),
+		"{@@TEMP}": format(float(temperature),"g"),
+	}
+	deck_text = deck.read_text()
+	for placeholder, value in replacements.items():
+		deck_text = deck_text.replace(placeholder, value)
+	deck.write_text(deck_text)
+
+def get_variation_results(acpath: Union[str,Path], noisepath: Union[str,Path], num_samples: int) -> np.array:
+	"""reads the wrdata files of opamp_variation_eval.sp
+	returns (num_samples, 5) array with columns VARIATION_RESULT_NAMES, missing samples are -987.654321"""
+	na = -987.654321
+	samples = np.full((num_samples, len(VARIATION_RESULT_NAMES)), na, dtype=np.float64)
+	def read_lines(path: Union[str,Path]) -> list[list[str]]:
+		path = Path(path).resolve()
+		if not path.is_file():
+			return list()
+		with open(path, "r") as report:
+			return [line.split() for line in report.readlines()[:num_samples]]
+	def to_float(columns: list[str], col: int) -> float:
+		try:
+			return float(columns[col])
+		except (IndexError, ValueError):
+			return na
+	# wrdata writes (scale, value) pairs, values are in the odd columns
+	for i, columns in enumerate(read_lines(acpath)):
+		samples[i,0] = to_float(columns, 1)# ugb
+		samples[i,2] = to_float(columns, 3)# phaseMargin
+		samples[i,1] = to_float(columns, 5)# dcGain
+		samples[i,3] = to_float(columns, 7)# power
+	for i, columns in enumerate(read_lines(noisepath)):
+		samples[i,4] = to_float(columns, 1)
+	return samples
+
+def summarize_variation(samples: np.array, spec: Optional[list[tuple[str,str,float]]] = None) -> dict:
+	"""returns mean, sigma, min, and max of every result and the yield against spec
+	args:
+	samples = (num_samples, 5) array from get_variation_results
+	spec = list of (result name, ">=" or "<=", value), e.g. [("ugb",">=",1e7),("phaseMargin",">=",60)]
+	****NOTE: failed samples count as failing the spec, with no spec the yield is the fraction of samples which simulated
+	"""
+	samples = np.atleast_2d(samples)
+	valid = ~opamp_results_failed(samples)
+	passing = valid.copy()
+	for name, relation, value in (spec or list()):
+		if name not in VARIATION_RESULT_NAMES:
+			raise ValueError("spec result must be one of " + str(VARIATION_RESULT_NAMES))
+		if relation not in (">=","<="):
+			raise ValueError("spec relation must be >= or <=")
+		column = samples[:,VARIATION_RESULT_NAMES.index(name)]
+		passing &= (column >= value) if relation==">=" else (column <= value)
+	summary = {"samples": int(len(samples)), "valid_samples": int(np.sum(valid)), "yield": float(np.mean(passing)) if len(samples) else 0.0}
+	for col, name in enumerate(VARIATION_RESULT_NAMES):
+		values = samples[valid,col]
+		summary[name] = {
+			"mean": float(np.mean(values)) if len(values) else float("nan"),
+			"sigma": float(np.std(values, ddof=1)) if len(values) > 1 else float("nan"),
+			"min": float(np.min(values)) if len(values) else float("nan"),
+			"max": float(np.max(values)) if len(values) else float("nan"),
+		}
+	return summary
+
+def __run_single_variation(index, parameters_ele, corners: list[str], num_samples: int, mismatch: bool, seed: int, bias: Optional[np.array] = None) -> tuple[np.array,np.array]:
+	"""returns (bias voltages (2,), samples (num corners, num_samples, 5)) for one design point"""
+	global SIM_TEMPS
+	na = -987.654321
+	samples = np.full((len(corners), num_samples, len(VARIATION_RESULT_NAMES)), na, dtype=np.float64)
+	with TemporaryDirectory() as tmpdirname:
+		__build_and_extract_opamp(index, parameters_ele, tmpdirname)
+		standardize_netlist_subckt_def(str(tmpdirname)+"/opamp_pex.spice", SIM_TEMPS[0])
+		if bias is None or np.any(opamp_results_failed(np.atleast_2d(bias))):
+			# find the nominal optimum bias the same way the training sweep does
+			copyfile("opamp_perf_eval.sp",str(tmpdirname)+"/opamp_perf_eval.sp")
+			format_perf_eval_deck(str(tmpdirname)+"/opamp_perf_eval.sp", SIM_TEMPS[:1])
+			Popen(["ngspice","-b","opamp_perf_eval.sp"],cwd=tmpdirname).wait()
+			nominal = get_sim_results(str(tmpdirname)+"/result_ac.txt", str(tmpdirname)+"/result_power.txt", str(tmpdirname)+"/result_noise.txt")
+			bias = np.array([nominal["biasVoltage1"], nominal["biasVoltage2"]], dtype=np.float64)
+			if np.any(opamp_results_failed(np.atleast_2d(bias))):
+				return bias, samples
+		print("Running " + str(num_samples) + " sample(s) at corner(s) " + str(corners) + " with bias " + str(bias))
+		# one ngspice run per corner, all corners at once
+		simulations = list()
+		for corner in corners:
+			deck = "opamp_variation_" + corner + ".sp"
+			copyfile("opamp_variation_eval.sp",str(tmpdirname)+"/"+deck)
+			format_variation_deck(str(tmpdirname)+"/"+deck, corner, num_samples, bias[0], bias[1], SIM_TEMPS[0], mismatch, seed)
+			simulations.append(Popen(["ngspice","-b",deck],cwd=tmpdirname))
+		for simulation in simulations:
+			simulation.wait()
+		for i, corner in enumerate(corners):
+			samples[i] = get_variation_results(str(tmpdirname)+"/result_variation_ac_"+corner+".txt", str(tmpdirname)+"/result_variation_noise_"+corner+".txt", num_samples)
+	return bias, samples
+
+def run_variation_analysis(
+	parameter_list: np.array,
+	corners: list[str] = PROCESS_CORNERS,
+	num_samples: int = 20,
+	spec: Optional[list[tuple[str,str,float]]] = None,
+	mismatch: bool = True,
+	seed: int = 1,
+	bias_list: Optional[np.array] = None,
+	processes: int = 8,
+) -> tuple[np.array,np.array,list[dict]]:
+	"""runs corner and mismatch simulations for every design point in parameter_list
+	args:
+	parameter_list = (points, 18) array of serialized opamp parameters
+	corners = process corners to simulate
+	num_samples = mismatch samples per corner
+	spec = yield spec, see summarize_variation
+	mismatch = False simulates each corner once without mismatch (num_samples is set to 1)
+	seed = random seed of the first sample
+	bias_list = (points, 2) nominal bias voltages (e.g. columns 3,4 of training results), found by simulation if None
+	processes = design points built and simulated at the same time
+	returns (bias (points,2), samples (points, corners, num_samples, 5), [{corner: summary} for every point])
+	"""
+	for corner in corners:
+		if corner not in PROCESS_CORNERS:
+			raise ValueError("corner must be one of " + str(PROCESS_CORNERS))
+	num_samples = num_samples if mismatch else 1
+	parameter_list = np.atleast_2d(parameter_list)
+	bias_list = [None]*len(parameter_list) if bias_list is None else np.atleast_2d(bias_list)
+	# same pdk setup as brute_force_full_layout_and_PEXsim
+	global save_gds_dir
+	add_npc_decorator = pdk.default_decorator
+	pdk.default_decorator = None
+	pdk.activate()
+	save_gds_dir = Path('./save_gds_by_index_variation').resolve()
+	save_gds_dir.mkdir(parents=True, exist_ok=True)
+	jobs = [(index, params, list(corners), num_samples, mismatch, seed, bias) for index, (params, bias) in enumerate(zip(parameter_list, bias_list))]
+	with Pool(processes) as cores:
+		outputs = cores.starmap(__run_single_variation, jobs)
+	pdk.default_decorator = add_npc_decorator
+	biases = np.array([output[0] for output in outputs])
+	samples = np.array([output[1] for output in outputs])
+	summaries = [{corner: summarize_variation(point_samples[i], spec) for i, corner in enumerate(corners)} for point_samples in samples]
+	if PEX_CACHE:
+		print("PEX cache: " + str(PEX_CACHE.stats()))
+	return biases, samples, summaries
+
+
+# ====Bayesian Optimization====
+
+
+# (low, high, quantum) for every entry of opamp_parameters_serializer
+# quantum=1 means integer dimension, low==high means the dimension is held fixed
+# widths and lengths are quantized to the sky130 2x grid because the generators snap to it anyway
+OPAMP_OPTIMIZE_BOUNDS = np.array([
+	(3, 9, 0.01), (0.3, 2, 0.01), (2, 6, 1),# diffpair_params
+	(3, 9, 0.01), (1, 3, 0.01), (2, 6, 1),# diffpair_bias
+	(3, 9, 0.01), (0.5, 2, 0.01), (2, 8, 1), (2, 4, 1),# houtput_bias
+	(4, 10, 0.01), (0.3, 2, 0.01), (6, 14, 1), (2, 4, 1),# pamp_hparams
+	(12, 12, 1), (12, 12, 1),# mim_cap_size
+	(2, 4, 1),# mim_cap_rows
+	(1, 3, 1)# rmult
+],dtype=np.float64)
+
+
+def opamp_snap_to_bounds(points: np.array, bounds: np.array=OPAMP_OPTIMIZE_BOUNDS) -> np.array:
+	"""clips points to bounds and rounds every dimension to its quantum (integers and quantized dims)
+	accepts a single (18,) vector or an (N,18) array"""
+	low, high, quantum = bounds[:,0], bounds[:,1], bounds[:,2]
+	snapped = np.clip(np.asarray(points,dtype=np.float64), low, high)
+	quantized = quantum > 0
+	snapped[...,quantized] = low[quantized] + np.round((snapped[...,quantized]-low[quantized])/quantum[quantized])*quantum[quantized]
+	# rounding to the grid can step over high, and float noise should not create unique points
+	return np.round(np.clip(snapped, low, high), 6)
+
+
+def opamp_results_failed(results: np.array) -> np.array:
+	"""returns a boolean mask of result rows which did not produce a usable simulation"""
+	results = np.atleast_2d(results)
+	return np.any(np.isclose(results, -987.654321), axis=1) | np.any(~np.isfinite(results), axis=1)
+
+
+def load_warm_start_data(file_pairs: list[tuple[Union[str,Path],Union[str,Path]]], sim_temp: float = float(27)) -> tuple[np.array,np.array]:
+	"""loads and concatenates (params.npy, results.npy) pairs from previous sweeps
+	missing files are skipped so the default training data names can always be passed
+	multi temperature results (points, temperatures, 8) use the sim_temp column, the temperatures are read from the
+	training_temps.npy next to the results file (see get_training_data), ValueError if it is missing or has no sim_temp"""
+	all_params = [np.empty((0,18))]
+	all_results = [np.empty((0,8))]
+	for params_file, results_file in file_pairs:
+		if not (Path(params_file).is_file() and Path(results_file).is_file()):
+			continue
+		params = np.load(params_file)
+		results = np.load(results_file)
+		if len(params) != len(results):
+			raise ValueError(str(params_file)+" and "+str(results_file)+" should be the same length")
+		if results.ndim == 3:
+			temps_file = Path(results_file).resolve().parent / "training_temps.npy"
+			temps = np.atleast_1d(np.load(temps_file)) if temps_file.is_file() else np.empty(0)
+			if len(temps) != results.shape[1]:
+				raise ValueError(str(results_file)+" has "+str(results.shape[1])+" temperatures but "+str(temps_file)+" is missing or does not match")
+			if not np.any(np.isclose(temps, sim_temp)):
+				raise ValueError(str(results_file)+" was not simulated at "+str(sim_temp)+" C (temperatures: "+str(list(temps))+")")
+			results = results[:, int(np.argmax(np.isclose(temps, sim_temp))), :]
+		all_params.append(params.reshape(-1,18))
+		all_results.append(results.reshape(-1,8))
+		print("warm start: loaded "+str(len(params))+" points from "+str(params_file))
+	return np.concatenate(all_params), np.concatenate(all_results)
+
+
+class OpampBayesianOptimizer:
+	"""constrained Bayesian optimization over the serialized opamp parameter vector
+	one gaussian process models the objective and one models each constrained result,
+	the acquisition is expected improvement weighted by the probability that all constraints are met.
+	integer and quantized dimensions are handled by snapping candidates before the gp is evaluated,
+	so the acquisition function only ever sees points which can actually be built.
+	points which are still being simulated are "fantasized" with the gp mean (kriging believer)
+	so that several proposals can be in flight at the same time without all being the same point.
+	an exact gp costs O(n^3) per fit and ask refits it, so the gps are trained on at most max_training_points rows:
+	the best half by objective (feasible points first) plus a random sample of the rest (see training_subset).
+	the fantasy refit for pending points reuses the fitted kernels instead of optimizing them again.
+	args:
+	objective = name of the result to optimize (see opamp_results_de_serializer)
+	minimize = if True minimize the objective else maximize it
+	constraints = list of (result name, ">=" or "<=", value)
+	bounds = (18,3) array of (low, high, quantum), see OPAMP_OPTIMIZE_BOUNDS
+	seed = random seed
+	max_training_points = limit on the rows the gps are fit on (a warm start can be every point of a sweep)
+	"""
+	def __init__(
+		self,
+		objective: str = "area",
+		minimize: bool = True,
+		constraints: Optional[list[tuple[str,str,float]]] = None,
+		bounds: np.array = OPAMP_OPTIMIZE_BOUNDS,
+		seed: Optional[int] = None,
+		max_training_points: int = 500,
+	):
+		if max_training_points < 1:
+			raise ValueError("max_training_points must be at least 1")
+		result_names = list(opamp_results_de_serializer().keys())
+		constraints = constraints if constraints is not None else list()
+		for name, relation, value in [(objective,">=",0)]+list(constraints):
+			if name not in result_names:
+				raise ValueError("unknown result "+str(name)+", choose from "+str(result_names))
+			if relation not in [">=","<="]:
+				raise ValueError("constraint relation must be >= or <=")
+		self.result_names = result_names
+		self.objective = result_names.index(objective)
+		self.sign = 1.0 if minimize else -1.0
+		self.constraints = [(result_names.index(name), relation, float(value)) for name, relation, value in constraints]
+		self.bounds = np.asarray(bounds,dtype=np.float64)
+		self.active = self.bounds[:,1] > self.bounds[:,0]
+		self.rng = np.random.default_rng(seed)
+		self.max_training_points = int(max_training_points)
+		self.X = np.empty((0,18))
+		self.Y = np.empty((0,8))
+		self.pending = list()
+
+	def tell(self, params: np.array, results: np.array) -> None:
+		"""adds evaluated (params, results) to the data set, accepts single vectors or arrays"""
+		params = np.atleast_2d(params).astype(np.float64)
+		results = np.atleast_2d(results).astype(np.float64)
+		if params.shape[1:] != (18,) or results.shape[1:] != (8,) or len(params) != len(results):
+			raise ValueError("tell expects (N,18) params and (N,8) results, got "+str(params.shape)+" and "+str(results.shape))
+		self.X = np.concatenate([self.X, params])
+		self.Y = np.concatenate([self.Y, results])
+		for param in params:
+			self.pending = [p for p in self.pending if not np.allclose(p, param)]
+
+	def is_feasible(self, results: np.array) -> np.array:
+		"""returns a boolean mask of result rows meeting every constraint"""
+		results = np.atleast_2d(results)
+		feasible = ~opamp_results_failed(results)
+		for col, relation, value in self.constraints:
+			feasible &= (results[:,col] >= value) if relation==">=" else (results[:,col] <= value)
+		return feasible
+
+	def best(self) -> tuple[Optional[np.array],Optional[np.array]]:
+		"""returns (params, results) of the best feasible point seen so far or (None, None)"""
+		feasible = self.is_feasible(self.Y)
+		if not np.any(feasible):
+			return None, None
+		candidates = np.where(feasible)[0]
+		best = candidates[np.argmin(self.sign*self.Y[candidates,self.objective])]
+		return self.X[best], self.Y[best]
+
+	def training_subset(self) -> np.array:
+		"""returns the indices of the rows of X the gps are fit on, all rows if there are at most max_training_points
+		otherwise the best max_training_points//2 rows (feasible points by objective, then the other usable points by
+		objective, then the failed ones) and a random sample of the remaining rows, so the model stays accurate around
+		the incumbent and still sees the rest of the space (and the failures it should avoid)"""
+		if len(self.X) <= self.max_training_points:
+			return np.arange(len(self.X))
+		failed = opamp_results_failed(self.Y)
+		objective = np.where(failed, np.inf, self.sign*self.Y[:,self.objective])
+		# lexsort sorts by the last key first
+		ranked = np.lexsort((objective, ~self.is_feasible(self.Y), failed))
+		num_best = self.max_training_points//2
+		rest = self.rng.choice(ranked[num_best:], self.max_training_points-num_best, replace=False)
+		return np.sort(np.concatenate([ranked[:num_best], rest]))
+
+	def __normalize(self, points: np.array) -> np.array:
+		low, high = self.bounds[self.active,0], self.bounds[self.active,1]
+		return (np.atleast_2d(points)[:,self.active] - low) / (high - low)
+
+	def __targets(self, rows: np.array) -> list[np.array]:
+		"""returns training targets [objective, constraint1, ...] of the rows of Y
+		results which span decades (ugb, dcGain, power, noise) are modeled in log space.
+		failed simulations are assigned a pessimistic value (worst observed) so the model learns to avoid them"""
+		results = self.Y[rows]
+		failed = opamp_results_failed(results)
+		targets = list()
+		for col, sign in [(self.objective, self.sign)] + [(c, (-1.0 if rel==">=" else 1.0)) for c, rel, _ in self.constraints]:
+			vals = self.__transform(results[:,col], col)
+			worst = np.max(sign*vals[~failed]) if np.any(~failed) else 1.0
+			targets.append(np.where(failed, worst + abs(worst)*0.1 + 1e-9, sign*vals))
+		return targets
+
+	def __transform(self, vals: np.array, col: int) -> np.array:
+		if self.result_names[col] in ["ugb","dcGain","power","noise"]:
+			return np.log10(np.clip(np.abs(vals),1e-30,None))
+		return vals
+
+	def __fit_gps(self, X: np.array, targets: list[np.array], kernels: Optional[list] = None) -> list:
+		"""fits one gp per target, with kernels (fitted kernels of earlier gps) the hyperparameters are kept fixed"""
+		from sklearn.gaussian_process import GaussianProcessRegressor
+		from sklearn.gaussian_process.kernels import Matern, ConstantKernel, WhiteKernel
+		gps = list()
+		ndims = int(np.sum(self.active))
+		for i, target in enumerate(targets):
+			if kernels is None:
+				kernel = ConstantKernel(1.0,(1e-3,1e3)) * Matern(length_scale=np.ones(ndims),length_scale_bounds=(1e-2,1e2),nu=2.5) + WhiteKernel(1e-4,(1e-8,1e-1))
+				gp = GaussianProcessRegressor(kernel=kernel, normalize_y=True, n_restarts_optimizer=2, random_state=int(self.rng.integers(2**31)))
+			else:
+				gp = GaussianProcessRegressor(kernel=kernels[i], normalize_y=True, optimizer=None)
+			gps.append(gp.fit(self.__normalize(X), target))
+		return gps
+
+	def __candidates(self, num_candidates: int) -> np.array:
+		"""random points in the box plus local perturbations of the best points, snapped to the grid"""
+		low, high = self.bounds[:,0], self.bounds[:,1]
+		global_pts = low + self.rng.random((num_candidates,18))*(high-low)
+		local_pts = list()
+		best_params, _ = self.best()
+		if len(self.X):
+			feasible = self.is_feasible(self.Y)
+			centers = self.X[feasible] if np.any(feasible) else self.X[~opamp_results_failed(self.Y)]
+			if best_params is not None:
+				centers = np.concatenate([centers, np.atleast_2d(best_params)])
+			if len(centers):
+				centers = centers[self.rng.integers(len(centers),size=num_candidates)]
+				local_pts.append(centers + self.rng.normal(0,0.1,(num_candidates,18))*(high-low))
+		candidates = opamp_snap_to_bounds(np.concatenate([global_pts]+local_pts), self.bounds)
+		candidates = np.unique(candidates, axis=0)
+		# never propose something that was already simulated or is being simulated
+		seen = np.concatenate([self.X]+[np.atleast_2d(p) for p in self.pending]) if (len(self.X) or self.pending) else np.empty((0,18))
+		if len(seen):
+			seen_set = {tuple(row) for row in opamp_snap_to_bounds(seen, self.bounds)}
+			candidates = np.array([row for row in candidates if tuple(row) not in seen_set]).reshape(-1,18)
+		return candidates
+
+	def ask(self, num_candidates: int = 4000, min_points: int = 8) -> np.array:
+		"""proposes the next point to evaluate and marks it as pending"""
+		from scipy.stats import norm as normal_dist
+		candidates = self.__candidates(num_candidates)
+		if len(candidates)==0:
+			raise RuntimeError("no unexplored points left inside the bounds")
+		usable = ~opamp_results_failed(self.Y)
+		if np.sum(usable) < min_points:
+			proposal = candidates[self.rng.integers(len(candidates))]
+			self.pending.append(proposal)
+			return proposal
+		rows = self.training_subset()
+		targets = self.__targets(rows)
+		gps = self.__fit_gps(self.X[rows], targets)
+		# kriging believer: pending points are assumed to return the current gp mean
+		if self.pending:
+			pending = np.array(self.pending)
+			fantasies = [gp.predict(self.__normalize(pending)) for gp in gps]
+			gps = self.__fit_gps(np.concatenate([self.X[rows], pending]), [np.concatenate([t, f]) for t, f in zip(targets, fantasies)], [gp.kernel_ for gp in gps])
+		normalized = self.__normalize(candidates)
+		# probability of feasibility, constraint targets are stored such that <= threshold is feasible
+		prob_feasible = np.ones(len(candidates))
+		for gp, (col, relation, value) in zip(gps[1:], self.constraints):
+			threshold = self.__transform(np.array([value]), col)[0]
+			threshold = -threshold if relation==">=" else threshold
+			mean, std = gp.predict(normalized, return_std=True)
+			prob_feasible *= normal_dist.cdf((threshold - mean)/np.maximum(std,1e-12))
+		best_params, best_results = self.best()
+		if best_params is None:
+			# nothing feasible yet, look for feasibility first
+			acquisition = prob_feasible
+		else:
+			incumbent = self.sign*self.__transform(np.array([best_results[self.objective]]), self.objective)[0]
+			mean, std = gps[0].predict(normalized, return_std=True)
+			std = np.maximum(std,1e-12)
+			z = (incumbent - mean)/std
+			expected_improvement = (incumbent - mean)*normal_dist.cdf(z) + std*normal_dist.pdf(z)
+			acquisition = expected_improvement * prob_feasible
+		proposal = candidates[int(np.argmax(acquisition))]
+		self.pending.append(proposal)
+		return proposal
+
+
+def optimize_opamp(
+	optimizer: OpampBayesianOptimizer,
+	num_evaluations: int = 100,
+	batch_size: int = 8,
+	warm_start: Optional[list[tuple[Union[str,Path],Union[str,Path]]]] = None,
+	history_prefix: Optional[str] = "optimize",
+	sim_temp: float = float(27),
+) -> tuple[Optional[np.array],Optional[np.array]]:
+	"""runs asynchronous batch parallel Bayesian optimization of the sky130 opamp
+	batch_size simulations are kept in flight, whenever one finishes the model is updated and a new point is proposed
+	args:
+	optimizer = OpampBayesianOptimizer holding the spec
+	num_evaluations = number of new layouts to build, extract, and simulate
+	batch_size = number of simulations running at the same time
+	warm_start = list of (params.npy, results.npy) from previous sweeps used as initial data
+	history_prefix = if not None, every evaluated point is saved to <prefix>_params.npy and <prefix>_results.npy
+	****NOTE: the history files use the same format as get_training_data so they can warm start later runs
+	returns the best feasible (params, results) or (None, None) if nothing met the spec
+	"""
+	from queue import Queue
+	if pdk.name != "sky130":
+		raise ValueError("this is for sky130 only")
+	warm_start = warm_start if warm_start is not None else list()
+	if history_prefix is not None:
+		warm_start = list(warm_start) + [(history_prefix+"_params.npy", history_prefix+"_results.npy")]
+	warm_params, warm_results = load_warm_start_data(warm_start, sim_temp)
+	if len(warm_params):
+		optimizer.tell(warm_params, warm_results)
+	history_params, history_results = load_warm_start_data([(history_prefix+"_params.npy", history_prefix+"_results.npy")] if history_prefix else [], sim_temp)
+	# disable adding NPC layer (same as brute_force_full_layout_and_PEXsim)
+	add_npc_decorator = pdk.default_decorator
+	pdk.default_decorator = None
+	pdk.activate()
+	# workers are forked so they inherit the pdk, gds dir, and temperature globals
+	global save_gds_dir
+	global SIM_TEMPS
+	save_gds_dir = Path('./save_gds_by_index_optimize').resolve()
+	save_gds_dir.mkdir(parents=True, exist_ok=True)
+	# the optimizer works on single temperature results
+	SIM_TEMPS = [sim_temp]
+	finished = Queue()
+	submitted = 0
+	completed = 0
+	index_offset = len(history_params)
+	with Pool(batch_size) as cores:
+		def submit():
+			nonlocal submitted
+			params = optimizer.ask()
+			callback = lambda res, params=params: finished.put((params, res))
+			error_callback = lambda err, params=params: finished.put((params, opamp_results_serializer()))
+			cores.apply_async(__run_single_brtfrc, (index_offset+submitted, params), callback=callback, error_callback=error_callback)
+			submitted += 1
+		for _ in range(min(batch_size, num_evaluations)):
+			submit()
+		while completed < num_evaluations:
+			params, results = finished.get()
+			completed += 1
+			optimizer.tell(params, results)
+			if history_prefix is not None:
+				history_params = np.concatenate([history_params, np.atleast_2d(params)])
+				history_results = np.concatenate([history_results, np.atleast_2d(results)])
+				np.save(history_prefix+"_params.npy", history_params)
+				np.save(history_prefix+"_results.npy", history_results)
+			best_params, best_results = optimizer.best()
+			status = "feasible="+str(bool(optimizer.is_feasible(results)[0]))
+			if best_results is not None:
+				status += " best "+optimizer.result_names[optimizer.objective]+"="+str(best_results[optimizer.objective])
+			print("optimize: "+str(completed)+"/"+str(num_evaluations)+" "+status)
+			if submitted < num_evaluations:
+				submit()
+	pdk.default_decorator = add_npc_decorator
+	if PEX_CACHE:
+		print("PEX cache: " + str(PEX_CACHE.stats()))
+	return optimizer.best()
+
+
 #======stats=======
 
 
@@ -479,15 +1456,18 @@ def save_distwith_best_fit(data, output_file, title="Distribution With Trend", x
 	plt.savefig(output_file)
 	plt.clf()
 
-def save_pairwise_scatter_plot(data, output_file):
+def save_pairwise_scatter_plot(data, output_file, max_points: Optional[int]=None):
 	"""Create a Pairwise Scatter Plot for the input data and save it as a PNG file.
 	args:
 		data (numpy.array or pandas.DataFrame):
 		output_file (str/path): File path to save the generated PNG.
+		max_points (int): plot a fixed random subset of at most max_points rows (default is all rows).
 	"""
 	# If the data is a NumPy array, convert it to a pandas DataFrame
 	if isinstance(data, np.ndarray):
 		data = pd.DataFrame(data)
+	if max_points is not None and len(data) > max_points:
+		data = data.sample(n=max_points, random_state=0)
 	# Create the Pairwise Scatter Plot
 	sns.pairplot(data)
 	# Save the plot as a PNG file
@@ -495,23 +1475,26 @@ def save_pairwise_scatter_plot(data, output_file):
 	plt.close()
 	plt.clf()
 
-def run_pca_and_save_plot(data, output_file):
+def run_pca_and_save_plot(data, output_file, pca_result=None, components=None):
 	"""Run PCA on the input data and save the PCA plot as a PNG file.
 	args:
 		data (numpy.array or pandas.DataFrame): The 17-dimensional input data for PCA.
 		output_file (str): File path to save the generated PNG.
+		pca_result, components (numpy.array): precomputed PCA (see fit_stats_models), PCA is run if None.
 	"""
 	# If the data is a pandas DataFrame, convert it to a NumPy array
 	if isinstance(data, pd.DataFrame):
 		data = data.to_numpy()
 	# Perform PCA
-	pca = PCA(n_components=2)  # Reduce to 2 dimensions for visualization
-	pca_result = pca.fit_transform(data)
+	if pca_result is None or components is None:
+		pca = PCA(n_components=2)  # Reduce to 2 dimensions for visualization
+		pca_result = pca.fit_transform(data)
+		components = pca.components_
 	# Create the biplot
 	plt.figure(figsize=(10, 8))
 	plt.scatter(pca_result[:, 0], pca_result[:, 1], alpha=0.7)
 	# Plot feature loadings as arrows
-	feature_vectors = pca.components_.T
+	feature_vectors = components.T
 	for i, (x, y) in enumerate(feature_vectors):
 		plt.arrow(0, 0, x, y, color='r', alpha=0.5)
 		plt.text(x, y, f'Feature {i+1}', color='g', ha='center', va='center')
@@ -540,25 +1523,30 @@ def elbow_point(x, y):
     elbow_index = np.argmax(deltas < np.mean(deltas))
     return x[elbow_index]
 
-def create_pca_biplot_with_clusters(data, results, output_file, max_clusters=10, results_index: int=0):
+def create_pca_biplot_with_clusters(data, results, output_file, max_clusters=10, results_index: int=0, pca_result=None, components=None, cluster_assignments=None):
+    """pca_result, components, and cluster_assignments can be passed from fit_stats_models to skip refitting"""
     if isinstance(data, pd.DataFrame):
         data = data.to_numpy()
     if isinstance(results, pd.Series):
         results = results.to_numpy()
-    pca = PCA(n_components=2)
-    pca_result = pca.fit_transform(data)
-    cluster_results = find_optimal_clusters(data, max_clusters)
-    num_clusters_values, inertias = zip(*cluster_results)
-    optimal_num_clusters = elbow_point(num_clusters_values, inertias)
-    kmeans = KMeans(n_clusters=int(optimal_num_clusters))
-    cluster_assignments = kmeans.fit_predict(data)
+    if pca_result is None or components is None:
+        pca = PCA(n_components=2)
+        pca_result = pca.fit_transform(data)
+        components = pca.components_
+    if cluster_assignments is None:
+        cluster_results = find_optimal_clusters(data, max_clusters)
+        num_clusters_values, inertias = zip(*cluster_results)
+        optimal_num_clusters = elbow_point(num_clusters_values, inertias)
+        kmeans = KMeans(n_clusters=int(optimal_num_clusters))
+        cluster_assignments = kmeans.fit_predict(data)
+    optimal_num_clusters = int(np.max(cluster_assignments)) + 1
     plt.figure(figsize=(10, 8))
     for i in range(int(optimal_num_clusters)):
         cluster_indices = np.where(cluster_assignments == i)[0]
         plt.scatter(pca_result[cluster_indices, 0], pca_result[cluster_indices, 1], alpha=0.7, label=f'Cluster {i+1}')
     # Color the data points based on their result values
     plt.scatter(pca_result[:, 0], pca_result[:, 1], c=results[:,results_index], cmap='viridis', edgecolor='k', s=80)
-    feature_vectors = pca.components_.T
+    feature_vectors = components.T
     for i, (x, y) in enumerate(feature_vectors):
         plt.arrow(0, 0, x, y, color='r', alpha=0.5)
         plt.text(x, y, f'Feature {i+1}', color='g', ha='center', va='center')
@@ -571,19 +1559,35 @@ def create_pca_biplot_with_clusters(data, results, output_file, max_clusters=10,
     plt.close()
     plt.clf()
 
-def create_heatmap_with_clusters(parameters, results, output_file, max_clusters=10,results_index: int=0):
+def cluster_results_hierarchical(results_column: np.array, max_clusters: int=10, max_points: int=5000) -> np.array:
+    """complete linkage clustering of one result column, returns a cluster id per row
+    the pairwise distance matrix is quadratic in size, so at most max_points rows are clustered
+    and every other row gets the cluster of the nearest clustered value (clusters of 1D data are intervals)"""
+    results_column = np.asarray(results_column).reshape(-1)
+    sample = np.arange(len(results_column))
+    if len(sample) > max_points:
+        sample = np.sort(np.random.default_rng(0).choice(len(results_column), size=max_points, replace=False))
+    results_dist = pdist(results_column[sample].reshape(-1, 1))  # Pairwise distance between result values
+    results_linkage = squareform(results_dist)  # Convert to a condensed distance matrix
+    clustering = AgglomerativeClustering(n_clusters=max_clusters, metric='precomputed', linkage='complete')
+    sample_assignments = clustering.fit_predict(results_linkage)
+    if len(sample) == len(results_column):
+        return sample_assignments
+    order = np.argsort(results_column[sample])
+    sorted_values = results_column[sample][order]
+    right = np.clip(np.searchsorted(sorted_values, results_column), 1, len(sorted_values)-1)
+    nearest = np.where(np.abs(results_column - sorted_values[right-1]) <= np.abs(sorted_values[right] - results_column), right-1, right)
+    return sample_assignments[order][nearest]
+
+def create_heatmap_with_clusters(parameters, results, output_file, max_clusters=10,results_index: int=0, cluster_assignments=None):
+    """cluster_assignments can be passed from fit_stats_models to skip clustering"""
     if isinstance(parameters, pd.DataFrame):
         parameters = parameters.to_numpy()
     if isinstance(results, pd.Series):
         results = results.to_numpy()
-    # Perform PCA
-    pca = PCA(n_components=2)
-    pca_result = pca.fit_transform(parameters)
     # Cluster the parameters based on the results using hierarchical clustering
-    results_dist = pdist(results[:,results_index].reshape(-1, 1))  # Pairwise distance between result values
-    results_linkage = squareform(results_dist)  # Convert to a condensed distance matrix
-    clustering = AgglomerativeClustering(n_clusters=max_clusters, affinity='precomputed', linkage='complete')
-    cluster_assignments = clustering.fit_predict(results_linkage)
+    if cluster_assignments is None:
+        cluster_assignments = cluster_results_hierarchical(results[:,results_index], max_clusters)
     # Create a dictionary to map clusters to their corresponding parameters
     cluster_param_dict = {}
     for cluster_id, param_values in zip(cluster_assignments, parameters):
@@ -706,7 +1710,9 @@ def simple2pt_param_scatter_wautocluster(x, y, output_file, x_label='X Axis', y_
     plt.clf()
 
 
-def simple2pt_param_scatter_wcluster(x, y, output_file, x_label='X Axis', y_label='Y Axis', num_clusters=3):
+def simple2pt_param_scatter_wcluster(x, y, output_file, x_label='X Axis', y_label='Y Axis', num_clusters=3, cluster_labels=None, max_point_labels: int=1000):
+    """cluster_labels can be passed from fit_stats_models to skip clustering
+    points are only annotated with their cluster id when there are at most max_point_labels points"""
     output_file = Path(output_file).resolve()
     # Create a scatter plot
     plt.figure(figsize=(8, 6))
@@ -714,14 +1720,17 @@ def simple2pt_param_scatter_wcluster(x, y, output_file, x_label='X Axis', y_labe
     # Combine data into a 2D array for clustering
     data = np.column_stack((x, y))
     # Perform K-means clustering with the specified number of clusters
-    kmeans = KMeans(n_clusters=num_clusters)
-    cluster_labels = kmeans.fit_predict(data)
+    if cluster_labels is None:
+        kmeans = KMeans(n_clusters=num_clusters)
+        cluster_labels = kmeans.fit_predict(data)
     # Color code the clusters and label each point
     unique_labels = np.unique(cluster_labels)
     colors = plt.cm.tab10.colors
     for i, label in enumerate(unique_labels):
         cluster_data = data[cluster_labels == label]
         plt.scatter(cluster_data[:, 0], cluster_data[:, 1], c=colors[i], label=f'Cluster {label}', edgecolors='black')
+        if len(data) > max_point_labels:
+            continue
         for point in cluster_data:
             plt.text(point[0], point[1], f'{label}', fontsize=10, ha='center', va='center', color='black')
     plt.xlabel(x_label)
@@ -734,15 +1743,152 @@ def simple2pt_param_scatter_wcluster(x, y, output_file, x_label='X Axis', y_labe
     plt.clf()
 
 
+# ====stats pipeline====
+# models are fit once per dataset and cached, figures render in parallel forked workers.
+# workers read the data and jobs from these globals (inherited when forking) so nothing large is pickled
+
+
+__STATS_DATA = dict()
+__STATS_FIGURE_JOBS = list()
+# bump when the cached models change so stale caches are not reused
+STATS_CACHE_VERSION = 1
+
+
+def stats_dataset_hash(params: np.array, results: np.array, max_clusters: int=10) -> str:
+	"""returns a hash identifying the dataset and the model settings"""
+	sha = hashlib.sha256()
+	for arr in [params, results]:
+		arr = np.ascontiguousarray(arr, dtype=np.float64)
+		sha.update(str(arr.shape).encode())
+		sha.update(arr.tobytes())
+	sha.update(("clusters="+str(max_clusters)+",version="+str(STATS_CACHE_VERSION)).encode())
+	return sha.hexdigest()
+
+
+def __init_stats_worker():
+	import matplotlib
+	matplotlib.use("Agg")
+
+
+def __fit_stats_model(task: tuple) -> tuple:
+	"""fits one model on the dataset stored in __STATS_DATA, returns (name, dict of arrays)"""
+	params, results = __STATS_DATA["params"], __STATS_DATA["results"]
+	kind = task[0]
+	if kind == "pca":
+		pca = PCA(n_components=2)
+		return "pca", {"pca_result": pca.fit_transform(params), "pca_components": pca.components_}
+	if kind == "kmeans":
+		num_clusters = task[1]
+		kmeans = KMeans(n_clusters=num_clusters, n_init=10, random_state=0)
+		labels = kmeans.fit_predict(params)
+		return "kmeans_"+str(num_clusters), {"inertia": np.array(kmeans.inertia_), "labels": labels}
+	if kind == "hierarchical":
+		results_index, max_clusters = task[1], task[2]
+		return "hierarchical_"+str(results_index), {"labels": cluster_results_hierarchical(results[:,results_index], max_clusters)}
+	if kind == "pair":
+		index1, index2 = task[1], task[2]
+		kmeans = KMeans(n_clusters=3, n_init=10, random_state=0)
+		return "pair_"+str(index1)+"_"+str(index2), {"labels": kmeans.fit_predict(np.column_stack((results[:,index1], results[:,index2])))}
+	raise ValueError("unknown stats model "+str(kind))
+
+
+def fit_stats_models(
+	params: np.array,
+	results: np.array,
+	max_clusters: int=10,
+	cache_dir: Optional[Union[str,Path]]="./stats/.cache",
+	processes: Optional[int]=None,
+) -> dict:
+	"""fits the dimensionality reduction and clustering used by extract_stats, or loads them from the cache
+	the cache file is keyed by stats_dataset_hash so it is only reused for the exact same data, cache_dir=None disables the cache
+	returns dict of numpy arrays:
+	pca_result, pca_components = 2 component PCA of params
+	inertias, kmeans_labels = kmeans inertia for k=1..max_clusters and the labels for the elbow k
+	hierarchical_labels = complete linkage clusters of result 0 (heatmap)
+	pair_<i>_<j> = kmeans (k=3) labels of result i vs result j
+	"""
+	cache_file = Path(cache_dir) / (stats_dataset_hash(params, results, max_clusters) + ".npz") if cache_dir is not None else None
+	if cache_file is not None and cache_file.is_file():
+		print("stats: loaded cached models from "+str(cache_file))
+		return dict(np.load(cache_file))
+	global __STATS_DATA
+	__STATS_DATA = {"params": params, "results": results}
+	num_results = results.shape[1]
+	tasks = [("pca",), ("hierarchical", 0, max_clusters)]
+	tasks += [("kmeans", k) for k in range(1, max_clusters + 1)]
+	tasks += [("pair", i, j) for i in range(num_results) for j in range(num_results) if i != j]
+	with get_context("fork").Pool(processes) as cores:
+		fitted = dict(cores.map(__fit_stats_model, tasks))
+	models = dict(fitted["pca"])
+	inertias = [float(fitted["kmeans_"+str(k)]["inertia"]) for k in range(1, max_clusters + 1)]
+	optimal_num_clusters = int(elbow_point(list(range(1, max_clusters + 1)), inertias))
+	models["inertias"] = np.array(inertias)
+	models["kmeans_labels"] = fitted["kmeans_"+str(optimal_num_clusters)]["labels"]
+	models["hierarchical_labels"] = fitted["hierarchical_0"]["labels"]
+	for name, fit in fitted.items():
+		if name.startswith("pair_"):
+			models[name] = fit["labels"]
+	if cache_file is None:
+		return models
+	Path(cache_dir).mkdir(parents=True, exist_ok=True)
+	# write then rename so an interrupted run never leaves a truncated cache file
+	tmp_cache_file = cache_file.with_suffix(".tmp.npz")
+	np.savez(tmp_cache_file, **models)
+	tmp_cache_file.replace(cache_file)
+	return models
+
+
+def __render_stats_figure(job_index: int) -> Optional[str]:
+	"""renders one job of __STATS_FIGURE_JOBS, returns an error message instead of raising so one bad figure does not stop the rest"""
+	function, args, kwargs = __STATS_FIGURE_JOBS[job_index]
+	try:
+		function(*args, **kwargs)
+		return None
+	except Exception as error:
+		return str(function.__name__) + " -> " + str(args[-1] if args else kwargs) + ": " + repr(error)
+	finally:
+		plt.close("all")
+
+
+def render_stats_figures(jobs: list[tuple], processes: Optional[int]=None) -> list[str]:
+	"""renders independent figures in parallel worker processes with the Agg backend
+	args:
+	jobs = list of (plot function, args tuple, kwargs dict)
+	processes = number of workers (default: cpu count)
+	returns a list of error messages for figures which failed
+	"""
+	global __STATS_FIGURE_JOBS
+	__STATS_FIGURE_JOBS = list(jobs)
+	with get_context("fork").Pool(processes, initializer=__init_stats_worker) as cores:
+		errors = cores.map(__render_stats_figure, range(len(__STATS_FIGURE_JOBS)), chunksize=1)
+	__STATS_FIGURE_JOBS = list()
+	return [error for error in errors if error is not None]
+
+
 def extract_stats(
 	params: Union[np.array,str,Path],
 	results: Union[np.array,str,Path],
+	temp_index: int = 0,
+	processes: Optional[int] = None,
+	cache_dir: Optional[Union[str,Path]] = "./stats/.cache",
+	max_scatter_points: int = 5000,
 ) -> None:
+	"""saves statistics plots of a sweep under ./stats
+	PCA and clustering are cached in cache_dir (None disables the cache) and all figures render in parallel
+	args:
+	params, results = arrays or .npy files from get_training_data
+	temp_index = which temperature to use for multi temperature results
+	processes = number of worker processes (default: cpu count)
+	max_scatter_points = the pairwise scatter plot uses a random subset of at most this many rows
+	"""
 	# reading files, error checks
 	strtopath = lambda strin : Path(strin).resolve() if isinstance(strin,str) else strin
 	pathtoarr = lambda datain : np.load(datain.resolve()) if isinstance(datain,Path) else datain
 	params_dirty = pathtoarr(strtopath(params))
 	results_dirty = pathtoarr(strtopath(results))
+	# multi temperature results are (points, temperatures, 8), run stats on one temperature
+	if results_dirty.ndim == 3:
+		results_dirty = results_dirty[:, temp_index, :]
 	# clean condition eliminates all failed runs AND negative phase margins
 	clean_condition = np.where(np.all(results_dirty > 0,axis=1)==True)
 	params = params_dirty[clean_condition]
@@ -767,50 +1913,113 @@ def extract_stats(
 	for i, colname in enumerate(colnames_vals):
 		colnames_vals[colname] = params[:, i]
 	
+	# fit (or load) the models shared by the cluster plots
+	models = fit_stats_models(params, results, cache_dir=cache_dir, processes=processes)
+	result_names = list(opamp_results_de_serializer().keys())
+	jobs = list()
 	# run statistics on distribution of training parameters individually
 	params_stats_hists = Path("./stats/param_stats/hists1D")
-	params_stats_hists.mkdir(parents=True)
+	params_stats_hists.mkdir(parents=True, exist_ok=True)
 	for colname, val in colnames_vals.items():
-		save_distwith_best_fit(val,str(params_stats_hists)+"/"+colname+".png",'Parameter Distribution',colname,'Normalized trials')
+		jobs.append((save_distwith_best_fit, (val,str(params_stats_hists)+"/"+colname+".png",'Parameter Distribution',colname,'Normalized trials'), {}))
 	# run stats on distribution of training parameters using pair scatter plots
 	params_stats_scatter = Path("./stats/param_stats/scatter")
-	params_stats_scatter.mkdir(parents=True)
-	save_pairwise_scatter_plot(params,str(params_stats_scatter)+"/pairscatter_params.png")
+	params_stats_scatter.mkdir(parents=True, exist_ok=True)
+	jobs.append((save_pairwise_scatter_plot, (params,str(params_stats_scatter)+"/pairscatter_params.png"), {"max_points": max_scatter_points}))
 	# run PCA on training parameters
-	run_pca_and_save_plot(params,str(params_stats_scatter)+"/PCA_params.png")
-	
+	jobs.append((run_pca_and_save_plot, (params,str(params_stats_scatter)+"/PCA_params.png"), {"pca_result": models["pca_result"], "components": models["pca_components"]}))
+
 	# run statistics on results
 	result_stats_dir = Path("./stats/result_stats/hist1d")
-	result_stats_dir.mkdir(parents=True)
-	for i,name in enumerate(opamp_results_de_serializer()):
-		save_distwith_best_fit(results[:,i],str(result_stats_dir)+"/result_"+name+"_dist.png",name+" Distribution",name)
+	result_stats_dir.mkdir(parents=True, exist_ok=True)
+	for i,name in enumerate(result_names):
+		jobs.append((save_distwith_best_fit, (results[:,i],str(result_stats_dir)+"/result_"+name+"_dist.png",name+" Distribution",name), {}))
 	# plot results against each other
 	result_stats_verses = Path("./stats/result_stats/compare")
-	result_stats_verses.mkdir(parents=True)
-	result_combs=list(opamp_results_de_serializer().keys())
-	result_unqiue_combs=np.array(np.meshgrid(result_combs, result_combs)).T.reshape(-1, 2)
-	for name1, name2 in result_unqiue_combs:
-		if name1==name2:
-			continue
-		index1 = result_combs.index(name1)
-		index2 = result_combs.index(name2)
-		output_name = str(result_stats_verses)+"/"+name1+"_vs_"+name2+".png"
-		simple2pt_param_scatter_wcluster(results[:,index1],results[:,index2],output_name,name1,name2)
+	result_stats_verses.mkdir(parents=True, exist_ok=True)
+	for index1, name1 in enumerate(result_names):
+		for index2, name2 in enumerate(result_names):
+			if name1==name2:
+				continue
+			output_name = str(result_stats_verses)+"/"+name1+"_vs_"+name2+".png"
+			pair_labels = models["pair_"+str(index1)+"_"+str(index2)]
+			jobs.append((simple2pt_param_scatter_wcluster, (results[:,index1],results[:,index2],output_name,name1,name2), {"cluster_labels": pair_labels}))
 
 	# run stats on results and data combined
 	comb_stats_dir = Path("./stats/combined")
-	comb_stats_dir.mkdir(parents=True)
-	create_pca_biplot_with_clusters(params,results,str(comb_stats_dir)+"/heatmapresults_params.png")
-	create_heatmap_with_clusters(params,results,str(comb_stats_dir)+"/heatmap_results_clustered.png")
-	for i, name in enumerate(opamp_results_de_serializer()):
+	comb_stats_dir.mkdir(parents=True, exist_ok=True)
+	jobs.append((create_pca_biplot_with_clusters, (params,results,str(comb_stats_dir)+"/heatmapresults_params.png"), {"pca_result": models["pca_result"], "components": models["pca_components"], "cluster_assignments": models["kmeans_labels"]}))
+	jobs.append((create_heatmap_with_clusters, (params,results,str(comb_stats_dir)+"/heatmap_results_clustered.png"), {"cluster_assignments": models["hierarchical_labels"]}))
+	for i, name in enumerate(result_names):
 		param_stats_isolate = Path("./stats/combined/isolate_params") / name
-		param_stats_isolate.mkdir(parents=True)
+		param_stats_isolate.mkdir(parents=True, exist_ok=True)
 		param_stats_NOisolate = Path("./stats/combined/NONisolated_params") / name
-		param_stats_NOisolate.mkdir(parents=True)
+		param_stats_NOisolate.mkdir(parents=True, exist_ok=True)
 		for j, colname in enumerate(colnames_vals):
-			single_param_scatter(params,results,j,str(param_stats_isolate)+"/"+colname+".png",results_index=i)
-			single_param_scatter(params,results,j,str(param_stats_NOisolate)+"/"+colname+".png",isolate=False,results_index=i)
-
+			jobs.append((single_param_scatter, (params,results,j,str(param_stats_isolate)+"/"+colname+".png"), {"results_index": i}))
+			jobs.append((single_param_scatter, (params,results,j,str(param_stats_NOisolate)+"/"+colname+".png"), {"isolate": False, "results_index": i}))
+	# render everything in parallel
+	errors = render_stats_figures(jobs, processes)
+	print("stats: rendered "+str(len(jobs)-len(errors))+"/"+str(len(jobs))+" figures")
+	for error in errors:
+		print("stats: figure failed: "+error)
+
+
+def extract_stats_incremental(
+	params: Union[str,Path],
+	results: Union[str,Path],
+	model_file: Union[str,Path] = "./stats/incremental_model.pkl",
+	chunk_rows: int = 100000,
+	temp_index: int = 0,
+	max_clusters: int = 10,
+	refit: bool = False,
+	max_plot_points: int = 5000,
+	processes: Optional[int] = None,
+) -> IncrementalStatsModel:
+	"""out of core version of the PCA and clustering of extract_stats for sweeps too large for memory
+	params and results are memory mapped and read in chunks of chunk_rows rows. the fitted models are saved in model_file
+	and later calls only read rows which were added since (refit=True starts over).
+	the PCA and cluster figures are saved under ./stats/incremental using a random subset of at most max_plot_points rows.
+	returns the updated model
+	"""
+	model_file = Path(model_file)
+	if model_file.is_file() and not refit:
+		model = IncrementalStatsModel.load(model_file)
+		if model.temp_index != temp_index or model.max_clusters != max_clusters:
+			raise ValueError(str(model_file)+" was fitted with temp_index="+str(model.temp_index)+" max_clusters="+str(model.max_clusters)+", refit the model to change them")
+	else:
+		model = IncrementalStatsModel(max_clusters=max_clusters, temp_index=temp_index)
+	start_time = time.time()
+	report = lambda done, total : print("stats: consumed "+str(done)+"/"+str(total)+" rows")
+	new_rows = model.update_from_files(params, results, chunk_rows, progress=report)
+	model.save(model_file)
+	print("stats: fitted "+str(new_rows)+" new rows in "+str(round(time.time()-start_time,1))+"s, model has seen "+str(model.rows_consumed)+" rows ("+str(model.rows_fitted)+" clean)")
+	if not model.fitted:
+		print("stats: not enough clean rows to fit the model yet")
+		return model
+	optimal_num_clusters = int(elbow_point(list(range(1, max_clusters + 1)), list(model.inertias)))
+	# figures use a sorted random subset so only those rows are read from the memory mapped files
+	params_map, results_map = load_training_arrays(params, results)
+	rows = np.arange(len(params_map))
+	if len(rows) > max_plot_points:
+		rows = np.sort(np.random.default_rng(0).choice(len(rows), size=max_plot_points, replace=False))
+	sample_params, sample_results = clean_training_rows(params_map[rows], results_map[rows], temp_index)
+	if len(sample_params) == 0:
+		print("stats: no clean rows in the plotted subset")
+		return model
+	pca_result = model.transform(sample_params)
+	components = model.pca.components_
+	out_dir = Path("./stats/incremental")
+	out_dir.mkdir(parents=True, exist_ok=True)
+	jobs = [
+		(run_pca_and_save_plot, (sample_params,str(out_dir)+"/PCA_params.png"), {"pca_result": pca_result, "components": components}),
+		(create_pca_biplot_with_clusters, (sample_params,sample_results,str(out_dir)+"/heatmapresults_params.png"), {"pca_result": pca_result, "components": components, "cluster_assignments": model.predict(sample_params, optimal_num_clusters)}),
+	]
+	errors = render_stats_figures(jobs, processes)
+	print("stats: "+str(optimal_num_clusters)+" clusters, rendered "+str(len(jobs)-len(errors))+"/"+str(len(jobs))+" figures")
+	for error in errors:
+		print("stats: figure failed: "+error)
+	return model
 
 
 
@@ -823,10 +2032,53 @@ if __name__ == "__main__":
 	extract_stats_parser = subparsers.add_parser("extract_stats", help="Run the extract_stats function.")
 	extract_stats_parser.add_argument("-p", "--params", default="training_params.npy", help="File path for params (default: training_params.npy)")
 	extract_stats_parser.add_argument("-r", "--results", default="training_results.npy", help="File path for results (default: training_results.npy)")
+	extract_stats_parser.add_argument("--temp-index", type=int, default=0, help="which temperature to use for multi temperature results (default: 0)")
+	extract_stats_parser.add_argument("--processes", type=int, default=None, help="number of worker processes for fitting and plotting (default: cpu count)")
+	extract_stats_parser.add_argument("--cache-dir", default="./stats/.cache", help="directory of cached PCA/clustering results (default: ./stats/.cache)")
+	extract_stats_parser.add_argument("--no-cache", action="store_true", help="refit PCA/clustering even if the dataset was seen before")
+	extract_stats_parser.add_argument("--incremental", action="store_true", help="out of core mode: fit incremental PCA and mini batch kmeans on chunks and only the PCA/cluster figures")
+	extract_stats_parser.add_argument("--model", default="./stats/incremental_model.pkl", help="incremental: saved model, updated with rows added since the last run (default: ./stats/incremental_model.pkl)")
+	extract_stats_parser.add_argument("--chunk-rows", type=int, default=100000, help="incremental: rows read per chunk (default: 100000)")
+	extract_stats_parser.add_argument("--refit", action="store_true", help="incremental: discard the saved model and fit from scratch")
 
 	# Subparser for get_training_data mode
 	get_training_data_parser = subparsers.add_parser("get_training_data", help="Run the get_training_data function.")
 	get_training_data_parser.add_argument("-t", "--test-mode", action="store_true", help="Set test_mode to True (default: False)")
+	get_training_data_parser.add_argument("--temps", nargs="+", type=float, default=[float(27)], help="Simulation temperatures, all simulated in one ngspice run per point (default: 27)")
+	get_training_data_parser.add_argument("--warm-pool", action="store_true", help="build the shared primitives once before forking the worker processes and report the time saved per worker")
+
+	# Subparser for the work queue sweep
+	sweep_parser = subparsers.add_parser("sweep", help="Run the training sweep from a work queue shared by several worker processes.")
+	sweep_parser.add_argument("action", choices=["init","worker","status","merge"], help="init: create the queue, worker: run jobs from the queue, status: print progress, merge: write training_params.npy and training_results.npy")
+	sweep_parser.add_argument("--db", default="./sweep_queue.db", help="queue file (default: ./sweep_queue.db)")
+	sweep_parser.add_argument("-t", "--test-mode", action="store_true", help="init: queue the test mode parameter list")
+	sweep_parser.add_argument("--temps", nargs="+", type=float, default=[float(27)], help="init: simulation temperatures (default: 27)")
+	sweep_parser.add_argument("--lease", type=float, default=1800, help="init: seconds without a heartbeat before a job is issued again (default: 1800)")
+	sweep_parser.add_argument("--max-attempts", type=int, default=3, help="init: attempts before a job is marked failed (default: 3)")
+	sweep_parser.add_argument("-j", "--processes", type=int, default=1, help="worker: number of worker processes on this machine (default: 1)")
+	sweep_parser.add_argument("--allow-partial", action="store_true", help="merge: merge even if jobs are unfinished")
+	sweep_parser.add_argument("--warm-pool", action="store_true", help="worker: build the shared primitives once before forking the worker processes and report the time saved per worker")
+
+	# Subparser for corner and Monte Carlo mode
+	variation_parser = subparsers.add_parser("variation", help="Simulate design points at process corners with mismatch samples and report mean, sigma, and yield.")
+	variation_parser.add_argument("-p", "--params", default="training_params.npy", help="File path for params (default: training_params.npy)")
+	variation_parser.add_argument("-r", "--results", default=None, help="results of a previous sweep, its bias voltages are reused instead of searching for them again")
+	variation_parser.add_argument("-i", "--indices", nargs="+", type=int, default=None, help="rows of the params file to simulate (default: all)")
+	variation_parser.add_argument("--corners", nargs="+", choices=PROCESS_CORNERS, default=list(PROCESS_CORNERS), help="process corners (default: tt ff ss fs sf)")
+	variation_parser.add_argument("-n", "--samples", type=int, default=20, help="mismatch samples per corner, all simulated in one ngspice run (default: 20)")
+	variation_parser.add_argument("--no-mismatch", action="store_true", help="simulate each corner once without mismatch")
+	variation_parser.add_argument("--min", nargs=2, action="append", default=[], metavar=("RESULT","VALUE"), help="yield spec RESULT >= VALUE, can be repeated")
+	variation_parser.add_argument("--max", nargs=2, action="append", default=[], metavar=("RESULT","VALUE"), help="yield spec RESULT <= VALUE, can be repeated")
+	variation_parser.add_argument("--seed", type=int, default=1, help="seed of the first mismatch sample (default: 1)")
+	variation_parser.add_argument("--processes", type=int, default=8, help="design points simulated at the same time (default: 8)")
+	variation_parser.add_argument("--prefix", default="variation", help="save <prefix>_samples.npy, <prefix>_bias.npy, and <prefix>_summary.json (default: variation)")
+	variation_parser.add_argument("--temp", type=float, default=float(27), help="Simulation temperature")
+
+	# Subparser for failure triage
+	triage_parser = subparsers.add_parser("triage", help="Print the most common failure signatures of recorded sweep failures.")
+	triage_parser.add_argument("--failure-dir", default="./sweep_failures", help="directory of the failure log (default: ./sweep_failures)")
+	triage_parser.add_argument("--top", type=int, default=10, help="number of signatures to list (default: 10)")
+	triage_parser.add_argument("--examples", type=int, default=3, help="example parameter vectors per signature (default: 3)")
 
 	# Subparser for gen_opamp mode
 	gen_opamp_parser = subparsers.add_parser("gen_opamp", help="Run the gen_opamp function.")
@@ -841,24 +2093,155 @@ if __name__ == "__main__":
 	gen_opamp_parser.add_argument("--output_gds", help="Filename for outputing opamp (gen_opamp mode only)")
 	gen_opamp_parser.add_argument("--temp", type=float, default=float(27), help="Simulation temperature")
 
+	# Subparser for optimize mode
+	optimize_parser = subparsers.add_parser("optimize", help="Run Bayesian optimization to find an opamp meeting a spec.")
+	optimize_parser.add_argument("--objective", default="area", choices=list(opamp_results_de_serializer().keys()), help="result to optimize (default: area)")
+	optimize_parser.add_argument("--maximize", action="store_true", help="maximize the objective instead of minimizing it")
+	optimize_parser.add_argument("--min", nargs=2, action="append", default=[], metavar=("RESULT","VALUE"), help="constraint RESULT >= VALUE, can be repeated (e.g. --min ugb 1e7 --min phaseMargin 60)")
+	optimize_parser.add_argument("--max", nargs=2, action="append", default=[], metavar=("RESULT","VALUE"), help="constraint RESULT <= VALUE, can be repeated")
+	optimize_parser.add_argument("-n", "--num-evaluations", type=int, default=100, help="number of new opamps to simulate (default: 100)")
+	optimize_parser.add_argument("-b", "--batch-size", type=int, default=8, help="number of simulations in flight (default: 8)")
+	optimize_parser.add_argument("--warm-start", nargs=2, action="append", default=None, metavar=("PARAMS","RESULTS"), help="previous sweep data used as warm start, can be repeated (default: training_params.npy training_results.npy)")
+	optimize_parser.add_argument("--history-prefix", default="optimize", help="save evaluated points to <prefix>_params.npy and <prefix>_results.npy (default: optimize)")
+	optimize_parser.add_argument("--seed", type=int, default=None, help="random seed")
+	optimize_parser.add_argument("--max-training-points", type=int, default=500, help="fit the gaussian processes on at most this many points (default: 500)")
+	optimize_parser.add_argument("--temp", type=float, default=float(27), help="Simulation temperature")
+	optimize_parser.add_argument("--space", default=None, help="take the search bounds from a parameter space file instead of OPAMP_OPTIMIZE_BOUNDS (constraints are not used)")
+
 	# Testing
+	# Subparser for the flat vs hierarchical output comparison
+	compare_hierarchy_parser = subparsers.add_parser("compare_hierarchy", help="Compare gds size, cell count, write time, and extraction time of flat, hierarchical, and deduplicated hierarchical output.")
+	compare_hierarchy_parser.add_argument("--output-dir", default="./hierarchy_compare", help="Directory for <index>_<mode>.gds and comparison.json (default: ./hierarchy_compare)")
+	compare_hierarchy_parser.add_argument("--no-extract", action="store_true", help="Do not time magic extraction")
+	compare_hierarchy_parser.add_argument("--num-points", type=int, default=0, help="compare this many random points of the sweep parameter list instead of the default opamp (default: 0)")
+	compare_hierarchy_parser.add_argument("--seed", type=int, default=None, help="random seed used to pick the sweep points")
+
+	# Subparser for the area estimate check
+	compare_area_parser = subparsers.add_parser("compare_area", help="Compare the analytic opamp bounding box estimate with built layouts.")
+	compare_area_parser.add_argument("--num-points", type=int, default=0, help="compare this many random points of the sweep parameter list instead of the default opamp (default: 0)")
+	compare_area_parser.add_argument("--seed", type=int, default=None, help="random seed used to pick the sweep points")
+
 	test = subparsers.add_parser("test", help="Test mode")
 	test.add_argument("--output_dir", type=Path, default="./", help="Directory for output GDS file")
 	test.add_argument("--temp", type=float, default=float(27), help="Simulation temperature")
+	test.add_argument("--temps", nargs="+", type=float, default=None, help="Simulation temperatures, overrides --temp")
 	
+	for space_parser in [get_training_data_parser, sweep_parser]:
+		space_parser.add_argument("--space", default=None, help="yaml/json parameter space to sweep instead of the built in list (e.g. opamp_param_space.yaml)")
+		space_parser.add_argument("--sampling", choices=SAMPLING_METHODS, default="grid", help="how to pick points from --space (default: grid)")
+		space_parser.add_argument("--num-points", type=int, default=1000, help="number of points for sobol, lhs, and random sampling (default: 1000)")
+		space_parser.add_argument("--seed", type=int, default=None, help="seed for sobol, lhs, and random sampling")
+		space_parser.add_argument("--max-area", type=float, default=None, help="skip points whose estimated opamp bounding box is above this many um^2 (see pygen/area_estimate.py)")
+
+	for pex_parser in [get_training_data_parser, optimize_parser, test, sweep_parser, variation_parser]:
+		pex_parser.add_argument("--pex-cache", default="./pex_cache", help="directory of the extraction cache (default: ./pex_cache)")
+		pex_parser.add_argument("--no-pex-cache", action="store_true", help="always run magic, even for layouts which were already extracted")
+
+	for archive_parser in [get_training_data_parser, optimize_parser, sweep_parser, variation_parser]:
+		archive_parser.add_argument("--gds-archive", default=None, help="store layouts in this archive file instead of one gds file per point (read it with pygen/pdk/util/gds_archive.py or write_opamp_matrix)")
+
+	for hierarchy_parser in [get_training_data_parser, optimize_parser, test, sweep_parser, variation_parser, gen_opamp_parser]:
+		hierarchy_parser.add_argument("--hierarchical", action="store_true", help="keep unique subcells as gds cells instead of flattening (smaller gds, extraction is still flat)")
+
+	for memory_parser in [get_training_data_parser, optimize_parser, test, sweep_parser, variation_parser, gen_opamp_parser]:
+		memory_parser.add_argument("--memory-profile", choices=["rss","trace"], default=None, help="record memory use of every generator (trace also records python allocations but is ~2-3x slower)")
+		memory_parser.add_argument("--memory-budget", type=float, default=None, help="abort a layout build with MemoryError when the process rss grows by more than this many MB during the build")
+		memory_parser.add_argument("--memory-report-dir", default="./memory_reports", help="where --memory-profile writes memory_<pid>.json (default: ./memory_reports)")
+
+	for failure_parser in [get_training_data_parser, optimize_parser, sweep_parser]:
+		failure_parser.add_argument("--failure-dir", default="./sweep_failures", help="where failed points are recorded (default: ./sweep_failures)")
+		failure_parser.add_argument("--keep-failures", type=int, default=3, help="temp directories kept per failure class (default: 3)")
+		failure_parser.add_argument("--retry", nargs=2, action="append", default=[], metavar=("CLASS","RETRIES"), help="retries for a failure class, one of " + ", ".join(FAILURE_CLASSES) + " (default: timeout 2, extraction_error 1, simulation_error 1, others 0)")
+		failure_parser.add_argument("--no-failure-log", action="store_true", help="do not record failures, a failing point stops the run")
+		failure_parser.add_argument("--sim-timeout", type=float, default=None, help="seconds before a ngspice run is killed (default: no limit)")
+
 	args = parser.parse_args()
 
-	# Simulation Temperature
-	global SIM_TEMP
-	SIM_TEMP = args.temp
+	if (args.mode in ["get_training_data","optimize","test","variation"] or getattr(args, "action", None)=="worker") and not args.no_pex_cache:
+		enable_pex_cache(args.pex_cache)
+
+	if args.mode in ["get_training_data","optimize"] or getattr(args, "action", None)=="worker":
+		SIM_TIMEOUT = args.sim_timeout
+		if not args.no_failure_log:
+			enable_failure_log(args.failure_dir, args.keep_failures, {name: int(retries) for name, retries in args.retry})
+
+	if getattr(args, "gds_archive", None):
+		enable_gds_archive(args.gds_archive)
+
+	if getattr(args, "hierarchical", False):
+		set_hierarchical_output(True)
+
+	# set before any Pool is started so the workers inherit it
+	if getattr(args, "memory_profile", None) or getattr(args, "memory_budget", None):
+		set_memory_profile(args.memory_profile, args.memory_budget, args.memory_report_dir if args.memory_profile else None)
+
+	# Simulation Temperature(s)
+	if getattr(args, "temps", None):
+		SIM_TEMPS = list(args.temps)
+	elif getattr(args, "temp", None) is not None:
+		SIM_TEMPS = [args.temp]
 
 	if args.mode=="extract_stats":
 		# Call the extract_stats function with the specified file paths or defaults
-		extract_stats(params=args.params, results=args.results)
+		if args.incremental:
+			extract_stats_incremental(args.params, args.results, model_file=args.model, chunk_rows=args.chunk_rows, temp_index=args.temp_index, refit=args.refit, processes=args.processes)
+		else:
+			extract_stats(params=args.params, results=args.results, temp_index=args.temp_index, processes=args.processes, cache_dir=None if args.no_cache else args.cache_dir)
 
 	elif args.mode=="get_training_data":
 		# Call the get_training_data function with test_mode flag
-		get_training_data(test_mode=args.test_mode)
+		get_training_data(test_mode=args.test_mode, space=args.space, sampling=args.sampling, num_points=args.num_points, seed=args.seed, max_area=args.max_area, warm_pool=args.warm_pool)
+
+	elif args.mode=="triage":
+		print(triage_report(args.failure_dir, args.top, args.examples))
+
+	elif args.mode=="sweep":
+		if args.action=="init":
+			params = get_parameter_list(args.test_mode, args.space, args.sampling, args.num_points, args.seed, args.max_area)
+			init_sweep_queue(args.db, args.test_mode, args.lease, args.max_attempts, params)
+		elif args.action=="worker":
+			run_sweep_worker(args.db, args.processes, args.warm_pool)
+		elif args.action=="status":
+			print(SweepQueue(args.db).progress())
+		else:
+			merge_sweep_queue(args.db, args.allow_partial)
+
+	elif args.mode=="variation":
+		params = np.atleast_2d(np.load(args.params))
+		indices = args.indices if args.indices is not None else list(range(len(params)))
+		bias_list = None
+		if args.results:
+			results = np.load(args.results)
+			# multi temperature results, use the first temperature
+			results = results[:,0,:] if results.ndim==3 else results
+			bias_list = results[indices][:,3:5]
+		spec = [(name, ">=", float(value)) for name, value in args.min]
+		spec += [(name, "<=", float(value)) for name, value in args.max]
+		biases, samples, summaries = run_variation_analysis(params[indices], args.corners, args.samples, spec, not args.no_mismatch, args.seed, bias_list, args.processes)
+		np.save(args.prefix+"_samples.npy", samples)
+		np.save(args.prefix+"_bias.npy", biases)
+		with open(args.prefix+"_summary.json", "w") as summary_file:
+			json.dump([{"index": index, "corners": summary} for index, summary in zip(indices, summaries)], summary_file, indent=2)
+		for index, summary in zip(indices, summaries):
+			print("design point " + str(index) + ":")
+			for corner, corner_summary in summary.items():
+				stats = ", ".join([name + " " + format(corner_summary[name]["mean"],".4g") + " +/- " + format(corner_summary[name]["sigma"],".3g") for name in VARIATION_RESULT_NAMES])
+				print("\t" + corner + ": yield " + format(100*corner_summary["yield"],".1f") + "% (" + str(corner_summary["valid_samples"]) + "/" + str(corner_summary["samples"]) + " simulated), " + stats)
+
+	elif args.mode=="optimize":
+		constraints = [(name, ">=", float(value)) for name, value in args.min]
+		constraints += [(name, "<=", float(value)) for name, value in args.max]
+		bounds = ParameterSpace.from_file(args.space).bounds() if args.space else OPAMP_OPTIMIZE_BOUNDS
+		optimizer = OpampBayesianOptimizer(objective=args.objective, minimize=not args.maximize, constraints=constraints, bounds=bounds, seed=args.seed, max_training_points=args.max_training_points)
+		warm_start = args.warm_start if args.warm_start is not None else [("training_params.npy","training_results.npy")]
+		best_params, best_results = optimize_opamp(optimizer, args.num_evaluations, args.batch_size, warm_start, args.history_prefix, args.temp)
+		if best_params is None:
+			print("no opamp meeting the spec was found")
+		else:
+			print("best opamp parameters:")
+			print(opamp_parameters_de_serializer(best_params))
+			print("best opamp results:")
+			print(opamp_results_de_serializer(best_results))
 
 	elif args.mode=="gen_opamp":
 		from pygen.pdk.sky130_mapped.sky130_mapped import sky130_mapped_pdk as pdk
@@ -888,6 +2271,22 @@ if __name__ == "__main__":
 		opamp_comp_final.show()
 		if args.output_gds:
 			opamp_comp_final.write_gds(args.output_gds)
+		if args.memory_profile:
+			print(format_memory_report(merge_memory_reports([write_memory_report()])))
+
+	elif args.mode=="compare_hierarchy":
+		parameter_list = None
+		if args.num_points > 0:
+			parameter_list = get_small_parameter_list()
+			parameter_list = parameter_list[np.random.default_rng(args.seed).choice(len(parameter_list), size=min(args.num_points, len(parameter_list)), replace=False)]
+		compare_hierarchy_output(parameter_list, output_dir=args.output_dir, extract=not args.no_extract)
+
+	elif args.mode=="compare_area":
+		parameter_list = None
+		if args.num_points > 0:
+			parameter_list = get_small_parameter_list()
+			parameter_list = parameter_list[np.random.default_rng(args.seed).choice(len(parameter_list), size=min(args.num_points, len(parameter_list)), replace=False)]
+		compare_area_estimate(parameter_list)
 
 	elif args.mode == "test":
 		params = {
@@ -0,0 +1,179 @@
+"""out of core PCA and clustering of training sweeps
+extract_stats loads every row into memory and fits PCA/KMeans in batch, which does not scale to sweeps of millions of
+points. IncrementalStatsModel fits an IncrementalPCA and one MiniBatchKMeans per cluster count on chunks read from
+memory mapped .npy files, so only one chunk is in memory at a time. the model is saved with the number of rows it
+consumed from every results file, so when a sweep adds rows (or new result files are added) updating the model only
+reads the new rows instead of refitting from scratch.
+****NOTE: the kmeans inertias are accumulated while fitting (each chunk is scored by the centers at that time), they
+are good enough to pick the elbow but are not the exact final inertia
+"""
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+
+# bump when the saved model changes so stale models are not reused
+STATS_MODEL_VERSION = 1
+
+# rows hashed to recognize a results file which was replaced by a different sweep
+FINGERPRINT_ROWS = 1024
+
+
+def clean_training_rows(params: np.array, results: np.array, temp_index: int = 0) -> tuple[np.array,np.array]:
+	"""drops failed runs and negative phase margins (the same rows extract_stats drops)
+	multi temperature results (points, temperatures, 8) are reduced to temperature temp_index"""
+	results = np.asarray(results)
+	if results.ndim == 3:
+		results = results[:, temp_index, :]
+	keep = np.all(results > 0, axis=1)
+	return np.asarray(params, dtype=np.float64)[keep], np.asarray(results, dtype=np.float64)[keep]
+
+
+def load_training_arrays(params_file: Union[str,Path], results_file: Union[str,Path]) -> tuple[np.array,np.array]:
+	"""memory maps a params/results pair, nothing is read until rows are indexed"""
+	params = np.load(Path(params_file).resolve(), mmap_mode="r")
+	results = np.load(Path(results_file).resolve(), mmap_mode="r")
+	if len(params) != len(results):
+		raise ValueError("expect both results and params to be same length, got " + str(len(params)) + " and " + str(len(results)))
+	return params, results
+
+
+def iter_training_chunks(
+	params_file: Union[str,Path],
+	results_file: Union[str,Path],
+	chunk_rows: int = 100000,
+	start_row: int = 0,
+	temp_index: int = 0,
+) -> Iterator[tuple[int,np.array,np.array]]:
+	"""yields (end row, clean params, clean results) for chunks of chunk_rows rows starting at start_row"""
+	if chunk_rows < 1:
+		raise ValueError("chunk_rows must be at least 1")
+	params, results = load_training_arrays(params_file, results_file)
+	for start in range(start_row, len(params), chunk_rows):
+		end = min(start + chunk_rows, len(params))
+		clean_params, clean_results = clean_training_rows(params[start:end], results[start:end], temp_index)
+		yield end, clean_params, clean_results
+
+
+def file_fingerprint(params_file: Union[str,Path], rows: int) -> str:
+	"""hash of the first rows of a params file"""
+	params = np.load(Path(params_file).resolve(), mmap_mode="r")
+	return hashlib.sha256(np.ascontiguousarray(params[:min(rows, FINGERPRINT_ROWS)], dtype=np.float64).tobytes()).hexdigest()
+
+
+class IncrementalStatsModel:
+	"""incrementally fitted 2 component PCA and kmeans (k=1..max_clusters) of sweep parameters
+	args:
+	max_clusters = largest cluster count, the elbow of the inertias picks the count used for labels
+	temp_index = temperature used for multi temperature results
+	random_state = seed of the kmeans initialization
+	"""
+	def __init__(self, max_clusters: int = 10, temp_index: int = 0, random_state: int = 0):
+		if max_clusters < 1:
+			raise ValueError("max_clusters must be at least 1")
+		self.version = STATS_MODEL_VERSION
+		self.max_clusters = max_clusters
+		self.temp_index = temp_index
+		self.pca = IncrementalPCA(n_components=2)
+		self.kmeans = [MiniBatchKMeans(n_clusters=k, n_init=3, random_state=random_state) for k in range(1, max_clusters + 1)]
+		self.inertias = np.zeros(max_clusters)
+		self.rows_fitted = 0
+		# resolved results file -> {"rows": rows consumed, "fingerprint": file_fingerprint of the params file}
+		self.sources = dict()
+		# the first fit needs at least max_clusters rows, smaller chunks wait here (and are saved with the model)
+		self.pending = np.zeros((0, 0))
+		self.updated = None
+
+	@property
+	def fitted(self) -> bool:
+		return self.rows_fitted > 0
+
+	@property
+	def rows_consumed(self) -> int:
+		"""rows read from all sources, including failed runs which are not fitted"""
+		return sum(source["rows"] for source in self.sources.values())
+
+	def partial_fit(self, params: np.array) -> int:
+		"""updates the models with a chunk of clean parameter rows, returns the number of rows fitted now"""
+		params = np.asarray(params, dtype=np.float64)
+		if len(params) == 0:
+			return 0
+		if len(self.pending):
+			params = np.concatenate([self.pending, params])
+			self.pending = np.zeros((0, 0))
+		# the first batch has to initialize every kmeans and the pca
+		if not self.fitted and len(params) < max(self.max_clusters, 2):
+			self.pending = params
+			return 0
+		self.pca.partial_fit(params)
+		for i, kmeans in enumerate(self.kmeans):
+			kmeans.partial_fit(params)
+			self.inertias[i] += -kmeans.score(params)
+		self.rows_fitted += len(params)
+		return len(params)
+
+	def update_from_files(
+		self,
+		params_file: Union[str,Path],
+		results_file: Union[str,Path],
+		chunk_rows: int = 100000,
+		progress: Optional[Callable[[int,int],None]] = None,
+	) -> int:
+		"""fits the rows of a params/results pair which were not consumed by an earlier update
+		args:
+		params_file, results_file = .npy files from get_training_data or sweep merge
+		chunk_rows = rows read per chunk
+		progress = called with (rows consumed, total rows) after every chunk
+		returns the number of new rows consumed
+		****NOTE: rows must only be appended to a results file, a file whose first rows changed raises ValueError
+		"""
+		key = str(Path(results_file).resolve())
+		params, _ = load_training_arrays(params_file, results_file)
+		total_rows = len(params)
+		del params
+		source = self.sources.get(key)
+		start_row = 0
+		if source is not None:
+			if source["rows"] > total_rows or file_fingerprint(params_file, source["rows"]) != source["fingerprint"]:
+				raise ValueError(key + " changed since the model was last updated, refit the model")
+			start_row = source["rows"]
+		for end_row, clean_params, _ in iter_training_chunks(params_file, results_file, chunk_rows, start_row, self.temp_index):
+			self.partial_fit(clean_params)
+			self.sources[key] = {"rows": end_row, "fingerprint": file_fingerprint(params_file, end_row)}
+			if progress is not None:
+				progress(end_row, total_rows)
+		self.updated = time.time()
+		return total_rows - start_row
+
+	def transform(self, params: np.array) -> np.array:
+		"""projects parameter rows onto the 2 principal components"""
+		return self.pca.transform(np.asarray(params, dtype=np.float64))
+
+	def predict(self, params: np.array, num_clusters: int) -> np.array:
+		"""cluster labels of parameter rows using the kmeans with num_clusters clusters"""
+		return self.kmeans[num_clusters - 1].predict(np.asarray(params, dtype=np.float64))
+
+	def save(self, path: Union[str,Path]) -> Path:
+		"""pickles the model, writing then renaming so an interrupted save never leaves a truncated file"""
+		path = Path(path)
+		path.parent.mkdir(parents=True, exist_ok=True)
+		tmp_path = path.with_name(path.name + "." + str(os.getpid()) + ".tmp")
+		with open(tmp_path, "wb") as model_file:
+			pickle.dump(self, model_file)
+		tmp_path.replace(path)
+		return path
+
+	@classmethod
+	def load(cls, path: Union[str,Path]) -> "IncrementalStatsModel":
+		with open(path, "rb") as model_file:
+			model = pickle.load(model_file)
+		if not isinstance(model, cls) or getattr(model, "version", None) != STATS_MODEL_VERSION:
+			raise ValueError(str(path) + " is not a stats model of version " + str(STATS_MODEL_VERSION) + ", refit the model")
+		return model
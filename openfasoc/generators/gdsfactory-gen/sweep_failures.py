@@ -0,0 +1,227 @@
+"""structured failure capture, retry policies, and triage for sweep points
+a failed point is recorded as one json line in <failure_dir>/failures.jsonl with the failing stage, failure class,
+exception type, message, stderr/log tail, and the parameters. the temp directory of the first few failures of every
+class is copied to <failure_dir>/kept/<class>/<n> so the magic/ngspice inputs and logs can be inspected later.
+usage: python sweep_failures.py <failure_dir> [--top 10] prints the triage report
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import time
+import traceback
+from collections import Counter, defaultdict
+from pathlib import Path
+from shutil import copytree
+from subprocess import TimeoutExpired
+from typing import Optional, Union
+
+import numpy as np
+
+# stages of a sweep point in the order they run
+FAILURE_STAGES = ("layout", "extraction", "simulation", "results")
+
+# timeout = a tool ran out of time, out_of_memory = the build went over the pygen memory budget (see
+# pygen/pdk/util/memory_profile.py), layout_error = the generator raised (invalid parameters or geometry),
+# extraction_error = magic failed, simulation_error = ngspice failed, measurement_failed = the simulation ran
+# but did not produce usable results (e.g. no unity gain crossing)
+FAILURE_CLASSES = ("timeout", "out_of_memory", "layout_error", "extraction_error", "simulation_error", "measurement_failed")
+
+# number of retries for each failure class, failures which are properties of the design are not retried
+DEFAULT_RETRY_POLICY = {
+	"timeout": 2,
+	"out_of_memory": 0,
+	"layout_error": 0,
+	"extraction_error": 1,
+	"simulation_error": 1,
+	"measurement_failed": 0,
+}
+
+
+class SweepPointFailure(Exception):
+	"""raised by a stage of a sweep point, carries everything needed to classify and record the failure
+	args:
+	stage = one of FAILURE_STAGES
+	cause = the exception raised by the stage (None for failures detected without an exception)
+	log_tail = last lines of the tool log or traceback
+	failure_class = overrides the class derived from the stage and cause
+	"""
+	def __init__(self, stage: str, cause: Optional[BaseException] = None, log_tail: str = "", failure_class: Optional[str] = None, message: Optional[str] = None):
+		if stage not in FAILURE_STAGES:
+			raise ValueError("stage must be one of " + str(FAILURE_STAGES))
+		self.stage = stage
+		self.cause = cause
+		self.log_tail = log_tail
+		self.failure_class = failure_class if failure_class is not None else classify_failure(stage, cause)
+		self.message = message if message is not None else (str(cause).splitlines()[0] if cause is not None and str(cause) else "")
+		super().__init__(stage + " failed (" + self.failure_class + "): " + self.message)
+
+	@property
+	def exception_type(self) -> str:
+		return type(self.cause).__name__ if self.cause is not None else "None"
+
+
+def classify_failure(stage: str, cause: Optional[BaseException] = None) -> str:
+	"""returns the failure class of an exception raised in stage"""
+	if isinstance(cause, TimeoutExpired) or type(cause).__name__.endswith("Timeout"):
+		return "timeout"
+	if isinstance(cause, MemoryError):
+		return "out_of_memory"
+	return {"layout": "layout_error", "extraction": "extraction_error", "simulation": "simulation_error", "results": "measurement_failed"}[stage]
+
+
+def tail(text: str, num_lines: int = 20) -> str:
+	return "\n".join(text.splitlines()[-num_lines:])
+
+
+def read_log_tail(path: Union[str,Path], num_lines: int = 20) -> str:
+	"""returns the last lines of a log file or an empty string if it does not exist"""
+	path = Path(path)
+	if not path.is_file():
+		return ""
+	return tail(path.read_text(errors="replace"), num_lines)
+
+
+def failure_signature(failure_class: str, stage: str, exception_type: str, message: str) -> str:
+	"""groups failures which differ only in numbers, paths, or addresses"""
+	message = re.sub(r"(/[^\s:'\"]+)+", "<path>", message)
+	message = re.sub(r"0x[0-9a-fA-F]+", "<addr>", message)
+	message = re.sub(r"[-+]?\d+(\.\d+)?([eE][-+]?\d+)?", "#", message)
+	return failure_class + " | " + stage + " | " + exception_type + " | " + message.strip()[:160]
+
+
+class FailureLog:
+	"""records failures of sweep points, shared by all worker processes through failure_dir
+	args:
+	failure_dir = directory for failures.jsonl and the kept temp directories
+	keep_per_class = number of temp directories kept for every failure class
+	retry_policy = {failure class: number of retries}, missing classes use DEFAULT_RETRY_POLICY
+	"""
+	def __init__(self, failure_dir: Union[str,Path] = "./sweep_failures", keep_per_class: int = 3, retry_policy: Optional[dict[str,int]] = None):
+		self.failure_dir = Path(failure_dir).resolve()
+		self.failure_dir.mkdir(parents=True, exist_ok=True)
+		self.keep_per_class = keep_per_class
+		self.retry_policy = dict(DEFAULT_RETRY_POLICY)
+		for failure_class, retries in (retry_policy or dict()).items():
+			if failure_class not in FAILURE_CLASSES:
+				raise ValueError("failure class must be one of " + str(FAILURE_CLASSES))
+			self.retry_policy[failure_class] = int(retries)
+
+	@property
+	def log_file(self) -> Path:
+		return self.failure_dir / "failures.jsonl"
+
+	def should_retry(self, failure: SweepPointFailure, attempt: int) -> bool:
+		"""attempt counts from 0, so attempt 0 is the first try"""
+		return attempt < self.retry_policy.get(failure.failure_class, 0)
+
+	def keep(self, failure_class: str, work_dir: Union[str,Path], index) -> Optional[Path]:
+		"""copies work_dir to kept/<class>/<n>/<index> if fewer than keep_per_class were kept, returns the copy"""
+		class_dir = self.failure_dir / "kept" / failure_class
+		class_dir.mkdir(parents=True, exist_ok=True)
+		for slot in range(self.keep_per_class):
+			# mkdir is atomic, so concurrent workers never take the same slot
+			try:
+				(class_dir / str(slot)).mkdir()
+			except FileExistsError:
+				continue
+			kept_dir = class_dir / str(slot) / str(index)
+			copytree(work_dir, kept_dir, symlinks=True)
+			return kept_dir
+		return None
+
+	def record(
+		self,
+		failure: SweepPointFailure,
+		index,
+		parameters: np.array,
+		attempt: int,
+		will_retry: bool,
+		work_dir: Optional[Union[str,Path]] = None,
+	) -> dict:
+		"""appends a failure to failures.jsonl and keeps work_dir if its class still has free slots"""
+		kept_dir = self.keep(failure.failure_class, work_dir, index) if work_dir is not None and Path(work_dir).is_dir() else None
+		entry = {
+			"time": time.time(),
+			"index": int(index),
+			"attempt": attempt,
+			"will_retry": will_retry,
+			"stage": failure.stage,
+			"failure_class": failure.failure_class,
+			"exception_type": failure.exception_type,
+			"message": failure.message,
+			"signature": failure_signature(failure.failure_class, failure.stage, failure.exception_type, failure.message),
+			"log_tail": failure.log_tail,
+			"parameters": [float(value) for value in np.asarray(parameters).flatten()],
+			"kept_dir": str(kept_dir) if kept_dir is not None else None,
+			"pid": os.getpid(),
+		}
+		# one unbuffered O_APPEND write per line so lines of concurrent workers do not interleave
+		log = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+		try:
+			os.write(log, (json.dumps(entry) + "\n").encode())
+		finally:
+			os.close(log)
+		return entry
+
+
+def load_failures(failure_dir: Union[str,Path]) -> list[dict]:
+	log_file = Path(failure_dir) / "failures.jsonl"
+	if not log_file.is_file():
+		return list()
+	with open(log_file, "r") as log:
+		return [json.loads(line) for line in log if line.strip()]
+
+
+def triage_report(failure_dir: Union[str,Path], top: int = 10, examples: int = 3) -> str:
+	"""returns a text report of the most common failure signatures with example parameter vectors
+	points which succeeded on a retry are counted as recovered"""
+	failures = load_failures(failure_dir)
+	if not failures:
+		return "no failures recorded in " + str(failure_dir)
+	final = [entry for entry in failures if not entry["will_retry"]]
+	retried_points = {entry["index"] for entry in failures if entry["will_retry"]}
+	failed_points = {entry["index"] for entry in final}
+	lines = [
+		"failures recorded: " + str(len(failures)) + " (" + str(len(failed_points)) + " points failed, " + str(len(retried_points - failed_points)) + " recovered by a retry)",
+		"by class: " + ", ".join(name + " " + str(count) for name, count in Counter(entry["failure_class"] for entry in failures).most_common()),
+		"by stage: " + ", ".join(name + " " + str(count) for name, count in Counter(entry["stage"] for entry in failures).most_common()),
+		"",
+	]
+	by_signature = defaultdict(list)
+	for entry in failures:
+		by_signature[entry["signature"]].append(entry)
+	ranked = sorted(by_signature.items(), key=lambda item: len(item[1]), reverse=True)
+	for rank, (signature, entries) in enumerate(ranked[:top]):
+		lines.append(str(rank+1) + ". " + str(len(entries)) + "x " + signature)
+		lines.append("   message: " + entries[0]["message"])
+		# retries of one point have the same parameters, list distinct points
+		example_entries = dict()
+		for entry in entries:
+			example_entries.setdefault(entry["index"], entry)
+		for entry in list(example_entries.values())[:examples]:
+			lines.append("   index " + str(entry["index"]) + " params " + str(entry["parameters"]))
+		kept = [entry["kept_dir"] for entry in entries if entry["kept_dir"]]
+		if kept:
+			lines.append("   kept: " + kept[0])
+		if entries[0]["log_tail"]:
+			lines.append("   log tail:")
+			lines += ["      " + line for line in tail(entries[0]["log_tail"], 5).splitlines()]
+	if len(ranked) > top:
+		lines.append("... " + str(len(ranked)-top) + " more signatures")
+	return "\n".join(lines)
+
+
+def traceback_tail(num_lines: int = 20) -> str:
+	"""tail of the traceback of the exception being handled"""
+	return tail(traceback.format_exc(), num_lines)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="print the triage report of recorded sweep failures")
+	parser.add_argument("failure_dir", nargs="?", default="./sweep_failures", help="failure directory (default: ./sweep_failures)")
+	parser.add_argument("--top", type=int, default=10, help="number of signatures to list (default: 10)")
+	parser.add_argument("--examples", type=int, default=3, help="example parameter vectors per signature (default: 3)")
+	args = parser.parse_args()
+	print(triage_report(args.failure_dir, args.top, args.examples))
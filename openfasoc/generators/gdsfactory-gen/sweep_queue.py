@@ -0,0 +1,313 @@
+"""sqlite work queue for running a parameter sweep with many worker processes
+workers on one machine (or on several machines sharing the queue file) lease parameter indices from the queue,
+keep the lease alive with a heartbeat while they build/simulate, and write the result back into the queue.
+a lease which is not renewed (worker killed, machine lost) expires and the index is issued again.
+when the sweep is finished merge() writes all results into one params/results dataset ordered by index.
+****NOTE: sqlite relies on posix file locks, for workers on several machines the queue must be on a filesystem
+with working locks (local disk exported over NFSv4 with locking, not an SMB share)
+"""
+from __future__ import annotations
+import io
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+# written for results of jobs which failed every attempt (same value the simulation parser uses for failures)
+FAILED_RESULT_VALUE = -987.654321
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	idx INTEGER PRIMARY KEY,
+	params BLOB NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending',
+	owner TEXT,
+	lease_expires REAL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	result BLOB,
+	error TEXT,
+	updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, idx);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB);
+"""
+
+
+def array_to_blob(array: np.array) -> bytes:
+	"""serializes an array (shape and dtype included) for storage in the queue"""
+	buffer = io.BytesIO()
+	np.save(buffer, np.asarray(array), allow_pickle=False)
+	return buffer.getvalue()
+
+
+def blob_to_array(blob: bytes) -> np.array:
+	return np.load(io.BytesIO(blob), allow_pickle=False)
+
+
+def default_worker_name() -> str:
+	"""<hostname>:<pid>, unique for every worker process on the LAN"""
+	return socket.gethostname() + ":" + str(os.getpid())
+
+
+class SweepQueue:
+	"""work queue of parameter indices stored in a sqlite file
+	args:
+	db_path = queue file, created by create()
+	every method opens its own short lived connection so a SweepQueue can be used from forked processes and threads
+	job status is one of pending, leased, done, failed
+	"""
+	def __init__(self, db_path: Union[str,Path], timeout: float = 60):
+		self.db_path = Path(db_path).resolve()
+		self.timeout = timeout
+		if not self.db_path.is_file():
+			raise FileNotFoundError("sweep queue " + str(self.db_path) + " does not exist, create it with SweepQueue.create")
+
+	@classmethod
+	def create(
+		cls,
+		db_path: Union[str,Path],
+		parameter_list: np.array,
+		lease_seconds: float = 600,
+		max_attempts: int = 3,
+		metadata: Optional[dict[str,np.array]] = None,
+	) -> "SweepQueue":
+		"""creates a queue with one job per row of parameter_list
+		args:
+		db_path = queue file to create (must not exist)
+		parameter_list = 2d array, row i is the parameters of job i
+		lease_seconds = time a worker can go without a heartbeat before its job is issued again
+		max_attempts = a job which failed (raised) this many times is marked failed and not issued again
+		metadata = arrays every worker should see (e.g. simulation temperatures), read with get_metadata
+		"""
+		db_path = Path(db_path).resolve()
+		if db_path.exists():
+			raise FileExistsError("sweep queue " + str(db_path) + " already exists")
+		connection = sqlite3.connect(db_path, timeout=60)
+		try:
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.executescript(QUEUE_SCHEMA)
+			with connection:
+				connection.executemany(
+					"INSERT INTO jobs (idx, params, updated) VALUES (?, ?, ?)",
+					((index, array_to_blob(params), time.time()) for index, params in enumerate(parameter_list)),
+				)
+				settings = {"lease_seconds": np.float64(lease_seconds), "max_attempts": np.int64(max_attempts)}
+				for key, value in {**settings, **(metadata or dict())}.items():
+					connection.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, array_to_blob(value)))
+		finally:
+			connection.close()
+		return cls(db_path)
+
+	def __connect(self) -> sqlite3.Connection:
+		# autocommit mode, transactions are started explicitly with BEGIN IMMEDIATE
+		connection = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+		connection.execute("PRAGMA busy_timeout=" + str(int(self.timeout * 1000)))
+		return connection
+
+	def get_metadata(self, key: str) -> np.array:
+		connection = self.__connect()
+		try:
+			row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+		finally:
+			connection.close()
+		if row is None:
+			raise KeyError("sweep queue has no metadata " + key)
+		return blob_to_array(row[0])
+
+	@property
+	def lease_seconds(self) -> float:
+		return float(self.get_metadata("lease_seconds"))
+
+	@property
+	def max_attempts(self) -> int:
+		return int(self.get_metadata("max_attempts"))
+
+	def lease(self, owner: str) -> Optional[tuple[int,np.array]]:
+		"""leases the lowest pending (or expired) job to owner
+		returns (index, params) or None if no job can be issued right now"""
+		lease_seconds, max_attempts = self.lease_seconds, self.max_attempts
+		connection = self.__connect()
+		try:
+			connection.execute("BEGIN IMMEDIATE")
+			now = time.time()
+			# jobs whose workers kept dying count as failed once they used all attempts
+			connection.execute(
+				"UPDATE jobs SET status = 'failed', error = 'lease of ' || owner || ' expired', updated = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+				(now, now, max_attempts),
+			)
+			row = connection.execute(
+				"SELECT idx, params FROM jobs WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? ORDER BY idx LIMIT 1",
+				(now, max_attempts),
+			).fetchone()
+			if row is None:
+				connection.execute("COMMIT")
+				return None
+			connection.execute(
+				"UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE idx = ?",
+				(owner, now + lease_seconds, now, row[0]),
+			)
+			connection.execute("COMMIT")
+		except BaseException:
+			if connection.in_transaction:
+				connection.execute("ROLLBACK")
+			raise
+		finally:
+			connection.close()
+		return int(row[0]), blob_to_array(row[1])
+
+	def heartbeat(self, index: int, owner: str) -> bool:
+		"""extends the lease of a job, returns False if owner no longer holds the lease"""
+		connection = self.__connect()
+		try:
+			now = time.time()
+			cursor = connection.execute(
+				"UPDATE jobs SET lease_expires = ?, updated = ? WHERE idx = ? AND owner = ? AND status = 'leased'",
+				(now + self.lease_seconds, now, index, owner),
+			)
+			return cursor.rowcount == 1
+		finally:
+			connection.close()
+
+	def complete(self, index: int, owner: str, result: np.array) -> bool:
+		"""stores the result of a job
+		a job which expired and was issued again can still be completed by the original owner, the first result wins
+		returns True if the result was stored"""
+		connection = self.__connect()
+		try:
+			cursor = connection.execute(
+				"UPDATE jobs SET status = 'done', owner = ?, result = ?, error = NULL, updated = ? WHERE idx = ? AND status != 'done'",
+				(owner, array_to_blob(result), time.time(), index),
+			)
+			return cursor.rowcount == 1
+		finally:
+			connection.close()
+
+	def fail(self, index: int, owner: str, error: str) -> None:
+		"""records a failed attempt, the job is issued again until it used max_attempts"""
+		connection = self.__connect()
+		try:
+			connection.execute(
+				"UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, owner = NULL, lease_expires = NULL, error = ?, updated = ? WHERE idx = ? AND owner = ? AND status = 'leased'",
+				(self.max_attempts, error, time.time(), index, owner),
+			)
+		finally:
+			connection.close()
+
+	def progress(self) -> dict[str,int]:
+		"""returns the number of jobs in each state, expired leases are counted as expired instead of leased"""
+		connection = self.__connect()
+		try:
+			counts = {"pending": 0, "leased": 0, "expired": 0, "done": 0, "failed": 0}
+			for status, count in connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+				counts[status] = count
+			expired = connection.execute(
+				"SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?", (time.time(),)
+			).fetchone()[0]
+		finally:
+			connection.close()
+		counts["leased"] -= expired
+		counts["expired"] = expired
+		counts["total"] = sum(counts.values())
+		return counts
+
+	def failures(self) -> list[tuple[int,int,str]]:
+		"""returns (index, attempts, last error) of every job which recorded an error"""
+		connection = self.__connect()
+		try:
+			return connection.execute("SELECT idx, attempts, error FROM jobs WHERE error IS NOT NULL ORDER BY idx").fetchall()
+		finally:
+			connection.close()
+
+	def is_finished(self) -> bool:
+		counts = self.progress()
+		return counts["done"] + counts["failed"] == counts["total"]
+
+	def merge(
+		self,
+		params_file: Optional[Union[str,Path]] = None,
+		results_file: Optional[Union[str,Path]] = None,
+		allow_partial: bool = False,
+	) -> tuple[np.array,np.array]:
+		"""returns (params, results) of all jobs ordered by index and optionally saves them as npy files
+		results of failed (or with allow_partial unfinished) jobs are filled with FAILED_RESULT_VALUE
+		args:
+		params_file, results_file = npy files to write
+		allow_partial = merge even if jobs are still pending or leased
+		"""
+		if not allow_partial and not self.is_finished():
+			raise RuntimeError("sweep is not finished: " + str(self.progress()))
+		connection = self.__connect()
+		try:
+			rows = connection.execute("SELECT params, result FROM jobs ORDER BY idx").fetchall()
+		finally:
+			connection.close()
+		params = np.array([blob_to_array(row[0]) for row in rows])
+		results = [blob_to_array(row[1]) if row[1] is not None else None for row in rows]
+		finished = [result for result in results if result is not None]
+		if not finished:
+			raise RuntimeError("sweep queue has no results to merge")
+		results = np.array([result if result is not None else np.full_like(finished[0], FAILED_RESULT_VALUE) for result in results])
+		if params_file is not None:
+			np.save(params_file, params)
+		if results_file is not None:
+			np.save(results_file, results)
+		return params, results
+
+
+def run_worker(
+	queue: Union[SweepQueue,str,Path],
+	evaluate: Callable[[int,np.array],np.array],
+	owner: Optional[str] = None,
+	heartbeat_interval: Optional[float] = None,
+	poll_interval: float = 5,
+	max_jobs: Optional[int] = None,
+) -> int:
+	"""pulls jobs from the queue until the sweep is finished
+	args:
+	queue = SweepQueue or path of the queue file
+	evaluate = function(index, params) -> result array, an exception fails the attempt
+	owner = name of this worker (default: <hostname>:<pid>)
+	heartbeat_interval = seconds between lease renewals (default: a third of the lease)
+	poll_interval = seconds to wait when every remaining job is leased by another worker
+	max_jobs = stop after this many jobs (default: run until the sweep is finished)
+	returns the number of jobs this worker completed
+	****NOTE: the worker keeps polling while other workers hold leases, their jobs are taken over if the leases expire
+	"""
+	queue = queue if isinstance(queue, SweepQueue) else SweepQueue(queue)
+	owner = owner if owner is not None else default_worker_name()
+	heartbeat_interval = heartbeat_interval if heartbeat_interval is not None else queue.lease_seconds / 3
+	completed = 0
+	while max_jobs is None or completed < max_jobs:
+		job = queue.lease(owner)
+		if job is None:
+			if queue.is_finished():
+				break
+			time.sleep(poll_interval)
+			continue
+		index, params = job
+		# renew the lease from a thread while evaluate runs
+		stop_heartbeat = threading.Event()
+		def keep_alive():
+			while not stop_heartbeat.wait(heartbeat_interval):
+				if not queue.heartbeat(index, owner):
+					break
+		heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+		heartbeat_thread.start()
+		try:
+			result = evaluate(index, params)
+		except Exception:
+			queue.fail(index, owner, traceback.format_exc())
+			print("sweep worker " + owner + ": job " + str(index) + " failed")
+			continue
+		finally:
+			stop_heartbeat.set()
+			heartbeat_thread.join()
+		if queue.complete(index, owner, result):
+			completed += 1
+	return completed
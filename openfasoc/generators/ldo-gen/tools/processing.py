@@ -10,12 +10,15 @@ import argparse
 from cairosvg import svg2png
 from PIL import Image
 from scipy.interpolate import make_interp_spline
-import ltspice
 import pandas as pd
 from configure_workspace import *
 from generate_verilog import *
 from simulations import *
 
+# TODO: Find a better way to import modules from parent directory
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from common.simulation_raw import read_raw_file
+
 parser = argparse.ArgumentParser(description="processing simulations")
 parser.add_argument("--file_path", "-f", help="sim path")
 parser.add_argument("--vref", "-v", help="vrefspec")
@@ -60,10 +63,9 @@ def fig_VREG_results(raw_files, vrefspec):
     for i, raw_file in enumerate(raw_files):
         cap_id = str(raw_file).split("/")[-1].split("_")[2] + " "
         freq_id = str(raw_file).split("/")[-1].split("_")[1] + " "
-        data = ltspice.Ltspice(raw_file)
-        data.parse()
-        time = data.get_time()
-        [VREG, VREF] = [data.get_data("v(vreg)"), data.get_data("v(vref)")]
+        data = read_raw_file(raw_file)[0]
+        time = data.scale
+        [VREG, VREF] = [data["v(vreg)"], data["v(vref)"]]
         axesVREG[i].set_title("VREG vs Time " + cap_id + freq_id, fontsize=15)
         axesVREG[i].ticklabel_format(style="sci", axis="x", scilimits=(-6, -6))
         axesVREG[i].plot(time, VREG)
@@ -86,12 +88,11 @@ def fig_comparator_results(raw_files):
     figure.text(0.5, 0.04, "Time [us]", ha="center", fontsize="large")
     figure.text(0.04, 0.5, "Cmp_out [V]", va="center", rotation="vertical", fontsize=15)
     for i, raw_file in enumerate(raw_files):
-        data = ltspice.Ltspice(raw_file)
-        data.parse()
+        data = read_raw_file(raw_file)[0]
         cap_id = str(raw_file).split("/")[-1].split("_")[2] + " "
         freq_id = str(raw_file).split("/")[-1].split("_")[1] + " "
-        time = data.get_time()
-        cmp_out = data.get_data("v(cmp_out)")
+        time = data.scale
+        cmp_out = data["v(cmp_out)"]
         axes[i].set_title("Comp_out vs Time " + cap_id + freq_id, fontsize=15)
         axes[i].ticklabel_format(style="sci", axis="x", scilimits=(-6, -6))
         axes[i].plot(time, cmp_out)
@@ -107,15 +108,14 @@ def fig_controller_results(raw_files):
         0.04, 0.5, "Active Switches", va="center", rotation="vertical", fontsize=15
     )
     for i, raw_file in enumerate(raw_files):
-        data = ltspice.Ltspice(raw_file)
-        data.parse()
+        data = read_raw_file(raw_file)[0]
         cap_id = str(raw_file).split("/")[-1].split("_")[2] + " "
         freq_id = str(raw_file).split("/")[-1].split("_")[1] + " "
-        time = data.get_time()[100:]
-        active_switches = np.copy(data.get_data("v(ctrl_out[0])"))
+        time = data.scale[100:]
+        active_switches = np.copy(data["v(ctrl_out[0])"])
         for regI in range(1, 9):
             active_switches += (
-                data.get_data("v(ctrl_out[" + str(regI) + "])") * 2**regI
+                data["v(ctrl_out[" + str(regI) + "])"] * 2**regI
             )
         active_switches = (np.rint(active_switches / 3.3)).astype(int)[100:]
         num_smooth_pts = np.linspace(time.min(), time.max(), 250)
@@ -136,11 +136,10 @@ def fig_dc_results(raw_file):
         va="center",
         rotation="vertical",
     )
-    data = ltspice.Ltspice(raw_file)
-    data.parse()
-    current_load = data.get_data("i(r1)")
-    VREF = data.get_data("v(vref)")
-    VREG = data.get_data("v(vreg)")
+    data = read_raw_file(raw_file)[0]
+    current_load = data["i(r1)"]
+    VREF = data["v(vref)"]
+    VREG = data["v(vreg)"]
     intersect = np.argwhere(np.diff(np.sign(VREG - VREF))).flatten()
     intersect = intersect[0] if isinstance(intersect, (np.ndarray, list)) else intersect
     axes.set_title(
@@ -166,10 +165,9 @@ def fig_load_change_results(raw_file, load):
         va="center",
         rotation="vertical",
     )
-    data = ltspice.Ltspice(raw_file)
-    data.parse()
-    VREG = data.get_data("v(vreg)")
-    Time = data.get_time()
+    data = read_raw_file(raw_file)[0]
+    VREG = data["v(vreg)"]
+    Time = data.scale
     axes.set_title("Load change sim from 1mA to " + str(load) + "mA")
     axes.ticklabel_format(style="sci", axis="x", scilimits=(-6, -6))
     axes.plot(Time, VREG)
@@ -185,12 +183,11 @@ def raw_to_csv(raw_files, vrefspec, odir):
     csv1 = odir + "/" + simtype + "/csv_data"
     os.system("mkdir -p " + csv1)
     for i, raw_file in enumerate(raw_files):
-        data = ltspice.Ltspice(raw_file)
-        data.parse()
-        VREG = data.get_data("v(vreg)")
-        VREF = data.get_data("v(vref)")
-        cmp_out = data.get_data("v(cmp_out)")
-        time = data.get_time()
+        data = read_raw_file(raw_file)[0]
+        VREG = data["v(vreg)"]
+        VREF = data["v(vref)"]
+        cmp_out = data["v(cmp_out)"]
+        time = data.scale
         test_conditions = str(raw_file).split("/")[-1].strip("cap_output.raw") + "p"
         iload = test_conditions[0:5]
         load.append(iload)
@@ -9,7 +9,6 @@ import matplotlib.pyplot as plt
 from cairosvg import svg2png
 from PIL import Image
 from scipy.interpolate import make_interp_spline
-import ltspice
 import pandas as pd
 
 # ------------------------------------------------------------------------------
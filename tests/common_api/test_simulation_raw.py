@@ -0,0 +1,102 @@
+import os
+import sys
+import numpy as np
+
+# Add the common API to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'common'))
+
+import simulation_raw
+
+def _header(plotname, flags, variables, num_points, data_format):
+	lines = [
+		"Title: test circuit",
+		"Date: Thu Jan  1 00:00:00  2024",
+		f"Plotname: {plotname}",
+		f"Flags: {flags}",
+		f"No. Variables: {len(variables)}",
+		f"No. Points: {num_points}",
+		"Variables:",
+	]
+	lines += [f"\t{i}\t{name}\t{vtype}" for i, (name, vtype) in enumerate(variables)]
+	lines.append(f"{data_format}:")
+	return ("\n".join(lines) + "\n").encode("latin-1")
+
+def _write_binary(path, plots):
+	with open(path, "wb") as raw_file:
+		for plotname, flags, variables, data in plots:
+			raw_file.write(_header(plotname, flags, variables, data.shape[0], "Binary"))
+			dtype = "<c16" if "complex" in flags else "<f8"
+			raw_file.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+
+TRAN_VARIABLES = [("time", "time"), ("v(vreg)", "voltage"), ("i(vdd)", "current")]
+
+def _tran_data(num_points=100):
+	time = np.linspace(0, 1e-6, num_points)
+	return np.stack([time, np.sin(time * 1e7), np.cos(time * 1e7)], axis=1)
+
+def test_binary_real(tmp_path):
+	raw_path = os.path.join(tmp_path, "tran.raw")
+	data = _tran_data()
+	_write_binary(raw_path, [("Transient Analysis", "real", TRAN_VARIABLES, data)])
+
+	plots = simulation_raw.read_raw_file(raw_path)
+	assert len(plots) == 1
+	plot = plots[0]
+	assert plot.plotname == "Transient Analysis"
+	assert plot.num_points == 100
+	assert np.array_equal(plot.scale, data[:, 0])
+	assert np.array_equal(plot["V(VREG)"], data[:, 1]), "Lookup should be case-insensitive."
+	# vectors are views into the memory-mapped file, not copies
+	assert not plot["v(vreg)"].flags.owndata
+	assert not plot["v(vreg)"].flags.writeable
+
+	vectors = simulation_raw.read_raw(raw_path, ["time", "i(vdd)"])
+	assert list(vectors.keys()) == ["time", "i(vdd)"]
+	assert np.array_equal(vectors["i(vdd)"], data[:, 2])
+
+def test_binary_multiple_plots_and_complex(tmp_path):
+	raw_path = os.path.join(tmp_path, "multi.raw")
+	tran = _tran_data(10)
+	frequency = np.logspace(0, 6, 7)
+	gain = 1 / (1 + 1j * frequency / 1e3)
+	ac = np.stack([frequency + 0j, gain], axis=1)
+	_write_binary(raw_path, [
+		("Transient Analysis", "real", TRAN_VARIABLES, tran),
+		("AC Analysis", "complex", [("frequency", "frequency"), ("v(out)", "voltage")], ac),
+	])
+
+	plots = simulation_raw.read_raw_file(raw_path)
+	assert [plot.plotname for plot in plots] == ["Transient Analysis", "AC Analysis"]
+	assert plots[1].is_complex
+	assert np.allclose(plots[1].scale.real, frequency)
+	assert np.allclose(plots[1]["v(out)"], gain)
+	assert np.allclose(simulation_raw.read_raw(raw_path, ["v(out)"], plot="ac analysis")["v(out)"], gain)
+
+def test_binary_truncated(tmp_path):
+	# interrupted simulations leave a header with more points than the file holds
+	raw_path = os.path.join(tmp_path, "truncated.raw")
+	data = _tran_data(50)
+	with open(raw_path, "wb") as raw_file:
+		raw_file.write(_header("Transient Analysis", "real", TRAN_VARIABLES, 1000, "Binary"))
+		raw_file.write(data.tobytes()[:-5])
+
+	plot = simulation_raw.read_raw_file(raw_path)[0]
+	assert plot.num_points == 49
+	assert np.array_equal(plot["v(vreg)"], data[:49, 1])
+
+def test_ascii(tmp_path):
+	raw_path = os.path.join(tmp_path, "ascii.raw")
+	data = _tran_data(20)
+	with open(raw_path, "wb") as raw_file:
+		raw_file.write(_header("Transient Analysis", "real", TRAN_VARIABLES, 20, "Values"))
+		for i, row in enumerate(data):
+			raw_file.write((f" {i}" + "".join(f"\t{value:.15e}\n" for value in row)).encode())
+		raw_file.write(_header("AC Analysis", "complex", [("frequency", "frequency"), ("V(OUT)", "voltage")], 2, "Values"))
+		raw_file.write(b" 0\t1.0e+00,0.0e+00\n\t5.0e-01,-2.5e-01\n 1\t1.0e+01,0.0e+00\n\t1.0e-01,-3.0e-01\n")
+
+	plots = simulation_raw.read_raw_file(raw_path)
+	assert len(plots) == 2
+	assert np.allclose(plots[0]["v(vreg)"], data[:, 1])
+	assert np.allclose(plots[0].scale, data[:, 0])
+	assert np.allclose(plots[1]["v(out)"], [0.5 - 0.25j, 0.1 - 0.3j])
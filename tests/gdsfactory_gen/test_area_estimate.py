@@ -0,0 +1,36 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from pygen.pdk.sky130_mapped import sky130_mapped_pdk as pdk
+from pygen.pdk.util.comp_utils import evaluate_bbox
+from pygen.fet import nmos, pmos
+from pygen.diff_pair import diff_pair
+from pygen.mimcap import mimcap_array
+from pygen.opamp import opamp
+from pygen.area_estimate import BBOX_ESTIMATES, ESTIMATE_TOLERANCE, estimate_area
+
+@pytest.mark.parametrize("generator, kwargs", [
+	(nmos, dict(width=3, fingers=2, multipliers=3, rmult=2, with_dummy=(True, False))),
+	(pmos, dict(width=1, fingers=6, multipliers=2, length=0.5, with_tie=False, sd_route_left=False)),
+	(diff_pair, dict(width=6, fingers=3, length=2, rmult=2, n_or_p_fet=False)),
+	(mimcap_array, dict(rows=2, columns=3, size=(12, 5))),
+	# the pmos section shift of the opamp is rounded, near .5 a small height error moved it by 1 um
+	(opamp, dict(diffpair_params=(3, 0.3, 6), houtput_bias=(6, 1, 6, 3), pamp_hparams=(4, 2, 6, 3), mim_cap_rows=2, rmult=2)),
+	(opamp, dict(diffpair_params=(3, 1, 6), houtput_bias=(3, 1, 6, 3), pamp_hparams=(4, 2, 14, 3), mim_cap_rows=3, rmult=1)),
+])
+def test_estimate_matches_build(generator, kwargs):
+	built = evaluate_bbox(generator(pdk, **kwargs))
+	estimate = BBOX_ESTIMATES[generator.__name__](pdk, **kwargs)
+	for built_dim, estimated_dim in zip(built, estimate):
+		assert estimated_dim == pytest.approx(built_dim, rel=ESTIMATE_TOLERANCE)
+	assert estimate_area(pdk, generator, **kwargs) == pytest.approx(estimate[0] * estimate[1])
+
+def test_unknown_generator():
+	with pytest.raises(ValueError, match="no area estimate for tapring"):
+		estimate_area(pdk, "tapring", (5, 5))
@@ -0,0 +1,36 @@
+import os
+import sys
+import json
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from pygen.cli import main
+from pygen.pdk.util.primitive_cache import set_primitive_cache, clear_primitive_cache
+
+@pytest.fixture(autouse=True)
+def primitive_cache():
+	yield
+	set_primitive_cache(False)
+	clear_primitive_cache()
+
+def test_build_batch(tmp_path):
+	params = tmp_path / "params.json"
+	params.write_text(json.dumps([{"glayer1": "met1", "glayer2": "met3"}, {"glayer1": "met1", "glayer2": "met3", "fulltop": True}, {"glayer1": "met1", "glayer2": "nolayer"}]))
+	assert main(["build", "via_stack", "--params", str(params), "--output-dir", str(tmp_path / "out")]) == 1
+	manifest = json.loads((tmp_path / "out" / "via_stack_1.json").read_text())
+	assert manifest["params"] == {"glayer1": "met1", "glayer2": "met3", "fulltop": True}
+	assert (tmp_path / "out" / "via_stack_1.gds").is_file() and manifest["build_seconds"] > 0
+	assert {port["name"] for port in manifest["ports"]} >= {"top_met_N", "bottom_met_S"}
+	assert manifest["size"] == [manifest["bbox"][1][0] - manifest["bbox"][0][0], manifest["bbox"][1][1] - manifest["bbox"][0][1]]
+	# a failing parameter set is reported without stopping the batch
+	assert "routable" in json.loads((tmp_path / "out" / "via_stack_2.json").read_text())["error"]
+
+def test_json_lists_become_tuples(tmp_path):
+	params = tmp_path / "params.json"
+	params.write_text(json.dumps({"enclosed_rectangle": [3, 2]}))
+	assert main(["build", "tapring", "--params", str(params), "--output-dir", str(tmp_path)]) == 0
+	assert "error" not in json.loads((tmp_path / "tapring_0.json").read_text())
@@ -0,0 +1,60 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from pygen.pdk.sky130_mapped import sky130_mapped_pdk as pdk
+from pygen.via_gen import via_stack
+from pygen.pdk.util.drc_cache import set_drc_cache, drc_cache_stats, reset_drc_cache_stats, clear_drc_cache, layout_hash, lookup_drc, read_lyrdb, store_drc
+
+LYRDB = """<?xml version="1.0" encoding="utf-8"?>
+<report-database>
+ <description>DRC</description><original-file/><generator/><top-cell>via</top-cell><tags/><categories/><cells/>
+ <items>
+  <item><tags/><category>'m1.1'</category><cell>via</cell><visited>false</visited><multiplicity>1</multiplicity><values><value>edge-pair: (0,0;1,0)/(0,1;1,1)</value></values></item>
+  <item><tags/><category>'m1.1'</category><cell>via</cell><visited>false</visited><multiplicity>1</multiplicity><values><value>edge-pair: (2,0;3,0)/(2,1;3,1)</value></values></item>
+  <item><tags/><category>'li.3'</category><cell>via</cell><visited>false</visited><multiplicity>1</multiplicity><values/></item>
+ </items>
+</report-database>
+"""
+
+@pytest.fixture
+def drc_cache(tmp_path):
+	set_drc_cache(tmp_path / "cache")
+	reset_drc_cache_stats()
+	yield tmp_path
+	set_drc_cache(None)
+
+def test_cached_drc_skips_klayout(drc_cache, monkeypatch):
+	comp = via_stack(pdk, "met1", "met2")
+	report = drc_cache / "report.lyrdb"
+	report.write_text(LYRDB)
+	results = read_lyrdb(report)
+	assert results["counts"] == {"m1.1": 2, "li.3": 1}
+	store_drc(layout_hash(comp), pdk.klayout_lydrc_file, report, results)
+	# a hit never starts klayout
+	monkeypatch.setattr("subprocess.Popen", None)
+	output_dir = drc_cache / "out"
+	output_dir.mkdir()
+	assert pdk.drc_results(comp, output_dir) == results
+	assert not pdk.drc(comp, output_dir)
+	assert (output_dir / (pdk.name + comp.name + "_drcreport.lyrdb")).read_text() == LYRDB
+	# the gds of the component has the same geometry
+	assert lookup_drc(layout_hash(comp.write_gds(gdsdir=drc_cache)), pdk.klayout_lydrc_file) == results
+	assert drc_cache_stats() == {"hits": 3, "misses": 0, "entries": 1}
+
+def test_deck_change_invalidates(drc_cache):
+	deck = drc_cache / "deck.lydrc"
+	deck.write_text("deck v1")
+	report = drc_cache / "report.lyrdb"
+	report.write_text(LYRDB)
+	store_drc("layout", deck, report, read_lyrdb(report))
+	assert lookup_drc("layout", deck) is not None
+	deck.write_text("deck v2, changed")
+	assert lookup_drc("layout", deck) is None
+	assert clear_drc_cache(deck) == 1
+	assert drc_cache_stats() == {"hits": 1, "misses": 1, "entries": 0}
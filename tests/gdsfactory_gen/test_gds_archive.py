@@ -0,0 +1,66 @@
+import os
+import sys
+import multiprocessing
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+from pygen.pdk.util.gds_archive import GDSArchive, pack_gds_directory, is_gds_archive
+
+def add_layouts(archive_path, start):
+	archive = GDSArchive(archive_path)
+	for index in range(start, start + 10):
+		archive.add(index, b"layout" + bytes([index % 3]))
+
+def test_add_read_and_dedupe(tmp_path):
+	archive = GDSArchive(tmp_path / "layouts.gdsar")
+	sha_a = archive.add(0, b"layout a" * 100)
+	sha_b = archive.add(1, b"layout b" * 100)
+	assert archive.add(2, b"layout a" * 100) == sha_a
+	assert archive.read_bytes(2) == b"layout a" * 100
+	assert archive.read_bytes(sha=sha_b) == b"layout b" * 100
+	assert archive.indices() == [0, 1, 2] and 1 in archive and 5 not in archive
+	stats = archive.stats()
+	assert (stats["members"], stats["unique_layouts"]) == (3, 2)
+	assert stats["stored_bytes"] < stats["raw_bytes"]
+	with pytest.raises(KeyError):
+		archive.read_bytes(5)
+	assert is_gds_archive(archive.path) and not is_gds_archive(tmp_path)
+
+def test_concurrent_writers(tmp_path):
+	archive_path = tmp_path / "layouts.gdsar"
+	GDSArchive(archive_path)
+	context = multiprocessing.get_context("fork")
+	workers = [context.Process(target=add_layouts, args=(archive_path, start)) for start in (0, 10, 20, 30)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join(timeout=60)
+		assert worker.exitcode == 0
+	archive = GDSArchive(archive_path)
+	assert archive.indices() == list(range(40))
+	assert archive.stats()["unique_layouts"] == 3
+	assert archive.read_bytes(31) == b"layout" + bytes([1])
+
+def test_pack_directory_and_matrix(tmp_path):
+	gf = pytest.importorskip("gdsfactory")
+	from pygen.pdk.util.opamp_array_create import write_opamp_matrix
+	gds_dir = tmp_path / "save_gds_by_index"
+	gds_dir.mkdir()
+	for index, size in enumerate([(1, 2), (3, 4), (1, 2)]):
+		gf.components.rectangle(size=size, layer=(1, 0)).write_gds(gds_dir / (str(index) + ".gds"))
+	archive = pack_gds_directory(gds_dir, tmp_path / "layouts.gdsar")
+	assert archive.indices() == [0, 1, 2]
+	assert archive.read_bytes(1) == (gds_dir / "1.gds").read_bytes()
+	cwd = os.getcwd()
+	os.chdir(tmp_path)
+	try:
+		write_opamp_matrix(archive.path, xspace=10, yspace=10)
+	finally:
+		os.chdir(cwd)
+	matrix = gf.import_gds(tmp_path / "big_gds_here.gds")
+	assert len(matrix.references) == 3
+	# identical layouts share one cell
+	assert len({ref.parent.name for ref in matrix.references}) == 2
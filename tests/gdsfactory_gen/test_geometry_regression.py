@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+import gdstk
+from gdsfactory.component import Component
+from pygen.regression import check_golden, write_golden, compare_geometry, get_regression_pdk
+from pygen.via_gen import via_stack
+
+@pytest.mark.parametrize("pdk_name", ["sky130", "gf180"])
+def test_matches_golden(pdk_name):
+	if pdk_name == "gf180":
+		pytest.importorskip("gf180")
+	assert check_golden(pdk_name) == []
+
+def test_reports_xor_area(tmp_path):
+	pdk = get_regression_pdk("sky130")
+	golden = write_golden("sky130", tmp_path, ["via_stack_met1_met3"])["via_stack_met1_met3"]
+	golden_cell = gdstk.read_gds(str(tmp_path / "sky130_geometry.gds")).cells[0]
+	# same stack with a 2x1 met3 patch away from it: only met3 differs, by exactly the patch
+	changed = Component()
+	changed.add_ports((changed << via_stack(pdk, "met1", "met3")).get_ports_list())
+	changed.add_polygon([(5, 5), (7, 5), (7, 6), (5, 6)], layer=pdk.get_glayer("met3"))
+	met3 = "/".join(str(number) for number in pdk.get_glayer("met3"))
+	differences = compare_geometry("via_stack_met1_met3", changed, golden, golden_cell)
+	assert len(differences) == 1 and differences[0].startswith("via_stack_met1_met3: layer " + met3 + " xor area 2.000000")
+	changed.ports.pop("top_met_N")
+	assert any("1 ports missing" in difference for difference in compare_geometry("via_stack_met1_met3", changed, golden, golden_cell))
@@ -0,0 +1,74 @@
+import os
+import sys
+import pickle
+import shutil
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from pygen.pdk.sky130_mapped import grules
+from pygen.pdk.util.print_rules import ruledeck_grules
+from pygen.pdk.mappedpdk import MappedPDK
+from pygen.pdk.sky130_mapped import sky130_mapped_pdk
+from pygen.pdk.util.grules_binary import GRULES_BINARY_VERSION, GRulesBinary, write_grules_binary, load_grules_binary, grules_differences, pdk_grules_binary
+
+RULES_CSV = """layer,met1,met2
+label,,
+label,,
+met1,"a,min_width=0.14","b,min_separation=0.2"
+,"c,min_separation=0.14","d,capmettop=(71,20)"
+,,
+met2,,"e,min_width=0.3"
+,,"f,min_enclosure"
+,,
+"""
+
+def test_sky130_rules_round_trip(tmp_path):
+	artifact = write_grules_binary(grules.grulesobj, tmp_path / "grules.bin", source=grules.__file__)
+	assert grules_differences(grules.grulesobj, load_grules_binary(artifact, source=grules.__file__)) == []
+
+def test_csv_rules_round_trip(tmp_path):
+	csv_file = tmp_path / "rules.csv"
+	csv_file.write_text(RULES_CSV)
+	grulesobj = ruledeck_grules(csv_file)
+	assert grulesobj["met1"]["met2"] == {"min_separation": 0.2, "capmettop": (71, 20)}
+	assert grulesobj["met2"]["met1"] == {}
+	assert grulesobj["met2"]["met2"]["min_enclosure"].startswith("*****FIXTHIS")
+	artifact = write_grules_binary(grulesobj, tmp_path / "grules.bin", source=csv_file)
+	assert load_grules_binary(artifact, source=csv_file) == grulesobj
+	# stale artifacts and other format versions are rejected
+	csv_file.write_text(RULES_CSV.replace("0.3", "0.35"))
+	with pytest.raises(ValueError, match="out of date"):
+		load_grules_binary(artifact, source=csv_file)
+	data = bytearray(artifact.read_bytes())
+	data[4] = GRULES_BINARY_VERSION + 1
+	artifact.write_bytes(bytes(data))
+	with pytest.raises(ValueError, match="format version"):
+		load_grules_binary(artifact)
+
+def test_pairs_are_decoded_on_first_use(tmp_path):
+	lazy_rules = load_grules_binary(write_grules_binary(grules.grulesobj, tmp_path / "grules.bin"))
+	assert lazy_rules.decoded_pairs() == 0 and list(lazy_rules) == list(grules.grulesobj)
+	assert lazy_rules["met1"]["met2"] == grules.grulesobj["met1"]["met2"] and lazy_rules.decoded_pairs() == 1
+	assert lazy_rules["met1"].get("met2") is lazy_rules["met1"]["met2"] and lazy_rules.decoded_pairs() == 1
+	assert lazy_rules.to_dict() == grules.grulesobj and lazy_rules.decoded_pairs() == len(grules.grulesobj) ** 2
+	assert pickle.loads(pickle.dumps(lazy_rules)) == grules.grulesobj
+
+def test_pdk_loads_current_artifact(tmp_path):
+	shutil.copy(grules.__file__, tmp_path / "grules.py")
+	assert pdk_grules_binary(tmp_path) is None
+	write_grules_binary(grules.grulesobj, tmp_path / "grules.bin", source=tmp_path / "grules.py")
+	lazy_rules = pdk_grules_binary(tmp_path)
+	assert isinstance(lazy_rules, GRulesBinary)
+	# a MappedPDK keeps the lazy rules and answers get_grule like with the dictionary
+	pdk = MappedPDK.from_gf_pdk(sky130_mapped_pdk, glayers=sky130_mapped_pdk.glayers, grules=lazy_rules)
+	assert pdk.grules is lazy_rules
+	assert pdk.get_grule("met1", "via1") == sky130_mapped_pdk.get_grule("met1", "via1")
+	# editing grules.py makes the artifact stale, the pdk falls back to grules.py
+	with open(tmp_path / "grules.py", "a") as grules_file:
+		grules_file.write("\n")
+	with pytest.warns(UserWarning, match="out of date"):
+		assert pdk_grules_binary(tmp_path) is None
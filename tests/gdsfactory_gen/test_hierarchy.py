@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+gf = pytest.importorskip("gdsfactory")
+gdstk = pytest.importorskip("gdstk")
+from gdsfactory.cell import clear_cache
+from pygen.pdk.util.hierarchy import hierarchical_output, hierarchical_output_enabled, maybe_flatten, dedupe_gds, geometry_fingerprint
+
+def flat_bbox(gds_file):
+	top = gdstk.read_gds(str(gds_file)).top_level()
+	assert len(top) == 1
+	top = top[0].copy("flat", deep_copy=True)
+	top.flatten()
+	return top.bounding_box(), len(top.polygons)
+
+def test_mode_is_restored():
+	assert not hierarchical_output_enabled()
+	with hierarchical_output():
+		assert hierarchical_output_enabled()
+		with hierarchical_output(False):
+			assert not hierarchical_output_enabled()
+		assert hierarchical_output_enabled()
+	assert not hierarchical_output_enabled()
+
+def test_cells_sharing_a_name_are_kept_apart(tmp_path):
+	# two different cells with the same fixed name, like Component("finger") in the generators
+	parent = gf.Component()
+	for size in [(1, 1), (3, 2)]:
+		child = gf.Component("fixed name")
+		child << gf.components.rectangle(size=size, layer=(1, 0))
+		parent << child
+	with hierarchical_output():
+		hierarchical = maybe_flatten(parent)
+	assert hierarchical is parent and len(parent.references) == 2
+	assert len({ref.parent.name for ref in parent.references}) == 2
+	assert parent.bbox.tolist() == [[0, 0], [3, 2]]
+	(bbox, num_polygons) = flat_bbox(parent.write_gds(tmp_path / "hierarchical.gds"))
+	assert bbox == ((0, 0), (3, 2)) and num_polygons == 2
+	assert len(maybe_flatten(parent).references) == 0
+
+def test_generator_geometry_matches_flat(tmp_path):
+	from pygen.pdk.sky130_mapped import sky130_mapped_pdk as pdk
+	from pygen.fet import nmos
+	layouts = list()
+	for hierarchical in [False, True]:
+		with hierarchical_output(hierarchical):
+			clear_cache()
+			comp = nmos(pdk, fingers=2, multipliers=2)
+			layouts.append((len(comp.references), flat_bbox(comp.write_gds(tmp_path / (str(hierarchical) + ".gds")))))
+	clear_cache()
+	assert layouts[0][0] == 0 and layouts[1][0] > 0
+	assert sum(layouts[0][1][0], ()) == pytest.approx(sum(layouts[1][1][0], ()), abs=0.01)
+
+def test_dedupe_merges_identical_cells(tmp_path):
+	library = gdstk.Library()
+	same_a, same_b, other = library.new_cell("a"), library.new_cell("b"), library.new_cell("c")
+	same_a.add(gdstk.rectangle((0, 0), (1, 1), layer=1), gdstk.rectangle((2, 0), (3, 1), layer=2))
+	# same polygons in a different order, one listed clockwise
+	same_b.add(gdstk.Polygon([(2, 0), (2, 1), (3, 1), (3, 0)], layer=2), gdstk.rectangle((0, 0), (1, 1), layer=1))
+	other.add(gdstk.rectangle((0, 0), (1, 1), layer=3))
+	top = library.new_cell("top")
+	top.add(gdstk.Reference(same_a), gdstk.Reference(same_b, (5, 0)), gdstk.Reference(other, (0, 5)))
+	library.write_gds(str(tmp_path / "dup.gds"))
+	counts = dedupe_gds(tmp_path / "dup.gds", tmp_path / "dedup.gds")
+	assert counts["merged"] == 1 and counts["cells_after"] == 3
+	assert counts["bytes_after"] < counts["bytes_before"]
+	assert flat_bbox(tmp_path / "dup.gds") == flat_bbox(tmp_path / "dedup.gds")
+	# the output does not depend on when it was written (byte hashes such as the pex cache key must match)
+	time.sleep(1.1)
+	dedupe_gds(tmp_path / "dup.gds", tmp_path / "dedup_again.gds")
+	assert (tmp_path / "dedup.gds").read_bytes() == (tmp_path / "dedup_again.gds").read_bytes()
+
+def test_geometry_fingerprint_includes_ports():
+	def make(port_x):
+		comp = gf.Component()
+		comp << gf.components.rectangle(size=(1, 1), layer=(1, 0))
+		comp.add_port("p", center=(port_x, 0), width=1, orientation=0, layer=(1, 0))
+		return comp
+	assert geometry_fingerprint(make(1)) == geometry_fingerprint(make(1))
+	assert geometry_fingerprint(make(1)) != geometry_fingerprint(make(0.5))
+	assert geometry_fingerprint(make(1), include_ports=False) == geometry_fingerprint(make(0.5), include_ports=False)
@@ -0,0 +1,80 @@
+import os
+import sys
+import stat
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+import magic_extract
+
+# stands in for magic: records each session and writes every "ext2spice -o" netlist
+MAGIC_STUB = '''#!{python}
+import os, sys, time
+script = sys.stdin.read()
+with open("sessions.txt", "a") as sessions:
+	sessions.write(script + "\\n----\\n")
+if os.environ.get("MAGIC_STUB_SLEEP"):
+	time.sleep(float(os.environ["MAGIC_STUB_SLEEP"]))
+print("stub magic " + " ".join(sys.argv[1:]))
+open("opamp.ext", "w").write("ext")
+for line in script.splitlines():
+	if line.startswith("ext2spice -o "):
+		open(line.split()[-1], "w").write(".subckt opamp\\n.ends\\n")
+sys.exit(int(os.environ.get("MAGIC_STUB_EXIT", "0")))
+'''
+
+@pytest.fixture
+def magic_stub(tmp_path):
+	stub_path = tmp_path / "magic_stub"
+	stub_path.write_text(MAGIC_STUB.format(python=sys.executable))
+	stub_path.chmod(stub_path.stat().st_mode | stat.S_IEXEC)
+	gds_path = tmp_path / "opamp.gds"
+	gds_path.write_bytes(b"not a real gds")
+	return str(stub_path), gds_path
+
+def test_single_session_both_modes(magic_stub):
+	stub, gds_path = magic_stub
+	outputs = magic_extract.run_magic_extraction(gds_path, "opamp", mode="both", magic=stub)
+
+	assert outputs["pex"].name == "opamp_pex.spice" and outputs["pex"].is_file()
+	assert outputs["lvs"].name == "opamp_lvs.spice" and outputs["lvs"].is_file()
+	assert "stub magic -rcfile" in outputs["log"].read_text(), "Magic output should be captured in the log."
+	sessions = (gds_path.parent / "sessions.txt").read_text().split("\n----\n")[:-1]
+	assert len(sessions) == 1, "Both netlists should come from one Magic session."
+	assert sessions[0].count("gds read") == 1 and sessions[0].count("extract all") == 1
+	assert not (gds_path.parent / "opamp.ext").exists(), ".ext files should be removed."
+
+def test_mode_selection(magic_stub):
+	stub, gds_path = magic_stub
+	outputs = magic_extract.run_magic_extraction(gds_path, "opamp", mode="lvs", magic=stub)
+	assert "lvs" in outputs and "pex" not in outputs
+	assert not (gds_path.parent / "opamp_pex.spice").exists()
+	with pytest.raises(ValueError):
+		magic_extract.run_magic_extraction(gds_path, "opamp", mode="rc", magic=stub)
+
+def test_pex_options():
+	def pass_options(script, netlist):
+		lines = script.splitlines()
+		end = lines.index("ext2spice -o " + netlist)
+		start = max(i for i in range(end) if lines[i] == "ext2spice default")
+		return lines[start+1:end]
+	# the default pex netlist uses exactly the options of the last extract.bash pass, even after an lvs pass
+	script = magic_extract.magic_extraction_script("opamp.gds", "opamp", mode="both")
+	assert pass_options(script, "opamp_lvs.spice") == ["ext2spice lvs"]
+	assert pass_options(script, "opamp_pex.spice") == ["ext2spice merge aggressive"]
+	script = magic_extract.magic_extraction_script("opamp.gds", "opamp", pex_options="lvs_all_caps")
+	assert pass_options(script, "opamp_pex.spice") == ["ext2spice lvs", "ext2spice merge aggressive", "ext2spice cthresh 0", "ext2spice rthresh 0"]
+	with pytest.raises(ValueError):
+		magic_extract.magic_extraction_script("opamp.gds", "opamp", pex_options="rc")
+
+def test_failures(magic_stub, monkeypatch):
+	stub, gds_path = magic_stub
+	monkeypatch.setenv("MAGIC_STUB_EXIT", "1")
+	with pytest.raises(magic_extract.MagicExtractionError, match="exited with code 1"):
+		magic_extract.run_magic_extraction(gds_path, "opamp", magic=stub)
+	monkeypatch.setenv("MAGIC_STUB_EXIT", "0")
+	monkeypatch.setenv("MAGIC_STUB_SLEEP", "5")
+	with pytest.raises(magic_extract.MagicExtractionError, match="timed out"):
+		magic_extract.run_magic_extraction(gds_path, "opamp", magic=stub, timeout=0.5)
@@ -0,0 +1,59 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from pygen.pdk.util.memory_profile import profile_memory, set_memory_profile, memory_report, reset_memory_profile, write_memory_report, merge_memory_reports, current_rss
+
+@profile_memory
+def leaf(num_bytes):
+	return b"\x01" * num_bytes
+
+@profile_memory
+def parent(num_bytes):
+	kept = leaf(num_bytes)
+	leaf(num_bytes * 4)
+	return kept
+
+@pytest.fixture(autouse=True)
+def restore_profile(monkeypatch):
+	for key in ["PYGEN_MEMORY_PROFILE", "PYGEN_MEMORY_BUDGET_MB", "PYGEN_MEMORY_REPORT_DIR"]:
+		monkeypatch.delenv(key, raising=False)
+	reset_memory_profile()
+	yield
+	set_memory_profile("off")
+	reset_memory_profile()
+
+def test_allocations_are_attributed(tmp_path):
+	set_memory_profile("trace", report_dir=tmp_path)
+	parent(2**20)
+	generators = memory_report()["generators"]
+	assert generators["leaf"]["calls"] == 2 and generators["leaf"]["callers"] == {"parent": 2}
+	# the parent sees the peak of its largest callee and keeps only the first buffer
+	assert generators["parent"]["traced_peak_bytes"] >= 4 * 2**20
+	assert 2**20 <= generators["parent"]["traced_net_bytes"] < 2 * 2**20
+	merged = merge_memory_reports([write_memory_report(), write_memory_report(tmp_path / "other.json")])
+	assert merged["processes"] == 2 and merged["generators"]["leaf"]["calls"] == 4
+
+def test_budget_aborts_with_generator_chain():
+	set_memory_profile("off", budget_mb=64)
+	with pytest.raises(MemoryError, match="parent > leaf"):
+		parent(128 * 2**20)
+	# profiling off records nothing and no report is written
+	assert memory_report()["generators"] == {} and write_memory_report() is None
+
+def test_build_after_over_budget_build():
+	set_memory_profile("off", budget_mb=64)
+	with pytest.raises(MemoryError):
+		parent(128 * 2**20)
+	# memory the worker keeps after the failed build is not counted against the next one
+	kept = b"\x02" * (128 * 2**20)
+	assert current_rss() > 128 * 2**20
+	assert len(parent(2**20)) == 2**20
+	with pytest.raises(MemoryError):
+		leaf(128 * 2**20)
+	del kept
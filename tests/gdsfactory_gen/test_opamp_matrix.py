@@ -0,0 +1,62 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+gf = pytest.importorskip("gdsfactory")
+gdstk = pytest.importorskip("gdstk")
+from pygen.pdk.util.opamp_array_create import stream_opamp_matrix
+from pygen.pdk.util.gds_archive import pack_gds_directory
+
+SIZES = [(1, 2), (3, 4), (1, 2), (5, 1), (2, 2)]
+
+@pytest.fixture
+def gds_dir(tmp_path):
+	gds_dir = tmp_path / "save_gds_by_index"
+	gds_dir.mkdir()
+	for index, size in enumerate(SIZES):
+		# every layout has a top cell with the same name and a subcell, like the sweep layouts
+		top = gf.Component("opamp")
+		top << gf.components.rectangle(size=size, layer=(1, 0))
+		top.write_gds(gds_dir / (str(index) + ".gds"))
+	return gds_dir
+
+def read_matrix(path):
+	library = gdstk.read_oas(str(path)) if path.suffix == ".oas" else gdstk.read_gds(str(path))
+	tops = library.top_level()
+	assert [top.name for top in tops] == ["opamp_matrix"]
+	return library, tops[0]
+
+@pytest.mark.parametrize("suffix", [".gds", ".oas"])
+def test_stream_directory(gds_dir, tmp_path, suffix):
+	output = stream_opamp_matrix(gds_dir, tmp_path / ("matrix" + suffix), xspace=10, yspace=20)
+	library, top = read_matrix(output)
+	# files are read in index order on a square (2 column) grid
+	origins = sorted((ref.origin, ref.cell.name) for ref in top.references)
+	assert [origin for origin, _ in origins] == sorted([(0, 0), (10, 0), (0, 20), (10, 20), (0, 40)])
+	assert len({name for _, name in origins}) == 5
+	flat = top.copy("flat", deep_copy=True).flatten()
+	boxes = sorted(polygon.bounding_box() for polygon in flat.polygons)
+	expected = sorted((((index % 2) * 10, (index // 2) * 20), ((index % 2) * 10 + size[0], (index // 2) * 20 + size[1])) for index, size in enumerate(SIZES))
+	assert boxes == pytest.approx(expected)
+
+def test_stream_archive_writes_repeated_layouts_once(gds_dir, tmp_path):
+	archive = pack_gds_directory(gds_dir, tmp_path / "layouts.gdsar")
+	library, top = read_matrix(stream_opamp_matrix(archive.path, tmp_path / "matrix.gds", columns=5))
+	assert len(top.references) == 5
+	# 4 unique layouts, the cells of each are written once under their own prefix
+	assert len({ref.cell.name for ref in top.references}) == 4
+	assert {cell.name.split("_")[0] for cell in library.cells if cell is not top} == {"m0", "m1", "m2", "m3"}
+	assert top.references[0].cell is top.references[2].cell
+
+def test_stream_into_the_opamps_directory(gds_dir):
+	# the matrix is not one of its own sources, also when written next to them under any name
+	output = stream_opamp_matrix(gds_dir, gds_dir / "matrix.gds", xspace=10, yspace=20)
+	library, top = read_matrix(output)
+	assert len(top.references) == 5
+	# a second run does not pick up the matrix of the first one
+	library, top = read_matrix(stream_opamp_matrix(gds_dir, gds_dir / "matrix.gds", xspace=10, yspace=20))
+	assert len(top.references) == 5
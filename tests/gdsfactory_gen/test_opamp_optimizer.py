@@ -0,0 +1,100 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+pytest.importorskip("sklearn")
+from sky130_nist_tapeout import OpampBayesianOptimizer, OPAMP_OPTIMIZE_BOUNDS, opamp_snap_to_bounds, load_warm_start_data
+
+# only the diffpair width and length are free, everything else is held at the low bound
+TOY_BOUNDS = OPAMP_OPTIMIZE_BOUNDS.copy()
+TOY_BOUNDS[2:,1] = TOY_BOUNDS[2:,0]
+
+def toy_results(params: np.array) -> np.array:
+	"""area is smallest at width 5 and length 1, phase margin drops with the length"""
+	width, length = params[0], params[1]
+	return np.array([1e7, 100, 90 - 20*length, 1, 1, 1 + (width - 5)**2 + (length - 1)**2, 1e-3, 1e-6])
+
+def test_snap_to_bounds():
+	point = OPAMP_OPTIMIZE_BOUNDS[:,0].copy()
+	point[0] = 4.567
+	point[2] = 3.4
+	point[5] = 100
+	point[1] = 0.1
+	snapped = opamp_snap_to_bounds(point)
+	assert snapped.shape == (18,)
+	assert snapped[0] == 4.57 and snapped[1] == 0.3 and snapped[2] == 3 and snapped[5] == 6
+	np.testing.assert_array_equal(opamp_snap_to_bounds(snapped), snapped)
+	# arrays snap row by row, and a fixed dimension is always its bound
+	points = np.random.default_rng(0).uniform(-20, 20, (64,18))
+	snapped = opamp_snap_to_bounds(points)
+	assert snapped.shape == (64,18)
+	assert np.all((snapped >= OPAMP_OPTIMIZE_BOUNDS[:,0]) & (snapped <= OPAMP_OPTIMIZE_BOUNDS[:,1]))
+	steps = (snapped - OPAMP_OPTIMIZE_BOUNDS[:,0]) / OPAMP_OPTIMIZE_BOUNDS[:,2]
+	np.testing.assert_allclose(steps, np.round(steps), atol=1e-6)
+	assert np.all(snapped[:,14] == 12)
+
+def test_tell_ask_round():
+	optimizer = OpampBayesianOptimizer(objective="area", constraints=[("phaseMargin", ">=", 60)], bounds=TOY_BOUNDS, seed=0)
+	proposals = [optimizer.ask(num_candidates=200) for _ in range(8)]
+	# random points until there is data, every pending point is proposed only once
+	assert len({tuple(point) for point in proposals}) == 8
+	for point in proposals:
+		np.testing.assert_array_equal(point, opamp_snap_to_bounds(point, TOY_BOUNDS))
+		optimizer.tell(point, toy_results(point))
+	assert optimizer.pending == []
+	first_best = optimizer.best()[1][5]
+	for _ in range(3):
+		batch = [optimizer.ask(num_candidates=200) for _ in range(2)]
+		assert not np.allclose(batch[0], batch[1])
+		optimizer.tell(np.array(batch), np.array([toy_results(point) for point in batch]))
+	assert len(optimizer.X) == 14 and optimizer.pending == []
+	params, results = optimizer.best()
+	assert results[2] >= 60 and results[5] <= first_best
+	np.testing.assert_array_equal(results, toy_results(params))
+
+def test_training_subset_is_capped():
+	optimizer = OpampBayesianOptimizer(objective="area", constraints=[("phaseMargin", ">=", 60)], bounds=TOY_BOUNDS, seed=0, max_training_points=10)
+	params = opamp_snap_to_bounds(np.random.default_rng(1).uniform(TOY_BOUNDS[:,0], TOY_BOUNDS[:,1], (40,18)), TOY_BOUNDS)
+	results = np.array([toy_results(point) for point in params])
+	results[:4] = -987.654321
+	optimizer.tell(params, results)
+	rows = optimizer.training_subset()
+	assert len(rows) == 10 and len(np.unique(rows)) == 10
+	# the 5 best feasible points are always part of the training set
+	feasible = np.where(optimizer.is_feasible(results))[0]
+	best = feasible[np.argsort(results[feasible,5])[:5]]
+	assert set(best) <= set(rows)
+	proposal = optimizer.ask(num_candidates=200)
+	assert proposal.shape == (18,)
+	with pytest.raises(ValueError):
+		OpampBayesianOptimizer(max_training_points=0)
+
+def test_multi_temperature_warm_start(tmp_path):
+	params = opamp_snap_to_bounds(np.random.default_rng(2).uniform(TOY_BOUNDS[:,0], TOY_BOUNDS[:,1], (5,18)), TOY_BOUNDS)
+	results = np.stack([np.array([toy_results(point) for point in params]) + offset for offset in (0, 1)], axis=1)
+	assert results.shape == (5, 2, 8)
+	np.save(tmp_path / "training_params.npy", params)
+	np.save(tmp_path / "training_results.npy", results)
+	files = [(tmp_path / "training_params.npy", tmp_path / "training_results.npy")]
+	# the temperatures are needed to pick a column
+	with pytest.raises(ValueError, match="temperatures"):
+		load_warm_start_data(files)
+	np.save(tmp_path / "training_temps.npy", np.array([-40.0, 27.0]))
+	warm_params, warm_results = load_warm_start_data(files, sim_temp=27)
+	assert warm_params.shape == (5, 18) and warm_results.shape == (5, 8)
+	np.testing.assert_array_equal(warm_results, results[:,1,:])
+	np.testing.assert_array_equal(load_warm_start_data(files, sim_temp=-40)[1], results[:,0,:])
+	with pytest.raises(ValueError, match="not simulated at 125"):
+		load_warm_start_data(files, sim_temp=125)
+	# rows which do not line up are refused instead of misaligning the gp data
+	optimizer = OpampBayesianOptimizer(bounds=TOY_BOUNDS)
+	with pytest.raises(ValueError):
+		optimizer.tell(params, results.reshape(-1,8))
+	optimizer.tell(warm_params, warm_results)
+	assert len(optimizer.X) == len(optimizer.Y) == 5
@@ -0,0 +1,59 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+GDSFACTORY_GEN = os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen')
+sys.path.append(GDSFACTORY_GEN)
+
+from param_space import ParameterSpace
+
+SPEC = {
+	"defaults": [1, 2, 3, 4, 5],
+	"dimensions": [
+		{"name": "width", "slot": 0, "type": "quantized", "low": 0.5, "high": 2, "step": 0.25},
+		{"name": "fingers", "slot": [1, 2], "type": "integer", "low": 1, "high": 4},
+		{"name": "rows", "slot": 4, "type": "categorical", "values": [2, 3]},
+	],
+	"constraints": ["width * fingers <= 4"],
+}
+
+def test_grid_order_and_constraints():
+	space = ParameterSpace.from_dict(SPEC)
+	grid = space.grid()
+	# 3 widths * 4 fingers * 2 rows, minus points over the total width
+	widths = [0.5, 1.25, 2.0]
+	expected = [(w, f, f, 4, r) for w in widths for f in [1, 2, 3, 4] for r in [2, 3] if w * f <= 4]
+	np.testing.assert_allclose(grid, expected)
+
+@pytest.mark.parametrize("method", ["sobol", "lhs", "random"])
+def test_sampling_respects_types(method):
+	space = ParameterSpace.from_dict(SPEC)
+	points = space.sample(64, method, seed=0)
+	assert points.shape == (64, 5)
+	np.testing.assert_allclose(points[:,0], np.round(points[:,0] / 0.25) * 0.25)
+	assert np.all((points[:,0] >= 0.5) & (points[:,0] <= 2))
+	assert np.all(np.isin(points[:,1], [1, 2, 3, 4]))
+	np.testing.assert_array_equal(points[:,1], points[:,2])
+	assert np.all(points[:,3] == 4)
+	assert np.all(np.isin(points[:,4], [2, 3]))
+	assert np.all(points[:,0] * points[:,1] <= 4)
+	np.testing.assert_array_equal(points, space.sample(64, method, seed=0))
+
+@pytest.mark.parametrize("constraint", ["__import__('os').getcwd() > 0", "width.real > 0", "unknown < 1", "'a' < 'b'"])
+def test_unsafe_constraints_are_rejected(constraint):
+	with pytest.raises(ValueError):
+		ParameterSpace.from_dict({**SPEC, "constraints": [constraint]})
+
+def test_example_opamp_space():
+	space = ParameterSpace.from_file(os.path.join(GDSFACTORY_GEN, "opamp_param_space.yaml"))
+	# the same points in the same order as the full get_small_parameter_list
+	assert space.grid().shape == (7776, 18)
+	pytest.importorskip("gdsfactory")
+	from sky130_nist_tapeout import get_small_parameter_list
+	assert np.array_equal(space.grid(), get_small_parameter_list())
+	bounds = space.bounds()
+	assert bounds.shape == (18, 3)
+	assert tuple(bounds[16]) == (2, 3, 1)
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+pytest.importorskip("gf180")
+from gdsfactory.pdk import get_active_pdk
+from pygen.pdk.sky130_mapped import sky130_mapped_pdk
+from pygen.pdk.gf180_mapped import gf180_mapped_pdk
+from pygen.pdk.util.pdk_context import scoped_pdk
+from pygen.via_gen import via_stack
+from pygen.straight_route import straight_route
+from pygen.pdk.util.hierarchy import geometry_fingerprint
+
+def test_scopes_nest_and_restore():
+	sky130_mapped_pdk.activate()
+	with gf180_mapped_pdk.scope():
+		assert get_active_pdk().name == "gf180" and scoped_pdk() is gf180_mapped_pdk
+		with sky130_mapped_pdk.scope():
+			assert get_active_pdk().name == "sky130"
+			# generators activate (a copy of) the scoped pdk, which is free, any other pdk is an error
+			via_stack(sky130_mapped_pdk, "met1", "met2")
+			with pytest.raises(RuntimeError, match="pdk_scope of sky130"):
+				gf180_mapped_pdk.activate()
+		assert get_active_pdk().name == "gf180"
+	assert get_active_pdk().name == "sky130" and scoped_pdk() is None
+
+def test_threads_build_both_pdks():
+	def build(pdk):
+		stack = via_stack(pdk, "met1", "met3")
+		route = straight_route(pdk, stack.ports["top_met_W"], stack.ports["top_met_E"])
+		return geometry_fingerprint(stack) + geometry_fingerprint(route)
+	expected = dict()
+	for pdk in (sky130_mapped_pdk, gf180_mapped_pdk):
+		with pdk.scope():
+			expected[pdk.name] = build(pdk)
+	results, errors = list(), list()
+	def worker(pdk):
+		try:
+			for _ in range(3):
+				with pdk.scope():
+					results.append((pdk.name, build(pdk)))
+		except Exception as error:
+			errors.append(error)
+	threads = [threading.Thread(target=worker, args=(pdk,)) for pdk in 2 * [sky130_mapped_pdk, gf180_mapped_pdk]]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert errors == [] and len(results) == 12
+	assert all(fingerprint == expected[name] for name, fingerprint in results)
+
+def test_threads_started_inside_a_scope():
+	# worker threads do not inherit the scope, their activate() of the active pdk must not wait for the scope to end
+	with sky130_mapped_pdk.scope():
+		expected = [geometry_fingerprint(via_stack(sky130_mapped_pdk, "met1", glayer)) for glayer in ["met2", "met3"]]
+		with ThreadPoolExecutor(2) as executor:
+			futures = executor.map(lambda glayer: geometry_fingerprint(via_stack(sky130_mapped_pdk, "met1", glayer)), ["met2", "met3"])
+			assert list(futures) == expected
+		# switching the pdk from under the scope is refused instead of silently changing this build
+		with ThreadPoolExecutor(1) as executor:
+			with pytest.raises(RuntimeError, match="pdk_scope of sky130"):
+				executor.submit(gf180_mapped_pdk.activate).result()
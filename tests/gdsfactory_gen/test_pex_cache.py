@@ -0,0 +1,76 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+from pex_cache import PEXCache
+
+@pytest.fixture
+def extraction(tmp_path):
+	gds_path = tmp_path / "opamp.gds"
+	gds_path.write_bytes(b"layout one")
+	magicrc = tmp_path / "sky130A.magicrc"
+	magicrc.write_text("tech load sky130A\n")
+	return gds_path, magicrc
+
+def test_key_sensitivity(tmp_path, extraction):
+	gds_path, magicrc = extraction
+	cache = PEXCache(tmp_path / "cache", setup_files=[magicrc], settings={"mode": "pex"})
+	key = cache.key(gds_path, "opamp", "opamp_pex.spice")
+	assert key == cache.key(gds_path, "opamp", "opamp_pex.spice")
+	assert key == PEXCache(tmp_path / "cache", setup_files=[magicrc], settings={"mode": "pex"}).key(gds_path, "opamp", "opamp_pex.spice")
+	# the top cell, netlist name, and extraction settings are part of the key
+	assert key != cache.key(gds_path, "opamp2", "opamp_pex.spice")
+	assert key != cache.key(gds_path, "opamp", "opamp_lvs.spice")
+	assert key != PEXCache(tmp_path / "cache", setup_files=[magicrc], settings={"mode": "lvs"}).key(gds_path, "opamp", "opamp_pex.spice")
+	# so are the layout bytes and the contents of the setup files (hashed when the cache is created)
+	gds_path.write_bytes(b"layout two")
+	assert key != cache.key(gds_path, "opamp", "opamp_pex.spice")
+	gds_path.write_bytes(b"layout one")
+	magicrc.write_text("tech load sky130B\n")
+	assert key == cache.key(gds_path, "opamp", "opamp_pex.spice")
+	assert key != PEXCache(tmp_path / "cache", setup_files=[magicrc], settings={"mode": "pex"}).key(gds_path, "opamp", "opamp_pex.spice")
+
+def test_fetch_after_store(tmp_path, extraction):
+	gds_path, magicrc = extraction
+	cache = PEXCache(tmp_path / "cache", setup_files=[magicrc])
+	key = cache.key(gds_path, "opamp", "opamp_pex.spice")
+	work_dir = tmp_path / "work"
+	work_dir.mkdir()
+	netlist = work_dir / "opamp_pex.spice"
+	# failed extractions (missing or empty netlists) are not stored
+	assert not cache.store(key, netlist)
+	netlist.write_text("")
+	assert not cache.store(key, netlist)
+	netlist.write_text(".subckt opamp\n.ends\n")
+	assert cache.store(key, netlist, {"index": 3})
+	# storing the same key again keeps the first entry
+	netlist.write_text(".subckt other\n.ends\n")
+	assert cache.store(key, netlist)
+	destination = tmp_path / "destination"
+	destination.mkdir()
+	assert cache.fetch(key, "opamp_pex.spice", destination)
+	assert (destination / "opamp_pex.spice").read_text() == ".subckt opamp\n.ends\n"
+	assert not any(entry.name.startswith(".staging_") for entry in cache.cache_dir.iterdir())
+
+def test_miss_accounting(tmp_path, extraction):
+	gds_path, magicrc = extraction
+	cache = PEXCache(tmp_path / "cache", setup_files=[magicrc])
+	key = cache.key(gds_path, "opamp", "opamp_pex.spice")
+	destination = tmp_path / "destination"
+	destination.mkdir()
+	assert not cache.fetch(key, "opamp_pex.spice", destination)
+	assert not (destination / "opamp_pex.spice").exists()
+	netlist = tmp_path / "opamp_pex.spice"
+	netlist.write_text(".subckt opamp\n.ends\n")
+	cache.store(key, netlist)
+	assert cache.fetch(key, "opamp_pex.spice", destination)
+	assert (cache.hits, cache.misses) == (1, 1)
+	# the stats are shared through the cache directory, another process sees the events of this one
+	other = PEXCache(tmp_path / "cache", setup_files=[magicrc])
+	assert not other.fetch(other.key(gds_path, "opamp", "opamp_lvs.spice"), "opamp_lvs.spice", destination)
+	assert (other.hits, other.misses) == (0, 1)
+	assert other.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "entries": 1}
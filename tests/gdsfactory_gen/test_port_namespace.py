@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+gf = pytest.importorskip("gdsfactory")
+np = pytest.importorskip("numpy")
+from pygen.pdk.util.port_utils import PortNamespace, PortTree, rename_ports_by_orientation
+
+def port_summary(comp):
+	return [(name, tuple(np.round(port.center, 6)), port.orientation, port.width) for name, port in comp.ports.items()]
+
+def child():
+	comp = gf.Component()
+	for i, x in enumerate([0, 4]):
+		rect = comp << gf.components.rectangle(size=(1, 2), layer=(1, 0))
+		rect.movex(x)
+		comp.add_ports(rect.get_ports_list(), prefix="finger_" + str(i) + "_")
+	return comp
+
+def placed_refs(top, comp):
+	refs = [top << comp, top << comp]
+	refs[0].rotate(90).movex(3)
+	refs[1].mirror().movey(-7)
+	return refs
+
+def test_lazy_ports_match_add_ports():
+	comp = child()
+	eager, lazy = gf.Component(), gf.Component()
+	for i, ref in enumerate(placed_refs(eager, comp)):
+		eager.add_ports(ref.get_ports_list(), prefix="row" + str(i) + "_")
+	lazy_ports = PortNamespace(lazy)
+	for i, ref in enumerate(placed_refs(lazy, comp)):
+		lazy_ports.add_ref_ports(ref, prefix="row" + str(i) + "_")
+	# lookups transform single ports without adding them to the component
+	assert len(lazy.ports) == 0 and len(lazy_ports) == len(eager.ports)
+	assert np.allclose(lazy_ports["row1_finger_0_e1"].center, eager.ports["row1_finger_0_e1"].center)
+	lazy_ports.materialize()
+	assert port_summary(lazy) == port_summary(eager)
+
+def test_lookups_and_renames():
+	top = gf.Component()
+	ref = top << child()
+	ref.movex(10)
+	assert PortNamespace(ref)["finger_1_e1"].center.tolist() == ref.ports["finger_1_e1"].center.tolist()
+	top.add_ports(ref.get_ports_list(), prefix="a_")
+	expected = rename_ports_by_orientation(top.copy())
+	ports = PortNamespace(top)
+	assert len(ports.prefix("a_finger_0")) == 4
+	assert sorted(port.name for port in ports.glob("a_finger_*_e3")) == ["a_finger_0_e3", "a_finger_1_e3"]
+	assert ports.ls("a_finger") == PortTree(top).ls("a_finger") == ["0", "1"]
+	with pytest.raises(KeyError):
+		ports.ls("b")
+	ports.rename_by_orientation()
+	assert port_summary(top) == port_summary(expected)
+	ports.rename_prefix("a_finger_1", "b")
+	assert len(ports.prefix("b")) == 4 and ports.prefix("a_finger_1") == []
+	assert "b_N" in ports and "a_finger_0_N" in top.ports
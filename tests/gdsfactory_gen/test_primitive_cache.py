@@ -0,0 +1,65 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from pygen.pdk.sky130_mapped import sky130_mapped_pdk as pdk
+from pygen.via_gen import via_stack
+from pygen.fet import nmos
+from pygen.pdk.util.hierarchy import geometry_fingerprint
+from pygen.pdk.util.primitive_cache import set_primitive_cache, clear_primitive_cache, primitive_cache_stats, warm_primitives
+
+@pytest.fixture(autouse=True)
+def primitive_cache():
+	clear_primitive_cache()
+	set_primitive_cache(True)
+	yield
+	set_primitive_cache(False, max_entries=256)
+	clear_primitive_cache()
+
+def test_cached_copies_are_independent():
+	built = via_stack(pdk, "met1", "met3")
+	warm_primitives([(via_stack, (pdk, "met1", "met3"), None), (via_stack, (pdk, "met1", "met3"), dict(fulltop=True))])
+	assert primitive_cache_stats() == {"hits": 1, "misses": 2, "evictions": 0, "entries": 2}
+	cached = via_stack(pdk, "met1", "met3")
+	assert cached is not built and cached.name == built.name
+	assert geometry_fingerprint(cached) == geometry_fingerprint(built)
+	# editing a copy does not change what later calls get
+	cached.add_port(name="extra", center=(0, 0), width=0.1, orientation=0, layer=(68, 20))
+	assert "extra" not in via_stack(pdk, "met1", "met3").ports
+
+def test_disabled_cache_builds_every_call():
+	set_primitive_cache(False)
+	via_stack(pdk, "met1", "met2")
+	via_stack(pdk, "met1", "met2")
+	assert primitive_cache_stats() == {"hits": 0, "misses": 0, "evictions": 0, "entries": 0}
+
+def test_least_recently_used_entries_are_evicted():
+	set_primitive_cache(True, max_entries=2)
+	via_stack(pdk, "met1", "met2")
+	via_stack(pdk, "met1", "met3")
+	via_stack(pdk, "met1", "met2")
+	via_stack(pdk, "met1", "met4")
+	assert primitive_cache_stats() == {"hits": 1, "misses": 3, "evictions": 1, "entries": 2}
+	# met1-met3 was the least recently used one
+	via_stack(pdk, "met1", "met2")
+	via_stack(pdk, "met1", "met3")
+	assert primitive_cache_stats()["misses"] == 4
+	with pytest.raises(ValueError):
+		set_primitive_cache(True, max_entries=0)
+
+def test_transistors_are_cached_on_request():
+	nmos(pdk, width=1, fingers=2)
+	nmos(pdk, width=1, fingers=2)
+	# only the vias and tap ring inside the transistor are cached
+	misses = primitive_cache_stats()["misses"]
+	assert primitive_cache_stats()["hits"] > 0 and misses > 0
+	set_primitive_cache(True, include_large=True)
+	first = nmos(pdk, width=1, fingers=2)
+	second = nmos(pdk, width=1, fingers=2)
+	assert primitive_cache_stats()["misses"] == misses + 2
+	assert geometry_fingerprint(first) == geometry_fingerprint(second)
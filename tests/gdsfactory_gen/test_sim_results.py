@@ -0,0 +1,88 @@
+import os
+import sys
+import shutil
+import numpy as np
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+GDSFACTORY_GEN = os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen')
+sys.path.append(GDSFACTORY_GEN)
+
+pytest.importorskip("gdsfactory")
+from sky130_nist_tapeout import format_variation_deck, get_variation_results, summarize_variation, format_perf_eval_deck, get_sim_results_multitemp
+
+NA = -987.654321
+
+def wrdata(path, rows):
+	"""writes rows like ngspice wrdata, a (scale, value) pair per vector"""
+	path.write_text("".join(" ".join(" 0.000000e+00 " + format(value, "e") for value in row) + "\n" for row in rows))
+	return path
+
+def test_format_variation_deck(tmp_path):
+	deck = shutil.copy(os.path.join(GDSFACTORY_GEN, "opamp_variation_eval.sp"), tmp_path)
+	format_variation_deck(deck, "ss", 16, 1.25, 0.9, temperature=-40, seed=7)
+	text = open(deck).read()
+	assert "{@@" not in text
+	assert ".temp -40" in text and ".param b1 = 1.25" in text and ".param b2 = 0.9" in text
+	assert "sky130.lib.spice ss_mm" in text and "let numSamples = 16" in text and "let seed = 7 + sample" in text
+	assert "result_variation_ac_ss.txt" in text and "result_variation_noise_ss.txt" in text
+	deck = shutil.copy(os.path.join(GDSFACTORY_GEN, "opamp_variation_eval.sp"), tmp_path / "nomismatch.sp")
+	format_variation_deck(deck, "tt", 1, 1, 1, mismatch=False)
+	assert "sky130.lib.spice tt\n" in open(deck).read()
+	with pytest.raises(ValueError):
+		format_variation_deck(deck, "typical", 1, 1, 1)
+	with pytest.raises(ValueError):
+		format_variation_deck(deck, "tt", 0, 1, 1)
+
+def test_get_variation_results(tmp_path):
+	# ac columns are ugb, phase margin, dc gain, power, the third sample failed to converge
+	ac = wrdata(tmp_path / "ac.txt", [(1e7, 60, 80, 1e-3), (2e7, 55, 75, 2e-3)])
+	with open(ac, "a") as ac_file:
+		ac_file.write(" 0 nan 0 garbage\n")
+	noise = wrdata(tmp_path / "noise.txt", [(1e-6,), (2e-6,), (3e-6,)])
+	samples = get_variation_results(ac, noise, 4)
+	assert samples.shape == (4, 5)
+	np.testing.assert_allclose(samples[0], [1e7, 80, 60, 1e-3, 1e-6])
+	np.testing.assert_allclose(samples[1], [2e7, 75, 55, 2e-3, 2e-6])
+	assert np.isnan(samples[2,0]) and np.all(samples[2,1:4] == NA) and samples[2,4] == 3e-6
+	assert np.all(samples[3] == NA)
+	assert np.all(get_variation_results(tmp_path / "missing.txt", noise, 2)[:,:4] == NA)
+
+def test_summarize_variation():
+	samples = np.array([
+		[1e7, 80, 60, 1e-3, 1e-6],
+		[2e7, 70, 50, 2e-3, 2e-6],
+		[3e7, 60, 70, 3e-3, 3e-6],
+		[NA, NA, NA, NA, NA],
+	])
+	summary = summarize_variation(samples, [("ugb", ">=", 1.5e7), ("phaseMargin", ">=", 55)])
+	assert summary["samples"] == 4 and summary["valid_samples"] == 3
+	# only the third sample meets both specs, the failed one counts as failing
+	assert summary["yield"] == 0.25
+	assert summary["ugb"]["mean"] == pytest.approx(2e7) and summary["ugb"]["sigma"] == pytest.approx(1e7)
+	assert summary["dcGain"]["min"] == 60 and summary["dcGain"]["max"] == 80
+	assert summarize_variation(samples)["yield"] == 0.75
+	single = summarize_variation(samples[:1])
+	assert single["yield"] == 1.0 and np.isnan(single["noise"]["sigma"])
+	with pytest.raises(ValueError):
+		summarize_variation(samples, [("area", ">=", 1)])
+	with pytest.raises(ValueError):
+		summarize_variation(samples, [("ugb", ">", 1)])
+
+def test_multi_temperature_results(tmp_path):
+	deck = shutil.copy(os.path.join(GDSFACTORY_GEN, "opamp_perf_eval.sp"), tmp_path)
+	format_perf_eval_deck(deck, [-40, 27.5, 125])
+	text = open(deck).read()
+	assert "{@@" not in text and ".temp -40" in text and "foreach tempC -40 27.5 125" in text
+	with pytest.raises(ValueError):
+		format_perf_eval_deck(deck, [])
+	# one line per temperature: ac is ugb, bias1, bias2, phase margin, dc gain, the hot run is missing from dc
+	ac = wrdata(tmp_path / "ac.txt", [(1e7, 1.1, 0.9, 60, 80), (8e6, 1.2, 0.8, 58, 78), (6e6, 1.3, 0.7, 55, 75)])
+	dc = wrdata(tmp_path / "dc.txt", [(1e-3,), (1.2e-3,)])
+	noise = wrdata(tmp_path / "noise.txt", [(1e-6,), (2e-6,), (3e-6,)])
+	results = get_sim_results_multitemp(ac, dc, noise, 3)
+	assert len(results) == 3
+	assert results[0] == {"ugb": 1e7, "biasVoltage1": 1.1, "biasVoltage2": 0.9, "phaseMargin": 60, "dcGain": 80, "power": 1e-3, "noise": 1e-6}
+	assert results[1]["ugb"] == 8e6 and results[1]["power"] == 1.2e-3 and results[1]["noise"] == 2e-6
+	assert all(value == NA for value in results[2].values())
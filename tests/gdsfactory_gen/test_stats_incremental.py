@@ -0,0 +1,57 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("sklearn")
+from stats_incremental import IncrementalStatsModel, iter_training_chunks
+
+def write_sweep(tmp_path, params, results):
+	np.save(tmp_path / "params.npy", params)
+	np.save(tmp_path / "results.npy", results)
+	return tmp_path / "params.npy", tmp_path / "results.npy"
+
+def make_sweep(num_rows, seed=0):
+	rng = np.random.default_rng(seed)
+	# two well separated groups of parameters
+	params = np.concatenate([rng.normal(0, 0.1, (num_rows // 2, 4)), rng.normal(5, 0.1, (num_rows - num_rows // 2, 4))])
+	results = rng.random((num_rows, 8)) + 0.01
+	results[::10, 0] = -987.654321
+	return params, results
+
+def test_chunks_drop_failed_rows(tmp_path):
+	params, results = make_sweep(1000)
+	files = write_sweep(tmp_path, params, results)
+	chunks = list(iter_training_chunks(*files, chunk_rows=300))
+	assert [end for end, _, _ in chunks] == [300, 600, 900, 1000]
+	assert sum(len(chunk) for _, chunk, _ in chunks) == 900
+	np.testing.assert_array_equal(np.concatenate([chunk for _, chunk, _ in chunks]), params[np.all(results > 0, axis=1)])
+
+def test_update_only_reads_new_rows(tmp_path):
+	params, results = make_sweep(4000)
+	files = write_sweep(tmp_path, params[:3000], results[:3000])
+	model = IncrementalStatsModel(max_clusters=4)
+	assert model.update_from_files(*files, chunk_rows=500) == 3000
+	model.save(tmp_path / "model.pkl")
+	# the sweep grows, the saved model only consumes the added rows
+	files = write_sweep(tmp_path, params, results)
+	model = IncrementalStatsModel.load(tmp_path / "model.pkl")
+	assert model.update_from_files(*files, chunk_rows=500) == 1000
+	assert model.update_from_files(*files, chunk_rows=500) == 0
+	assert (model.rows_consumed, model.rows_fitted) == (4000, 3600)
+	labels = model.predict(params, 2)
+	assert len(set(labels[:2000])) == 1 and len(set(labels[2000:])) == 1 and labels[0] != labels[-1]
+	assert model.transform(params).shape == (4000, 2)
+
+def test_changed_file_is_rejected(tmp_path):
+	params, results = make_sweep(1000)
+	files = write_sweep(tmp_path, params, results)
+	model = IncrementalStatsModel(max_clusters=3)
+	model.update_from_files(*files)
+	write_sweep(tmp_path, params[::-1], results)
+	with pytest.raises(ValueError):
+		model.update_from_files(*files)
@@ -0,0 +1,71 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+pytest.importorskip("sklearn")
+import sky130_nist_tapeout
+from sky130_nist_tapeout import cluster_results_hierarchical, stats_dataset_hash, fit_stats_models
+
+def dataset(num_rows=30, seed=0):
+	rng = np.random.default_rng(seed)
+	return rng.uniform(0, 10, (num_rows,4)), rng.uniform(0, 1, (num_rows,3))
+
+def test_dataset_hash_keys():
+	params, results = dataset()
+	key = stats_dataset_hash(params, results)
+	assert key == stats_dataset_hash(params.copy(), results.copy())
+	# the dtype does not matter, the values do
+	assert stats_dataset_hash(params.round(), results) == stats_dataset_hash(params.round().astype(int), results)
+	# the data, its shape, and the number of clusters are part of the key
+	changed = results.copy()
+	changed[7,1] += 1e-9
+	assert key != stats_dataset_hash(params, changed)
+	assert key != stats_dataset_hash(params[:-1], results[:-1])
+	assert key != stats_dataset_hash(params.reshape(15,8), results)
+	assert key != stats_dataset_hash(params, results, max_clusters=5)
+
+def test_cached_models_are_loaded(tmp_path, monkeypatch, capsys):
+	params, results = dataset()
+	models = fit_stats_models(params, results, max_clusters=3, cache_dir=tmp_path, processes=1)
+	cache_files = list(tmp_path.glob("*.npz"))
+	assert [path.name for path in cache_files] == [stats_dataset_hash(params, results, 3) + ".npz"]
+	assert models["pca_result"].shape == (30,2) and models["inertias"].shape == (3,)
+	assert models["hierarchical_labels"].shape == (30,) and "pair_0_2" in models
+	# the second call must not fit anything (no worker pool is started)
+	def no_pool(*args, **kwargs):
+		raise AssertionError("models were refit instead of loaded from the cache")
+	monkeypatch.setattr(sky130_nist_tapeout, "get_context", no_pool)
+	capsys.readouterr()
+	cached = fit_stats_models(params, results, max_clusters=3, cache_dir=tmp_path, processes=1)
+	assert "loaded cached models" in capsys.readouterr().out
+	assert cached.keys() == models.keys()
+	for name in models:
+		np.testing.assert_array_equal(cached[name], models[name])
+	# other settings are a different cache entry
+	with pytest.raises(AssertionError, match="refit"):
+		fit_stats_models(params, results, max_clusters=4, cache_dir=tmp_path, processes=1)
+
+def test_subsampled_clustering():
+	rng = np.random.default_rng(3)
+	# three well separated groups, only 60 of the 3000 rows are clustered
+	groups = np.repeat(np.arange(3), 1000)
+	column = np.array([0, 100, 1000])[groups] + rng.uniform(0, 1, 3000)
+	labels = cluster_results_hierarchical(column, max_clusters=3, max_points=60)
+	assert labels.shape == (3000,)
+	assert all(len(np.unique(labels[groups == group])) == 1 for group in range(3))
+	assert len(np.unique(labels)) == 3
+	# unclustered rows get the cluster of the nearest clustered value, so clusters stay intervals of the values
+	column = rng.uniform(0, 1, 2000)
+	column[:10] = column[10]
+	labels = cluster_results_hierarchical(column, max_clusters=4, max_points=100)
+	assert len(np.unique(labels[:11])) == 1
+	sorted_labels = labels[np.argsort(column, kind="stable")]
+	assert np.count_nonzero(np.diff(sorted_labels)) == 3 and len(np.unique(labels)) == 4
+	# small columns are clustered directly
+	np.testing.assert_array_equal(cluster_results_hierarchical(column[:50], max_clusters=4), cluster_results_hierarchical(column[:50], max_clusters=4, max_points=50))
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+from sweep_queue import SweepQueue, run_worker, FAILED_RESULT_VALUE
+
+def double_params(index, params):
+	time.sleep(0.01)
+	return 2 * params
+
+def slow_double_params(index, params):
+	time.sleep(1.0)
+	return 2 * params
+
+def fail_on_three(index, params):
+	if index == 3:
+		raise RuntimeError("simulation crashed")
+	return 2 * params
+
+def worker_process(db_path, completed):
+	completed.put(run_worker(db_path, double_params, poll_interval=0.05))
+
+@pytest.fixture
+def params():
+	return np.arange(60, dtype=np.float64).reshape(20, 3)
+
+def test_multiple_worker_processes(tmp_path, params):
+	queue = SweepQueue.create(tmp_path / "queue.db", params, metadata={"sim_temps": np.array([27.0])})
+	context = multiprocessing.get_context("fork")
+	completed = context.Queue()
+	workers = [context.Process(target=worker_process, args=(str(queue.db_path), completed)) for _ in range(4)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join(timeout=60)
+		assert worker.exitcode == 0
+	assert sum(completed.get() for _ in workers) == len(params)
+	assert queue.progress()["done"] == len(params)
+	merged_params, merged_results = queue.merge(tmp_path / "params.npy", tmp_path / "results.npy")
+	np.testing.assert_array_equal(merged_params, params)
+	np.testing.assert_array_equal(np.load(tmp_path / "results.npy"), 2 * params)
+	np.testing.assert_array_equal(queue.get_metadata("sim_temps"), [27.0])
+
+def test_expired_lease_is_reissued(tmp_path, params):
+	queue = SweepQueue.create(tmp_path / "queue.db", params[:4], lease_seconds=0.2)
+	# a worker leases job 0 and dies without a heartbeat
+	assert queue.lease("dead-worker")[0] == 0
+	with pytest.raises(RuntimeError):
+		queue.merge()
+	time.sleep(0.3)
+	assert queue.progress()["expired"] == 1
+	assert run_worker(queue, double_params, owner="live-worker", poll_interval=0.05) == 4
+	_, results = queue.merge()
+	np.testing.assert_array_equal(results, 2 * params[:4])
+	# the dead worker lost its lease
+	assert not queue.heartbeat(0, "dead-worker")
+
+def test_heartbeat_keeps_lease(tmp_path, params):
+	queue = SweepQueue.create(tmp_path / "queue.db", params[:1], lease_seconds=0.4)
+	context = multiprocessing.get_context("fork")
+	worker = context.Process(target=run_worker, args=(str(queue.db_path), slow_double_params), kwargs={"heartbeat_interval": 0.1})
+	worker.start()
+	time.sleep(0.7)
+	# the job runs longer than the lease but is not issued again
+	assert queue.lease("other-worker") is None
+	worker.join(timeout=30)
+	assert queue.progress()["done"] == 1
+
+def test_failed_jobs_after_max_attempts(tmp_path, params):
+	queue = SweepQueue.create(tmp_path / "queue.db", params[:5], max_attempts=2)
+	assert run_worker(queue, fail_on_three, poll_interval=0.05) == 4
+	assert queue.progress()["failed"] == 1
+	index, attempts, error = queue.failures()[0]
+	assert (index, attempts) == (3, 2)
+	assert "simulation crashed" in error
+	_, results = queue.merge()
+	assert np.all(results[3] == FAILED_RESULT_VALUE)
+	np.testing.assert_array_equal(results[4], 2 * params[4])
@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+
+# Add the gdsfactory-gen directory to the path
+# TODO: Find a better way to import the modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'openfasoc', 'generators', 'gdsfactory-gen'))
+
+pytest.importorskip("gdsfactory")
+from gdsfactory.component import Component
+from pygen.pdk.sky130_mapped import sky130_mapped_pdk as pdk
+from pygen.via_gen import via_array, via_array_ring, via_stack
+from pygen.pdk.util.comp_utils import evaluate_bbox
+from pygen.pdk.util.hierarchy import geometry_fingerprint, hierarchical_output
+
+@pytest.mark.parametrize("enclosed_rectangle, horizontal_glayer, vertical_glayer", [
+	((2.0, 4.0), "met2", "met1"),
+	((13.37, 7.21), "met3", "met2"),
+])
+def test_matches_four_via_arrays(enclosed_rectangle, horizontal_glayer, vertical_glayer):
+	# the ring vias as tapring used to place them, one via_array reference per side
+	width = 0.34
+	expected = Component()
+	for prefix, glayer, along, move in [("N_", horizontal_glayer, 0, (0, 1)), ("E_", vertical_glayer, 1, (1, 0)), ("S_", horizontal_glayer, 0, (0, -1)), ("W_", vertical_glayer, 1, (-1, 0))]:
+		size = 2 * [evaluate_bbox(via_stack(pdk, "active_tap", glayer))[0]]
+		size[along] = enclosed_rectangle[along]
+		ref = expected << via_array(pdk, "active_tap", glayer, tuple(size), minus1=True)
+		ref.move(tuple(round(0.5 * direction * (enclosed_rectangle[i] + width), 4) for i, direction in enumerate(move)))
+		expected.add_ports(ref.get_ports_list(), prefix=prefix)
+	ring = via_array_ring(pdk, enclosed_rectangle, width, "active_tap", horizontal_glayer, vertical_glayer)
+	assert geometry_fingerprint(ring) == geometry_fingerprint(expected.flatten())
+
+def test_hierarchical_sides_are_arrays():
+	with hierarchical_output(True):
+		ring = via_array_ring(pdk, (20.0, 10.0), 0.34)
+	with hierarchical_output(False):
+		expected = via_array_ring(pdk, (20.0, 10.0), 0.34)
+	via_refs = [ref for ref in ring.references if ref.parent.name.startswith("via_stack")]
+	assert len(via_refs) == 4 and all(ref.rows * ref.columns > 1 for ref in via_refs)
+	assert geometry_fingerprint(ring.flatten()) == geometry_fingerprint(expected)